@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Backfill Job Cost Ledger
+
+The profitability report reads the `job_costs` collection, which is written
+as jobs clear and when their job cards or timesheets change. This script
+costs every completed order into it, so jobs finished before the ledger
+existed are reported too.
+
+Usage:
+    python backfill_job_costs.py
+
+Note: This script is idempotent - each job's ledger entry is replaced with a
+fresh costing, so it can be rerun after changing material or machine rates.
+"""
+
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+from dotenv import load_dotenv
+from datetime import datetime
+from job_costing import backfill_job_costs, COSTED_ORDER_QUERY, JOB_COSTS_COLLECTION
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+
+if not MONGO_URL or not DB_NAME:
+    print("❌ Error: MONGO_URL or DB_NAME not found in environment")
+    sys.exit(1)
+
+async def main():
+    """Main migration function"""
+    print("\n" + "="*60)
+    print("DATABASE MIGRATION: Backfill Job Cost Ledger")
+    print("="*60)
+    print(f"Database: {DB_NAME}")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("="*60 + "\n")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        await db.command('ping')
+        print("✅ Connected to MongoDB successfully\n")
+
+        completed = await db.orders.count_documents(COSTED_ORDER_QUERY)
+        print(f"📝 Costing {completed} completed orders...")
+
+        costed = await backfill_job_costs(db)
+        print(f"✅ {costed} jobs written to {JOB_COSTS_COLLECTION}")
+
+        total = await db[JOB_COSTS_COLLECTION].count_documents({})
+        print(f"\n📊 Ledger now holds {total} jobs")
+
+        print("\n" + "="*60)
+        print("✅ MIGRATION COMPLETED SUCCESSFULLY")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+from typing import Dict, List, Optional
+from pymongo import UpdateOne
+import logging
+
+# display_order ranks are sparse: a card dropped between two others gets the
+# midpoint of their ranks, so a move normally rewrites only that card. When
+# neighbours end up closer than MIN_RANK_GAP (or share a rank, like cards that
+# were never ranked) the whole column is renumbered RANK_GAP apart.
+RANK_GAP = 1.0
+MIN_RANK_GAP = 1e-6
+
+# Rank the board assumes for cards that have never been ordered
+UNRANKED = 999
+
+logger = logging.getLogger(__name__)
+
+_transactions_supported: Optional[bool] = None
+
+def rank_between(previous_rank: Optional[float], next_rank: Optional[float]) -> Optional[float]:
+    """Rank for a card dropped between two neighbours, or None if there's no room"""
+    if previous_rank is None and next_rank is None:
+        return 0.0
+    if previous_rank is None:
+        return next_rank - RANK_GAP
+    if next_rank is None:
+        return previous_rank + RANK_GAP
+    if next_rank - previous_rank <= MIN_RANK_GAP:
+        return None
+    return (previous_rank + next_rank) / 2
+
+def spaced_ranks(order_ids: List[str]) -> Dict[str, float]:
+    """Evenly spaced ranks for a full column, in the given order"""
+    return {order_id: index * RANK_GAP for index, order_id in enumerate(order_ids)}
+
+async def transactions_supported(client) -> bool:
+    """True when connected to a replica set or mongos (standalone servers can't run transactions)"""
+    global _transactions_supported
+    if _transactions_supported is None:
+        try:
+            hello = await client.admin.command("ismaster")
+            _transactions_supported = bool(hello.get("setName")) or hello.get("msg") == "isdbgrid"
+        except Exception as e:
+            logger.warning(f"Could not determine MongoDB topology: {str(e)}")
+            return False
+    return _transactions_supported
+
+async def write_display_orders(client, collection, ranks: Dict[str, float]) -> int:
+    """Write {order_id: rank} in one unordered bulk_write.
+
+    Runs inside a transaction when the deployment supports one, so a failed
+    drag never leaves a column half renumbered.
+    """
+    if not ranks:
+        return 0
+    operations = [
+        UpdateOne({"id": order_id}, {"$set": {"display_order": rank}})
+        for order_id, rank in ranks.items()
+    ]
+    if len(operations) > 1 and await transactions_supported(client):
+        async with await client.start_session() as session:
+            async with session.start_transaction():
+                result = await collection.bulk_write(operations, ordered=False, session=session)
+    else:
+        result = await collection.bulk_write(operations, ordered=False)
+    return result.matched_count
@@ -0,0 +1,87 @@
+from datetime import datetime
+from typing import Dict
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+import logging
+import re
+
+# One document per sequence: {"_id": <counter name>, "seq": <last value issued>}.
+# find_one_and_update with $inc hands out each value exactly once, however many
+# requests race for it.
+COUNTERS_COLLECTION = "counters"
+INVOICE_COUNTER_NAME = "invoice_number:INV"
+
+ORDER_NUMBER_PATTERN = re.compile(r"^ADM-(\d{4})-(\d+)$")
+INVOICE_NUMBER_PATTERN = re.compile(r"^INV-(\d+)(?:~\d+)?$")
+
+logger = logging.getLogger(__name__)
+
+def order_counter_name(year: int) -> str:
+    return f"order_number:ADM-{year}"
+
+async def next_sequence(db, name: str) -> int:
+    """Atomically increment and return the named counter (first value is 1)"""
+    for _ in range(2):
+        try:
+            counter = await db[COUNTERS_COLLECTION].find_one_and_update(
+                {"_id": name},
+                {"$inc": {"seq": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            return counter["seq"]
+        except DuplicateKeyError:
+            # Two first-ever upserts raced; the loser retries against the new document
+            continue
+    raise RuntimeError(f"Could not allocate a value from counter {name}")
+
+async def seed_counter(db, name: str, value: int):
+    """Raise a counter to at least value. Never lowers it, so safe to repeat."""
+    await db[COUNTERS_COLLECTION].update_one({"_id": name}, {"$max": {"seq": value}}, upsert=True)
+
+async def next_order_number(db, year: int = None) -> str:
+    year = year or datetime.now().year
+    return f"ADM-{year}-{await next_sequence(db, order_counter_name(year)):04d}"
+
+async def next_invoice_number(db) -> str:
+    return f"INV-{await next_sequence(db, INVOICE_COUNTER_NAME):04d}"
+
+async def seed_order_counters(db, year: int = None) -> Dict[str, int]:
+    """Seed order counters from the highest existing ADM-YYYY-NNNN per year.
+
+    Pass year to seed only that year (uses the order_number index prefix).
+    """
+    prefix = f"^ADM-{year}-" if year else "^ADM-"
+    highest: Dict[int, int] = {}
+    async for order in db.orders.find({"order_number": {"$regex": prefix}}, {"_id": 0, "order_number": 1}):
+        match = ORDER_NUMBER_PATTERN.match(order.get("order_number") or "")
+        if match:
+            order_year, number = int(match.group(1)), int(match.group(2))
+            highest[order_year] = max(highest.get(order_year, 0), number)
+
+    seeded = {}
+    for order_year, number in highest.items():
+        await seed_counter(db, order_counter_name(order_year), number)
+        seeded[order_counter_name(order_year)] = number
+    return seeded
+
+async def seed_invoice_counter(db) -> Dict[str, int]:
+    """Seed the invoice counter past every number the old scheme could have issued.
+
+    The old scheme used count_documents({}) + 1, so the counter starts at the
+    larger of the invoice count and the highest INV-NNNN already stored.
+    """
+    highest = await db.invoices.count_documents({})
+    async for invoice in db.invoices.find({"invoice_number": {"$regex": r"^INV-\d"}}, {"_id": 0, "invoice_number": 1}):
+        match = INVOICE_NUMBER_PATTERN.match(invoice.get("invoice_number") or "")
+        if match:
+            highest = max(highest, int(match.group(1)))
+    await seed_counter(db, INVOICE_COUNTER_NAME, highest)
+    return {INVOICE_COUNTER_NAME: highest}
+
+async def seed_counters(db) -> Dict[str, int]:
+    """Seed every counter from existing data"""
+    seeded = await seed_order_counters(db)
+    seeded.update(await seed_invoice_counter(db))
+    logger.info(f"Seeded counters: {seeded}")
+    return seeded
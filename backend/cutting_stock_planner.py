@@ -0,0 +1,154 @@
+from typing import Dict, Any, Optional
+import math
+import time
+from slitting_optimizer import find_slit_patterns
+
+DEFAULT_CPU_TIME_LIMIT_SECONDS = 10.0
+
+# Demand below this many slit-rolls is treated as met (floating point slack)
+DEMAND_EPSILON = 1e-6
+
+def _best_pattern(master_width_mm: float, remaining: Dict[float, float], max_waste_mm: float):
+    """Highest-yield single pattern that doesn't cut more of a width than is still needed"""
+    max_counts = {width: math.ceil(need - DEMAND_EPSILON) for width, need in remaining.items()}
+    widths = [width for width, count in max_counts.items() if count > 0]
+    search = find_slit_patterns(
+        master_width_mm,
+        widths,
+        max_waste_mm,
+        max_results=1,
+        time_budget_seconds=1.0,
+        max_counts=max_counts
+    )
+    if not search.patterns:
+        return None
+    return {width: count for width, count in zip(search.widths, search.patterns[0]) if count}
+
+def _pack_remaining(master_width_mm: float, remaining: Dict[float, float]):
+    """Pack the slit-rolls still needed into as few master rolls as possible (first-fit decreasing)"""
+    rolls = []
+    free_width = []
+    for width in sorted(remaining, reverse=True):
+        for _ in range(math.ceil(remaining[width] - DEMAND_EPSILON)):
+            roll = next((i for i, free in enumerate(free_width) if width <= free + DEMAND_EPSILON), None)
+            if roll is None:
+                roll = len(rolls)
+                rolls.append({})
+                free_width.append(master_width_mm)
+            rolls[roll][width] = rolls[roll].get(width, 0) + 1
+            free_width[roll] -= width
+    return rolls
+
+def plan_cutting_stock(
+    master_width_mm: float,
+    master_roll_length_m: float,
+    demand_meters: Dict[float, float],
+    max_waste_mm: Optional[float] = None,
+    cpu_time_limit_seconds: float = DEFAULT_CPU_TIME_LIMIT_SECONDS
+) -> Dict[str, Any]:
+    """Plan how many master rolls to slit, and with which patterns, to cover the demand.
+
+    Uses a sequential heuristic: demand is expressed in slit-rolls (one master
+    roll length of a width), the highest-yield pattern that doesn't overproduce
+    any width is found with the bounded knapsack search, and it is run as many
+    times as it can be without overproducing. This repeats until the demand is
+    met. Once no pattern fits within max_waste_mm (typically when only part
+    rolls are left), or the CPU time limit is reached, what is left is packed
+    into as few master rolls as possible, and any pattern wasting more than
+    max_waste_mm is flagged. The material lower bound (total demanded area
+    over master roll area) is returned so the plan's quality can be judged.
+
+    Runs in a worker process, so arguments and result are plain data.
+    """
+    start = time.process_time()
+    if max_waste_mm is None:
+        max_waste_mm = master_width_mm
+
+    totals: Dict[float, float] = {}
+    for width, meters in demand_meters.items():
+        totals[float(width)] = totals.get(float(width), 0) + float(meters)
+    demand_meters = totals
+
+    # Demand in slit-rolls per width, skipping widths that can't be cut from this master
+    remaining = {
+        float(width): meters / master_roll_length_m
+        for width, meters in demand_meters.items()
+        if meters > 0 and 0 < float(width) <= master_width_mm
+    }
+    unplannable = sorted(float(w) for w, m in demand_meters.items() if m > 0 and float(w) > master_width_mm)
+    demanded_area = sum(width * need for width, need in remaining.items())
+    lower_bound = math.ceil(demanded_area / master_width_mm - DEMAND_EPSILON) if demanded_area else 0
+
+    schedule = []
+    timed_out = False
+    while any(need > DEMAND_EPSILON for need in remaining.values()):
+        pattern = None
+        if time.process_time() - start < cpu_time_limit_seconds:
+            pattern = _best_pattern(
+                master_width_mm,
+                {w: need for w, need in remaining.items() if need > DEMAND_EPSILON},
+                max_waste_mm
+            )
+        else:
+            timed_out = True
+        if not pattern:
+            # Finish off whatever is left together, even past the waste limit
+            for packed in _pack_remaining(
+                master_width_mm,
+                {w: need for w, need in remaining.items() if need > DEMAND_EPSILON}
+            ):
+                for width, count in packed.items():
+                    remaining[width] -= count
+                schedule.append((packed, 1))
+            break
+
+        # Run the pattern as often as possible without overproducing any width in it
+        runs = max(1, min(int((remaining[w] + DEMAND_EPSILON) // count) for w, count in pattern.items()))
+        for width, count in pattern.items():
+            remaining[width] -= count * runs
+        schedule.append((pattern, runs))
+
+    # Merge repeated patterns so the schedule reads as one line per setup
+    merged: Dict[tuple, int] = {}
+    for pattern, runs in schedule:
+        key = tuple(sorted(pattern.items(), reverse=True))
+        merged[key] = merged.get(key, 0) + runs
+
+    plan = []
+    produced: Dict[float, float] = {}
+    for key, runs in sorted(merged.items(), key=lambda item: -item[1]):
+        used_width = sum(width * count for width, count in key)
+        for width, count in key:
+            produced[width] = produced.get(width, 0) + count * runs * master_roll_length_m
+        plan.append({
+            "pattern": [f"{width}mm" for width, count in key for _ in range(count)],
+            "pattern_description": " + ".join(f"{count}×{width}mm" for width, count in key),
+            "master_rolls": runs,
+            "used_width_mm": round(used_width, 2),
+            "waste_mm": round(master_width_mm - used_width, 2),
+            "yield_percentage": round(used_width / master_width_mm * 100, 2),
+            "exceeds_waste_limit": master_width_mm - used_width > max_waste_mm + DEMAND_EPSILON
+        })
+
+    total_rolls = sum(entry["master_rolls"] for entry in plan)
+    total_used_area = sum(entry["used_width_mm"] * entry["master_rolls"] for entry in plan)
+
+    return {
+        "patterns": plan,
+        "total_master_rolls": total_rolls,
+        "lower_bound_master_rolls": lower_bound,
+        "master_rolls_over_waste_limit": sum(entry["master_rolls"] for entry in plan if entry["exceeds_waste_limit"]),
+        "average_yield_percentage": round(total_used_area / (total_rolls * master_width_mm) * 100, 2) if total_rolls else 0,
+        "demand": [
+            {
+                "slit_width_mm": width,
+                "required_meters": round(demand_meters.get(width, 0), 2),
+                "planned_meters": round(produced.get(width, 0), 2),
+                "surplus_meters": round(produced.get(width, 0) - demand_meters.get(width, 0), 2)
+            }
+            for width in sorted(produced, reverse=True)
+        ],
+        "unplannable_widths_mm": unplannable,
+        "timed_out": timed_out,
+        "cpu_seconds": round(time.process_time() - start, 3)
+    }
@@ -0,0 +1,28 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+# Date fields the reports compare and group on. Older documents hold some of
+# them as ISO strings, since update_order stored them straight from the JSON
+# body; normalise_date_fields.py converts those to real dates.
+DATE_FIELDS = {
+    "orders": ["due_date", "completed_at", "created_at", "updated_at", "invoice_date"],
+    "archived_orders": ["due_date", "completed_at", "created_at"],
+}
+
+def as_utc_datetime(value) -> Optional[datetime]:
+    """Normalise a stored date (ISO string or naive/aware datetime) to an aware UTC datetime"""
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        # Mongo hands back naive datetimes that are already UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def to_date_expression(field: str) -> dict:
+    """Aggregation expression reading field as a date, or null if it can't be read as one"""
+    return {"$convert": {"input": f"${field}", "to": "date", "onError": None, "onNull": None}}
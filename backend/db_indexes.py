@@ -0,0 +1,271 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+import json
+import logging
+import os
+from production_events import PRODUCTION_EVENTS_COLLECTION, PRODUCTION_EVENT_TTL_SECONDS, STREAM_TICKETS_COLLECTION
+from production_board import BOARD_CHANGES_COLLECTION, BOARD_CHANGE_TTL_SECONDS
+
+# Collections whose documents are always created with a uuid "id" field and
+# looked up by it. Each gets a unique index on id.
+ID_COLLECTIONS = [
+    "users", "clients", "orders", "materials", "suppliers", "products",
+    "client_products", "product_specifications", "machinery_rates",
+    "raw_material_stock", "raw_substrate_stock", "slit_widths", "stocktakes",
+    "manual_stocktakes", "page_templates", "label_templates", "invoices",
+    "job_cards", "job_specifications", "employee_profiles", "timesheets",
+    "payslips", "leave_requests",
+]
+
+# Secondary indexes for the lookups the API makes on every request path.
+# Names are fixed so the index report can match registry entries to what the
+# server actually has.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "users": [
+        IndexModel([("username", ASCENDING)], name="username_1"),
+        IndexModel([("email", ASCENDING)], name="email_1"),
+    ],
+    "orders": [
+        IndexModel([("order_number", ASCENDING)], name="order_number_1", unique=True),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING)], name="status_1_created_at_-1"),
+        IndexModel([("current_stage", ASCENDING), ("created_at", DESCENDING)], name="current_stage_1_created_at_-1"),
+        IndexModel([("client_id", ASCENDING), ("created_at", DESCENDING)], name="client_id_1_created_at_-1"),
+        IndexModel([("created_at", DESCENDING)], name="created_at_-1"),
+    ],
+    "clients": [
+        IndexModel([("is_active", ASCENDING), ("company_name", ASCENDING)], name="is_active_1_company_name_1"),
+    ],
+    "products": [
+        IndexModel([("client_id", ASCENDING)], name="client_id_1"),
+    ],
+    "client_products": [
+        IndexModel([("client_id", ASCENDING)], name="client_id_1"),
+    ],
+    "stock_movements": [
+        IndexModel([("reference", ASCENDING), ("movement_type", ASCENDING), ("is_archived", ASCENDING)], name="reference_1_movement_type_1_is_archived_1"),
+        IndexModel([("reference_id", ASCENDING)], name="reference_id_1"),
+        IndexModel([("stock_id", ASCENDING), ("created_at", DESCENDING)], name="stock_id_1_created_at_-1"),
+        IndexModel([("product_id", ASCENDING), ("client_id", ASCENDING), ("movement_type", ASCENDING)], name="product_id_1_client_id_1_movement_type_1"),
+    ],
+    "stock_alerts": [
+        IndexModel([("stock_id", ASCENDING)], name="stock_id_1"),
+    ],
+    "raw_material_stock": [
+        IndexModel([("material_id", ASCENDING)], name="material_id_1"),
+    ],
+    "raw_substrate_stock": [
+        IndexModel([("client_id", ASCENDING), ("product_id", ASCENDING)], name="client_id_1_product_id_1"),
+        IndexModel([("source_order_id", ASCENDING)], name="source_order_id_1"),
+    ],
+    "production_logs": [
+        IndexModel([("order_id", ASCENDING), ("timestamp", ASCENDING)], name="order_id_1_timestamp_1"),
+    ],
+    "job_specifications": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_1"),
+    ],
+    "job_cards": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_1"),
+    ],
+    "job_costs": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_1", unique=True),
+        IndexModel([("created_at", DESCENDING)], name="created_at_-1"),
+        IndexModel([("client_id", ASCENDING), ("created_at", DESCENDING)], name="client_id_1_created_at_-1"),
+    ],
+    "report_rollups": [
+        IndexModel([("kind", ASCENDING), ("client_id", ASCENDING), ("month", ASCENDING)], name="kind_1_client_id_1_month_1"),
+        IndexModel([("kind", ASCENDING), ("day", ASCENDING)], name="kind_1_day_1"),
+    ],
+    "materials_status": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_1"),
+    ],
+    "order_items_status": [
+        IndexModel([("order_id", ASCENDING)], name="order_id_1"),
+    ],
+    "stocktakes": [
+        IndexModel([("month", ASCENDING)], name="month_1"),
+    ],
+    "employee_profiles": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+        IndexModel([("employee_number", ASCENDING)], name="employee_number_1"),
+        IndexModel([("is_active", ASCENDING)], name="is_active_1"),
+    ],
+    "timesheets": [
+        IndexModel([("employee_id", ASCENDING), ("week_starting", DESCENDING)], name="employee_id_1_week_starting_-1"),
+        IndexModel([("status", ASCENDING), ("week_starting", DESCENDING)], name="status_1_week_starting_-1"),
+        IndexModel([("order_id", ASCENDING)], name="order_id_1"),
+    ],
+    "payslips": [
+        IndexModel([("timesheet_id", ASCENDING)], name="timesheet_id_1"),
+        IndexModel([("employee_id", ASCENDING)], name="employee_id_1"),
+    ],
+    "leave_requests": [
+        IndexModel([("employee_id", ASCENDING)], name="employee_id_1"),
+        IndexModel([("status", ASCENDING)], name="status_1"),
+    ],
+    "leave_adjustments": [
+        IndexModel([("employee_id", ASCENDING)], name="employee_id_1"),
+    ],
+    "xero_tokens": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_1"),
+    ],
+    "xero_auth_states": [
+        IndexModel([("state", ASCENDING)], name="state_1"),
+    ],
+    PRODUCTION_EVENTS_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=PRODUCTION_EVENT_TTL_SECONDS),
+    ],
+    STREAM_TICKETS_COLLECTION: [
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_1", expireAfterSeconds=0),
+    ],
+    BOARD_CHANGES_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=BOARD_CHANGE_TTL_SECONDS),
+    ],
+}
+
+for _collection in ID_COLLECTIONS:
+    INDEX_REGISTRY.setdefault(_collection, []).insert(0, IndexModel([("id", ASCENDING)], name="id_1", unique=True))
+
+# When set, startup turns on the MongoDB profiler for operations slower than
+# this many milliseconds so the index report can list them
+MONGO_PROFILER_SLOW_MS = os.getenv("MONGO_PROFILER_SLOW_MS")
+
+# Slow operations returned by the index report
+SLOW_QUERY_LIMIT = 50
+
+logger = logging.getLogger(__name__)
+
+def _key_spec(key) -> List[List[Any]]:
+    # list_indexes may return directions as floats; text/hashed stay strings
+    return [
+        [field, int(direction) if isinstance(direction, (int, float)) else direction]
+        for field, direction in key.items()
+    ]
+
+async def ensure_indexes(db) -> Dict[str, Any]:
+    """Create every registered index that doesn't exist yet.
+
+    create_index is a no-op for an identical existing index, so this is safe
+    to run on every startup. Each index is created on its own: one failure
+    (for example duplicate order numbers blocking the unique index) is logged
+    and the rest still get built.
+    """
+    created = 0
+    failed = []
+    for collection_name, models in INDEX_REGISTRY.items():
+        collection = db[collection_name]
+        for model in models:
+            name = model.document["name"]
+            try:
+                await collection.create_indexes([model])
+                created += 1
+            except OperationFailure as e:
+                failed.append({"collection": collection_name, "index": name, "error": str(e)})
+                logger.error(f"Failed to create index {name} on {collection_name}: {str(e)}")
+    if failed:
+        logger.warning(f"{len(failed)} registered indexes could not be created; see /api/system/indexes")
+    else:
+        logger.info(f"Verified {created} registered indexes")
+    return {"verified": created, "failed": failed}
+
+async def enable_profiler(db, slow_ms: Optional[str] = MONGO_PROFILER_SLOW_MS):
+    """Profile operations slower than slow_ms when MONGO_PROFILER_SLOW_MS is set"""
+    if not slow_ms:
+        return
+    try:
+        await db.command("profile", 1, slowms=int(slow_ms))
+        logger.info(f"MongoDB profiler recording operations slower than {slow_ms}ms")
+    except (OperationFailure, ValueError) as e:
+        # Managed clusters may not allow changing the profiling level
+        logger.warning(f"Could not enable MongoDB profiler: {str(e)}")
+
+async def _collection_index_report(db, collection_name: str) -> Dict[str, Any]:
+    collection = db[collection_name]
+    existing = {}
+    async for index in collection.list_indexes():
+        existing[index["name"]] = _key_spec(index["key"])
+
+    usage = {}
+    try:
+        async for stat in collection.aggregate([{"$indexStats": {}}]):
+            usage[stat["name"]] = stat.get("accesses", {})
+    except OperationFailure as e:
+        logger.warning(f"$indexStats unavailable for {collection_name}: {str(e)}")
+
+    registered = INDEX_REGISTRY.get(collection_name, [])
+    registered_keys = [_key_spec(model.document["key"]) for model in registered]
+    existing_keys = list(existing.values())
+
+    missing = [
+        {"name": model.document["name"], "key": key, "unique": model.document.get("unique", False)}
+        for model, key in zip(registered, registered_keys)
+        if key not in existing_keys
+    ]
+
+    indexes = []
+    for name, key in existing.items():
+        accesses = usage.get(name, {})
+        ops = accesses.get("ops")
+        indexes.append({
+            "name": name,
+            "key": key,
+            "registered": name == "_id_" or key in registered_keys,
+            "ops": ops,
+            "since": accesses.get("since"),
+            "unused": name != "_id_" and ops == 0,
+        })
+
+    return {
+        "collection": collection_name,
+        "missing": missing,
+        "unused": [index["name"] for index in indexes if index["unused"]],
+        "unregistered": [index["name"] for index in indexes if not index["registered"]],
+        "indexes": indexes,
+    }
+
+async def _slow_queries(db, min_ms: int, limit: int) -> Dict[str, Any]:
+    try:
+        profile = await db.command("profile", -1)
+    except OperationFailure as e:
+        return {"enabled": False, "error": str(e), "queries": []}
+
+    queries = []
+    cursor = db["system.profile"].find(
+        {"millis": {"$gte": min_ms}},
+        {"_id": 0, "op": 1, "ns": 1, "millis": 1, "ts": 1, "planSummary": 1,
+         "docsExamined": 1, "keysExamined": 1, "nreturned": 1,
+         "command.filter": 1, "command.sort": 1, "command.pipeline": 1, "command.q": 1}
+    ).sort("ts", DESCENDING).limit(limit)
+    async for entry in cursor:
+        entry["collection_scan"] = entry.get("planSummary") == "COLLSCAN"
+        # Filters can hold ObjectIds, regexes or binary values; keep them readable
+        queries.append(json.loads(json.dumps(entry, default=str)))
+
+    return {
+        "enabled": profile.get("was", 0) > 0,
+        "level": profile.get("was", 0),
+        "slow_ms": profile.get("slowms"),
+        "queries": queries,
+    }
+
+async def index_report(db, slow_ms: int = 100, limit: int = SLOW_QUERY_LIMIT) -> Dict[str, Any]:
+    """Missing, unused and unregistered indexes plus recent slow operations.
+
+    Usage counts come from $indexStats and reset when mongod restarts, so an
+    index is only reported unused since the returned ``since`` time.
+    """
+    existing_collections = set(await db.list_collection_names())
+    collections = []
+    for collection_name in sorted(INDEX_REGISTRY):
+        if collection_name not in existing_collections:
+            continue
+        collections.append(await _collection_index_report(db, collection_name))
+
+    return {
+        "generated_at": datetime.now(timezone.utc),
+        "missing_count": sum(len(c["missing"]) for c in collections),
+        "unused_count": sum(len(c["unused"]) for c in collections),
+        "collections": collections,
+        "slow_queries": await _slow_queries(db, slow_ms, limit),
+    }
@@ -0,0 +1,187 @@
+from typing import Dict, Any, List, Optional
+import cProfile
+import logging
+import pstats
+import threading
+import time
+
+import orjson
+
+from auth import verify_token
+from models import UserRole
+from http_responses import dumps
+from request_metrics import RequestStats, current_request_stats, _current_request
+
+DEBUG_PROFILE_HEADER = "x-debug-profile"
+
+# Functions listed in the Python profile summary, by cumulative time
+PROFILE_TOP_FUNCTIONS = 40
+
+logger = logging.getLogger(__name__)
+
+# cProfile hooks the whole thread, so only one request is profiled at a time.
+# Others still get their Mongo breakdown.
+_profiler_lock = threading.Lock()
+
+def _is_admin(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() != "bearer":
+                return False
+            payload = verify_token(token)
+            return payload is not None and payload.get("role") == UserRole.ADMIN.value
+    return False
+
+def _wants_profile(scope) -> bool:
+    for name, value in scope.get("headers", []):
+        if name == DEBUG_PROFILE_HEADER.encode():
+            return value.strip().lower() not in (b"", b"0", b"false", b"off")
+    return False
+
+def _python_profile(profiler: cProfile.Profile) -> Dict[str, Any]:
+    stats = pstats.Stats(profiler)
+    rows = []
+    for (filename, line, function), (_, ncalls, tottime, cumtime, _) in stats.stats.items():
+        rows.append({
+            "function": f"{filename}:{line}({function})",
+            "calls": ncalls,
+            "own_ms": round(tottime * 1000, 3),
+            "cumulative_ms": round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row["cumulative_ms"], reverse=True)
+    return {"total_ms": round(stats.total_tt * 1000, 3), "top_functions": rows[:PROFILE_TOP_FUNCTIONS]}
+
+def _db_summary(stats: RequestStats) -> Dict[str, Any]:
+    by_collection: Dict[str, Dict[str, Any]] = {}
+    for command in stats.commands or []:
+        key = f"{command['collection'] or '-'}.{command['command']}"
+        entry = by_collection.setdefault(key, {"count": 0, "time_ms": 0.0, "docs": 0})
+        entry["count"] += 1
+        entry["time_ms"] = round(entry["time_ms"] + command.get("duration_ms", 0), 3)
+        entry["docs"] += command.get("docs") or 0
+    return {
+        "commands": stats.db_commands,
+        "time_ms": round(stats.db_seconds * 1000, 3),
+        "by_collection": dict(sorted(by_collection.items(), key=lambda item: item[1]["time_ms"], reverse=True)),
+    }
+
+def _content_type(start_message) -> str:
+    return dict(start_message["headers"]).get(b"content-type", b"").decode("latin-1")
+
+class DebugProfileMiddleware:
+    """Per-request profile for admins who send ``X-Debug-Profile: 1``.
+
+    The response comes back as ``{"response": ..., "debug_profile": ...}``:
+    every Mongo command the request issued (collection, filter shape with
+    values replaced by types, duration, documents returned) and a cProfile
+    summary of Python time on the event loop. Non-JSON responses (PDFs,
+    spreadsheets) are replaced by their content type and size. Event streams
+    and other non-JSON streaming responses are passed straight through
+    unprofiled, since buffering them could take forever.
+
+    cProfile sees everything the event loop runs meanwhile, including other
+    requests, and nothing done in the worker pools; the Mongo breakdown is
+    exact for this request.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _wants_profile(scope) or not _is_admin(scope):
+            await self.app(scope, receive, send)
+            return
+
+        stats = current_request_stats()
+        token = None
+        if stats is None:
+            stats = RequestStats()
+            token = _current_request.set(stats)
+        stats.commands = []
+
+        start_message = None
+        body_parts: List[bytes] = []
+        passthrough = False
+        profiler: Optional[cProfile.Profile] = None
+
+        def stop_profiling():
+            nonlocal profiler
+            if profiler is not None:
+                profiler.disable()
+                profiler = None
+                _profiler_lock.release()
+
+        async def start_passthrough():
+            nonlocal passthrough
+            passthrough = True
+            stop_profiling()
+            await send(start_message)
+
+        async def capture(message):
+            nonlocal start_message
+            if passthrough:
+                await send(message)
+            elif message["type"] == "http.response.start":
+                start_message = message
+                if _content_type(message).startswith("text/event-stream"):
+                    await start_passthrough()
+            elif message["type"] == "http.response.body":
+                if message.get("more_body") and not body_parts and not _content_type(start_message).startswith("application/json"):
+                    await start_passthrough()
+                    await send(message)
+                else:
+                    body_parts.append(message.get("body", b""))
+
+        if _profiler_lock.acquire(blocking=False):
+            profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            if profiler is not None:
+                profiler.enable()
+            await self.app(scope, receive, capture)
+        finally:
+            profiled = profiler
+            stop_profiling()
+            if token is not None:
+                _current_request.reset(token)
+
+        if passthrough:
+            return
+        if start_message is None:
+            # Nothing to wrap; let the server report the missing response
+            logger.warning(f"Debug profile {scope['method']} {scope['path']}: no response was started")
+            return
+
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 3)
+        body = b"".join(body_parts)
+        headers = [(name, value) for name, value in start_message["headers"]
+                   if name not in (b"content-length", b"content-type", b"content-encoding", b"content-disposition")]
+        content_type = _content_type(start_message)
+
+        if content_type.startswith("application/json"):
+            try:
+                original = orjson.loads(body) if body else None
+            except orjson.JSONDecodeError:
+                original = body.decode("utf-8", errors="replace")
+        else:
+            original = {"content_type": content_type, "bytes": len(body)}
+
+        profile = {
+            "method": scope["method"],
+            "path": scope["path"],
+            "status": start_message["status"],
+            "duration_ms": elapsed_ms,
+            "db": _db_summary(stats),
+            "db_commands": stats.commands,
+            "python": _python_profile(profiled) if profiled is not None else "skipped: another request is being profiled",
+        }
+        logger.info(
+            f"Debug profile {scope['method']} {scope['path']}: {elapsed_ms}ms, "
+            f"{stats.db_commands} DB commands in {round(stats.db_seconds * 1000, 1)}ms"
+        )
+
+        content = dumps({"response": original, "debug_profile": profile})
+        headers += [(b"content-type", b"application/json"), (b"content-length", str(len(content)).encode())]
+        await send({"type": "http.response.start", "status": start_message["status"], "headers": headers})
+        await send({"type": "http.response.body", "body": content})
@@ -0,0 +1,188 @@
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import Response
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from file_utils import UPLOAD_DIR
+
+# Rendered order documents are kept on disk so repeat downloads skip ReportLab.
+# Least recently served files are evicted once either limit is exceeded.
+DOCUMENT_CACHE_DIR = os.path.join(UPLOAD_DIR, "document_cache")
+DOCUMENT_CACHE_MAX_BYTES = int(os.getenv("DOCUMENT_CACHE_MAX_MB", "200")) * 1024 * 1024
+DOCUMENT_CACHE_MAX_FILES = int(os.getenv("DOCUMENT_CACHE_MAX_FILES", "5000"))
+
+logger = logging.getLogger(__name__)
+
+def document_cache_key(doc_type: str, order: dict, render_data: Dict[str, Any], template_id: str = None) -> str:
+    """Content address for one rendered order document.
+
+    Built from the document type, order id, order version (``updated_at``),
+    template id and a digest of the exact data handed to the renderer, so a
+    change to the order, its client or anything else printed on the document
+    produces a new key rather than a stale PDF.
+    """
+    payload = json.dumps(
+        jsonable_encoder({
+            "doc_type": doc_type,
+            "order_id": order["id"],
+            "order_version": order.get("updated_at") or order.get("created_at"),
+            "template_id": template_id,
+            "data": render_data,
+        }),
+        sort_keys=True,
+        default=str
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class DocumentCache:
+    """On-disk LRU cache of rendered PDFs.
+
+    Files are named ``<order_id>-<key>.pdf`` so every document for an order can
+    be dropped when the order changes. The LRU index is kept in memory and
+    rebuilt from file modification times on first use. The disk work runs in
+    worker threads, so the index and byte count are only touched under _lock.
+    """
+
+    def __init__(self, directory: str = DOCUMENT_CACHE_DIR, max_bytes: int = DOCUMENT_CACHE_MAX_BYTES, max_files: int = DOCUMENT_CACHE_MAX_FILES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_files = max_files
+        self._index: Optional[OrderedDict] = None  # filename -> size, least recently used first
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load_index(self):
+        if self._index is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        entries = []
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if entry.is_file() and entry.name.endswith(".pdf"):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, entry.name, stat.st_size))
+        entries.sort()
+        self._index = OrderedDict((name, size) for _, name, size in entries)
+        self._total_bytes = sum(self._index.values())
+
+    def _path(self, filename: str) -> str:
+        return os.path.join(self.directory, filename)
+
+    def _forget(self, filename: str):
+        size = self._index.pop(filename, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _remove(self, filename: str):
+        self._forget(filename)
+        try:
+            os.remove(self._path(filename))
+        except FileNotFoundError:
+            pass
+
+    def _lookup(self, order_id: str, key: str) -> Optional[str]:
+        filename = f"{order_id}-{key}.pdf"
+        path = self._path(filename)
+        with self._lock:
+            self._load_index()
+            if filename not in self._index or not os.path.exists(path):
+                self._forget(filename)
+                return None
+            self._index.move_to_end(filename)
+            os.utime(path)  # keeps the order across restarts
+        return path
+
+    def _store(self, order_id: str, key: str, content: bytes) -> str:
+        filename = f"{order_id}-{key}.pdf"
+        path = self._path(filename)
+        # Write to a temp file and rename so a reader never sees a partial PDF
+        temp_path = self._path(f".{uuid.uuid4().hex}.tmp")
+        with open(temp_path, "wb") as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            self._load_index()
+            self._forget(filename)
+            self._index[filename] = len(content)
+            self._total_bytes += len(content)
+            while self._index and (self._total_bytes > self.max_bytes or len(self._index) > self.max_files):
+                oldest = next(iter(self._index))
+                if oldest == filename:
+                    break
+                self._remove(oldest)
+        return path
+
+    def _invalidate_order(self, order_id: str):
+        prefix = f"{order_id}-"
+        with self._lock:
+            self._load_index()
+            for filename in [name for name in self._index if name.startswith(prefix)]:
+                self._remove(filename)
+
+    async def get(self, order_id: str, key: str) -> Optional[str]:
+        """Path of the cached PDF for this key, or None"""
+        path = await asyncio.to_thread(self._lookup, order_id, key)
+        if path is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return path
+
+    async def put(self, order_id: str, key: str, content: bytes) -> Optional[str]:
+        """Store a rendered PDF; a disk failure only costs the cache entry"""
+        try:
+            return await asyncio.to_thread(self._store, order_id, key, content)
+        except OSError as e:
+            logger.error(f"Failed to cache document for order {order_id}: {str(e)}")
+            return None
+
+    async def invalidate_order(self, order_id: str):
+        """Drop every cached document for an order after it changes"""
+        try:
+            await asyncio.to_thread(self._invalidate_order, order_id)
+        except OSError as e:
+            logger.error(f"Failed to invalidate cached documents for order {order_id}: {str(e)}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "files": len(self._index or {}),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "max_files": self.max_files,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+document_cache = DocumentCache()
+
+def cached_pdf_response(content: bytes, key: str, filename: str) -> Response:
+    """Serve a cacheable PDF with its content address as a strong ETag.
+
+    Takes the bytes rather than the cache path: the file can be evicted or
+    invalidated before a FileResponse would get round to opening it.
+    """
+    return Response(
+        content,
+        media_type="application/pdf",
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            "ETag": f'"{key}"',
+            "Cache-Control": "private, no-cache"
+        }
+    )
+
+def not_modified(request, key: str) -> Optional[Response]:
+    """304 response when the client already holds this exact document"""
+    if_none_match = request.headers.get("if-none-match", "")
+    if f'"{key}"' in if_none_match or if_none_match.strip() == "*":
+        return Response(status_code=304, headers={"ETag": f'"{key}"'})
+    return None
@@ -238,13 +238,14 @@ class DocumentGenerator:
         # Calculate delivery date based on client lead time
         lead_time_days = order_data.get('client_lead_time_days', 7)
         from datetime import datetime, timedelta
-        delivery_date = datetime.now() + timedelta(days=lead_time_days)
+        document_date = order_data.get('document_date') or datetime.now()
+        delivery_date = document_date + timedelta(days=lead_time_days)
         
         # Order details table
         order_data_table = [
             ['Order Number:', order_data.get('order_number', 'N/A')],
             ['Invoice Number:', order_data.get('invoice_number', 'TBD')],
-            ['Date:', datetime.now().strftime('%d/%m/%Y')],
+            ['Date:', document_date.strftime('%d/%m/%Y')],
             ['Due Date:', order_data.get('due_date', 'N/A')],
             ['Estimated Delivery:', delivery_date.strftime('%d/%m/%Y')],
             ['Lead Time:', f"{lead_time_days} business days"]
@@ -445,7 +446,7 @@ class DocumentGenerator:
         packing_header = [
             ['Order Number:', order_data.get('order_number', 'N/A')],
             ['Customer:', order_data.get('client_name', 'N/A')],
-            ['Ship Date:', datetime.now().strftime('%d/%m/%Y')],
+            ['Ship Date:', (order_data.get('document_date') or datetime.now()).strftime('%d/%m/%Y')],
             ['Delivery Address:', order_data.get('delivery_address', 'N/A')]
         ]
         
@@ -518,7 +519,7 @@ class DocumentGenerator:
         invoice_header = [
             ['Invoice Number:', invoice_data.get('invoice_number', 'N/A')],
             ['Order Number:', invoice_data.get('order_number', 'N/A')],
-            ['Invoice Date:', datetime.now().strftime('%d/%m/%Y')],
+            ['Invoice Date:', (invoice_data.get('document_date') or datetime.now()).strftime('%d/%m/%Y')],
             ['Due Date:', invoice_data.get('payment_due_date', 'N/A')]
         ]
         
@@ -0,0 +1,514 @@
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import letter, A4
+from reportlab.lib.units import inch
+from reportlab.lib import colors
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.enums import TA_CENTER
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from io import BytesIO
+from PyPDF2 import PdfReader, PdfWriter
+import asyncio
+import base64
+import logging
+import os
+import zipfile
+from document_generator import DocumentGenerator
+from job_executor import job_executor
+
+# PDFs are rendered in the shared worker processes so ReportLab never blocks
+# the event loop. A render that takes longer than this is abandoned with 504.
+PDF_RENDER_TIMEOUT_SECONDS = float(os.getenv("PDF_RENDER_TIMEOUT_SECONDS", "30"))
+
+# Size of each chunk when streaming a rendered PDF back to the client
+PDF_STREAM_CHUNK_SIZE = 64 * 1024
+
+logger = logging.getLogger(__name__)
+
+# One generator per worker process; building its style sheet isn't free
+_generator: Optional[DocumentGenerator] = None
+
+def _document_generator() -> DocumentGenerator:
+    global _generator
+    if _generator is None:
+        _generator = DocumentGenerator()
+    return _generator
+
+def _format_date(date_value) -> str:
+    """Safely format date from various types"""
+    if not date_value:
+        return "N/A"
+    try:
+        # Handle datetime objects directly
+        if isinstance(date_value, datetime):
+            return date_value.strftime("%Y-%m-%d")
+        # Handle string dates
+        elif isinstance(date_value, str):
+            # Parse ISO format string
+            dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
+            return dt.strftime("%Y-%m-%d")
+        # Handle date objects
+        elif hasattr(date_value, 'strftime'):
+            return date_value.strftime("%Y-%m-%d")
+        else:
+            # Convert to string as fallback
+            return str(date_value)
+    except Exception as e:
+        logger.warning(f"Date formatting error for value {date_value} (type: {type(date_value)}): {str(e)}")
+        return "N/A"
+
+def build_template_pdf(template: Dict[str, Any], order_data: Dict[str, Any]) -> bytes:
+    """Render an order document from a page template's positioned elements"""
+    buffer = BytesIO()
+    pdf = canvas.Canvas(buffer, pagesize=(template.get('page_width', 595), template.get('page_height', 842)))
+
+    # Render each element from template
+    for element in template.get('elements', []):
+        element_type = element.get('type')
+        x = element.get('x', 0)
+        y = template.get('page_height', 842) - element.get('y', 0) - element.get('height', 0)  # Flip Y coordinate
+
+        if element_type == 'text':
+            # Render static text or label
+            pdf.setFont("Helvetica-Bold" if element.get('fontWeight') == 'bold' else "Helvetica", element.get('fontSize', 12))
+            pdf.setFillColor(element.get('color', '#000000'))
+            pdf.drawString(x, y, element.get('content', ''))
+
+        elif element_type == 'field':
+            # Render dynamic field data
+            field_type = element.get('field_type')
+            value = order_data.get(field_type, f"{{{field_type}}}")
+
+            pdf.setFont("Helvetica-Bold" if element.get('fontWeight') == 'bold' else "Helvetica", element.get('fontSize', 12))
+            pdf.setFillColor(element.get('color', '#000000'))
+            pdf.drawString(x, y, str(value))
+
+        elif element_type == 'shape':
+            shape_type = element.get('shape_type')
+            width = element.get('width', 100)
+            height = element.get('height', 100)
+
+            pdf.setStrokeColor(element.get('borderColor', '#000000'))
+            pdf.setLineWidth(element.get('borderWidth', 1))
+
+            filled = bool(element.get('fillColor')) and element.get('fillColor') != 'transparent'
+            if filled:
+                pdf.setFillColor(element.get('fillColor'))
+
+            if shape_type == 'rectangle':
+                pdf.rect(x, y, width, height, fill=1 if filled else 0, stroke=1)
+            elif shape_type == 'circle':
+                radius = min(width, height) / 2
+                pdf.circle(x + radius, y + radius, radius, fill=1 if filled else 0, stroke=1)
+            elif shape_type == 'line':
+                pdf.line(x, y, x + width, y)
+
+        elif element_type == 'image' and element.get('src'):
+            # Handle base64 images
+            try:
+                image_data = element.get('src', '')
+                if image_data.startswith('data:image'):
+                    # Extract base64 data
+                    image_bytes = base64.b64decode(image_data.split(',')[1])
+                    pdf.drawImage(ImageReader(BytesIO(image_bytes)), x, y,
+                                  width=element.get('width', 200),
+                                  height=element.get('height', 150))
+            except Exception as e:
+                logger.error(f"Error rendering image: {str(e)}")
+
+    pdf.save()
+    return buffer.getvalue()
+
+def build_stock_description_pdf(stock: Dict[str, Any], stock_type: str, movements: List[Dict[str, Any]]) -> bytes:
+    """Printable description of a substrate or raw material stock unit with its recent movements"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
+
+    # Container for PDF elements
+    elements = []
+    styles = getSampleStyleSheet()
+
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#1e40af'),
+        spaceAfter=30,
+        alignment=TA_CENTER
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#1e3a8a'),
+        spaceAfter=12,
+        spaceBefore=12
+    )
+
+    # Title
+    elements.append(Paragraph("Adela Merchants - Stock Description", title_style))
+    elements.append(Spacer(1, 0.3*inch))
+
+    # Stock Information
+    if stock_type == "substrate":
+        elements.append(Paragraph("Product on Hand", heading_style))
+
+        data = [
+            ["Product Code:", stock.get("product_code", "N/A")],
+            ["Description:", stock.get("product_description", "N/A")],
+            ["Client:", stock.get("client_name", "N/A")],
+            ["Quantity on Hand:", f"{stock.get('quantity_on_hand', 0)} {stock.get('unit_of_measure', 'units')}"],
+            ["Minimum Stock Level:", f"{stock.get('minimum_stock_level', 0)} {stock.get('unit_of_measure', 'units')}"],
+            ["Source Order:", stock.get("source_order_id", "N/A")],
+            ["Location:", stock.get("location", "Main Warehouse")],
+            ["Last Updated:", _format_date(stock.get("created_at"))]
+        ]
+    else:
+        elements.append(Paragraph("Raw Material Stock", heading_style))
+
+        data = [
+            ["Material Name:", stock.get("material_name", "N/A")],
+            ["Material ID:", stock.get("material_id", "N/A")],
+            ["Quantity on Hand:", f"{stock.get('quantity_on_hand', 0)} {stock.get('unit_of_measure', 'kg')}"],
+            ["Minimum Stock Level:", f"{stock.get('minimum_stock_level', 0)} {stock.get('unit_of_measure', 'kg')}"],
+            ["Usage Rate/Month:", f"{stock.get('usage_rate_per_month', 0)} {stock.get('unit_of_measure', 'kg')}"],
+            ["Alert Threshold:", f"{stock.get('alert_threshold_days', 7)} days"],
+            ["Supplier:", stock.get("supplier_name", "N/A")],
+            ["Last Updated:", _format_date(stock.get("created_at"))]
+        ]
+
+    # Create table
+    table = Table(data, colWidths=[2.5*inch, 4*inch])
+    table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
+        ('TOPPADDING', (0, 0), (-1, -1), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+    ]))
+
+    elements.append(table)
+    elements.append(Spacer(1, 0.5*inch))
+
+    if movements:
+        elements.append(Paragraph("Recent Stock Movements", heading_style))
+
+        movement_data = [["Date", "Type", "Quantity", "Reference"]]
+        for movement in movements:
+            movement_data.append([
+                _format_date(movement.get("created_at")),
+                movement.get("movement_type", "N/A").title(),
+                f"{movement.get('quantity', 0)} {stock.get('unit_of_measure', 'units')}",
+                movement.get("reference", "N/A")[:30]
+            ])
+
+        movement_table = Table(movement_data, colWidths=[1.2*inch, 1.2*inch, 1.5*inch, 2.6*inch])
+        movement_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ]))
+
+        elements.append(movement_table)
+
+    # Footer
+    elements.append(Spacer(1, 0.5*inch))
+
+    footer_text = f"Generated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}"
+    footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
+    elements.append(Paragraph(footer_text, footer_style))
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+def build_payslip_pdf(data: Dict[str, Any]) -> bytes:
+    """Payslip PDF from a stored payslip's payslip_data"""
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
+    story = []
+    styles = getSampleStyleSheet()
+
+    # Custom styles
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=24,
+        textColor=colors.HexColor('#F59E0B'),
+        alignment=TA_CENTER,
+        spaceAfter=20
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=14,
+        textColor=colors.HexColor('#F59E0B'),
+        spaceAfter=10
+    )
+
+    # Title
+    story.append(Paragraph("PAYSLIP", title_style))
+    story.append(Paragraph("Misty Manufacturing", styles['Normal']))
+    story.append(Spacer(1, 0.3*inch))
+
+    # Employee Information
+    story.append(Paragraph("EMPLOYEE INFORMATION", heading_style))
+    emp_data = [
+        ['Name:', data['employee']['name'], 'Employee Number:', data['employee']['employee_number']],
+        ['Position:', data['employee']['position'], 'Department:', data['employee']['department']],
+        ['Tax File Number:', data['employee']['tax_file_number'], '', '']
+    ]
+    emp_table = Table(emp_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+    emp_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(emp_table)
+    story.append(Spacer(1, 0.2*inch))
+
+    # Pay Period
+    story.append(Paragraph("PAY PERIOD", heading_style))
+    period_data = [
+        ['Week Starting:', data['pay_period']['week_start'], 'Week Ending:', data['pay_period']['week_end']]
+    ]
+    period_table = Table(period_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+    period_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(period_table)
+    story.append(Spacer(1, 0.2*inch))
+
+    # Hours Worked
+    story.append(Paragraph("HOURS WORKED", heading_style))
+    hours_data = [
+        ['Regular Hours:', f"{data['hours']['regular_hours']}h", 'Rate:', f"${data['hours']['hourly_rate']:.2f}/hr"],
+        ['Overtime Hours:', f"{data['hours']['overtime_hours']}h", 'Rate:', f"${data['hours']['hourly_rate'] * 1.5:.2f}/hr"],
+    ]
+
+    # Add leave hours if present
+    if data['hours'].get('leave_hours', 0) > 0:
+        hours_data.append(['Leave Hours:', f"{data['hours']['leave_hours']}h", '', ''])
+
+    hours_data.append(['Total Hours:', f"{data['hours'].get('total_hours', data['hours']['regular_hours'] + data['hours']['overtime_hours'])}h", '', ''])
+
+    hours_table = Table(hours_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
+    hours_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
+    ]))
+    story.append(hours_table)
+    story.append(Spacer(1, 0.2*inch))
+
+    # Leave Used (if any)
+    if data.get('leave_used') and len(data['leave_used']) > 0:
+        story.append(Paragraph("LEAVE USED THIS PERIOD", heading_style))
+        leave_data = []
+        for leave_type, hours in data['leave_used'].items():
+            leave_name = leave_type.replace('_', ' ').title()
+            leave_data.append([leave_name + ':', f"{hours}h"])
+
+        leave_table = Table(leave_data, colWidths=[3*inch, 3*inch])
+        leave_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ]))
+        story.append(leave_table)
+        story.append(Spacer(1, 0.2*inch))
+
+    # Earnings
+    story.append(Paragraph("EARNINGS", heading_style))
+    earnings_data = [
+        ['Regular Pay:', f"${data['earnings']['regular_pay']:.2f}"],
+        ['Overtime Pay:', f"${data['earnings']['overtime_pay']:.2f}"],
+        ['Gross Pay:', f"${data['earnings']['gross_pay']:.2f}"],
+    ]
+    earnings_table = Table(earnings_data, colWidths=[3*inch, 3*inch])
+    earnings_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
+        ('FONTSIZE', (0, -1), (-1, -1), 12),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#10B981')),
+    ]))
+    story.append(earnings_table)
+    story.append(Spacer(1, 0.2*inch))
+
+    # Deductions
+    story.append(Paragraph("DEDUCTIONS", heading_style))
+    deductions_data = [
+        ['PAYG Tax:', f"${data['deductions'].get('payg_tax', data['deductions']['tax_withheld']):.2f}"],
+    ]
+
+    # Add Medicare Levy if present
+    if data['deductions'].get('medicare_levy', 0) > 0:
+        deductions_data.append(['Medicare Levy (2%):', f"${data['deductions']['medicare_levy']:.2f}"])
+
+    # Add HELP withholding if present
+    if data['deductions'].get('help_withholding', 0) > 0:
+        deductions_data.append(['HELP/HECS Repayment:', f"${data['deductions']['help_withholding']:.2f}"])
+
+    # Total tax withheld
+    deductions_data.append(['Total Tax Withheld:', f"${data['deductions']['tax_withheld']:.2f}"])
+    deductions_data.append(['', ''])  # Spacer
+    deductions_data.append(['Superannuation (12%):', f"${data['deductions']['superannuation']:.2f}"])
+    deductions_data.append(['', '(Paid by employer, not deducted from pay)'])
+
+    deductions_table = Table(deductions_data, colWidths=[3*inch, 3*inch])
+    deductions_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LINEABOVE', (0, 3), (-1, 3), 1, colors.grey),
+        ('FONTSIZE', (0, -1), (-1, -1), 8),
+        ('TEXTCOLOR', (0, -1), (-1, -1), colors.grey),
+    ]))
+    story.append(deductions_table)
+    story.append(Spacer(1, 0.2*inch))
+
+    # Net Pay
+    story.append(Paragraph("NET PAY", heading_style))
+    net_data = [
+        ['NET PAY (Paid to your account):', f"${data['net_pay']:.2f}"],
+    ]
+    net_table = Table(net_data, colWidths=[3*inch, 3*inch])
+    net_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 14),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#F59E0B')),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LINEABOVE', (0, 0), (-1, -1), 2, colors.HexColor('#F59E0B')),
+        ('LINEBELOW', (0, 0), (-1, -1), 2, colors.HexColor('#F59E0B')),
+    ]))
+    story.append(net_table)
+    story.append(Spacer(1, 0.3*inch))
+
+    # Leave Balances
+    if data.get('leave_balances'):
+        story.append(Paragraph("LEAVE BALANCES (After this payslip)", heading_style))
+        balance_data = [
+            ['Annual Leave:', f"{data['leave_balances'].get('annual_leave', 0):.1f} hours"],
+            ['Sick Leave:', f"{data['leave_balances'].get('sick_leave', 0):.1f} hours"],
+            ['Personal Leave:', f"{data['leave_balances'].get('personal_leave', 0):.1f} hours"],
+        ]
+        balance_table = Table(balance_data, colWidths=[3*inch, 3*inch])
+        balance_table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, -1), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F3F4F6')),
+        ]))
+        story.append(balance_table)
+        story.append(Spacer(1, 0.2*inch))
+
+    # Payment Details
+    story.append(Paragraph("PAYMENT DETAILS", heading_style))
+    payment_data = [
+        ['BSB:', data['bank_details']['bsb']],
+        ['Account Number:', data['bank_details']['account_number']],
+        ['Superannuation Fund:', data['bank_details']['superannuation_fund']],
+    ]
+    payment_table = Table(payment_data, colWidths=[3*inch, 3*inch])
+    payment_table.setStyle(TableStyle([
+        ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    story.append(payment_table)
+    story.append(Spacer(1, 0.3*inch))
+
+    # Footer
+    footer_text = f"Generated: {datetime.fromisoformat(data['generated_at'].replace('Z', '+00:00')).strftime('%d %B %Y at %I:%M %p')}"
+    story.append(Paragraph(footer_text, styles['Normal']))
+
+    doc.build(story)
+    return buffer.getvalue()
+
+def merge_pdfs(documents: List[bytes]) -> bytes:
+    """Concatenate rendered PDFs into one file, in the order given"""
+    writer = PdfWriter()
+    for content in documents:
+        writer.append(PdfReader(BytesIO(content)))
+    buffer = BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+def zip_documents(files: List[Tuple[str, bytes]]) -> bytes:
+    """Bundle rendered PDFs into a ZIP archive of (filename, content) pairs"""
+    buffer = BytesIO()
+    # PDFs are already compressed; storing them keeps the archive cheap to build
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_STORED) as archive:
+        for filename, content in files:
+            archive.writestr(filename, content)
+    return buffer.getvalue()
+
+# Document types the render workers know how to build
+RENDERERS = {
+    "acknowledgment": lambda data: _document_generator().generate_order_acknowledgment(data),
+    "job_card": lambda data: _document_generator().generate_job_card(data),
+    "packing_list": lambda data: _document_generator().generate_packing_list(data),
+    "invoice": lambda data: _document_generator().generate_invoice(data),
+    "template": build_template_pdf,
+    "stock_description": build_stock_description_pdf,
+    "payslip": build_payslip_pdf,
+}
+
+def render_document(doc_type: str, *args) -> bytes:
+    """Worker-process entry point: build one PDF and return its bytes"""
+    return RENDERERS[doc_type](*args)
+
+async def render_pdf(doc_type: str, *args, timeout: float = PDF_RENDER_TIMEOUT_SECONDS) -> bytes:
+    """Render a PDF in the PDF worker pool behind the "pdf" job queue.
+
+    Arguments must be plain picklable data (strip Mongo ``_id`` first). Raises
+    503 when the render queue is full and 504 when the render times out.
+    """
+    if doc_type not in RENDERERS:
+        raise ValueError(f"Unknown document type: {doc_type}")
+    try:
+        return await job_executor.run_in_process("pdf", render_document, doc_type, *args, timeout=timeout)
+    except asyncio.TimeoutError:
+        logger.error(f"Rendering {doc_type} PDF timed out after {timeout}s")
+        raise HTTPException(status_code=504, detail="Document generation timed out, please try again")
+
+def _iter_chunks(content: bytes):
+    view = memoryview(content)
+    for start in range(0, len(content), PDF_STREAM_CHUNK_SIZE):
+        yield bytes(view[start:start + PDF_STREAM_CHUNK_SIZE])
+
+def pdf_response(content: bytes, filename: str, media_type: str = "application/pdf") -> StreamingResponse:
+    """Stream rendered PDF (or archive) bytes back as a download"""
+    return StreamingResponse(
+        _iter_chunks(content),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"attachment; filename={filename}",
+            "Content-Length": str(len(content)),
+        }
+    )
@@ -0,0 +1,442 @@
+from datetime import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from pymongo import ASCENDING
+import numpy as np
+import logging
+from report_rollups import ROLLUPS_COLLECTION
+from report_streaming import iter_batches, find_by_ids
+
+# Forecast behind the projected order analysis. Demand comes from the
+# product_day rollups (order lines per product, client and day, kept up to
+# date by record_rollups), and each product's material requirement is worked
+# out once per unit and cached, so a projection is the per-unit figures
+# multiplied by the projected quantities.
+
+# Projection periods and their length in days
+PROJECTION_PERIODS = {"3_months": 90, "6_months": 180, "9_months": 270, "12_months": 365}
+
+FORECAST_MATERIAL_PROJECTION = {
+    "_id": 0, "id": 1, "material_description": 1, "supplier": 1, "price": 1, "gsm": 1, "cost_per_unit": 1
+}
+
+logger = logging.getLogger(__name__)
+
+# {product_id: (cache key, unit requirement)}
+_unit_requirements: Dict[str, Tuple[Any, Dict[str, Any]]] = {}
+
+def _layer_material_ids(product: dict) -> List[str]:
+    return [layer.get("material_id") for layer in product.get("material_layers") or [] if layer.get("material_id")]
+
+def _cache_key(product: dict, materials: Dict[str, dict]) -> tuple:
+    # Editing a product sets updated_at; the layer materials' prices and
+    # grammage are part of the key too, since changing them doesn't
+    materials_used = tuple(
+        (material_id, sorted(materials[material_id].items()))
+        for material_id in sorted(set(_layer_material_ids(product)))
+        if material_id in materials
+    )
+    return (product.get("updated_at") or product.get("created_at"), materials_used)
+
+def _core_unit(product: dict, materials: Dict[str, dict]) -> Dict[str, Any]:
+    """Spiral-wound paper core: each layer is a cylinder shell around the previous one"""
+    try:
+        core_id_mm = float(product.get("core_id") or 76)  # Inner diameter in mm
+        core_length_mm = float(product.get("core_width") or product.get("width") or 1200)  # Core length in mm
+        wall_thickness_mm = float(product.get("core_thickness") or 3)  # Wall thickness in mm
+    except (TypeError, ValueError):
+        core_id_mm, core_length_mm, wall_thickness_mm = 76, 1200, 3
+    core_length_m = core_length_mm / 1000
+    current_inner_radius = core_id_mm / 1000 / 2
+
+    layers = []
+    for layer_index, layer in enumerate(product.get("material_layers") or []):
+        try:
+            material_id = layer.get("material_id")
+            thickness_mm = float(layer.get("thickness") or 0)  # Thickness per single layer in mm
+            num_layers = int(layer.get("quantity") or 1)  # How many layers of this material
+            layer_width_mm = float(layer.get("width") or 0)  # Width in mm (if material is cut into strips)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error parsing layer fields: {e}, layer: {layer}")
+            continue
+
+        if thickness_mm <= 0 or num_layers <= 0:
+            continue
+
+        layer_width_m = layer_width_mm / 1000 if layer_width_mm > 0 else None
+        total_stream_thickness_m = thickness_mm / 1000 * num_layers
+        stream_inner_radius = current_inner_radius
+        stream_outer_radius = current_inner_radius + total_stream_thickness_m
+
+        # Volume = π × core_length × (outer_radius² - inner_radius²)
+        volume_m3 = 3.14159 * core_length_m * (
+            (stream_outer_radius ** 2) - (stream_inner_radius ** 2)
+        )
+
+        material_name = layer.get("material_name", "Unknown")
+        gsm = 0
+        cost_per_meter = 0
+        price_per_tonne = 0
+        linear_metres_per_tonne = 0
+        material = materials.get(material_id) if material_id else None
+        if material:
+            material_name = material.get("material_description", material.get("supplier", material_name))
+            price_per_tonne = float(material.get("price", 0))
+            # GSM is stored as a string
+            gsm_str = material.get("gsm", "0")
+            try:
+                gsm = float(gsm_str) if gsm_str else 0
+            except (ValueError, TypeError):
+                gsm = 0
+            if gsm > 0 and layer_width_m and layer_width_m > 0:
+                # 1 tonne = 1,000,000 grams, so linear metres per tonne = 1,000,000 / (GSM × width)
+                linear_metres_per_tonne = 1000000 / (gsm * layer_width_m)
+                cost_per_meter = price_per_tonne / linear_metres_per_tonne
+            else:
+                # Without GSM or width, use the price directly
+                cost_per_meter = price_per_tonne
+
+        # density = GSM ÷ thickness(mm) gives kg/m³
+        density_kg_m3 = gsm / thickness_mm if gsm > 0 else 0
+        stream_mass_kg = volume_m3 * density_kg_m3
+        stream_area_m2 = volume_m3 / total_stream_thickness_m
+        stream_strip_length_m = stream_area_m2 / layer_width_m if layer_width_m else 0
+
+        layers.append({
+            "layer_order": layer_index + 1,
+            "layer_type": layer.get("layer_type", f"Layer {layer_index + 1}"),
+            "material_id": material_id,
+            "material_name": material_name,
+            "width_mm": layer_width_mm,
+            "thickness_mm": thickness_mm,
+            "gsm": gsm,
+            "num_layers": num_layers,
+            "stream_inner_radius_mm": stream_inner_radius * 1000,
+            "stream_outer_radius_mm": stream_outer_radius * 1000,
+            "volume_m3_per_core": volume_m3,
+            "density_kg_m3": density_kg_m3,
+            "mass_kg_per_core": stream_mass_kg,
+            "area_m2_per_core": stream_area_m2,
+            "strip_length_m_per_core": stream_strip_length_m,
+            "price_per_tonne": price_per_tonne,
+            "linear_metres_per_tonne": linear_metres_per_tonne,
+            "cost_per_meter": cost_per_meter,
+            # Costed by strip length where there is one, otherwise by area
+            "cost_per_core": stream_strip_length_m * cost_per_meter if stream_strip_length_m > 0 else stream_area_m2 * cost_per_meter,
+        })
+        current_inner_radius = stream_outer_radius
+
+    return {
+        "kind": "core",
+        "layers": layers,
+        "outer_diameter_mm": core_id_mm + (2 * wall_thickness_mm),
+        "core_length_m": core_length_m,
+    }
+
+def _flat_unit(product: dict, materials: Dict[str, dict]) -> Dict[str, Any]:
+    """Labels, films and tapes: each layer runs the product's length per lap"""
+    try:
+        product_width = float(product.get("width") or 0) / 1000  # Convert mm to meters
+        product_length = float(product.get("length") or 0)  # Already in meters
+    except (TypeError, ValueError):
+        product_width = 1.0
+        product_length = 100
+
+    layers = []
+    for layer_index, layer in enumerate(product.get("material_layers") or []):
+        try:
+            material_id = layer.get("material_id")
+            thickness = float(layer.get("thickness") or 0)  # mm
+            width = float(layer.get("width") or (product_width * 1000))  # mm
+            quantity_per_unit = int(layer.get("quantity") or 1)
+        except (TypeError, ValueError) as e:
+            logger.error(f"Error parsing flat product layer fields: {e}, layer: {layer}")
+            continue
+
+        material_name = layer.get("material_name", "Unknown")
+        cost_per_meter = 0
+        material = materials.get(material_id) if material_id else None
+        if material:
+            material_name = material.get("material_description", material.get("supplier", material_name))
+            cost_per_meter = float(material.get("cost_per_unit", 0))
+
+        layers.append({
+            "layer_order": layer_index + 1,
+            "layer_type": layer.get("layer_type", f"Layer {layer_index + 1}"),
+            "material_id": material_id,
+            "material_name": material_name,
+            "width_mm": width,
+            "thickness_mm": thickness,
+            "gsm": layer.get("gsm", 0),
+            "laps_per_core": quantity_per_unit,
+            "meters_per_core": product_length * quantity_per_unit,
+            "cost_per_meter": cost_per_meter,
+        })
+
+    return {"kind": "flat", "layers": layers}
+
+def unit_requirement(product: dict, materials: Dict[str, dict]) -> Dict[str, Any]:
+    """One unit's material requirement by layer, cached until the product or its materials change"""
+    key = _cache_key(product, materials)
+    cached = _unit_requirements.get(product["id"])
+    if cached and cached[0] == key:
+        return cached[1]
+    if product.get("product_type") == "paper_cores":
+        unit = _core_unit(product, materials)
+    else:
+        unit = _flat_unit(product, materials)
+    _unit_requirements[product["id"]] = (key, unit)
+    return unit
+
+def _core_requirements(unit: Dict[str, Any], quantities: np.ndarray) -> List[List[dict]]:
+    layers = unit["layers"]
+    periods = [[] for _ in quantities]
+    if not layers:
+        return periods
+
+    per_core = {
+        name: np.array([layer[name] for layer in layers], dtype=float)
+        for name in ("mass_kg_per_core", "area_m2_per_core", "strip_length_m_per_core", "cost_per_core")
+    }
+    has_strip = per_core["strip_length_m_per_core"] > 0
+
+    # layers × periods
+    total_mass = np.outer(per_core["mass_kg_per_core"], quantities)
+    total_area = np.outer(per_core["area_m2_per_core"], quantities)
+    total_length = np.outer(per_core["strip_length_m_per_core"], quantities)
+    # Area-costed layers are charged for one core, whatever the quantity
+    total_cost = np.where(
+        has_strip[:, None],
+        np.outer(per_core["cost_per_core"], quantities),
+        per_core["cost_per_core"][:, None]
+    )
+
+    paper_mass = total_mass.sum(axis=0).tolist()
+    paper_area = total_area.sum(axis=0).tolist()
+    strip_length = total_length.sum(axis=0).tolist()
+    cost = total_cost.sum(axis=0).tolist()
+    total_mass, total_area = total_mass.tolist(), total_area.tolist()
+    total_length, total_cost = total_length.tolist(), total_cost.tolist()
+
+    core_length_m = unit["core_length_m"]
+    for p, projected_qty in enumerate(quantities.tolist()):
+        rows = periods[p]
+        for i, layer in enumerate(layers):
+            strip = has_strip[i]
+            rows.append({
+                "layer_order": layer["layer_order"],
+                "layer_type": layer["layer_type"],
+                "material_id": layer["material_id"],
+                "material_name": layer["material_name"],
+                "width_mm": layer["width_mm"],
+                "thickness_mm": layer["thickness_mm"],
+                "gsm": layer["gsm"],
+                "num_layers": layer["num_layers"],
+                "stream_inner_radius_mm": round(layer["stream_inner_radius_mm"], 2),
+                "stream_outer_radius_mm": round(layer["stream_outer_radius_mm"], 2),
+                "volume_m3_per_core": round(layer["volume_m3_per_core"], 6),
+                "density_kg_m3": round(layer["density_kg_m3"], 2),
+                "mass_kg_per_core": round(layer["mass_kg_per_core"], 4),
+                "area_m2_per_core": round(layer["area_m2_per_core"], 4),
+                "strip_length_m_per_core": round(layer["strip_length_m_per_core"], 2) if strip else None,
+                "total_mass_kg": round(total_mass[i][p], 2),
+                "total_area_m2": round(total_area[i][p], 2),
+                "total_strip_length_m": round(total_length[i][p], 2) if strip else None,
+                "meters_per_core": round(layer["strip_length_m_per_core"], 2) if strip else round(layer["area_m2_per_core"], 2),
+                "total_meters_needed": round(total_length[i][p], 2) if strip else round(total_area[i][p], 2),
+                "price_per_tonne": round(layer["price_per_tonne"], 2),
+                "linear_metres_per_tonne": round(layer["linear_metres_per_tonne"], 2) if layer["linear_metres_per_tonne"] > 0 else None,
+                "cost_per_meter": round(layer["cost_per_meter"], 4),
+                "cost_per_core": round(layer["cost_per_core"], 4),
+                "total_cost": round(total_cost[i][p], 2)
+            })
+
+        cost_per_core = cost[p] / projected_qty if projected_qty > 0 else 0
+        cost_per_metre_of_core = cost_per_core / core_length_m if core_length_m > 0 else 0
+        rows.append({
+            "is_total": True,
+            "outer_diameter_mm": round(unit["outer_diameter_mm"], 2),
+            "core_length_m": round(core_length_m, 3),
+            "total_paper_mass_kg": round(paper_mass[p], 2),
+            "total_paper_area_m2": round(paper_area[p], 2),
+            "total_strip_length_m": round(strip_length[p], 2) if strip_length[p] > 0 else None,
+            "total_meters_all_layers": round(strip_length[p], 2) if strip_length[p] > 0 else round(paper_area[p], 2),
+            "total_cost": round(cost[p], 2),
+            "cost_per_core": round(cost_per_core, 4),
+            "cost_per_metre_of_core": round(cost_per_metre_of_core, 4),
+            "projected_quantity": int(projected_qty)
+        })
+    return periods
+
+def _flat_requirements(unit: Dict[str, Any], quantities: np.ndarray) -> List[List[dict]]:
+    layers = unit["layers"]
+    periods = [[] for _ in quantities]
+    if not layers:
+        return periods
+
+    meters_per_unit = np.array([layer["meters_per_core"] for layer in layers], dtype=float)
+    cost_per_meter = np.array([layer["cost_per_meter"] for layer in layers], dtype=float)
+    total_meters = np.outer(meters_per_unit, quantities)
+    total_cost = (total_meters * cost_per_meter[:, None]).tolist()
+    meters_all_layers = total_meters.sum(axis=0).tolist()
+    total_meters = total_meters.tolist()
+
+    for p in range(len(quantities)):
+        for i, layer in enumerate(layers):
+            periods[p].append({
+                "layer_order": layer["layer_order"],
+                "layer_type": layer["layer_type"],
+                "material_id": layer["material_id"],
+                "material_name": layer["material_name"],
+                "width_mm": layer["width_mm"],
+                "thickness_mm": layer["thickness_mm"],
+                "gsm": layer["gsm"],
+                "laps_per_core": layer["laps_per_core"],
+                "meters_per_core": round(layer["meters_per_core"], 2),
+                "total_meters_needed": round(total_meters[i][p], 2),
+                "cost_per_meter": round(layer["cost_per_meter"], 4),
+                "total_cost": round(total_cost[i][p], 2)
+            })
+        periods[p].append({
+            "is_total": True,
+            "total_meters_all_layers": round(meters_all_layers[p], 2)
+        })
+    return periods
+
+def material_requirements(unit: Dict[str, Any], projections: Dict[str, float]) -> Dict[str, List[dict]]:
+    """Each period's layer rows and total row for the projected quantities"""
+    quantities = np.array(list(projections.values()), dtype=float)
+    if unit["kind"] == "core":
+        periods = _core_requirements(unit, quantities)
+    else:
+        periods = _flat_requirements(unit, quantities)
+    return dict(zip(projections, periods))
+
+async def product_demand(db, start_day: str, end_day: str, client_id: Optional[str] = None) -> Dict[str, Dict[str, Any]]:
+    """Order lines per product between two days (inclusive), from the product_day rollups"""
+    query: Dict[str, Any] = {"kind": "product_day", "day": {"$gte": start_day, "$lte": end_day}}
+    if client_id:
+        query["client_id"] = client_id
+
+    demand: Dict[str, Dict[str, Any]] = {}
+    async for bucket in db[ROLLUPS_COLLECTION].find(query, {"_id": 0}).sort("day", ASCENDING):
+        client_name = bucket.get("client_name")
+        product = demand.setdefault(bucket["product_id"], {
+            "client_name": client_name, "total_quantity": 0, "order_count": 0, "customers": {}
+        })
+        quantity = bucket.get("quantity", 0)
+        product["total_quantity"] += quantity
+        product["order_count"] += bucket.get("count", 0)
+        customer = product["customers"].setdefault(client_name, {"total_quantity": 0, "order_count": 0})
+        customer["total_quantity"] += quantity
+        customer["order_count"] += bucket.get("count", 0)
+    return demand
+
+async def historical_orders(db, start: datetime, end: datetime, client_id: Optional[str], product_ids) -> Dict[str, List[dict]]:
+    """The order lines behind product_demand, for reports that list them"""
+    query: Dict[str, Any] = {"created_at": {"$gte": start, "$lte": end}, "status": {"$ne": "cancelled"}}
+    if client_id:
+        query["client_id"] = client_id
+    product_ids = set(product_ids)
+
+    lines: Dict[str, List[dict]] = {product_id: [] for product_id in product_ids}
+    orders = db.orders.find(
+        query,
+        {"_id": 0, "order_number": 1, "client_name": 1, "created_at": 1,
+         "items.product_id": 1, "items.quantity": 1}
+    )
+    async for batch in iter_batches(orders):
+        for order in batch:
+            for item in order.get("items", []):
+                quantity = item.get("quantity", 0)
+                if item.get("product_id") in product_ids and quantity > 0:
+                    lines[item["product_id"]].append({
+                        "order_number": order.get("order_number"),
+                        "order_date": order.get("created_at"),
+                        "quantity": quantity,
+                        "client_name": order.get("client_name")
+                    })
+    return lines
+
+async def projected_order_analysis(db, start: datetime, end: datetime, client_id: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Each product's demand over start..end projected forward, with its material requirements"""
+    days_in_period = (end - start).days or 1
+    demand = await product_demand(db, start.strftime("%Y-%m-%d"), end.strftime("%Y-%m-%d"), client_id)
+    products = await find_by_ids(db.client_products, demand, {"_id": 0})
+    materials = await find_by_ids(
+        db.materials,
+        (material_id for product in products.values() for material_id in _layer_material_ids(product)),
+        FORECAST_MATERIAL_PROJECTION
+    )
+
+    products_list = []
+    for product_id, data in demand.items():
+        product = products.get(product_id)
+        if not product or data["total_quantity"] <= 0:
+            continue
+
+        avg_per_day = data["total_quantity"] / days_in_period
+        projections = {
+            period: round(avg_per_day * days, 2) for period, days in PROJECTION_PERIODS.items()
+        }
+
+        total_qty = data["total_quantity"]
+        customer_breakdown = {}
+        customer_projections = {}
+        for client_name, customer in data["customers"].items():
+            percentage = (customer["total_quantity"] / total_qty * 100) if total_qty > 0 else 0
+            customer_breakdown[client_name] = {**customer, "percentage": round(percentage, 1)}
+            customer_projections[client_name] = {
+                **{period: round(quantity * percentage / 100, 2) for period, quantity in projections.items()},
+                "percentage": round(percentage, 1),
+                "historical_total": customer["total_quantity"],
+                "order_count": customer["order_count"]
+            }
+
+        products_list.append({
+            "product_info": {
+                "product_id": product_id,
+                "product_description": product.get("product_description", "Unknown"),
+                "product_code": product.get("product_code", "N/A"),
+                "product_type": product.get("product_type", "Unknown"),
+                "client_id": product.get("client_id"),
+                "client_name": data["client_name"] or "Unknown",
+                "width": product.get("width", 0),
+                "length": product.get("length", 0),
+                "unit_of_measure": product.get("unit_of_measure", "units")
+            },
+            "historical_data": {
+                "total_quantity": data["total_quantity"],
+                "order_count": data["order_count"],
+                "total_orders": data["order_count"],  # Alias for frontend compatibility
+                "average_per_day": round(avg_per_day, 2),
+                "average_per_month": round(avg_per_day * 30, 2),
+                "avg_monthly_orders": round(avg_per_day * 30, 2),  # Alias for frontend compatibility
+            },
+            "projections": projections,
+            "material_requirements": (
+                material_requirements(unit_requirement(product, materials), projections)
+                if product.get("material_layers") else {}
+            ),
+            "customer_breakdown": customer_breakdown,
+            "customer_projections": customer_projections
+        })
+
+    # Most used first
+    products_list.sort(key=lambda x: x["historical_data"]["total_quantity"], reverse=True)
+    return products_list
+
+def period_summaries(products_list: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    summaries = {}
+    for period in PROJECTION_PERIODS:
+        total_material_cost = sum(
+            row.get("total_cost", 0)
+            for product in products_list
+            for row in product["material_requirements"].get(period, [])
+            if not row.get("is_total")
+        )
+        summaries[period] = {
+            "total_projected_orders": round(sum(p["projections"][period] for p in products_list), 2),
+            "total_projected_material_cost": round(total_material_cost, 2),
+            "products_analyzed": len(products_list)
+        }
+    return summaries
@@ -0,0 +1,235 @@
+from datetime import timedelta
+from decimal import Decimal
+from functools import wraps
+from typing import Any, Optional
+from bson import Decimal128, ObjectId
+from fastapi import Response
+from fastapi.datastructures import DefaultPlaceholder
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from pydantic import BaseModel
+from starlette.datastructures import Headers, MutableHeaders
+import inspect
+import os
+import zlib
+
+import orjson
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+# Responses smaller than this aren't worth compressing
+COMPRESSION_MINIMUM_SIZE = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4  # fast enough to run per request, still well ahead of gzip on JSON
+
+# Only text-like payloads are compressed. PDFs, ZIPs, spreadsheets and images
+# are already compressed, and event streams must reach the display unbuffered.
+COMPRESSIBLE_TYPES = ("application/json", "text/html", "text/plain", "text/csv", "application/javascript", "text/css")
+
+def _default(value: Any) -> Any:
+    """Types orjson doesn't serialise natively, handled once for every response"""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, Decimal128):
+        return float(value.to_decimal())
+    if isinstance(value, timedelta):
+        return value.total_seconds()
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    if isinstance(value, (set, frozenset, tuple)):
+        return list(value)
+    if isinstance(value, bytes):
+        return value.decode("utf-8", errors="replace")
+    if hasattr(value, "isoformat"):
+        # datetime subclasses such as pandas Timestamp
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(
+        content,
+        default=_default,
+        option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+    )
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered by orjson (the app's default response class)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+class FastJSONRoute(APIRoute):
+    """Route that skips jsonable_encoder for handlers without a response model.
+
+    FastAPI walks every returned dict through jsonable_encoder before the
+    response class sees it, which dominates the cost of large report
+    payloads. Async handlers that declare neither response_model nor a return
+    annotation have their result rendered straight by ORJSONResponse instead.
+    Headers and status set on an injected Response are carried over the same
+    way FastAPI does it.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        response_model = kwargs.get("response_model")
+        explicit_model = response_model is not None and not isinstance(response_model, DefaultPlaceholder)
+        if (
+            inspect.iscoroutinefunction(endpoint)
+            and not explicit_model
+            and inspect.signature(endpoint).return_annotation is inspect.Signature.empty
+        ):
+            endpoint = _render_with_orjson(endpoint, kwargs.get("status_code"))
+        super().__init__(path, endpoint, **kwargs)
+
+def _render_with_orjson(endpoint, status_code: Optional[int]):
+    signature = inspect.signature(endpoint)
+    response_param = next(
+        (name for name, param in signature.parameters.items() if param.annotation is Response),
+        None
+    )
+    if response_param is None:
+        # Ask FastAPI for the sub-response so handlers' dependencies can still set headers
+        response_param = "_sub_response"
+        signature = signature.replace(parameters=[
+            *signature.parameters.values(),
+            inspect.Parameter(response_param, inspect.Parameter.KEYWORD_ONLY, annotation=Response),
+        ])
+        passes_response = False
+    else:
+        passes_response = True
+
+    @wraps(endpoint)
+    async def wrapper(*args, **kwargs):
+        sub_response = kwargs[response_param] if passes_response else kwargs.pop(response_param)
+        result = await endpoint(*args, **kwargs)
+        if isinstance(result, Response):
+            return result
+        response = ORJSONResponse(result, status_code=sub_response.status_code or status_code or 200)
+        response.headers.raw.extend(
+            (key, value) for key, value in sub_response.headers.raw if key != b"content-length"
+        )
+        return response
+
+    wrapper.__signature__ = signature
+    return wrapper
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick br or gzip from an Accept-Encoding header, honouring q=0"""
+    accepted = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[token.strip().lower()] = quality
+    if brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+class _Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        """Compress and flush, so a streamed chunk reaches the client promptly"""
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.flush()
+        return self._zlib.compress(data) + self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data) + self._brotli.finish()
+        return self._zlib.compress(data) + self._zlib.flush()
+
+class CompressionMiddleware:
+    """gzip/brotli response compression negotiated from Accept-Encoding.
+
+    Starlette's GZipMiddleware only speaks gzip and compresses every media
+    type; this one prefers brotli when installed and leaves already
+    compressed files and event streams alone.
+    """
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _CompressionResponder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+class _CompressionResponder:
+    def __init__(self, app, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send = None
+        self.start_message = None
+        self.started = False
+        self.passthrough = False
+        self.compressor = None
+
+    async def __call__(self, scope, receive, send):
+        self.send = send
+        await self.app(scope, receive, self.send_compressed)
+
+    def _compressible(self, headers: MutableHeaders) -> bool:
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    async def send_compressed(self, message):
+        message_type = message["type"]
+        if message_type == "http.response.start":
+            self.start_message = message
+            return
+        if message_type != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if not self.started:
+            self.started = True
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if not self._compressible(headers) or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(self.start_message)
+                await self.send(message)
+                return
+
+            self.compressor = _Compressor(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                message["body"] = self.compressor.chunk(body)
+            else:
+                message["body"] = self.compressor.finish(body)
+                headers["Content-Length"] = str(len(message["body"]))
+            await self.send(self.start_message)
+            await self.send(message)
+            return
+
+        message["body"] = self.compressor.chunk(body) if more_body else self.compressor.finish(body)
+        await self.send(message)
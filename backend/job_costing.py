@@ -0,0 +1,273 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterable
+from pymongo import ReplaceOne
+from report_streaming import find_by_ids, group_by_key, iter_batches
+import logging
+
+# One document per completed job, keyed by order_id, holding its revenue and
+# costs as of the last time the job, its job card or its timesheets changed
+JOB_COSTS_COLLECTION = "job_costs"
+
+# Jobs that are costed into the ledger (and reported on by default)
+COSTED_ORDER_QUERY = {"$or": [{"status": "completed"}, {"current_stage": "cleared"}]}
+
+# Order fields the cost calculation reads
+ORDER_COST_PROJECTION = {
+    "_id": 0, "id": 1, "order_number": 1, "client_id": 1, "client_name": 1,
+    "created_at": 1, "completed_at": 1,
+    "items.product_id": 1, "items.unit_price": 1, "items.quantity": 1
+}
+
+OVERTIME_MULTIPLIER = 1.5
+
+logger = logging.getLogger(__name__)
+
+async def load_cost_inputs(db, orders: List[dict]) -> Dict[str, Dict[str, Any]]:
+    """Everything needed to cost a batch of orders, fetched with one $in query per collection.
+
+    Returns lookups keyed by id: job_cards and timesheets by order id,
+    materials, employees, machinery rates and client products by their own id.
+    """
+    order_ids = [order.get("id") for order in orders]
+    job_cards = {
+        order_id: cards[0]
+        for order_id, cards in (await group_by_key(
+            db.job_cards, {"order_id": {"$in": order_ids}}, "order_id",
+            {"_id": 0, "order_id": 1, "product_specs.material_layers": 1, "calculations": 1, "machine_usage": 1}
+        )).items()
+    }
+    timesheets = await group_by_key(
+        db.timesheets, {"order_id": {"$in": order_ids}}, "order_id",
+        {"_id": 0, "order_id": 1, "employee_id": 1, "entries.regular_hours": 1, "entries.overtime_hours": 1}
+    )
+
+    material_ids = set()
+    machine_ids = set()
+    for job_card in job_cards.values():
+        for layer in job_card.get("product_specs", {}).get("material_layers", []):
+            material_ids.add(layer.get("material_id"))
+        for machine in job_card.get("machine_usage", []):
+            machine_ids.add(machine.get("machine_id"))
+    employee_ids = {timesheet.get("employee_id") for sheets in timesheets.values() for timesheet in sheets}
+    product_ids = {item.get("product_id") for order in orders for item in order.get("items", [])}
+
+    return {
+        "job_cards": job_cards,
+        "timesheets": timesheets,
+        "materials": await find_by_ids(db.materials, material_ids, {"_id": 0, "id": 1, "price": 1}),
+        "employees": await find_by_ids(db.employee_profiles, employee_ids, {"_id": 0, "id": 1, "hourly_rate": 1}),
+        "machinery": await find_by_ids(db.machinery_rates, machine_ids, {"_id": 0, "id": 1, "hourly_rate": 1}),
+        "products": await find_by_ids(db.client_products, product_ids, {"_id": 0, "id": 1, "consumables": 1}),
+    }
+
+def job_cost(order: dict, inputs: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """Revenue, costs and profit for one order, from prefetched inputs.
+
+    Gross profit is revenue less materials, labour and consumables; net profit
+    then takes off machine costs, which stand in for overheads.
+    """
+    order_id = order.get("id")
+    items = order.get("items", [])
+
+    # Selling price ex GST from the order items
+    job_revenue = 0
+    for item in items:
+        job_revenue += (item.get("unit_price") or 0) * (item.get("quantity") or 0)
+
+    job_card = inputs["job_cards"].get(order_id)
+    timesheets = inputs["timesheets"].get(order_id, [])
+
+    # Material costs from the job card's layers
+    material_cost = 0
+    material_layers_breakdown = []
+    if job_card:
+        calculations = job_card.get("calculations", {})
+        total_length_m = float(calculations.get("totalLengthRequired") or 0)
+        good_length_m = float(calculations.get("goodMaterialLength") or 0)
+        makeready_length_m = float(calculations.get("makereadyLength") or 0)
+        waste_length_m = float(calculations.get("wasteLength") or 0)
+
+        for layer in job_card.get("product_specs", {}).get("material_layers", []):
+            layer_width_mm = float(layer.get("width") or 0)
+            layer_gsm = float(layer.get("gsm") or 0)
+            material_doc = inputs["materials"].get(layer.get("material_id"))
+            price_per_tonne = float(material_doc.get("price") or 0) if material_doc else 0
+
+            # Weight: (width_m * length_m * gsm) / 1000 = kg; cost per tonne
+            weight_kg = (layer_width_mm / 1000.0 * total_length_m * layer_gsm) / 1000.0
+            layer_cost = (weight_kg / 1000.0) * price_per_tonne
+            material_cost += layer_cost
+
+            material_layers_breakdown.append({
+                "layer_type": layer.get("layer_type", "Unknown"),
+                "material_name": layer.get("material_name", "Unknown"),
+                "supplier": layer.get("supplier", "Unknown"),
+                "width_mm": layer_width_mm,
+                "thickness_microns": float(layer.get("thickness") or 0),
+                "gsm": layer_gsm,
+                "linear_meters_consumed": round(total_length_m, 2),
+                "good_material_meters": round(good_length_m, 2),
+                "makeready_meters": round(makeready_length_m, 2),
+                "waste_meters": round(waste_length_m, 2),
+                "weight_kg": round(weight_kg, 3),
+                "price_per_tonne": round(price_per_tonne, 2),
+                "layer_cost_aud": round(layer_cost, 2)
+            })
+
+    # Labour costs from timesheets, overtime at 1.5x
+    labour_cost = 0
+    total_hours = 0
+    for timesheet in timesheets:
+        employee = inputs["employees"].get(timesheet.get("employee_id"))
+        hourly_rate = float(employee.get("hourly_rate") or 0) if employee else 0
+        for entry in timesheet.get("entries", []):
+            regular_hours = float(entry.get("regular_hours") or 0)
+            overtime_hours = float(entry.get("overtime_hours") or 0)
+            total_hours += regular_hours + overtime_hours
+            if employee:
+                labour_cost += (regular_hours * hourly_rate) + (overtime_hours * hourly_rate * OVERTIME_MULTIPLIER)
+
+    # Machine costs from the job card's machine usage; these are the overheads
+    machine_cost = 0
+    if job_card:
+        for machine in job_card.get("machine_usage", []):
+            machinery = inputs["machinery"].get(machine.get("machine_id"))
+            if machinery:
+                machine_cost += (float(machine.get("runtime_minutes") or 0) / 60.0) * float(machinery.get("hourly_rate") or 0)
+    overhead_cost = machine_cost
+
+    # Consumables from the client product catalogue
+    consumables_cost = 0
+    for item in items:
+        client_product = inputs["products"].get(item.get("product_id"))
+        if client_product:
+            quantity = item.get("quantity") or 0
+            for consumable in client_product.get("consumables", []):
+                consumable_cost_per_unit = float(consumable.get("cost_per_unit") or 0)
+                consumable_quantity_per_product = float(consumable.get("quantity_per_unit") or 1)
+                consumables_cost += quantity * consumable_quantity_per_product * consumable_cost_per_unit
+
+    total_production_cost = material_cost + labour_cost + machine_cost + consumables_cost
+    gp_percentage = ((job_revenue - total_production_cost) / job_revenue * 100) if job_revenue > 0 else 0
+    gross_profit = job_revenue - (material_cost + labour_cost + consumables_cost)
+    net_profit = gross_profit - machine_cost
+    np_percentage = (net_profit / job_revenue * 100) if job_revenue > 0 else 0
+    profit_per_hour = (net_profit / total_hours) if job_card and total_hours > 0 else 0
+
+    return {
+        "order_id": order_id,
+        "order_number": order.get("order_number", "Unknown"),
+        "client_name": order.get("client_name", "Unknown"),
+        "job_revenue": round(job_revenue, 2),
+        "material_cost": round(material_cost, 2),
+        "material_layers_breakdown": material_layers_breakdown,
+        "labour_cost": round(labour_cost, 2),
+        "machine_cost": round(machine_cost, 2),
+        "consumables_cost": round(consumables_cost, 2),
+        "total_production_cost": round(total_production_cost, 2),
+        "gross_profit": round(gross_profit, 2),
+        "gp_percentage": round(gp_percentage, 2),
+        "overhead_cost": round(overhead_cost, 2),
+        "net_profit": round(net_profit, 2),
+        "np_percentage": round(np_percentage, 2),
+        "profit_per_hour": round(profit_per_hour, 2),
+        "completed_at": order.get("completed_at"),
+        # Unrounded, so report totals don't pick up each job's rounding error
+        "exact_totals": {
+            "job_revenue": job_revenue,
+            "total_production_cost": total_production_cost,
+            "gross_profit": gross_profit,
+            "net_profit": net_profit,
+        }
+    }
+
+def cost_orders(orders: List[dict], inputs: Dict[str, Dict[str, Any]]) -> List[Dict[str, Any]]:
+    return [job_cost(order, inputs) for order in orders]
+
+def profitability_summary(jobs: List[Dict[str, Any]], profit_threshold: float) -> Dict[str, Any]:
+    """Flag jobs below the net profit threshold and total them up.
+
+    Drops each job's exact_totals once it has been added in.
+    """
+    total_revenue = 0
+    total_costs = 0
+    total_gp = 0
+    total_np = 0
+    for job in jobs:
+        job["alert_low_profit"] = job["np_percentage"] < profit_threshold
+        # Ledger entries costed before exact_totals existed only have the rounded figures
+        totals = job.pop("exact_totals", None) or job
+        total_revenue += totals["job_revenue"]
+        total_costs += totals["total_production_cost"]
+        total_gp += totals["gross_profit"]
+        total_np += totals["net_profit"]
+
+    avg_gp_percentage = (total_gp / total_revenue * 100) if total_revenue > 0 else 0
+    avg_np_percentage = (total_np / total_revenue * 100) if total_revenue > 0 else 0
+    return {
+        "total_jobs": len(jobs),
+        "total_revenue": round(total_revenue, 2),
+        "total_costs": round(total_costs, 2),
+        "total_gross_profit": round(total_gp, 2),
+        "total_net_profit": round(total_np, 2),
+        "average_gp_percentage": round(avg_gp_percentage, 2),
+        "average_np_percentage": round(avg_np_percentage, 2),
+        "jobs_below_threshold": sum(1 for job in jobs if job["alert_low_profit"])
+    }
+
+def _ledger_entry(order: dict, inputs: Dict[str, Dict[str, Any]], costed_at: datetime) -> Dict[str, Any]:
+    return {
+        **job_cost(order, inputs),
+        # Carried over from the order so the report can filter the ledger alone
+        "client_id": order.get("client_id"),
+        "created_at": order.get("created_at"),
+        "product_ids": sorted({item.get("product_id") for item in order.get("items", []) if item.get("product_id")}),
+        "costed_at": costed_at,
+    }
+
+async def record_job_costs(db, order_ids: Iterable[str]) -> int:
+    """Recost the given orders into the job_costs ledger.
+
+    Completed orders are (re)written; any of the given orders that are no
+    longer completed are removed from the ledger. Returns the number written.
+    """
+    order_ids = list({order_id for order_id in order_ids if order_id})
+    if not order_ids:
+        return 0
+    orders = await db.orders.find(
+        {"$and": [{"id": {"$in": order_ids}}, COSTED_ORDER_QUERY]}, ORDER_COST_PROJECTION
+    ).to_list(length=None)
+
+    costed_ids = {order["id"] for order in orders}
+    stale_ids = [order_id for order_id in order_ids if order_id not in costed_ids]
+    if stale_ids:
+        await db[JOB_COSTS_COLLECTION].delete_many({"order_id": {"$in": stale_ids}})
+    if not orders:
+        return 0
+
+    inputs = await load_cost_inputs(db, orders)
+    costed_at = datetime.now(timezone.utc)
+    await db[JOB_COSTS_COLLECTION].bulk_write([
+        ReplaceOne({"order_id": order["id"]}, _ledger_entry(order, inputs, costed_at), upsert=True)
+        for order in orders
+    ], ordered=False)
+    return len(orders)
+
+async def refresh_job_costs(db, order_ids: Iterable[str]):
+    """record_job_costs for a write path; a failure is logged, never raised.
+
+    The ledger can always be rebuilt with backfill_job_costs.py, so a costing
+    problem shouldn't fail the stage change or timesheet edit that triggered it.
+    """
+    order_ids = list(order_ids)
+    try:
+        await record_job_costs(db, order_ids)
+    except Exception as e:
+        logger.error(f"Failed to update job costs for orders {order_ids}: {str(e)}")
+
+async def backfill_job_costs(db) -> int:
+    """Cost every completed order into the ledger, a batch at a time"""
+    total = 0
+    async for batch in iter_batches(db.orders.find(COSTED_ORDER_QUERY, {"_id": 0, "id": 1})):
+        total += await record_job_costs(db, [order["id"] for order in batch])
+    return total
@@ -0,0 +1,288 @@
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, asdict
+from functools import partial, wraps
+from typing import Dict, Any, Callable, Optional, Set
+from fastapi import HTTPException
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+
+# Shared pools for CPU-heavy work (calculators, planners, report builders and
+# document rendering) so it never runs on the event loop itself
+PROCESS_WORKERS = int(os.getenv("EXECUTOR_PROCESS_WORKERS", "2"))
+THREAD_WORKERS = int(os.getenv("EXECUTOR_THREAD_WORKERS", "4"))
+
+# Interactive PDF downloads get their own small process pool, so a delivery
+# docket never waits behind a cutting-stock plan or a report
+PDF_PROCESS_WORKERS = int(os.getenv("EXECUTOR_PDF_PROCESS_WORKERS", "2"))
+PDF_JOB_TYPE = "pdf"
+
+# Per job type: how many may run at once, and how many may wait before new
+# requests are turned away with 503
+JOB_TYPE_LIMITS = {
+    "calculator": {"concurrency": 2, "max_queued": 20},
+    "planner": {"concurrency": 1, "max_queued": 5},
+    "report": {"concurrency": 2, "max_queued": 10},
+    "pdf": {"concurrency": 4, "max_queued": 100},
+    "excel": {"concurrency": 2, "max_queued": 10},
+}
+DEFAULT_JOB_LIMIT = {"concurrency": 2, "max_queued": 20}
+
+logger = logging.getLogger(__name__)
+
+# Slots held by the current task, so pool work started inside a limited()
+# handler runs in the handler's slot instead of waiting for a second one
+_held_slots: ContextVar[Dict[str, "_Slot"]] = ContextVar("held_job_slots", default={})
+
+@dataclass
+class JobTypeStats:
+    queued: int = 0
+    running: int = 0
+    completed: int = 0
+    failed: int = 0
+    timed_out: int = 0
+    rejected: int = 0
+    max_queue_depth: int = 0
+    total_wait_seconds: float = 0.0
+    total_run_seconds: float = 0.0
+
+class _Slot:
+    """A held concurrency slot.
+
+    Pool work can't be interrupted, so work still running when the job
+    gives up (a timeout, a cancelled request) keeps the slot held until it
+    actually finishes.
+    """
+
+    def __init__(self, release: Callable[[], None]):
+        self._release = release
+        self._work: Set[Future] = set()
+
+    def track(self, future: Future):
+        self._work.add(future)
+
+    def close(self, loop: asyncio.AbstractEventLoop):
+        running = [future for future in self._work if not future.done()]
+        if not running:
+            self._release()
+            return
+        remaining = [len(running)]
+
+        def finished():
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                self._release()
+
+        def on_done(_):
+            # Called from a pool thread
+            try:
+                loop.call_soon_threadsafe(finished)
+            except RuntimeError:
+                pass  # loop already closed at shutdown
+
+        for future in running:
+            future.add_done_callback(on_done)
+
+class JobExecutor:
+    """Bounded process/thread pools with per-job-type concurrency limits.
+
+    Every job goes through ``slot(job_type)``, which queues it behind that
+    type's concurrency limit and records queue depth, wait and run time.
+    A slot is only freed once the pool work started in it has finished.
+
+    The job types' limits add up to more than a pool has workers, so work is
+    only submitted once a worker is free. A job's timeout therefore covers
+    its own run, not time spent behind other job types' work.
+    """
+
+    def __init__(self, process_workers: int = PROCESS_WORKERS, thread_workers: int = THREAD_WORKERS, pdf_process_workers: int = PDF_PROCESS_WORKERS):
+        self.process_workers = process_workers
+        self.thread_workers = thread_workers
+        self.pdf_process_workers = pdf_process_workers
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._pdf_process_pool: Optional[ProcessPoolExecutor] = None
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._free_workers: Dict[str, asyncio.Semaphore] = {}
+        self._stats: Dict[str, JobTypeStats] = {}
+
+    @staticmethod
+    def _new_process_pool(workers: int) -> ProcessPoolExecutor:
+        # Spawn rather than fork: the server process has Motor and executor threads running
+        return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+    @property
+    def process_pool(self) -> ProcessPoolExecutor:
+        if self._process_pool is None:
+            self._process_pool = self._new_process_pool(self.process_workers)
+        return self._process_pool
+
+    @property
+    def pdf_process_pool(self) -> ProcessPoolExecutor:
+        if self._pdf_process_pool is None:
+            self._pdf_process_pool = self._new_process_pool(self.pdf_process_workers)
+        return self._pdf_process_pool
+
+    @property
+    def thread_pool(self) -> ThreadPoolExecutor:
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.thread_workers, thread_name_prefix="job-executor")
+        return self._thread_pool
+
+    def _limits(self, job_type: str) -> Dict[str, int]:
+        return JOB_TYPE_LIMITS.get(job_type, DEFAULT_JOB_LIMIT)
+
+    def _job_stats(self, job_type: str) -> JobTypeStats:
+        if job_type not in self._stats:
+            self._stats[job_type] = JobTypeStats()
+        return self._stats[job_type]
+
+    @asynccontextmanager
+    async def slot(self, job_type: str):
+        """Wait for a free slot for this job type, then track the job while it runs"""
+        held = _held_slots.get()
+        if job_type in held:
+            # Already running in one of this type's slots
+            yield held[job_type]
+            return
+
+        limits = self._limits(job_type)
+        stats = self._job_stats(job_type)
+        if job_type not in self._semaphores:
+            self._semaphores[job_type] = asyncio.Semaphore(limits["concurrency"])
+        semaphore = self._semaphores[job_type]
+
+        if stats.queued >= limits["max_queued"]:
+            stats.rejected += 1
+            raise HTTPException(status_code=503, detail=f"Server is busy with {job_type} jobs, please try again shortly")
+
+        stats.queued += 1
+        stats.max_queue_depth = max(stats.max_queue_depth, stats.queued)
+        queued_at = time.monotonic()
+        try:
+            await semaphore.acquire()
+        finally:
+            stats.queued -= 1
+        started_at = time.monotonic()
+        stats.total_wait_seconds += started_at - queued_at
+        stats.running += 1
+
+        def release():
+            stats.running -= 1
+            stats.total_run_seconds += time.monotonic() - started_at
+            semaphore.release()
+
+        slot = _Slot(release)
+        token = _held_slots.set({**held, job_type: slot})
+        try:
+            yield slot
+            stats.completed += 1
+        except asyncio.TimeoutError:
+            stats.timed_out += 1
+            raise
+        except Exception:
+            stats.failed += 1
+            raise
+        finally:
+            _held_slots.reset(token)
+            slot.close(asyncio.get_running_loop())
+
+    def limited(self, job_type: str):
+        """Decorator that runs an async handler inside a slot for job_type.
+
+        For handlers that interleave database reads with heavy processing.
+        The processing itself still belongs in run_in_process/run_in_thread,
+        which run in the handler's slot rather than queueing for another.
+        """
+        def decorator(handler):
+            @wraps(handler)
+            async def wrapper(*args, **kwargs):
+                async with self.slot(job_type):
+                    return await handler(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    async def _submit(self, pool_name: str, pool, workers: int, func: Callable, args, kwargs) -> Future:
+        """Submit once one of the pool's workers is free, so the work starts straight away.
+
+        The worker counts as busy until the work finishes, including work
+        that carries on after its caller timed out.
+        """
+        if pool_name not in self._free_workers:
+            self._free_workers[pool_name] = asyncio.Semaphore(workers)
+        free_workers = self._free_workers[pool_name]
+        await free_workers.acquire()
+        try:
+            future = pool.submit(partial(func, *args, **kwargs))
+        except BaseException:
+            free_workers.release()
+            raise
+        loop = asyncio.get_running_loop()
+
+        def on_done(_):
+            # Called from a pool thread
+            try:
+                loop.call_soon_threadsafe(free_workers.release)
+            except RuntimeError:
+                pass  # loop already closed at shutdown
+
+        future.add_done_callback(on_done)
+        return future
+
+    async def _run(self, pool_name: str, pool, workers: int, job_type: str, func: Callable, args, kwargs, timeout: Optional[float]):
+        async with self.slot(job_type) as slot:
+            future = await self._submit(pool_name, pool, workers, func, args, kwargs)
+            slot.track(future)
+            # The timeout starts once a worker has the job, not while it waits for one.
+            # On a timeout the wrapper is cancelled, which only cancels work
+            # that hasn't started; running work keeps the slot until it ends
+            return await asyncio.wait_for(asyncio.wrap_future(future), timeout=timeout)
+
+    async def run_in_process(self, job_type: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a picklable top-level function in the process pool (pure CPU work).
+
+        "pdf" jobs run in their own pool; every other job type shares one.
+        """
+        if job_type == PDF_JOB_TYPE:
+            return await self._run("pdf_process", self.pdf_process_pool, self.pdf_process_workers, job_type, func, args, kwargs, timeout)
+        return await self._run("process", self.process_pool, self.process_workers, job_type, func, args, kwargs, timeout)
+
+    async def run_in_thread(self, job_type: str, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Run a function in the thread pool (work that needs unpicklable state or releases the GIL)"""
+        return await self._run("thread", self.thread_pool, self.thread_workers, job_type, func, args, kwargs, timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool sizes and per-job-type queue/run metrics"""
+        job_types = {}
+        for job_type, stats in self._stats.items():
+            finished = stats.completed + stats.failed + stats.timed_out
+            job_types[job_type] = {
+                **asdict(stats),
+                **self._limits(job_type),
+                "average_wait_seconds": round(stats.total_wait_seconds / finished, 4) if finished else 0,
+                "average_run_seconds": round(stats.total_run_seconds / finished, 4) if finished else 0,
+            }
+        return {
+            "process_workers": self.process_workers,
+            "pdf_process_workers": self.pdf_process_workers,
+            "thread_workers": self.thread_workers,
+            "job_types": job_types,
+        }
+
+    def shutdown(self):
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=False, cancel_futures=True)
+            self._process_pool = None
+        if self._pdf_process_pool is not None:
+            self._pdf_process_pool.shutdown(wait=False, cancel_futures=True)
+            self._pdf_process_pool = None
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=False, cancel_futures=True)
+            self._thread_pool = None
+        self._free_workers = {}
+
+job_executor = JobExecutor()
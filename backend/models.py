@@ -218,6 +218,31 @@ class Order(BaseModel):
     fully_invoiced: bool = False  # Flag when all items have been invoiced
     version: int = 1  # Optimistic locking - increment on each update to prevent concurrent modification conflicts
 
+class OrderSummary(BaseModel):
+    """The order fields shown in list views (GET /orders?view=summary)"""
+    id: str
+    order_number: str
+    client_id: str
+    client_name: str
+    purchase_order_number: Optional[str] = None
+    subtotal: float
+    gst: float
+    total_amount: float
+    due_date: datetime
+    priority: OrderPriority = OrderPriority.NORMAL_LOW
+    status: OrderStatus = OrderStatus.ACTIVE
+    current_stage: ProductionStage = ProductionStage.ORDER_ENTERED
+    runtime_estimate: Optional[str] = None
+    created_at: datetime
+    updated_at: Optional[datetime] = None
+    invoiced: Optional[bool] = None
+    partially_invoiced: Optional[bool] = None
+    fully_invoiced: bool = False
+    version: int = 1
+
+# Fields projected from Mongo for the summary view
+ORDER_SUMMARY_FIELDS = list(OrderSummary.model_fields)
+
 class OrderCreate(BaseModel):
     client_id: str
     purchase_order_number: Optional[str] = None  # Client's PO number
@@ -275,6 +300,16 @@ class StageJumpRequest(BaseModel):
     target_stage: str  # Direct stage to jump to
     notes: Optional[str] = None
 
+# Drag and drop reordering within a board column. Send order_id with its new
+# neighbours to move one card; job_order (the full column) is used to
+# renumber the column when there is no room between the neighbours.
+class JobReorderRequest(BaseModel):
+    stage: str
+    order_id: Optional[str] = None  # Card that was moved
+    previous_id: Optional[str] = None  # Card now directly above it
+    next_id: Optional[str] = None  # Card now directly below it
+    job_order: Optional[List[str]] = None  # Full column order after the move
+
 # Job Specification Models
 class JobSpecification(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -341,6 +376,17 @@ class DocumentTemplate(BaseModel):
     template_data: Dict[str, Any]
     generated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BatchDocumentType(str, Enum):
+    ACKNOWLEDGMENT = "acknowledgment"
+    JOB_CARD = "job_card"
+    PACKING_LIST = "packing_list"
+    INVOICE = "invoice"
+
+class DocumentBatchRequest(BaseModel):
+    order_ids: List[str] = Field(..., min_length=1, max_length=200)
+    document_types: List[BatchDocumentType] = Field(..., min_length=1)
+    output_format: str = "pdf"  # pdf (one merged file) or zip (one file per document)
+
 # Supplier Models
 class Supplier(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -468,6 +514,23 @@ class RawMaterialPermutationRequest(BaseModel):
     waste_allowance_mm: float  # Maximum acceptable waste in mm
     desired_slit_widths: List[float]  # List of target slit widths in mm
     quantity_master_rolls: int = 1  # Number of master rolls available
+    max_results: int = Field(200, ge=1, le=5000)  # Cap on patterns returned (best yield first)
+    time_budget_seconds: float = Field(2.0, gt=0, le=30)  # Stop searching after this long
+    top_n: Optional[int] = Field(None, ge=1)  # Patterns returned with full detail (defaults to all candidates)
+
+class SlitWidthDemand(BaseModel):
+    slit_width_mm: float
+    quantity_meters: float
+    order_id: Optional[str] = None
+
+class CuttingStockPlanRequest(BaseModel):
+    material_id: str  # Raw material (master roll) to plan slitting for
+    demand: List[SlitWidthDemand] = []  # Explicit demand; derived from open orders when empty
+    order_ids: Optional[List[str]] = None  # Restrict derived demand to these orders
+    use_slit_width_stock: bool = True  # Net off slit widths already on hand
+    master_roll_length_m: Optional[float] = None  # Defaults from the material's supplied roll weight
+    max_waste_mm: Optional[float] = None  # Maximum trim per pattern (defaults to no limit)
+    cpu_time_limit_seconds: float = Field(10.0, gt=0, le=120)
 
 class ProfitabilityReportRequest(BaseModel):
     order_ids: Optional[List[str]] = None  # For specific order analysis (not used in new design)
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Normalise Date Fields
+
+Some orders hold due_date, completed_at and other dates as ISO strings rather
+than dates, because update_order used to store them straight from the JSON
+body. Reports that compare or group on these fields in MongoDB skip values
+they can't read as dates. This script converts every string date in
+DATE_FIELDS to a real (UTC) date.
+
+Strings that can't be parsed are listed and left untouched.
+
+Usage:
+    python normalise_date_fields.py
+
+Note: This script is idempotent - only string values are converted.
+"""
+
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import UpdateOne
+import asyncio
+from dotenv import load_dotenv
+from datetime import datetime
+from date_fields import DATE_FIELDS, as_utc_datetime
+from report_streaming import iter_batches
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+
+if not MONGO_URL or not DB_NAME:
+    print("❌ Error: MONGO_URL or DB_NAME not found in environment")
+    sys.exit(1)
+
+def _string_dates_query(fields):
+    return {"$or": [{field: {"$type": "string"}} for field in fields]}
+
+async def normalise_collection(db, collection_name, fields):
+    """Convert string dates in one collection; returns (documents updated, unparseable values)"""
+    collection = db[collection_name]
+    query = _string_dates_query(fields)
+
+    count = await collection.count_documents(query)
+    if count == 0:
+        print(f"✅ {collection_name}: No string dates")
+        return 0, []
+
+    print(f"📝 {collection_name}: Converting string dates in {count} documents...")
+    updated = 0
+    unparseable = []
+    projection = {"_id": 1, "id": 1, **{field: 1 for field in fields}}
+    async for batch in iter_batches(collection.find(query, projection)):
+        operations = []
+        for document in batch:
+            converted = {}
+            for field in fields:
+                value = document.get(field)
+                if not isinstance(value, str):
+                    continue
+                parsed = as_utc_datetime(value)
+                if parsed is None:
+                    unparseable.append((document.get("id") or document["_id"], field, value))
+                else:
+                    converted[field] = parsed
+            if converted:
+                operations.append(UpdateOne({"_id": document["_id"]}, {"$set": converted}))
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            updated += result.modified_count
+
+    print(f"✅ {collection_name}: Updated {updated} documents")
+    return updated, unparseable
+
+async def main():
+    """Main migration function"""
+    print("\n" + "="*60)
+    print("DATABASE MIGRATION: Normalise Date Fields")
+    print("="*60)
+    print(f"Database: {DB_NAME}")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("="*60 + "\n")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        await db.command('ping')
+        print("✅ Connected to MongoDB successfully\n")
+
+        total_updated = 0
+        all_unparseable = []
+        for collection_name, fields in DATE_FIELDS.items():
+            updated, unparseable = await normalise_collection(db, collection_name, fields)
+            total_updated += updated
+            all_unparseable.extend((collection_name, *entry) for entry in unparseable)
+
+        print(f"\n📊 Total documents updated: {total_updated}")
+
+        if all_unparseable:
+            print(f"\n⚠️  {len(all_unparseable)} values could not be parsed and were left as strings:")
+            for collection_name, document_id, field, value in all_unparseable:
+                print(f"  {collection_name} {document_id} {field}: {value!r}")
+
+        print("\n" + "="*60)
+        print("✅ MIGRATION COMPLETED SUCCESSFULLY")
+        print("="*60)
+        print("\nNext steps:")
+        print("1. ⏳ Run rebuild_report_rollups.py so the rollups use the converted dates")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,180 @@
+from typing import Dict, Any, List, Optional, Iterable, Tuple
+from fastapi import HTTPException, Query
+from http_responses import ORJSONResponse
+from bson import BSON, Binary, Decimal128, Int64, ObjectId, Regex, Timestamp
+from bson.errors import BSONError
+from datetime import datetime
+import base64
+import binascii
+import re
+
+# List endpoints return everything unless a limit is given; a page is never
+# larger than this
+MAX_PAGE_SIZE = 1000
+
+TOTAL_COUNT_HEADER = "X-Total-Count"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+PAGINATION_HEADERS = [TOTAL_COUNT_HEADER, NEXT_CURSOR_HEADER]
+
+_FIELD_NAME = re.compile(r"^[A-Za-z0-9_]+(\.[A-Za-z0-9_]+)*$")
+
+class PageParams:
+    """Query parameters shared by the paginated list endpoints.
+
+    ``after`` is the ``X-Next-Cursor`` value from the previous page (an
+    opaque token holding the last row's sort value and id), ``fields`` a
+    comma separated list of fields to return instead of the full document.
+    """
+
+    def __init__(
+        self,
+        after: Optional[str] = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
+        limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Page size; omit to return every row"),
+        fields: Optional[str] = Query(None, description="Comma separated fields to return, e.g. id,company_name")
+    ):
+        self.after = after
+        self.limit = limit
+        self.fields = fields
+
+def parse_fields(fields: Optional[str], allowed: Optional[Iterable[str]] = None) -> Optional[List[str]]:
+    """Validate a fields= list against the allowed top-level fields"""
+    if not fields:
+        return None
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    allowed = set(allowed) if allowed is not None else None
+    for field in requested:
+        if not _FIELD_NAME.match(field) or (allowed is not None and field.split(".")[0] not in allowed):
+            raise HTTPException(status_code=400, detail=f"Unknown field: {field}")
+    return requested
+
+def _encode_cursor(value, document_id: str) -> str:
+    # BSON keeps the sort value's type (dates, numbers, None for a missing
+    # field) and base64 keeps any text in it header safe
+    encoded = base64.urlsafe_b64encode(BSON.encode({"value": value, "id": document_id}))
+    return encoded.decode("ascii").rstrip("=")
+
+def _decode_cursor(after: str) -> Tuple[Any, str]:
+    try:
+        cursor = BSON(base64.urlsafe_b64decode(after + "=" * (-len(after) % 4))).decode()
+    except (BSONError, binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(cursor.get("id"), str) or "value" not in cursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return cursor["value"], cursor["id"]
+
+# MongoDB sorts values of different BSON types by type in this order
+# (numbers compare with each other across int/long/double/decimal, and so do
+# strings and symbols), while $gt/$lt only match values of the cursor
+# value's own type. Missing fields and null sort before all of these.
+_BSON_TYPE_ORDER = [
+    ["int", "long", "double", "decimal"],
+    ["string", "symbol"],
+    ["object"],
+    ["array"],
+    ["binData"],
+    ["objectId"],
+    ["bool"],
+    ["date"],
+    ["timestamp"],
+    ["regex"],
+]
+
+def _type_rank(value) -> int:
+    """Position of a cursor value's type in _BSON_TYPE_ORDER"""
+    # bool before int: True is an int in Python
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float, Int64, Decimal128)):
+        return 0
+    if isinstance(value, str):
+        return 1
+    if isinstance(value, dict):
+        return 2
+    if isinstance(value, list):
+        return 3
+    if isinstance(value, (bytes, Binary)):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    if isinstance(value, Timestamp):
+        return 8
+    if isinstance(value, (Regex, re.Pattern)):
+        return 9
+    raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def _after_cursor(sort_field: str, value, document_id: str, direction: int) -> Dict[str, Any]:
+    """Rows that come after (value, id) in (sort_field, id) order.
+
+    Rows whose sort value is of another BSON type are matched by type, so a
+    field holding e.g. dates on some documents and strings on others pages
+    in the same order MongoDB sorts it. Array sort values aren't supported.
+    """
+    comparison = "$lt" if direction < 0 else "$gt"
+    clauses = [{sort_field: value, "id": {comparison: document_id}}]
+    if value is None:
+        # Missing values sort before everything else
+        later_types = _BSON_TYPE_ORDER if direction > 0 else []
+    else:
+        rank = _type_rank(value)
+        clauses.append({sort_field: {comparison: value}})
+        later_types = _BSON_TYPE_ORDER[rank + 1:] if direction > 0 else _BSON_TYPE_ORDER[:rank]
+    if later_types:
+        clauses.append({sort_field: {"$type": [alias for aliases in later_types for alias in aliases]}})
+    if direction < 0 and value is not None:
+        # Descending, the rows without the field come last
+        clauses.append({sort_field: None})
+    return clauses[0] if len(clauses) == 1 else {"$or": clauses}
+
+async def find_page(
+    collection,
+    query: Dict[str, Any],
+    page: PageParams,
+    sort_field: str = "created_at",
+    direction: int = -1,
+    allowed_fields: Optional[Iterable[str]] = None,
+    default_fields: Optional[List[str]] = None
+) -> Tuple[List[dict], Dict[str, str], bool]:
+    """Fetch one keyset page (or every row when no limit is given).
+
+    Rows are ordered by (sort_field, id) so the cursor is stable while
+    documents are added. Returns (documents, headers, projected); projected is
+    True when fields= (or default_fields, for a fixed summary view) trimmed
+    the documents, so the caller should skip model validation and return them
+    as they are.
+    """
+    fields = parse_fields(page.fields, allowed_fields) or default_fields
+    projection = {"_id": 0}
+    if fields:
+        projection.update({field: 1 for field in fields})
+        projection.update({"id": 1, sort_field: 1})
+
+    page_query = query
+    if page.after:
+        value, document_id = _decode_cursor(page.after)
+        page_query = {"$and": [query, _after_cursor(sort_field, value, document_id, direction)]}
+
+    cursor = collection.find(page_query, projection).sort([(sort_field, direction), ("id", direction)])
+    if page.limit:
+        cursor = cursor.limit(page.limit)
+    documents = await cursor.to_list(length=None)
+
+    if page.limit or page.after:
+        total = await collection.count_documents(query)
+    else:
+        total = len(documents)
+    headers = {TOTAL_COUNT_HEADER: str(total)}
+    if page.limit and len(documents) == page.limit:
+        last = documents[-1]
+        headers[NEXT_CURSOR_HEADER] = _encode_cursor(last.get(sort_field), last["id"])
+
+    if fields:
+        # Only hand back what was asked for, not the fields needed for the cursor
+        wanted = {field.split(".")[0] for field in fields}
+        documents = [{k: v for k, v in document.items() if k in wanted} for document in documents]
+    return documents, headers, bool(fields)
+
+def projected_response(documents: List[dict], headers: Dict[str, str]) -> ORJSONResponse:
+    """Return projected rows without running them through the response model"""
+    return ORJSONResponse(content=documents, headers=headers)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, status
+from fastapi import APIRouter, HTTPException, Depends, BackgroundTasks, Response, status
 from typing import List, Optional, Dict, Any
 from datetime import datetime, date, timedelta, timezone
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -9,6 +9,12 @@ import os
 from auth import require_admin, require_admin_or_manager, get_current_user, require_any_role, require_manager, require_payroll_access
 from payroll_models import *
 from payroll_service import PayrollCalculationService, TimesheetService, LeaveManagementService, PayrollReportingService, prepare_for_mongo
+from document_renderer import render_pdf, pdf_response
+from pagination import PageParams, find_page
+from http_responses import FastJSONRoute
+from request_metrics import mongo_command_listener
+from report_streaming import find_by_ids
+from job_costing import refresh_job_costs
 import logging
 
 # MongoDB connection for payroll endpoints
@@ -16,11 +22,11 @@ ROOT_DIR = os.path.dirname(__file__)
 load_dotenv(os.path.join(ROOT_DIR, '.env'))
 
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_listener])
 db = client[os.environ['DB_NAME']]
 
 # Create router for payroll endpoints
-payroll_router = APIRouter(prefix="/api/payroll", tags=["payroll"])
+payroll_router = APIRouter(prefix="/api/payroll", tags=["payroll"], route_class=FastJSONRoute)
 
 # Initialize services
 payroll_calc_service = PayrollCalculationService()
@@ -929,6 +935,8 @@ async def update_timesheet(timesheet_id: str, timesheet_data: TimesheetCreate, c
         {"id": timesheet_id},
         {"$set": timesheet_dict}
     )
+    # Hours booked against a job change its labour cost
+    await refresh_job_costs(db, [existing_timesheet.get("order_id")])
     
     return StandardResponse(success=True, message="Timesheet updated successfully")
 
@@ -1009,6 +1017,8 @@ async def delete_timesheet(timesheet_id: str, current_user: dict = Depends(requi
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Timesheet not found")
     
+    await refresh_job_costs(db, [timesheet.get("order_id")])
+    
     logger.info(f"Timesheet {timesheet_id} deleted by manager {current_user.get('sub')}")
     
     return StandardResponse(
@@ -1221,41 +1231,38 @@ async def approve_timesheet(timesheet_id: str, current_user: dict = Depends(requ
         raise HTTPException(status_code=500, detail=f"Failed to calculate pay: {str(e)}")
 
 @payroll_router.get("/timesheets/pending")
-async def get_pending_timesheets(current_user: dict = Depends(require_payroll_access)):
-    """Get all pending timesheets for approval"""
+async def get_pending_timesheets(
+    response: Response,
+    page: PageParams = Depends(),
+    current_user: dict = Depends(require_payroll_access)
+):
+    """Get all pending timesheets for approval (paginated with limit/after, trimmed with fields)"""
     
-    pending_timesheets = await db.timesheets.find({"status": TimesheetStatus.SUBMITTED}).to_list(1000)
+    pending_timesheets, headers, projected = await find_page(
+        db.timesheets, {"status": TimesheetStatus.SUBMITTED}, page, direction=1
+    )
+    response.headers.update(headers)
+    
+    # Enrich with employee names. A timesheet's employee_id may hold either the
+    # employee profile id or (for older timesheets) the user id.
+    employee_ids = [t["employee_id"] for t in pending_timesheets if t.get("employee_id")]
+    employees_by_id = await find_by_ids(db.employee_profiles, employee_ids)
+    employees_by_user = await find_by_ids(
+        db.employee_profiles, [i for i in employee_ids if i not in employees_by_id], key="user_id"
+    )
     
-    # Remove MongoDB ObjectId and enrich with employee names
     for timesheet in pending_timesheets:
-        # Remove MongoDB ObjectId to prevent serialization errors
-        if "_id" in timesheet:
-            del timesheet["_id"]
-        
-        # Try to find employee by id first, then by user_id as fallback
+        if "employee_id" not in timesheet:
+            continue
         employee_id = timesheet.get("employee_id")
-        employee = None
-        
-        if employee_id:
-            # First try: Find by employee_id in employee_profiles
-            employee = await db.employee_profiles.find_one({"id": employee_id})
-            
-            # Second try: Find by user_id in employee_profiles (in case employee_id is actually a user_id)
-            if not employee:
-                employee = await db.employee_profiles.find_one({"user_id": employee_id})
-            
-            # Third try: Find user and get their employee profile
-            if not employee:
-                user = await db.users.find_one({"id": employee_id})
-                if user:
-                    employee = await db.employee_profiles.find_one({"user_id": user["id"]})
+        employee = employees_by_id.get(employee_id) or employees_by_user.get(employee_id)
         
         # Set employee name and number if found, otherwise use ID
         if employee:
             timesheet["employee_name"] = f"{employee['first_name']} {employee['last_name']}"
             timesheet["employee_number"] = employee.get('employee_number', 'N/A')
         else:
-            timesheet["employee_name"] = f"Unknown Employee (ID: {employee_id[:8]}...)"
+            timesheet["employee_name"] = f"Unknown Employee (ID: {(employee_id or '')[:8]}...)"
             timesheet["employee_number"] = "N/A"
             logger.warning(f"Could not find employee for timesheet {timesheet.get('id')} with employee_id {employee_id}")
     
@@ -1728,20 +1735,19 @@ async def generate_payslip(timesheet_id: str, current_user: dict = Depends(requi
 
 @payroll_router.get("/reports/payslips")
 async def get_all_payslips(
+    response: Response,
     employee_id: Optional[str] = None,
+    page: PageParams = Depends(),
     current_user: dict = Depends(require_payroll_access)
 ):
-    """Get all historic payslips"""
+    """Get all historic payslips, newest first (paginated with limit/after, trimmed with fields)"""
     
     query = {}
     if employee_id:
         query["employee_id"] = employee_id
     
-    payslips = await db.payslips.find(query).sort("created_at", -1).to_list(1000)
-    
-    for payslip in payslips:
-        if "_id" in payslip:
-            del payslip["_id"]
+    payslips, headers, projected = await find_page(db.payslips, query, page)
+    response.headers.update(headers)
     
     return {"success": True, "data": payslips}
 
@@ -1969,245 +1975,18 @@ async def generate_payslip(timesheet_id: str, current_user: dict = Depends(requi
 @payroll_router.get("/reports/payslip/{payslip_id}/pdf")
 async def download_payslip_pdf(payslip_id: str, current_user: dict = Depends(require_payroll_access)):
     """Generate and download a PDF payslip"""
-    from reportlab.lib.pagesizes import A4
-    from reportlab.lib import colors
-    from reportlab.lib.units import inch
-    from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-    from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-    from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-    from io import BytesIO
-    
     try:
         # Get payslip from database
-        payslip = await db.payslips.find_one({"id": payslip_id})
+        payslip = await db.payslips.find_one({"id": payslip_id}, {"_id": 0, "payslip_data": 1})
         if not payslip:
             raise HTTPException(status_code=404, detail="Payslip not found")
         
         data = payslip['payslip_data']
-        
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        story = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#F59E0B'),
-            alignment=TA_CENTER,
-            spaceAfter=20
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#F59E0B'),
-            spaceAfter=10
-        )
-        
-        # Title
-        story.append(Paragraph("PAYSLIP", title_style))
-        story.append(Paragraph("Misty Manufacturing", styles['Normal']))
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Employee Information
-        story.append(Paragraph("EMPLOYEE INFORMATION", heading_style))
-        emp_data = [
-            ['Name:', data['employee']['name'], 'Employee Number:', data['employee']['employee_number']],
-            ['Position:', data['employee']['position'], 'Department:', data['employee']['department']],
-            ['Tax File Number:', data['employee']['tax_file_number'], '', '']
-        ]
-        emp_table = Table(emp_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
-        emp_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        story.append(emp_table)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Pay Period
-        story.append(Paragraph("PAY PERIOD", heading_style))
-        period_data = [
-            ['Week Starting:', data['pay_period']['week_start'], 'Week Ending:', data['pay_period']['week_end']]
-        ]
-        period_table = Table(period_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
-        period_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        story.append(period_table)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Hours Worked
-        story.append(Paragraph("HOURS WORKED", heading_style))
-        hours_data = [
-            ['Regular Hours:', f"{data['hours']['regular_hours']}h", 'Rate:', f"${data['hours']['hourly_rate']:.2f}/hr"],
-            ['Overtime Hours:', f"{data['hours']['overtime_hours']}h", 'Rate:', f"${data['hours']['hourly_rate'] * 1.5:.2f}/hr"],
-        ]
-        
-        # Add leave hours if present
-        if data['hours'].get('leave_hours', 0) > 0:
-            hours_data.append(['Leave Hours:', f"{data['hours']['leave_hours']}h", '', ''])
-            
-        hours_data.append(['Total Hours:', f"{data['hours'].get('total_hours', data['hours']['regular_hours'] + data['hours']['overtime_hours'])}h", '', ''])
-        
-        hours_table = Table(hours_data, colWidths=[1.5*inch, 2*inch, 1.5*inch, 2*inch])
-        hours_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTNAME', (2, 0), (2, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
-        ]))
-        story.append(hours_table)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Leave Used (if any)
-        if data.get('leave_used') and len(data['leave_used']) > 0:
-            story.append(Paragraph("LEAVE USED THIS PERIOD", heading_style))
-            leave_data = []
-            for leave_type, hours in data['leave_used'].items():
-                leave_name = leave_type.replace('_', ' ').title()
-                leave_data.append([leave_name + ':', f"{hours}h"])
-            
-            leave_table = Table(leave_data, colWidths=[3*inch, 3*inch])
-            leave_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            story.append(leave_table)
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Earnings
-        story.append(Paragraph("EARNINGS", heading_style))
-        earnings_data = [
-            ['Regular Pay:', f"${data['earnings']['regular_pay']:.2f}"],
-            ['Overtime Pay:', f"${data['earnings']['overtime_pay']:.2f}"],
-            ['Gross Pay:', f"${data['earnings']['gross_pay']:.2f}"],
-        ]
-        earnings_table = Table(earnings_data, colWidths=[3*inch, 3*inch])
-        earnings_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LINEABOVE', (0, -1), (-1, -1), 1, colors.grey),
-            ('FONTSIZE', (0, -1), (-1, -1), 12),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.HexColor('#10B981')),
-        ]))
-        story.append(earnings_table)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Deductions
-        story.append(Paragraph("DEDUCTIONS", heading_style))
-        deductions_data = [
-            ['PAYG Tax:', f"${data['deductions'].get('payg_tax', data['deductions']['tax_withheld']):.2f}"],
-        ]
-        
-        # Add Medicare Levy if present
-        if data['deductions'].get('medicare_levy', 0) > 0:
-            deductions_data.append(['Medicare Levy (2%):', f"${data['deductions']['medicare_levy']:.2f}"])
-        
-        # Add HELP withholding if present
-        if data['deductions'].get('help_withholding', 0) > 0:
-            deductions_data.append(['HELP/HECS Repayment:', f"${data['deductions']['help_withholding']:.2f}"])
-        
-        # Total tax withheld
-        deductions_data.append(['Total Tax Withheld:', f"${data['deductions']['tax_withheld']:.2f}"])
-        deductions_data.append(['', ''])  # Spacer
-        deductions_data.append(['Superannuation (12%):', f"${data['deductions']['superannuation']:.2f}"])
-        deductions_data.append(['', '(Paid by employer, not deducted from pay)'])
-        
-        deductions_table = Table(deductions_data, colWidths=[3*inch, 3*inch])
-        deductions_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LINEABOVE', (0, 3), (-1, 3), 1, colors.grey),
-            ('FONTSIZE', (0, -1), (-1, -1), 8),
-            ('TEXTCOLOR', (0, -1), (-1, -1), colors.grey),
-        ]))
-        story.append(deductions_table)
-        story.append(Spacer(1, 0.2*inch))
-        
-        # Net Pay
-        story.append(Paragraph("NET PAY", heading_style))
-        net_data = [
-            ['NET PAY (Paid to your account):', f"${data['net_pay']:.2f}"],
-        ]
-        net_table = Table(net_data, colWidths=[3*inch, 3*inch])
-        net_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 14),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.HexColor('#F59E0B')),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LINEABOVE', (0, 0), (-1, -1), 2, colors.HexColor('#F59E0B')),
-            ('LINEBELOW', (0, 0), (-1, -1), 2, colors.HexColor('#F59E0B')),
-        ]))
-        story.append(net_table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Leave Balances
-        if data.get('leave_balances'):
-            story.append(Paragraph("LEAVE BALANCES (After this payslip)", heading_style))
-            balance_data = [
-                ['Annual Leave:', f"{data['leave_balances'].get('annual_leave', 0):.1f} hours"],
-                ['Sick Leave:', f"{data['leave_balances'].get('sick_leave', 0):.1f} hours"],
-                ['Personal Leave:', f"{data['leave_balances'].get('personal_leave', 0):.1f} hours"],
-            ]
-            balance_table = Table(balance_data, colWidths=[3*inch, 3*inch])
-            balance_table.setStyle(TableStyle([
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 10),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('BACKGROUND', (0, 0), (-1, -1), colors.HexColor('#F3F4F6')),
-            ]))
-            story.append(balance_table)
-            story.append(Spacer(1, 0.2*inch))
-        
-        # Payment Details
-        story.append(Paragraph("PAYMENT DETAILS", heading_style))
-        payment_data = [
-            ['BSB:', data['bank_details']['bsb']],
-            ['Account Number:', data['bank_details']['account_number']],
-            ['Superannuation Fund:', data['bank_details']['superannuation_fund']],
-        ]
-        payment_table = Table(payment_data, colWidths=[3*inch, 3*inch])
-        payment_table.setStyle(TableStyle([
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        story.append(payment_table)
-        story.append(Spacer(1, 0.3*inch))
-        
-        # Footer
-        footer_text = f"Generated: {datetime.fromisoformat(data['generated_at'].replace('Z', '+00:00')).strftime('%d %B %Y at %I:%M %p')}"
-        story.append(Paragraph(footer_text, styles['Normal']))
-        
-        # Build PDF
-        doc.build(story)
-        buffer.seek(0)
+        pdf_content = await render_pdf("payslip", data)
         
         # Return PDF as response
         filename = f"payslip_{data['employee']['employee_number']}_{data['pay_period']['week_start']}.pdf"
-        
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(
-            buffer,
-            media_type="application/pdf",
-            headers={"Content-Disposition": f"attachment; filename={filename}"}
-        )
+        return pdf_response(pdf_content, filename)
         
     except HTTPException:
         raise
@@ -0,0 +1,398 @@
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterable, Optional, Tuple
+from cachetools import TTLCache
+import asyncio
+import logging
+import time
+from models import ProductionStage, OrderStatus
+from file_utils import get_file_url
+from counters import COUNTERS_COLLECTION, next_sequence
+from date_fields import as_utc_datetime
+
+# Client name/logo lookups change rarely but are needed for every card on the
+# board, so keep them in a short-lived in-process cache
+CLIENT_CACHE_TTL_SECONDS = 60
+CLIENT_CACHE_MAX_SIZE = 2048
+
+_client_cache: TTLCache = TTLCache(maxsize=CLIENT_CACHE_MAX_SIZE, ttl=CLIENT_CACHE_TTL_SECONDS)
+
+# Only the order fields rendered on a board card are fetched from Mongo
+BOARD_ORDER_PROJECTION = {
+    "_id": 0,
+    "id": 1,
+    "order_number": 1,
+    "client_id": 1,
+    "client_name": 1,
+    "due_date": 1,
+    "total_amount": 1,
+    "runtime_estimate": 1,
+    "items": 1,
+    "delivery_address": 1,
+    "production_started_at": 1,
+    "stage_start_times": 1,
+    "display_order": 1,
+    "current_stage": 1,
+}
+
+# Board versions come from a shared counter that every board write bumps, and
+# each bump is logged with the orders it touched, so every worker's snapshot
+# catches up on the same numbered changes
+BOARD_VERSION_COUNTER = "production_board"
+BOARD_CHANGES_COLLECTION = "production_board_changes"
+
+# Logged board changes expire after this long (TTL index on created_at)
+BOARD_CHANGE_TTL_SECONDS = 3600
+
+# A writer takes its version from the counter before its change is logged, so
+# a missing change is only treated as lost (and the board rebuilt) once a
+# later change has been logged for longer than this. Changes that expired
+# under the TTL are covered by the snapshot's max age being far shorter.
+BOARD_CHANGE_GRACE_SECONDS = 10
+
+# The board snapshot is fully reloaded from Mongo at least this often, so
+# writes made outside the API (scripts, the Mongo shell) still reach the tablets
+BOARD_SNAPSHOT_MAX_AGE_SECONDS = 300
+
+# Number of removed cards remembered for delta responses
+BOARD_REMOVED_HISTORY = 500
+
+logger = logging.getLogger(__name__)
+
+def invalidate_client_cache(client_id: str = None):
+    """Drop a cached client (or the whole cache) after the client record changes"""
+    if client_id is None:
+        _client_cache.clear()
+    else:
+        _client_cache.pop(client_id, None)
+
+async def get_clients_by_ids(db, client_ids: Iterable[str]) -> Dict[str, Dict[str, Any]]:
+    """Return {client_id: {"name", "logo_url"}} using the cache and one bulk query for misses"""
+    wanted = {client_id for client_id in client_ids if client_id}
+    found = {}
+    missing = []
+    for client_id in wanted:
+        cached = _client_cache.get(client_id)
+        if cached is not None:
+            found[client_id] = cached
+        else:
+            missing.append(client_id)
+
+    if missing:
+        cursor = db.clients.find(
+            {"id": {"$in": missing}},
+            {"_id": 0, "id": 1, "company_name": 1, "logo_path": 1}
+        )
+        async for client in cursor:
+            entry = {
+                "name": client.get("company_name"),
+                "logo_url": get_file_url(client.get("logo_path", "")),
+            }
+            _client_cache[client["id"]] = entry
+            found[client["id"]] = entry
+
+    return found
+
+async def get_materials_ready_by_order(db, order_ids: List[str]) -> Dict[str, bool]:
+    """Return {order_id: materials_ready} for the given orders in one bulk query"""
+    if not order_ids:
+        return {}
+
+    cursor = db.materials_status.find(
+        {"order_id": {"$in": order_ids}},
+        {"_id": 0, "order_id": 1, "materials_ready": 1}
+    )
+    return {status["order_id"]: status.get("materials_ready", False) async for status in cursor}
+
+def _parse_due_date(due_date) -> datetime:
+    """Normalise a stored due date (string or naive/aware datetime) to an aware datetime"""
+    if isinstance(due_date, str):
+        due_date = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
+    if isinstance(due_date, datetime) and due_date.tzinfo is None:
+        # Make timezone-naive datetime timezone-aware (assume UTC)
+        due_date = due_date.replace(tzinfo=timezone.utc)
+    return due_date
+
+def build_order_card(order: dict, client: dict, materials_ready: bool) -> Dict[str, Any]:
+    """Build the production board card for a single order (without is_overdue, see with_overdue)"""
+    return {
+        "id": order["id"],
+        "order_number": order["order_number"],
+        "client_name": order["client_name"],
+        "client_logo": client.get("logo_url") if client else None,
+        "due_date": order["due_date"],
+        "total_amount": order["total_amount"],
+        "runtime": order.get("runtime_estimate", "2-3 days"),
+        "materials_ready": materials_ready,
+        "items": order["items"],
+        "delivery_address": order.get("delivery_address"),
+        "production_started_at": order.get("production_started_at"),
+        "stage_start_times": order.get("stage_start_times", {}),
+        "display_order": order.get("display_order", 999)  # Default to end if not set
+    }
+
+def with_overdue(card: Dict[str, Any], now: datetime) -> Dict[str, Any]:
+    """The card as served. is_overdue depends on when the board is read, so
+    it is added on every read rather than kept on the cached card."""
+    return {**card, "is_overdue": _parse_due_date(card["due_date"]) < now}
+
+def empty_board() -> Dict[str, List[Dict[str, Any]]]:
+    """Board skeleton with one column per visible production stage"""
+    # Don't show cleared orders on board
+    return {stage.value: [] for stage in ProductionStage if stage != ProductionStage.CLEARED}
+
+async def fetch_board_orders(db, order_ids: List[str] = None) -> List[dict]:
+    """Fetch the orders that belong on the board (optionally restricted to some ids)"""
+    query = {
+        "status": {"$ne": OrderStatus.COMPLETED},
+        "current_stage": {"$ne": ProductionStage.CLEARED.value}
+    }
+    if order_ids is not None:
+        query["id"] = {"$in": order_ids}
+
+    orders = await db.orders.find(query, BOARD_ORDER_PROJECTION).to_list(length=None)
+    visible_stages = empty_board()
+    return [
+        order for order in orders
+        if order.get("current_stage", ProductionStage.ORDER_ENTERED.value) in visible_stages
+    ]
+
+async def build_board_cards(db, orders: List[dict]) -> Dict[str, Tuple[str, Dict[str, Any]]]:
+    """Return {order_id: (stage, card)} for the given orders.
+
+    Client info and materials status are joined in memory from bulk $in
+    lookups instead of one query per order.
+    """
+    clients = await get_clients_by_ids(db, (order.get("client_id") for order in orders))
+    materials_ready = await get_materials_ready_by_order(db, [order["id"] for order in orders])
+
+    cards = {}
+    for order in orders:
+        stage = order.get("current_stage", ProductionStage.ORDER_ENTERED.value)
+        cards[order["id"]] = (stage, build_order_card(
+            order,
+            clients.get(order.get("client_id")),
+            materials_ready.get(order["id"], False)
+        ))
+    return cards
+
+def group_cards_by_stage(cards: Iterable[Tuple[str, Dict[str, Any]]]) -> Dict[str, List[Dict[str, Any]]]:
+    """Group (stage, card) pairs into board columns sorted by display_order"""
+    board = empty_board()
+    now = datetime.now(timezone.utc)
+    for stage, card in cards:
+        board[stage].append(with_overdue(card, now))
+
+    # Sort each stage by display_order
+    for stage in board:
+        board[stage].sort(key=lambda x: x.get("display_order", 999))
+
+    return board
+
+async def build_production_board(db) -> Dict[str, List[Dict[str, Any]]]:
+    """Build the production board with a fixed number of round-trips"""
+    orders = await fetch_board_orders(db)
+    cards = await build_board_cards(db, orders)
+    return group_cards_by_stage(cards.values())
+
+async def record_board_change(db, order_ids: List[str]) -> int:
+    """Bump the shared board version and log which orders changed at it"""
+    version = await next_sequence(db, BOARD_VERSION_COUNTER)
+    await db[BOARD_CHANGES_COLLECTION].insert_one({
+        "_id": version,
+        "order_ids": order_ids,
+        "created_at": datetime.now(timezone.utc)
+    })
+    return version
+
+async def current_board_version(db) -> int:
+    counter = await db[COUNTERS_COLLECTION].find_one({"_id": BOARD_VERSION_COUNTER})
+    return counter["seq"] if counter else 0
+
+class ProductionBoardSnapshot:
+    """Versioned in-memory copy of the production board.
+
+    Board versions are shared by every worker: write endpoints bump a Mongo
+    counter and log the orders they touched (``record_board_change``), and
+    each worker's snapshot re-reads the orders logged since its own version
+    before answering. Every card carries the version at which it last changed,
+    so ``If-None-Match`` (304 when nothing moved) and ``since=<version>`` (only
+    changed and removed cards) mean the same on every worker. A periodic full
+    reload picks up anything written outside the API.
+    """
+
+    def __init__(self):
+        self.version = 0
+        self._cards: Dict[str, Tuple[str, Dict[str, Any], int]] = {}
+        self._removed: Dict[str, int] = {}
+        self._oldest_delta_version = 0
+        # When each version's change was logged, to tell which cards have gone
+        # overdue since a client's version
+        self._logged_at: Dict[int, datetime] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = asyncio.Lock()
+
+    @property
+    def etag(self) -> str:
+        # Cards go overdue without a write, so the overdue count is part of the tag
+        now = datetime.now(timezone.utc)
+        overdue = sum(1 for _, card, _ in self._cards.values() if _parse_due_date(card["due_date"]) < now)
+        return f'W/"board-{self.version}-{overdue}"'
+
+    def invalidate(self):
+        """Force a full reload on the next read"""
+        self._loaded_at = None
+
+    def _is_stale(self) -> bool:
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= BOARD_SNAPSHOT_MAX_AGE_SECONDS
+
+    def _store(self, order_id: str, entry: Optional[Tuple[str, Dict[str, Any]]], version: int):
+        """Store a card (or its removal) as changed at version.
+
+        Always relabelled, even if the card looks the same: it may have been
+        read after a write whose change wasn't logged yet.
+        """
+        if entry is None:
+            if order_id not in self._cards and order_id not in self._removed:
+                return
+            self._cards.pop(order_id, None)
+            self._removed[order_id] = version
+            if len(self._removed) > BOARD_REMOVED_HISTORY:
+                oldest_id = min(self._removed, key=self._removed.get)
+                self._oldest_delta_version = self._removed.pop(oldest_id)
+            return
+
+        stage, card = entry
+        self._cards[order_id] = (stage, card, version)
+        self._removed.pop(order_id, None)
+
+    def _unlogged_changes(self, cards: Dict[str, Tuple[str, Dict[str, Any]]]) -> List[str]:
+        """Orders whose rebuilt card differs from the snapshot's without a logged change"""
+        changed = [
+            order_id for order_id, entry in cards.items()
+            if order_id not in self._cards or self._cards[order_id][:2] != entry
+        ]
+        changed.extend(order_id for order_id in self._cards if order_id not in cards)
+        return changed
+
+    async def _reload(self, db):
+        """Rebuild every card; deltas can only start from the version read here.
+
+        Cards that changed without a logged change (a write from outside the
+        API, or one whose change failed to log) are logged now, so the board
+        version, and with it the ETag, moves past what clients already hold.
+        """
+        version = await current_board_version(db)
+        change = await db[BOARD_CHANGES_COLLECTION].find_one({"_id": version}, {"created_at": 1}) if version else None
+        orders = await fetch_board_orders(db)
+        cards = await build_board_cards(db, orders)
+        unlogged = self._unlogged_changes(cards) if self._loaded_at is not None or self._cards else []
+        self._cards = {order_id: (stage, card, version) for order_id, (stage, card) in cards.items()}
+        # Cards that vanished unlogged are kept as removals so the replay reports them
+        self._removed = {order_id: version for order_id in unlogged if order_id not in cards}
+        logged_at = as_utc_datetime(change.get("created_at")) if change else None
+        self._logged_at = {version: logged_at} if logged_at else {}
+        self.version = self._oldest_delta_version = version
+        self._loaded_at = time.monotonic()
+        if unlogged:
+            # Replaying the new change relabels those cards with its version. A
+            # change missing before it is left to the next read's sync rather
+            # than rebuilding again from here
+            latest = await record_board_change(db, unlogged)
+            await self._catch_up(db, latest)
+
+    async def _catch_up(self, db, latest: int) -> bool:
+        """Re-read the orders logged between this snapshot's version and latest.
+
+        Stops at the first missing change; returns True if that change looks
+        lost rather than still being logged, so the board needs a rebuild.
+        """
+        changes = await db[BOARD_CHANGES_COLLECTION].find(
+            {"_id": {"$gt": self.version, "$lte": latest}}
+        ).sort("_id", 1).to_list(length=None)
+        touched: Dict[str, int] = {}
+        applied = self.version
+        lost = False
+        for change in changes:
+            if change["_id"] != applied + 1:
+                # A writer may have its version but not have logged it yet;
+                # once later changes have aged past the grace period it has failed
+                logged_at = as_utc_datetime(change.get("created_at"))
+                lost = logged_at is None or (datetime.now(timezone.utc) - logged_at).total_seconds() > BOARD_CHANGE_GRACE_SECONDS
+                break
+            applied = change["_id"]
+            logged_at = as_utc_datetime(change.get("created_at"))
+            if logged_at:
+                self._logged_at[applied] = logged_at
+            for order_id in change["order_ids"]:
+                touched[order_id] = applied
+        if touched:
+            orders = await fetch_board_orders(db, list(touched))
+            cards = await build_board_cards(db, orders)
+            for order_id, version in touched.items():
+                self._store(order_id, cards.get(order_id), version)
+        # A version whose change isn't logged yet is picked up on a later read
+        self.version = applied
+        return lost
+
+    async def sync(self, db):
+        """Catch up with the shared board version (no-op until the board is first loaded)"""
+        if self._loaded_at is None:
+            return
+        latest = await current_board_version(db)
+        if latest == self.version:
+            return
+        async with self._lock:
+            # Another request may have caught up while this one waited
+            latest = await current_board_version(db)
+            if latest < self.version or latest - self.version > BOARD_REMOVED_HISTORY:
+                # Counter reset, or too far behind to be worth replaying
+                await self._reload(db)
+            elif latest > self.version and await self._catch_up(db, latest):
+                # A change was lost (failed after taking its version, or expired)
+                await self._reload(db)
+
+    async def ensure_fresh(self, db):
+        """Load the snapshot if it was never loaded or is too old, otherwise catch it up"""
+        if not self._is_stale():
+            await self.sync(db)
+            return
+        async with self._lock:
+            if self._is_stale():
+                await self._reload(db)
+
+    def board(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Full board grouped by stage"""
+        return group_cards_by_stage((stage, card) for stage, card, _ in self._cards.values())
+
+    def delta_since(self, since: int) -> Optional[Dict[str, Any]]:
+        """Cards changed and removed after ``since``, or None if a full board is needed.
+
+        Cards that went overdue after ``since`` was logged count as changed.
+        """
+        if since > self.version or since < self._oldest_delta_version:
+            return None
+        since_logged_at = self._logged_at.get(since)
+        if since_logged_at is None:
+            # Can't tell which cards have gone overdue since then
+            return None
+        now = datetime.now(timezone.utc)
+        changed = []
+        for stage, card, card_version in self._cards.values():
+            served = with_overdue(card, now)
+            went_overdue = served["is_overdue"] and _parse_due_date(card["due_date"]) >= since_logged_at
+            if card_version > since or went_overdue:
+                changed.append({"stage": stage, "card": served})
+        changed.sort(key=lambda x: x["card"].get("display_order", 999))
+        removed = [order_id for order_id, removed_version in self._removed.items() if removed_version > since]
+        return {"changed": changed, "removed": removed}
+
+production_board_snapshot = ProductionBoardSnapshot()
+
+async def notify_board_orders_changed(db, order_ids: List[str]):
+    """Record a board write for every worker's snapshot without failing the caller's write"""
+    try:
+        await record_board_change(db, list(dict.fromkeys(order_ids)))
+        await production_board_snapshot.sync(db)
+    except Exception as e:
+        logger.error(f"Failed to refresh production board for orders {order_ids}: {str(e)}")
+        production_board_snapshot.invalidate()
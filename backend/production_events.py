@@ -0,0 +1,246 @@
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Any, List, Optional, Set
+from fastapi.encoders import jsonable_encoder
+import asyncio
+import json
+import logging
+import os
+import secrets
+from counters import COUNTERS_COLLECTION, next_sequence
+
+# "memory" fans events out inside this process only. "changestream" writes each
+# event to Mongo and fans out from a change stream, so every uvicorn worker sees
+# every event (requires MongoDB running as a replica set)
+PRODUCTION_EVENTS_BACKEND = os.getenv("PRODUCTION_EVENTS_BACKEND", "memory")
+PRODUCTION_EVENTS_COLLECTION = "production_events"
+
+# Every event is numbered from this shared counter and, in "changestream" mode,
+# stored under that number, so event IDs agree across workers and restarts
+PRODUCTION_EVENTS_COUNTER = "production_events"
+
+# Stored events are what a reconnecting display replays from in "changestream"
+# mode; a TTL index on created_at drops them after this long
+PRODUCTION_EVENT_TTL_SECONDS = 3600
+
+# Events kept in memory for Last-Event-ID replay in "memory" mode
+EVENT_HISTORY_SIZE = 500
+
+# Events buffered per connection before a slow display is told to resync
+SUBSCRIBER_QUEUE_SIZE = 200
+
+# Seconds between SSE keepalive comments so proxies don't close idle streams
+HEARTBEAT_SECONDS = 15
+
+# EventSource can't send an Authorization header, so a display first POSTs for
+# a single-use ticket and opens the stream with ?ticket=. Tickets live in Mongo
+# so any worker can redeem them; a TTL index on expires_at clears unused ones.
+STREAM_TICKETS_COLLECTION = "production_stream_tickets"
+STREAM_TICKET_TTL_SECONDS = 60
+
+logger = logging.getLogger(__name__)
+
+def _make_event(event_id: Optional[int], event_type: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    return {"id": event_id, "type": event_type, "data": data}
+
+def _resync_event() -> Dict[str, Any]:
+    return _make_event(None, "resync", {})
+
+async def issue_stream_ticket(db, user: Dict[str, Any]) -> Dict[str, Any]:
+    """Store a single-use ticket that opens one event stream as user"""
+    ticket = secrets.token_urlsafe(32)
+    expires_at = datetime.now(timezone.utc) + timedelta(seconds=STREAM_TICKET_TTL_SECONDS)
+    await db[STREAM_TICKETS_COLLECTION].insert_one({
+        "_id": ticket,
+        "user_id": user.get("user_id"),
+        "username": user.get("sub"),
+        "role": user.get("role"),
+        "expires_at": expires_at
+    })
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+async def redeem_stream_ticket(db, ticket: str) -> Optional[Dict[str, Any]]:
+    """Consume a ticket, returning who it was issued to (None if unknown, used or expired)"""
+    # The TTL monitor only runs once a minute, so expiry is checked here too
+    return await db[STREAM_TICKETS_COLLECTION].find_one_and_delete({
+        "_id": ticket,
+        "expires_at": {"$gt": datetime.now(timezone.utc)}
+    })
+
+class ProductionEventBus:
+    """Pub/sub for production board events.
+
+    Each connected display gets its own bounded queue. Event IDs come from a
+    shared counter, so a display reconnecting to any worker can send
+    Last-Event-ID and replay what it missed, from the stored events in
+    "changestream" mode or the recent in-process history in "memory" mode.
+    """
+
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._history: deque = deque(maxlen=EVENT_HISTORY_SIZE)
+        self._db = None
+        self._watch_task: Optional[asyncio.Task] = None
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    @property
+    def uses_change_stream(self) -> bool:
+        return self._watch_task is not None and not self._watch_task.done()
+
+    async def subscribe(self, last_event_id: Optional[int] = None) -> asyncio.Queue:
+        """Register a display, pre-filled with any events newer than last_event_id"""
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Registered before reading the replay so nothing published meanwhile is lost
+        self._subscribers.add(queue)
+        if last_event_id is None:
+            return queue
+
+        try:
+            replay = await self._replay(last_event_id)
+        except Exception as e:
+            logger.error(f"Could not replay production events after {last_event_id}: {str(e)}")
+            replay = None
+        live = []
+        while not queue.empty():
+            live.append(queue.get_nowait())
+        if replay is None:
+            # Can't replay reliably (too far behind, or from before a reset);
+            # the display should reload the board
+            events = [_resync_event(), *live]
+        else:
+            replayed = {event["id"] for event in replay}
+            events = replay + [event for event in live if event["id"] not in replayed]
+        for event in events:
+            self._deliver(queue, event)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    async def _replay(self, last_event_id: int) -> Optional[List[Dict[str, Any]]]:
+        """Events after last_event_id, or None if they can't all be replayed"""
+        counter = await self._db[COUNTERS_COLLECTION].find_one({"_id": PRODUCTION_EVENTS_COUNTER})
+        latest = counter["seq"] if counter else 0
+        if last_event_id > latest:
+            return None
+        if last_event_id == latest:
+            return []
+
+        if self.uses_change_stream:
+            documents = await self._db[PRODUCTION_EVENTS_COLLECTION].find(
+                {"_id": {"$gt": last_event_id}}
+            ).sort("_id", 1).limit(SUBSCRIBER_QUEUE_SIZE).to_list(length=None)
+            events = [_make_event(doc["_id"], doc["type"], doc.get("data", {})) for doc in documents]
+        else:
+            events = [event for event in self._history if event["id"] > last_event_id]
+
+        # Missing the next event means it has expired (or was never stored)
+        if not events or events[0]["id"] > last_event_id + 1 or len(events) >= SUBSCRIBER_QUEUE_SIZE:
+            return None
+        return events
+
+    def _deliver(self, queue: asyncio.Queue, event: Dict[str, Any]):
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Display isn't keeping up; replace its backlog with a resync marker
+            while not queue.empty():
+                queue.get_nowait()
+            queue.put_nowait(_resync_event())
+
+    def _dispatch(self, event: Dict[str, Any]):
+        """Hand an event to every local subscriber"""
+        for queue in list(self._subscribers):
+            self._deliver(queue, event)
+
+    async def publish(self, event_type: str, data: Dict[str, Any]):
+        """Publish an event to every connected display"""
+        published_at = datetime.now(timezone.utc)
+        data = jsonable_encoder({**data, "published_at": published_at})
+        event_id = await next_sequence(self._db, PRODUCTION_EVENTS_COUNTER)
+        if self.uses_change_stream:
+            # The watcher dispatches it once Mongo confirms the insert
+            await self._db[PRODUCTION_EVENTS_COLLECTION].insert_one(
+                {"_id": event_id, "type": event_type, "data": data, "created_at": published_at}
+            )
+        else:
+            event = _make_event(event_id, event_type, data)
+            self._history.append(event)
+            self._dispatch(event)
+
+    async def start(self, db):
+        """Start the change-stream watcher when that backend is configured"""
+        self._db = db
+        if PRODUCTION_EVENTS_BACKEND != "changestream":
+            return
+        try:
+            # Change streams are only available on replica sets
+            hello = await db.command("hello")
+            if not hello.get("setName"):
+                logger.warning("PRODUCTION_EVENTS_BACKEND=changestream but MongoDB is not a replica set; using in-process events")
+                return
+        except Exception as e:
+            logger.warning(f"Could not check MongoDB topology for production events: {str(e)}")
+            return
+        self._watch_task = asyncio.create_task(self._watch(db))
+        logger.info("Production events fanning out from MongoDB change stream")
+
+    async def stop(self):
+        if self._watch_task:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, db):
+        pipeline = [{"$match": {"operationType": "insert"}}]
+        while True:
+            try:
+                async with db[PRODUCTION_EVENTS_COLLECTION].watch(pipeline) as stream:
+                    async for change in stream:
+                        document = change["fullDocument"]
+                        self._dispatch(_make_event(document["_id"], document["type"], document.get("data", {})))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Production event change stream failed, retrying: {str(e)}")
+                self._dispatch(_resync_event())
+                await asyncio.sleep(5)
+
+    async def stream(self, queue: asyncio.Queue, is_disconnected):
+        """Yield server-sent event frames for one display until it disconnects"""
+        # A replayed event can still arrive from the change stream afterwards
+        sent_ids: deque = deque(maxlen=SUBSCRIBER_QUEUE_SIZE)
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                if await is_disconnected():
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if event["id"] is not None:
+                    if event["id"] in sent_ids:
+                        continue
+                    sent_ids.append(event["id"])
+                yield format_sse(event)
+        finally:
+            self.unsubscribe(queue)
+
+def format_sse(event: Dict[str, Any]) -> str:
+    """Render an event as a text/event-stream frame"""
+    lines = []
+    if event.get("id") is not None:
+        lines.append(f"id: {event['id']}")
+    lines.append(f"event: {event['type']}")
+    lines.append(f"data: {json.dumps(event['data'])}")
+    return "\n".join(lines) + "\n\n"
+
+production_events = ProductionEventBus()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Rebuild Report Rollups
+
+The late deliveries, customer annual, monthly invoicing and projected order
+analysis reports read per-client, per-month, per-product and per-day
+aggregates from the `report_rollups` collection. They are kept up to date as orders are created,
+change stage and are invoiced; this script recomputes all of them from the
+orders and invoices collections, for the first deployment or if they drift.
+
+Usage:
+    python rebuild_report_rollups.py
+
+Note: This script is idempotent - the rollups are replaced, not added to.
+Reports opened while it runs may show partial figures.
+"""
+
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+from dotenv import load_dotenv
+from datetime import datetime
+from report_rollups import rebuild_rollups, ROLLUPS_COLLECTION
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+
+if not MONGO_URL or not DB_NAME:
+    print("❌ Error: MONGO_URL or DB_NAME not found in environment")
+    sys.exit(1)
+
+async def main():
+    """Main migration function"""
+    print("\n" + "="*60)
+    print("DATABASE MIGRATION: Rebuild Report Rollups")
+    print("="*60)
+    print(f"Database: {DB_NAME}")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("="*60 + "\n")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        await db.command('ping')
+        print("✅ Connected to MongoDB successfully\n")
+
+        result = await rebuild_rollups(db)
+        print(f"✅ Rolled up {result['orders']} orders and {result['invoices']} invoices")
+
+        print("\n📊 Buckets by kind:")
+        async for kind in db[ROLLUPS_COLLECTION].aggregate([
+            {"$group": {"_id": "$kind", "buckets": {"$sum": 1}}},
+            {"$sort": {"_id": 1}}
+        ]):
+            print(f"  {kind['_id']}: {kind['buckets']}")
+
+        print("\n" + "="*60)
+        print("✅ MIGRATION COMPLETED SUCCESSFULLY")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
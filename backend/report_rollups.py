@@ -0,0 +1,403 @@
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Iterable, Optional
+from pymongo import UpdateOne, DeleteOne
+from pymongo.errors import DuplicateKeyError
+from report_streaming import iter_batches
+from date_fields import as_utc_datetime, to_date_expression
+import logging
+
+# Materialised aggregates behind the reports module. Each bucket is one
+# document with a "count" and its other metrics:
+#
+#   client_month:<client>:<YYYY-MM>                   orders created that month (count, revenue, completed, on_time)
+#   client_product_month:<client>:<YYYY-MM>:<product> order lines by product (count, quantity, revenue)
+#   product_day:<product id>:<client>:<YYYY-MM-DD>    order lines by catalogue product, bar cancelled orders (count, quantity)
+#   late_month:<client>:<YYYY-MM>                     completed late, by completion month (count, delay_days)
+#   completed_month:<YYYY-MM>                         jobs cleared that month, per cleared_at (count)
+#   invoiced_month:<YYYY-MM>                          invoices raised that month (count, amount)
+#
+# What every order and invoice last added to the buckets is kept alongside,
+# so an update takes its old contribution back out before adding the new one.
+# Contributions carry a version, and a refresh only adjusts the buckets after
+# swapping in its contribution at the version it read, so two refreshes of the
+# same order can't both take the old contribution out.
+ROLLUPS_COLLECTION = "report_rollups"
+CONTRIBUTIONS_COLLECTION = "report_rollup_contributions"
+
+# Attempts per source when another refresh swaps its contribution first
+CONTRIBUTION_RETRIES = 5
+
+ROLLUP_ORDER_PROJECTION = {
+    "_id": 0, "id": 1, "client_id": 1, "client_name": 1, "status": 1, "current_stage": 1,
+    "total_amount": 1, "due_date": 1, "created_at": 1, "completed_at": 1, "updated_at": 1,
+    "items.product_id": 1, "items.product_name": 1, "items.quantity": 1, "items.total_price": 1
+}
+ROLLUP_INVOICE_PROJECTION = {"_id": 0, "id": 1, "total_amount": 1, "created_at": 1}
+
+logger = logging.getLogger(__name__)
+
+def _number(value) -> float:
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _month(value: datetime) -> str:
+    return value.strftime("%Y-%m")
+
+def cleared_at(order: dict) -> Optional[datetime]:
+    """When a cleared job was cleared.
+
+    Moving a job to cleared on the board doesn't set completed_at, so those
+    jobs fall back to updated_at. cleared_between_query matches the same way.
+    """
+    if order.get("current_stage") != "cleared":
+        return None
+    return as_utc_datetime(order.get("completed_at")) or as_utc_datetime(order.get("updated_at"))
+
+def cleared_between_query(start: datetime, end: datetime) -> Dict[str, Any]:
+    """Orders query for jobs whose cleared_at falls in [start, end)"""
+    cleared = {"$ifNull": [to_date_expression("completed_at"), to_date_expression("updated_at")]}
+    return {
+        "current_stage": "cleared",
+        "$expr": {"$and": [{"$gte": [cleared, start]}, {"$lt": [cleared, end]}]}
+    }
+
+class _Contribution:
+    """Buckets one order or invoice adds to, as {key: {"meta": ..., "values": ...}}"""
+
+    def __init__(self):
+        self.buckets: Dict[str, Dict[str, Any]] = {}
+
+    def add(self, key: str, meta: Dict[str, Any], **values: float):
+        bucket = self.buckets.setdefault(key, {"meta": meta, "values": {}})
+        for name, value in values.items():
+            bucket["values"][name] = bucket["values"].get(name, 0) + value
+
+    def as_list(self) -> List[Dict[str, Any]]:
+        return [{"key": key, **bucket} for key, bucket in self.buckets.items()]
+
+def order_contribution(order: dict) -> List[Dict[str, Any]]:
+    """The rollup buckets an order counts towards in its current state"""
+    contribution = _Contribution()
+    client_id = order.get("client_id")
+    client_name = order.get("client_name")
+    created_at = as_utc_datetime(order.get("created_at"))
+    completed_at = as_utc_datetime(order.get("completed_at"))
+    due_date = as_utc_datetime(order.get("due_date"))
+
+    if created_at:
+        month = _month(created_at)
+        contribution.add(
+            f"client_month:{client_id}:{month}",
+            {"kind": "client_month", "client_id": client_id, "client_name": client_name, "month": month},
+            count=1,
+            revenue=_number(order.get("total_amount")),
+            completed=1 if completed_at else 0,
+            on_time=1 if completed_at and due_date and completed_at <= due_date else 0
+        )
+        for item in order.get("items", []):
+            product = item.get("product_name")
+            contribution.add(
+                f"client_product_month:{client_id}:{month}:{product}",
+                {"kind": "client_product_month", "client_id": client_id, "month": month, "product": product},
+                count=1,
+                quantity=_number(item.get("quantity")),
+                revenue=_number(item.get("total_price"))
+            )
+
+        # Daily demand behind the projected order analysis
+        if order.get("status") != "cancelled":
+            day = created_at.strftime("%Y-%m-%d")
+            for item in order.get("items", []):
+                product_id = item.get("product_id")
+                quantity = _number(item.get("quantity"))
+                if product_id and quantity > 0:
+                    # Whole quantities stay integers in the report
+                    quantity = int(quantity) if quantity.is_integer() else quantity
+                    contribution.add(
+                        f"product_day:{product_id}:{client_id}:{day}",
+                        {"kind": "product_day", "product_id": product_id, "client_id": client_id,
+                         "client_name": client_name, "day": day},
+                        count=1,
+                        quantity=quantity
+                    )
+
+    if order.get("status") == "completed" and completed_at and due_date and completed_at > due_date:
+        month = _month(completed_at)
+        contribution.add(
+            f"late_month:{client_id}:{month}",
+            {"kind": "late_month", "client_id": client_id, "client_name": client_name, "month": month},
+            count=1,
+            delay_days=(completed_at - due_date).days
+        )
+
+    cleared = cleared_at(order)
+    if cleared:
+        month = _month(cleared)
+        contribution.add(f"completed_month:{month}", {"kind": "completed_month", "month": month}, count=1)
+
+    return contribution.as_list()
+
+def invoice_contribution(invoice: dict) -> List[Dict[str, Any]]:
+    contribution = _Contribution()
+    created_at = as_utc_datetime(invoice.get("created_at"))
+    if created_at:
+        month = _month(created_at)
+        contribution.add(
+            f"invoiced_month:{month}", {"kind": "invoiced_month", "month": month},
+            count=1, amount=_number(invoice.get("total_amount"))
+        )
+    return contribution.as_list()
+
+async def _current_contributions(db, sources: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+    """Contributions of the sources that still exist, from their current state"""
+    order_ids = [source.split(":", 1)[1] for source in sources if source.startswith("order:")]
+    invoice_ids = [source.split(":", 1)[1] for source in sources if source.startswith("invoice:")]
+    current: Dict[str, List[Dict[str, Any]]] = {}
+    if order_ids:
+        async for order in db.orders.find({"id": {"$in": order_ids}}, ROLLUP_ORDER_PROJECTION):
+            current[f"order:{order['id']}"] = order_contribution(order)
+    if invoice_ids:
+        async for invoice in db.invoices.find({"id": {"$in": invoice_ids}}, ROLLUP_INVOICE_PROJECTION):
+            current[f"invoice:{invoice['id']}"] = invoice_contribution(invoice)
+    return current
+
+async def _swap_contribution(db, source: str, previous: Optional[dict], new: Optional[List[Dict[str, Any]]]) -> bool:
+    """Replace a source's stored contribution, unless it changed since it was read"""
+    contributions = db[CONTRIBUTIONS_COLLECTION]
+    if previous is None:
+        try:
+            await contributions.insert_one({"_id": source, "buckets": new, "version": 1})
+        except DuplicateKeyError:
+            return False
+        return True
+    # Contributions written by rebuild_rollups have no version yet; None matches that
+    version = previous.get("version")
+    if new is None:
+        result = await contributions.delete_one({"_id": source, "version": version})
+        return result.deleted_count == 1
+    result = await contributions.update_one(
+        {"_id": source, "version": version},
+        {"$set": {"buckets": new, "version": (version or 0) + 1}}
+    )
+    return result.matched_count == 1
+
+async def record_rollups(db, order_ids: Iterable[str] = (), invoice_ids: Iterable[str] = ()) -> int:
+    """Bring the rollups up to date with the current state of some orders and invoices.
+
+    Each source's stored contribution is subtracted and its new one added,
+    so this is safe to call after any create, update or delete, including
+    concurrently for the same source. Returns the number of buckets changed.
+    """
+    order_ids = list({order_id for order_id in order_ids if order_id})
+    invoice_ids = list({invoice_id for invoice_id in invoice_ids if invoice_id})
+    pending = [f"order:{order_id}" for order_id in order_ids] + [f"invoice:{invoice_id}" for invoice_id in invoice_ids]
+    if not pending:
+        return 0
+
+    increments: Dict[str, Dict[str, float]] = {}
+    metadata: Dict[str, Dict[str, Any]] = {}
+    for _ in range(CONTRIBUTION_RETRIES):
+        # Read the stored contributions before the sources: a refresh that
+        # swaps in between then fails our version check and we read again
+        previous = {
+            document["_id"]: document
+            async for document in db[CONTRIBUTIONS_COLLECTION].find({"_id": {"$in": pending}})
+        }
+        current = await _current_contributions(db, pending)
+
+        conflicted = []
+        for source in pending:
+            stored, new = previous.get(source), current.get(source)
+            old = stored["buckets"] if stored else []
+            if (stored is None and new is None) or (stored is not None and new == old):
+                continue
+            if not await _swap_contribution(db, source, stored, new):
+                conflicted.append(source)
+                continue
+            for bucket in old:
+                delta = increments.setdefault(bucket["key"], {})
+                for name, value in bucket["values"].items():
+                    delta[name] = delta.get(name, 0) - value
+            for bucket in new or []:
+                delta = increments.setdefault(bucket["key"], {})
+                for name, value in bucket["values"].items():
+                    delta[name] = delta.get(name, 0) + value
+                metadata[bucket["key"]] = bucket["meta"]
+        pending = conflicted
+        if not pending:
+            break
+    if pending:
+        logger.warning(f"Gave up updating report rollups for {pending} after {CONTRIBUTION_RETRIES} conflicting refreshes")
+
+    operations = []
+    for key, delta in increments.items():
+        delta = {name: value for name, value in delta.items() if value}
+        if not delta and key not in metadata:
+            continue
+        update: Dict[str, Any] = {"$inc": delta} if delta else {}
+        if key in metadata:
+            update["$set"] = metadata[key]
+        if update:
+            operations.append(UpdateOne({"_id": key}, update, upsert=True))
+
+    if operations:
+        await db[ROLLUPS_COLLECTION].bulk_write(operations, ordered=False)
+        # Buckets nothing counts towards any more. A concurrent refresh's
+        # increments can land in either order, so a bucket is only dropped
+        # once every metric is back to zero, never with a count of zero but
+        # amounts still waiting to be cancelled out.
+        await db[ROLLUPS_COLLECTION].bulk_write([
+            DeleteOne({"_id": key, **{name: {"$in": [0, None]} for name in {"count", *delta}}})
+            for key, delta in increments.items()
+        ], ordered=False)
+    return len(operations)
+
+async def refresh_rollups(db, order_ids: Iterable[str] = (), invoice_ids: Iterable[str] = ()):
+    """record_rollups for a write path; a failure is logged, never raised.
+
+    rebuild_rollups.py recomputes everything from orders and invoices if the
+    rollups ever drift.
+    """
+    order_ids, invoice_ids = list(order_ids), list(invoice_ids)
+    try:
+        await record_rollups(db, order_ids, invoice_ids)
+    except Exception as e:
+        logger.error(f"Failed to update report rollups for orders {order_ids}, invoices {invoice_ids}: {str(e)}")
+
+async def rebuild_rollups(db) -> Dict[str, int]:
+    """Recompute every bucket and contribution from the orders and invoices collections"""
+    totals: Dict[str, Dict[str, Any]] = {}
+    await db[CONTRIBUTIONS_COLLECTION].delete_many({})
+
+    async def add_sources(collection, projection, prefix, contribution_of):
+        count = 0
+        async for batch in iter_batches(collection.find({}, projection)):
+            documents = []
+            for source in batch:
+                buckets = contribution_of(source)
+                for bucket in buckets:
+                    total = totals.setdefault(bucket["key"], {"_id": bucket["key"], **bucket["meta"]})
+                    for name, value in bucket["values"].items():
+                        total[name] = total.get(name, 0) + value
+                documents.append({"_id": f"{prefix}:{source['id']}", "buckets": buckets})
+            await db[CONTRIBUTIONS_COLLECTION].insert_many(documents, ordered=False)
+            count += len(documents)
+        return count
+
+    orders = await add_sources(db.orders, ROLLUP_ORDER_PROJECTION, "order", order_contribution)
+    invoices = await add_sources(db.invoices, ROLLUP_INVOICE_PROJECTION, "invoice", invoice_contribution)
+
+    await db[ROLLUPS_COLLECTION].delete_many({})
+    buckets = list(totals.values())
+    for start in range(0, len(buckets), 1000):
+        await db[ROLLUPS_COLLECTION].insert_many(buckets[start:start + 1000], ordered=False)
+    return {"orders": orders, "invoices": invoices, "buckets": len(buckets)}
+
+async def _buckets(db, query: Dict[str, Any]) -> List[dict]:
+    return await db[ROLLUPS_COLLECTION].find(query, {"_id": 0}).to_list(length=None)
+
+async def customer_annual_rollup(db, client_id: str, year: int) -> Dict[str, Any]:
+    """Orders, revenue, top products and on-time rate for one client's year"""
+    months = {"$gte": f"{year}-01", "$lte": f"{year}-12"}
+    orders_by_month = {f"{year}-{month:02d}": 0 for month in range(1, 13)}
+    revenue_by_month = {key: 0 for key in orders_by_month}
+    completed = on_time = 0
+    for bucket in await _buckets(db, {"kind": "client_month", "client_id": client_id, "month": months}):
+        orders_by_month[bucket["month"]] += bucket.get("count", 0)
+        revenue_by_month[bucket["month"]] += bucket.get("revenue", 0)
+        completed += bucket.get("completed", 0)
+        on_time += bucket.get("on_time", 0)
+
+    product_stats: Dict[str, Dict[str, float]] = {}
+    for bucket in await _buckets(db, {"kind": "client_product_month", "client_id": client_id, "month": months}):
+        stats = product_stats.setdefault(bucket["product"], {"quantity": 0, "revenue": 0, "orders": 0})
+        stats["quantity"] += bucket.get("quantity", 0)
+        stats["revenue"] += bucket.get("revenue", 0)
+        stats["orders"] += bucket.get("count", 0)
+
+    total_orders = sum(orders_by_month.values())
+    total_revenue = sum(revenue_by_month.values())
+    return {
+        "total_orders": total_orders,
+        "total_revenue": total_revenue,
+        "average_order_value": total_revenue / total_orders if total_orders > 0 else 0,
+        "orders_by_month": orders_by_month,
+        "revenue_by_month": revenue_by_month,
+        "top_products": sorted(
+            [{"product": product, **stats} for product, stats in product_stats.items()],
+            key=lambda x: x["revenue"],
+            reverse=True
+        )[:5],
+        "on_time_delivery_rate": (on_time / completed) * 100 if completed else 0,
+    }
+
+async def late_deliveries_rollup(db) -> Dict[str, Any]:
+    total_late = 0
+    total_delay = 0
+    late_by_client: Dict[str, int] = {}
+    late_by_month: Dict[str, int] = {}
+    for bucket in await _buckets(db, {"kind": "late_month"}):
+        count = bucket.get("count", 0)
+        total_late += count
+        total_delay += bucket.get("delay_days", 0)
+        client = bucket.get("client_name") or "Unknown"
+        late_by_client[client] = late_by_client.get(client, 0) + count
+        late_by_month[bucket["month"]] = late_by_month.get(bucket["month"], 0) + count
+    return {
+        "total_late_deliveries": total_late,
+        "average_delay_days": total_delay / total_late if total_late > 0 else 0,
+        "late_deliveries_by_client": late_by_client,
+        "late_deliveries_by_month": dict(sorted(late_by_month.items())),
+    }
+
+async def outstanding_jobs_summary(db, now: datetime) -> Dict[str, Any]:
+    """Open jobs by stage, and by whether they're overdue or due today or this week.
+
+    Not a rollup: whether a job is overdue depends on when the report is
+    opened. One $facet pipeline over the open orders returns just the counts.
+    """
+    today_end = now.replace(hour=23, minute=59, second=59)
+    week_end = now + timedelta(days=7)
+    result = await db.orders.aggregate([
+        {"$match": {"status": {"$ne": "completed"}}},
+        {"$project": {
+            "_id": 0,
+            "stage": {"$ifNull": ["$current_stage", "order_entered"]},
+            "due": to_date_expression("due_date")
+        }},
+        {"$facet": {
+            "by_stage": [{"$group": {"_id": "$stage", "count": {"$sum": 1}}}],
+            "due": [
+                {"$match": {"due": {"$lte": week_end}}},
+                {"$group": {
+                    "_id": None,
+                    "overdue": {"$sum": {"$cond": [{"$lt": ["$due", now]}, 1, 0]}},
+                    "today": {"$sum": {"$cond": [{"$and": [{"$gte": ["$due", now]}, {"$lte": ["$due", today_end]}]}, 1, 0]}},
+                    "this_week": {"$sum": {"$cond": [{"$gt": ["$due", today_end]}, 1, 0]}},
+                }}
+            ],
+        }}
+    ]).to_list(length=None)
+
+    facets = result[0] if result else {"by_stage": [], "due": []}
+    jobs_by_stage = {row["_id"]: row["count"] for row in facets["by_stage"]}
+    due_counts = facets["due"][0] if facets["due"] else {}
+    return {
+        "total_jobs": sum(jobs_by_stage.values()),
+        "jobs_by_stage": jobs_by_stage,
+        "overdue_jobs": due_counts.get("overdue", 0),
+        "jobs_due_today": due_counts.get("today", 0),
+        "jobs_due_this_week": due_counts.get("this_week", 0),
+    }
+
+async def monthly_invoicing_rollup(db, month: int, year: int) -> Dict[str, Any]:
+    key = f"{year}-{month:02d}"
+    completed = await db[ROLLUPS_COLLECTION].find_one({"_id": f"completed_month:{key}"}) or {}
+    invoiced = await db[ROLLUPS_COLLECTION].find_one({"_id": f"invoiced_month:{key}"}) or {}
+    return {
+        "total_jobs_completed": completed.get("count", 0),
+        "total_jobs_invoiced": invoiced.get("count", 0),
+        "total_invoice_amount": invoiced.get("amount", 0),
+    }
@@ -0,0 +1,53 @@
+from typing import Dict, Any, List, Iterable, AsyncIterator, Optional
+from http_responses import dumps
+
+# Documents pulled per round-trip when a report walks a cursor. Related records
+# are looked up once per batch with $in instead of once per document.
+REPORT_BATCH_SIZE = 500
+
+async def iter_batches(cursor, batch_size: int = REPORT_BATCH_SIZE) -> AsyncIterator[List[dict]]:
+    """Walk a Motor cursor in lists of up to batch_size documents.
+
+    Only one batch is held in memory at a time, so a report's peak memory
+    doesn't grow with the collection.
+    """
+    batch = []
+    async for document in cursor.batch_size(batch_size):
+        batch.append(document)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+async def find_by_ids(collection, ids: Iterable[Any], projection: Optional[Dict[str, Any]] = None, key: str = "id") -> Dict[Any, dict]:
+    """Return {key value: document} for the given ids in one $in query.
+
+    The projection must include the key field.
+    """
+    wanted = list({value for value in ids if value is not None})
+    if not wanted:
+        return {}
+    return {
+        document[key]: document
+        async for document in collection.find({key: {"$in": wanted}}, projection)
+    }
+
+async def group_by_key(collection, query: Dict[str, Any], key: str, projection: Optional[Dict[str, Any]] = None, sort=None) -> Dict[Any, List[dict]]:
+    """Return {key value: [documents]} for every document matching query"""
+    cursor = collection.find(query, projection)
+    if sort:
+        cursor = cursor.sort(sort)
+    grouped: Dict[Any, List[dict]] = {}
+    async for document in cursor:
+        grouped.setdefault(document.get(key), []).append(document)
+    return grouped
+
+async def stream_json_list(field: str, items: AsyncIterator[dict]) -> AsyncIterator[str]:
+    """Serialise ``{field: [items...]}`` one item at a time for a StreamingResponse"""
+    yield f'{{"{field}": ['
+    first = True
+    async for item in items:
+        yield ("" if first else ",") + dumps(item).decode("utf-8")
+        first = False
+    yield "]}"
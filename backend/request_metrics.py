@@ -0,0 +1,290 @@
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional, Tuple
+from pymongo import monitoring
+import logging
+import os
+import threading
+import time
+
+# Requests slower than this are logged with their DB command count and time
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "2.0"))
+
+# Prometheus scrapers send this as a bearer token; admins can use their own login
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+SIZE_BUCKETS = (1024, 10240, 102400, 524288, 1048576, 5242880, 10485760)
+DB_COMMAND_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500, 1000)
+
+logger = logging.getLogger(__name__)
+
+class Histogram:
+    """Cumulative-bucket histogram in the Prometheus sense"""
+
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[index] += 1
+
+class RequestStats:
+    """Mongo work done on behalf of one HTTP request.
+
+    Motor runs commands on its executor threads but copies the caller's
+    context, so the command listener finds the request through a context var.
+    """
+
+    def __init__(self):
+        self.db_commands = 0
+        self.db_seconds = 0.0
+        self.commands: Optional[List[Dict[str, Any]]] = None  # per-command detail, only while profiling
+        self._lock = threading.Lock()
+
+    def record_command(self, command_name: str, collection: Optional[str], seconds: float, detail: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            self.db_commands += 1
+            self.db_seconds += seconds
+            if detail is not None and self.commands is not None:
+                self.commands.append(detail)
+
+_current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request_stats", default=None)
+
+def current_request_stats() -> Optional[RequestStats]:
+    return _current_request.get()
+
+def _shape(value: Any) -> Any:
+    """Replace the values in a query with their types, keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: _shape(item) for key, item in value.items()}
+    if isinstance(value, list):
+        if value and all(isinstance(item, dict) for item in value):
+            return [_shape(item) for item in value]
+        return f"<list of {len(value)}>"
+    return f"<{type(value).__name__}>"
+
+def command_filter_shape(command_name: str, command: Dict[str, Any]) -> Any:
+    """The query a command runs, with values replaced by their types"""
+    if command_name == "find":
+        return _shape(command.get("filter", {}))
+    if command_name in ("count", "distinct", "findAndModify"):
+        return _shape(command.get("query", {}))
+    if command_name == "update":
+        return [_shape(statement.get("q", {})) for statement in command.get("updates", [])]
+    if command_name == "delete":
+        return [_shape(statement.get("q", {})) for statement in command.get("deletes", [])]
+    if command_name == "aggregate":
+        return [_shape(stage) for stage in command.get("pipeline", [])]
+    if command_name == "insert":
+        return f"<{len(command.get('documents', []))} documents>"
+    return None
+
+def reply_document_count(reply: Dict[str, Any]) -> Optional[int]:
+    """Documents returned (cursor batches) or affected (n) by a command reply"""
+    cursor = reply.get("cursor")
+    if isinstance(cursor, dict):
+        return len(cursor.get("firstBatch", cursor.get("nextBatch", [])))
+    if "value" in reply:
+        return 0 if reply["value"] is None else 1
+    if "n" in reply:
+        return reply["n"]
+    return None
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(names: Tuple[str, ...], values: Tuple[Any, ...], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}"
+
+class MetricsRegistry:
+    """In-process request and Mongo metrics for this worker"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.in_flight = 0
+        self.request_latency: Dict[Tuple[str, str, str], Histogram] = {}
+        self.response_size: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db_commands: Dict[Tuple[str, str], Histogram] = {}
+        self.request_db_seconds: Dict[Tuple[str, str], float] = {}
+        self.request_bytes: Dict[Tuple[str, str], int] = {}
+        self.db_commands: Dict[Tuple[str, str], int] = {}
+        self.db_command_seconds: Dict[Tuple[str, str], float] = {}
+        self.db_command_failures: Dict[Tuple[str, str], int] = {}
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float,
+                        request_bytes: int, response_bytes: int, stats: RequestStats):
+        route_key = (method, route)
+        with self._lock:
+            self.request_latency.setdefault((method, route, str(status)), Histogram(LATENCY_BUCKETS)).observe(seconds)
+            self.response_size.setdefault(route_key, Histogram(SIZE_BUCKETS)).observe(response_bytes)
+            self.request_db_commands.setdefault(route_key, Histogram(DB_COMMAND_BUCKETS)).observe(stats.db_commands)
+            self.request_db_seconds[route_key] = self.request_db_seconds.get(route_key, 0.0) + stats.db_seconds
+            self.request_bytes[route_key] = self.request_bytes.get(route_key, 0) + request_bytes
+
+    def observe_command(self, command_name: str, collection: Optional[str], seconds: float, failed: bool):
+        key = (command_name, collection or "")
+        with self._lock:
+            self.db_commands[key] = self.db_commands.get(key, 0) + 1
+            self.db_command_seconds[key] = self.db_command_seconds.get(key, 0.0) + seconds
+            if failed:
+                self.db_command_failures[key] = self.db_command_failures.get(key, 0) + 1
+
+    def _histogram_lines(self, name: str, label_names: Tuple[str, ...], histograms: Dict[tuple, Histogram]) -> List[str]:
+        lines = []
+        for key, histogram in sorted(histograms.items()):
+            for bound, count in zip(histogram.buckets, histogram.counts):
+                le = f'le="{bound}"'
+                lines.append(f"{name}_bucket{_labels(label_names, key, le)} {count}")
+            le = 'le="+Inf"'
+            lines.append(f"{name}_bucket{_labels(label_names, key, le)} {histogram.count}")
+            lines.append(f"{name}_sum{_labels(label_names, key)} {histogram.sum}")
+            lines.append(f"{name}_count{_labels(label_names, key)} {histogram.count}")
+        return lines
+
+    def _counter_lines(self, name: str, label_names: Tuple[str, ...], values: Dict[tuple, Any]) -> List[str]:
+        return [f"{name}{_labels(label_names, key)} {value}" for key, value in sorted(values.items())]
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        route_labels = ("method", "route")
+        command_labels = ("command", "collection")
+        with self._lock:
+            sections = [
+                ("http_request_duration_seconds", "histogram", "Request latency by route and status",
+                 self._histogram_lines("http_request_duration_seconds", ("method", "route", "status"), self.request_latency)),
+                ("http_response_size_bytes", "histogram", "Response body size by route",
+                 self._histogram_lines("http_response_size_bytes", route_labels, self.response_size)),
+                ("http_request_size_bytes_total", "counter", "Request body bytes received by route",
+                 self._counter_lines("http_request_size_bytes_total", route_labels, self.request_bytes)),
+                ("http_request_db_commands", "histogram", "Mongo commands issued per request by route",
+                 self._histogram_lines("http_request_db_commands", route_labels, self.request_db_commands)),
+                ("http_request_db_seconds_total", "counter", "Time spent in Mongo commands by route",
+                 self._counter_lines("http_request_db_seconds_total", route_labels, self.request_db_seconds)),
+                ("http_requests_in_flight", "gauge", "Requests currently being served",
+                 [f"http_requests_in_flight {self.in_flight}"]),
+                ("mongodb_commands_total", "counter", "Mongo commands by command name and collection",
+                 self._counter_lines("mongodb_commands_total", command_labels, self.db_commands)),
+                ("mongodb_command_seconds_total", "counter", "Time spent in Mongo commands by command name and collection",
+                 self._counter_lines("mongodb_command_seconds_total", command_labels, self.db_command_seconds)),
+                ("mongodb_command_failures_total", "counter", "Failed Mongo commands by command name and collection",
+                 self._counter_lines("mongodb_command_failures_total", command_labels, self.db_command_failures)),
+                ("process_start_time_seconds", "gauge", "Start time of this worker since the epoch",
+                 [f"process_start_time_seconds {self.started_at}"]),
+            ]
+        lines = []
+        for name, metric_type, help_text, metric_lines in sections:
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            lines.extend(metric_lines)
+        return "\n".join(lines) + "\n"
+
+metrics_registry = MetricsRegistry()
+
+class MongoCommandListener(monitoring.CommandListener):
+    """Counts and times every Mongo command, globally and for the current request"""
+
+    def __init__(self, registry: MetricsRegistry = metrics_registry):
+        self.registry = registry
+        self._started: Dict[Tuple[Any, int], Tuple[Optional[str], Optional[RequestStats]]] = {}
+        self._lock = threading.Lock()
+
+    def started(self, event):
+        # Most commands name their collection as the command's value; getMore
+        # carries a cursor id there and the collection separately
+        collection = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = None
+        stats = _current_request.get()
+        detail = None
+        if stats is not None and stats.commands is not None:
+            detail = {
+                "command": event.command_name,
+                "collection": collection,
+                "filter": command_filter_shape(event.command_name, event.command),
+            }
+        with self._lock:
+            self._started[(event.connection_id, event.request_id)] = (collection, stats, detail)
+
+    def _finish(self, event, failed: bool, reply: Optional[Dict[str, Any]] = None):
+        with self._lock:
+            collection, stats, detail = self._started.pop((event.connection_id, event.request_id), (None, None, None))
+        seconds = event.duration_micros / 1_000_000
+        self.registry.observe_command(event.command_name, collection, seconds, failed)
+        if stats is not None:
+            if detail is not None:
+                detail["duration_ms"] = round(seconds * 1000, 3)
+                detail["docs"] = reply_document_count(reply) if reply else None
+                detail["failed"] = failed
+            stats.record_command(event.command_name, collection, seconds, detail)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False, reply=event.reply)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+mongo_command_listener = MongoCommandListener()
+
+class MetricsMiddleware:
+    """Records latency, payload size and Mongo work for every HTTP request.
+
+    The route label is the matched path template (``/api/orders/{order_id}``),
+    so metrics stay bounded however many ids are requested.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = metrics_registry, slow_seconds: float = SLOW_REQUEST_SECONDS):
+        self.app = app
+        self.registry = registry
+        self.slow_seconds = slow_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current_request.set(stats)
+        started = time.perf_counter()
+        status_code = 500
+        response_bytes = 0
+
+        async def send_with_metrics(message):
+            nonlocal status_code, response_bytes
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            elif message["type"] == "http.response.body":
+                response_bytes += len(message.get("body", b""))
+            await send(message)
+
+        self.registry.in_flight += 1
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            self.registry.in_flight -= 1
+            _current_request.reset(token)
+            seconds = time.perf_counter() - started
+            route = scope.get("route")
+            route_path = getattr(route, "path", None) or "unmatched"
+            request_bytes = 0
+            for name, value in scope.get("headers", []):
+                if name == b"content-length":
+                    request_bytes = int(value or 0)
+            self.registry.observe_request(
+                scope["method"], route_path, status_code, seconds, request_bytes, response_bytes, stats
+            )
+            if seconds >= self.slow_seconds:
+                logger.warning(
+                    f"Slow request {scope['method']} {scope['path']} ({route_path}): {seconds:.2f}s, "
+                    f"status {status_code}, {stats.db_commands} DB commands in {stats.db_seconds:.2f}s, "
+                    f"{response_bytes} response bytes"
+                )
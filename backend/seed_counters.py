@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Database Migration Script - Seed Number Counters
+
+Order and invoice numbers are allocated from the `counters` collection with
+an atomic $inc. This script seeds those counters from existing data so the
+first number handed out after the switch follows the last one in use:
+
+- order_number:ADM-YYYY: highest ADM-YYYY-NNNN per year
+- invoice_number:INV: larger of the invoice count and highest INV-NNNN
+
+It also reports any duplicate order numbers, which block the unique index on
+orders.order_number (fix them with fix_duplicate_order_numbers.py first).
+
+Usage:
+    python seed_counters.py
+
+Note: This script is idempotent - counters are only ever raised, never lowered.
+"""
+
+import os
+import sys
+from motor.motor_asyncio import AsyncIOMotorClient
+import asyncio
+from dotenv import load_dotenv
+from datetime import datetime
+from counters import seed_counters, COUNTERS_COLLECTION
+
+# Load environment variables
+load_dotenv('/app/backend/.env')
+
+# MongoDB connection
+MONGO_URL = os.environ.get('MONGO_URL')
+DB_NAME = os.environ.get('DB_NAME')
+
+if not MONGO_URL or not DB_NAME:
+    print("❌ Error: MONGO_URL or DB_NAME not found in environment")
+    sys.exit(1)
+
+async def report_duplicate_order_numbers(db):
+    """Print order numbers used by more than one order"""
+    duplicates = await db.orders.aggregate([
+        {"$group": {"_id": "$order_number", "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ]).to_list(length=None)
+
+    if duplicates:
+        print(f"⚠️  {len(duplicates)} duplicate order numbers found (unique index cannot be built):")
+        for duplicate in duplicates:
+            print(f"  {duplicate['_id']}: {duplicate['count']} orders")
+    else:
+        print("✅ No duplicate order numbers")
+
+async def main():
+    """Main migration function"""
+    print("\n" + "="*60)
+    print("DATABASE MIGRATION: Seed Order and Invoice Number Counters")
+    print("="*60)
+    print(f"Database: {DB_NAME}")
+    print(f"Timestamp: {datetime.now().isoformat()}")
+    print("="*60 + "\n")
+
+    client = AsyncIOMotorClient(MONGO_URL)
+    db = client[DB_NAME]
+
+    try:
+        await db.command('ping')
+        print("✅ Connected to MongoDB successfully\n")
+
+        await report_duplicate_order_numbers(db)
+
+        seeded = await seed_counters(db)
+        print("\n📇 Counters seeded from existing data:")
+        for name, value in sorted(seeded.items()):
+            print(f"  {name}: {value}")
+
+        print("\n📊 Current counter values:")
+        async for counter in db[COUNTERS_COLLECTION].find().sort("_id", 1):
+            print(f"  {counter['_id']}: next value {counter['seq'] + 1}")
+
+        print("\n" + "="*60)
+        print("✅ MIGRATION COMPLETED SUCCESSFULLY")
+        print("="*60 + "\n")
+
+    except Exception as e:
+        print(f"\n❌ Migration failed: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        sys.exit(1)
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,10 +1,12 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, status, Header, Request
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, UploadFile, File, status, Header, Request, Query
 from fastapi.responses import FileResponse, StreamingResponse, HTMLResponse, Response
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
@@ -19,6 +21,7 @@ import requests
 import base64
 from urllib.parse import urlencode
 import asyncio
+import tempfile
 
 # Xero SDK imports
 from xero_python.api_client import ApiClient, Configuration
@@ -29,9 +32,28 @@ from xero_python.accounting.models import Invoice, Contact, LineItem, Contacts,
 # Import our custom modules
 from models import *
 from auth import *
-from document_generator import DocumentGenerator
 from file_utils import *
 from payroll_endpoints import payroll_router
+from production_board import production_board_snapshot, notify_board_orders_changed, invalidate_client_cache
+from production_events import production_events, issue_stream_ticket, redeem_stream_ticket
+from slitting_optimizer import search_and_rank_patterns
+from cutting_stock_planner import plan_cutting_stock
+from job_executor import job_executor, JOB_TYPE_LIMITS
+from document_renderer import render_pdf, pdf_response, merge_pdfs, zip_documents, PDF_RENDER_TIMEOUT_SECONDS
+from document_cache import document_cache, document_cache_key, cached_pdf_response, not_modified
+from report_streaming import REPORT_BATCH_SIZE, iter_batches, find_by_ids, group_by_key, stream_json_list
+from job_costing import JOB_COSTS_COLLECTION, ORDER_COST_PROJECTION, load_cost_inputs, cost_orders, profitability_summary, refresh_job_costs
+from date_fields import DATE_FIELDS, as_utc_datetime
+from report_rollups import refresh_rollups, rebuild_rollups, customer_annual_rollup, late_deliveries_rollup, outstanding_jobs_summary, monthly_invoicing_rollup, cleared_between_query
+from forecast import projected_order_analysis, historical_orders, period_summaries
+from job_performance import empty_job_card_metrics, job_card_batch_metrics, merge_job_card_metrics, job_card_performance
+from db_indexes import ensure_indexes, enable_profiler, index_report, SLOW_QUERY_LIMIT
+from counters import next_order_number, next_invoice_number, seed_order_counters, seed_counters
+from board_ordering import UNRANKED, rank_between, spaced_ranks, write_display_orders
+from pagination import PageParams, find_page, projected_response, PAGINATION_HEADERS
+from http_responses import ORJSONResponse, FastJSONRoute, CompressionMiddleware
+from request_metrics import MetricsMiddleware, metrics_registry, mongo_command_listener, METRICS_TOKEN
+from debug_profile import DebugProfileMiddleware
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
@@ -45,17 +67,14 @@ os.environ['FRONTEND_URL'] = 'https://misty-ato-payroll.preview.emergentagent.co
 
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[mongo_command_listener])
 db = client[os.environ['DB_NAME']]
 
 # Create the main app
-app = FastAPI(title="Misty Manufacturing Management System", version="1.0.0")
+app = FastAPI(title="Misty Manufacturing Management System", version="1.0.0", default_response_class=ORJSONResponse)
 
 # Create router with /api prefix
-api_router = APIRouter(prefix="/api")
-
-# Initialize document generator
-doc_generator = DocumentGenerator()
+api_router = APIRouter(prefix="/api", route_class=FastJSONRoute)
 
 # Ensure upload directories exist
 ensure_upload_dirs()
@@ -195,13 +214,18 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 # ============= CLIENT MANAGEMENT ENDPOINTS =============
 
 @api_router.get("/clients", response_model=List[Client])
-async def get_clients(current_user: dict = Depends(require_any_role)):
-    """Get all clients"""
-    clients = await db.clients.find({"is_active": True}).to_list(1000)
+async def get_clients(response: Response, page: PageParams = Depends(), current_user: dict = Depends(require_any_role)):
+    """Get all clients (paginated with limit/after, trimmed with fields)"""
+    clients, headers, projected = await find_page(
+        db.clients, {"is_active": True}, page, direction=1, allowed_fields=Client.model_fields
+    )
     # Transform logo_path to proper URL for frontend
     for client in clients:
         if client.get("logo_path"):
             client["logo_path"] = get_file_url(client["logo_path"])
+    if projected:
+        return projected_response(clients, headers)
+    response.headers.update(headers)
     return [Client(**client) for client in clients]
 
 @api_router.post("/clients", response_model=StandardResponse)
@@ -239,6 +263,8 @@ async def update_client(client_id: str, client_data: ClientCreate, current_user:
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
     
+    invalidate_client_cache(client_id)
+    
     return StandardResponse(success=True, message="Client updated successfully")
 
 @api_router.post("/clients/{client_id}/logo")
@@ -259,6 +285,7 @@ async def upload_client_logo(client_id: str, file: UploadFile = File(...), curre
             {"id": client_id},
             {"$set": {"logo_path": file_path, "updated_at": datetime.now(timezone.utc)}}
         )
+        invalidate_client_cache(client_id)
         
         return StandardResponse(success=True, message="Logo uploaded successfully", data={"file_url": file_url})
     
@@ -270,9 +297,14 @@ async def upload_client_logo(client_id: str, file: UploadFile = File(...), curre
 # ============= PRODUCT MANAGEMENT ENDPOINTS =============
 
 @api_router.get("/products", response_model=List[Product])
-async def get_all_products(current_user: dict = Depends(require_any_role)):
-    """Get all products"""
-    products = await db.products.find({"is_active": True}).to_list(1000)
+async def get_all_products(response: Response, page: PageParams = Depends(), current_user: dict = Depends(require_any_role)):
+    """Get all products (paginated with limit/after, trimmed with fields)"""
+    products, headers, projected = await find_page(
+        db.products, {"is_active": True}, page, direction=1, allowed_fields=Product.model_fields
+    )
+    if projected:
+        return projected_response(products, headers)
+    response.headers.update(headers)
     return [Product(**product) for product in products]
 
 @api_router.get("/clients/{client_id}/products", response_model=List[Product])
@@ -317,9 +349,14 @@ async def update_product(product_id: str, product_data: ProductCreate, current_u
 # ============= MATERIALS MANAGEMENT ENDPOINTS =============
 
 @api_router.get("/materials", response_model=List[Material])
-async def get_materials(current_user: dict = Depends(require_any_role)):
-    """Get all materials"""
-    materials = await db.materials.find({"is_active": True}).to_list(1000)
+async def get_materials(response: Response, page: PageParams = Depends(), current_user: dict = Depends(require_any_role)):
+    """Get all materials (paginated with limit/after, trimmed with fields)"""
+    materials, headers, projected = await find_page(
+        db.materials, {"is_active": True}, page, direction=1, allowed_fields=Material.model_fields
+    )
+    if projected:
+        return projected_response(materials, headers)
+    response.headers.update(headers)
     return [Material(**material) for material in materials]
 
 @api_router.post("/materials", response_model=StandardResponse)
@@ -371,9 +408,14 @@ async def delete_material(material_id: str, current_user: dict = Depends(require
 # ============= SUPPLIERS ENDPOINTS =============
 
 @api_router.get("/suppliers", response_model=List[Supplier])
-async def get_suppliers(current_user: dict = Depends(require_any_role)):
-    """Get all active suppliers"""
-    suppliers = await db.suppliers.find({"is_active": True}).sort("supplier_name", 1).to_list(1000)
+async def get_suppliers(response: Response, page: PageParams = Depends(), current_user: dict = Depends(require_any_role)):
+    """Get all active suppliers by name (paginated with limit/after, trimmed with fields)"""
+    suppliers, headers, projected = await find_page(
+        db.suppliers, {"is_active": True}, page, sort_field="supplier_name", direction=1, allowed_fields=Supplier.model_fields
+    )
+    if projected:
+        return projected_response(suppliers, headers)
+    response.headers.update(headers)
     return [Supplier(**supplier) for supplier in suppliers]
 
 @api_router.post("/suppliers", response_model=StandardResponse)
@@ -818,9 +860,6 @@ async def calculate_raw_material_permutation(
     Includes cost, waste, and yield optimization.
     """
     try:
-        from itertools import combinations_with_replacement
-        from decimal import Decimal
-        
         # Get material information - combine data from both collections
         # First get the base material data (has GSM, width, price)
         base_material = await db.materials.find_one({"id": request.material_id})
@@ -865,85 +904,58 @@ async def calculate_raw_material_permutation(
         material_name = base_material.get("material_description", base_material.get("supplier", "Unknown"))
         material_code = base_material.get("product_code", "N/A")
         
-        # Generate all possible permutations
-        permutations = []
-        max_slits = int(master_width_mm / min(request.desired_slit_widths)) if request.desired_slit_widths else 0
+        # Search for the best slit patterns (counts per width) without enumerating every
+        # combination, then compute metrics for every candidate in one vectorised pass
+        search, metrics = await job_executor.run_in_process(
+            "calculator",
+            search_and_rank_patterns,
+            master_width_mm,
+            request.desired_slit_widths,
+            request.waste_allowance_mm,
+            request.max_results,
+            request.time_budget_seconds,
+            total_linear_meters,
+            gsm,
+            cost_per_tonne,
+            timeout=request.time_budget_seconds + 30
+        )
         
-        # Generate all combinations of slit widths that fit within master width
-        for num_slits in range(1, max_slits + 1):
-            for combo in combinations_with_replacement(request.desired_slit_widths, num_slits):
-                total_width = sum(combo)
-                
-                # Check if this combination fits within master width
-                if total_width <= master_width_mm:
-                    waste_mm = master_width_mm - total_width
-                    
-                    # Check if waste is within allowance
-                    if waste_mm <= request.waste_allowance_mm:
-                        # Calculate metrics for this pattern
-                        pattern = sorted(combo, reverse=True)  # Sort descending for readability
-                        
-                        # Yield percentage
-                        yield_pct = (total_width / master_width_mm) * 100
-                        
-                        # Number of slits per master roll (how many times this pattern fits)
-                        slits_per_master = 1  # Each pattern uses the full width once
-                        
-                        # Total finished rolls produced
-                        total_finished_rolls = len(pattern) * request.quantity_master_rolls
-                        
-                        # Linear meters per slit (all slits get the same length)
-                        linear_meters_per_slit = total_linear_meters
-                        
-                        # Calculate material weight and cost for each slit width in the pattern
-                        slit_details = []
-                        total_pattern_weight = 0
-                        total_pattern_cost = 0
-                        
-                        # Group by width for cleaner display
-                        width_counts = {}
-                        for width in pattern:
-                            width_counts[width] = width_counts.get(width, 0) + 1
-                        
-                        for slit_width, count in sorted(width_counts.items(), reverse=True):
-                            # Material weight per slit: (width_m * length_m * GSM) / 1000 = kg
-                            width_meters = slit_width / 1000.0
-                            weight_per_slit_kg = (width_meters * linear_meters_per_slit * gsm) / 1000
-                            
-                            # Material cost per slit: (weight_kg / 1000) * cost_per_tonne
-                            cost_per_slit = (weight_per_slit_kg / 1000) * cost_per_tonne
-                            
-                            total_pattern_weight += weight_per_slit_kg * count
-                            total_pattern_cost += cost_per_slit * count
-                            
-                            slit_details.append({
-                                "slit_width_mm": slit_width,
-                                "count": count,
-                                "linear_meters": round(linear_meters_per_slit, 2),
-                                "weight_per_slit_kg": round(weight_per_slit_kg, 3),
-                                "cost_per_slit_aud": round(cost_per_slit, 2)
-                            })
-                        
-                        # Total cost for all master rolls
-                        total_cost_all_rolls = total_pattern_cost * request.quantity_master_rolls
-                        
-                        permutations.append({
-                            "pattern": [f"{w}mm" for w in pattern],
-                            "pattern_description": " + ".join([f"{count}×{width}mm" for width, count in sorted(width_counts.items(), reverse=True)]),
-                            "used_width_mm": total_width,
-                            "waste_mm": round(waste_mm, 2),
-                            "yield_percentage": round(yield_pct, 2),
-                            "slits_per_master_roll": slits_per_master,
-                            "total_finished_rolls": total_finished_rolls,
-                            "linear_meters_per_slit": round(linear_meters_per_slit, 2),
-                            "slit_details": slit_details,
-                            "total_pattern_weight_kg": round(total_pattern_weight, 3),
-                            "total_pattern_cost_aud": round(total_pattern_cost, 2),
-                            "total_cost_all_rolls_aud": round(total_cost_all_rolls, 2)
-                        })
+        # Linear meters per slit (all slits get the same length)
+        linear_meters_per_slit = total_linear_meters
         
-        # Sort by yield percentage (descending), then by waste (ascending)
-        permutations.sort(key=lambda x: (-x["yield_percentage"], x["waste_mm"]))
+        # Build detail dicts only for the rows returned, best yield first
+        top_n = request.top_n or len(search.patterns)
+        permutations = []
+        for row in metrics.order[:top_n]:
+            width_counts = []
+            slit_details = []
+            for column, width in enumerate(search.widths):
+                count = int(metrics.counts[row, column])
+                if not count:
+                    continue
+                width_counts.append((width, count))
+                slit_details.append({
+                    "slit_width_mm": width,
+                    "count": count,
+                    "linear_meters": round(linear_meters_per_slit, 2),
+                    "weight_per_slit_kg": round(float(metrics.weight_per_slit_kg[column]), 3),
+                    "cost_per_slit_aud": round(float(metrics.cost_per_slit_aud[column]), 2)
+                })
+            
+            permutations.append({
+                "pattern": [f"{width}mm" for width, count in width_counts for _ in range(count)],
+                "pattern_description": " + ".join([f"{count}×{width}mm" for width, count in width_counts]),
+                "used_width_mm": float(metrics.used_width_mm[row]),
+                "waste_mm": round(float(metrics.waste_mm[row]), 2),
+                "yield_percentage": round(float(metrics.yield_percentage[row]), 2),
+                "slits_per_master_roll": 1,  # Each pattern uses the full width once
+                "total_finished_rolls": int(metrics.slits[row]) * request.quantity_master_rolls,
+                "linear_meters_per_slit": round(linear_meters_per_slit, 2),
+                "slit_details": slit_details,
+                "total_pattern_weight_kg": round(float(metrics.weight_kg[row]), 3),
+                "total_pattern_cost_aud": round(float(metrics.cost_aud[row]), 2),
+                "total_cost_all_rolls_aud": round(float(metrics.cost_aud[row]) * request.quantity_master_rolls, 2)
+            })
         
         result = {
             "material_info": {
@@ -958,22 +970,29 @@ async def calculate_raw_material_permutation(
             "input_parameters": {
                 "waste_allowance_mm": request.waste_allowance_mm,
                 "desired_slit_widths": request.desired_slit_widths,
-                "quantity_master_rolls": request.quantity_master_rolls
+                "quantity_master_rolls": request.quantity_master_rolls,
+                "max_results": request.max_results,
+                "time_budget_seconds": request.time_budget_seconds,
+                "top_n": request.top_n
             },
             "permutations": permutations,
-            "total_permutations_found": len(permutations),
+            "total_permutations_found": search.total_patterns,
+            "permutations_returned": len(permutations),
+            "search_truncated": search.truncated or len(permutations) < len(search.patterns),
             "best_yield_percentage": permutations[0]["yield_percentage"] if permutations else 0,
             "lowest_waste_mm": permutations[0]["waste_mm"] if permutations else 0
         }
         
         return StandardResponse(
             success=True,
-            message=f"Found {len(permutations)} valid slit patterns",
+            message=f"Found {search.total_patterns} valid slit patterns" + (f", showing best {len(permutations)}" if len(permutations) < search.total_patterns else ""),
             data=result
         )
         
     except HTTPException:
         raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Permutation calculation timed out")
     except Exception as e:
         logger.error(f"Material permutation calculation failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Calculation failed: {str(e)}")
@@ -1049,6 +1068,173 @@ async def calculate_spiral_core_consumption(
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Spiral core calculation failed: {str(e)}")
 
+# Open orders whose slitting has not been run yet
+CUTTING_STOCK_PLANNING_STAGES = [
+    ProductionStage.ORDER_ENTERED.value,
+    ProductionStage.PENDING_MATERIAL.value,
+    ProductionStage.PAPER_SLITTING.value
+]
+
+async def _get_open_order_slit_demand(material_id: str, order_ids: Optional[List[str]] = None) -> List[dict]:
+    """Slit-width demand (meters per width) for open orders that use this material"""
+    query = {
+        "status": {"$nin": ["completed", "cancelled", "archived"]},
+        "current_stage": {"$in": CUTTING_STOCK_PLANNING_STAGES}
+    }
+    if order_ids:
+        query["id"] = {"$in": order_ids}
+    
+    orders = await db.orders.find(
+        query, {"_id": 0, "id": 1, "order_number": 1, "items": 1}
+    ).to_list(length=None)
+    
+    product_ids = list({item.get("product_id") for order in orders for item in order.get("items", []) if item.get("product_id")})
+    client_products = {
+        product["id"]: product
+        async for product in db.client_products.find(
+            {"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "material_layers": 1}
+        )
+    }
+    
+    demand = []
+    for order in orders:
+        for item in order.get("items", []):
+            client_product = client_products.get(item.get("product_id"))
+            if not client_product:
+                continue
+            for material_layer in client_product.get("material_layers", []):
+                if material_layer.get("material_id") != material_id:
+                    continue
+                width_mm = material_layer.get("width_mm") or material_layer.get("width") or 0
+                # Same length-per-unit estimate as the material usage report
+                length_per_unit = material_layer.get("quantity") or material_layer.get("length_m", 1.0)
+                remaining_units = item.get("remaining_to_produce")
+                if remaining_units is None:
+                    remaining_units = item.get("quantity", 0)
+                quantity_meters = remaining_units * length_per_unit
+                if width_mm > 0 and quantity_meters > 0:
+                    demand.append({
+                        "slit_width_mm": float(width_mm),
+                        "quantity_meters": quantity_meters,
+                        "order_id": order["id"],
+                        "order_number": order.get("order_number")
+                    })
+    return demand
+
+@api_router.post("/calculators/cutting-stock-plan", response_model=StandardResponse)
+async def plan_cutting_stock_for_orders(
+    request: CuttingStockPlanRequest,
+    current_user: dict = Depends(require_any_role)
+):
+    """
+    Plan slitting across master rolls for the open orders' slit-width demand.
+    Returns the number of master rolls needed and the pattern schedule. Planning
+    runs in a worker process so it doesn't block other requests.
+    """
+    try:
+        material = await db.materials.find_one({"id": request.material_id})
+        if not material:
+            raise HTTPException(status_code=404, detail="Material not found")
+        
+        master_width_mm = float(material.get("width_mm") or material.get("master_deckle_width_mm") or 0)
+        if master_width_mm == 0:
+            raise HTTPException(status_code=400, detail="Material does not have width defined")
+        
+        try:
+            gsm = float(material.get("gsm") or 0)
+        except (ValueError, TypeError):
+            gsm = 0
+        roll_weight_kg = float(material.get("supplied_roll_weight") or 0)
+        
+        # Master roll length: (roll weight in grams) / (GSM * width in meters)
+        master_roll_length_m = request.master_roll_length_m
+        if not master_roll_length_m and roll_weight_kg > 0 and gsm > 0:
+            master_roll_length_m = (roll_weight_kg * 1000) / (gsm * master_width_mm / 1000.0)
+        if not master_roll_length_m:
+            raise HTTPException(
+                status_code=400,
+                detail="Master roll length unknown - provide master_roll_length_m or set the material's GSM and supplied roll weight"
+            )
+        
+        # Demand per width, explicit or from open orders
+        if request.demand:
+            demand_entries = [entry.dict() for entry in request.demand]
+        else:
+            demand_entries = await _get_open_order_slit_demand(request.material_id, request.order_ids)
+        
+        demand_meters = {}
+        for entry in demand_entries:
+            width = float(entry["slit_width_mm"])
+            demand_meters[width] = demand_meters.get(width, 0) + entry["quantity_meters"]
+        
+        # Net off slit widths already cut and sitting in stock
+        slit_stock_meters = {}
+        if request.use_slit_width_stock:
+            async for slit in db.slit_widths.find(
+                {"raw_material_id": request.material_id, "remaining_quantity": {"$gt": 0}},
+                {"_id": 0, "slit_width_mm": 1, "remaining_quantity": 1}
+            ):
+                width = float(slit["slit_width_mm"])
+                slit_stock_meters[width] = slit_stock_meters.get(width, 0) + slit["remaining_quantity"]
+        
+        net_demand = {
+            width: meters - slit_stock_meters.get(width, 0)
+            for width, meters in demand_meters.items()
+            if meters - slit_stock_meters.get(width, 0) > 0
+        }
+        
+        plan = await job_executor.run_in_process(
+            "planner",
+            plan_cutting_stock,
+            master_width_mm,
+            master_roll_length_m,
+            net_demand,
+            request.max_waste_mm,
+            request.cpu_time_limit_seconds,
+            timeout=request.cpu_time_limit_seconds + 30
+        )
+        
+        # Compare against master rolls on hand
+        raw_material = await db.raw_material_stock.find_one({"material_id": request.material_id})
+        rolls_on_hand = None
+        if raw_material and roll_weight_kg > 0 and raw_material.get("unit_of_measure", "kg") == "kg":
+            rolls_on_hand = float(raw_material.get("quantity_on_hand", 0)) / roll_weight_kg
+        
+        result = {
+            "material_info": {
+                "material_id": request.material_id,
+                "material_name": material.get("material_description", material.get("supplier", "Unknown")),
+                "material_code": material.get("product_code", "N/A"),
+                "master_width_mm": master_width_mm,
+                "master_roll_length_m": round(master_roll_length_m, 2),
+                "gsm": gsm
+            },
+            "demand_sources": demand_entries,
+            "slit_width_stock_meters": [
+                {"slit_width_mm": width, "available_meters": round(meters, 2)}
+                for width, meters in sorted(slit_stock_meters.items(), reverse=True)
+            ],
+            "plan": plan,
+            "stock": {
+                "master_rolls_on_hand": round(rolls_on_hand, 2) if rolls_on_hand is not None else None,
+                "shortfall_master_rolls": max(0, plan["total_master_rolls"] - int(rolls_on_hand)) if rolls_on_hand is not None else None
+            }
+        }
+        
+        return StandardResponse(
+            success=True,
+            message=f"Planned {plan['total_master_rolls']} master roll(s) across {len(plan['patterns'])} pattern(s)",
+            data=result
+        )
+        
+    except HTTPException:
+        raise
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Cutting stock planning timed out")
+    except Exception as e:
+        logger.error(f"Cutting stock planning failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Planning failed: {str(e)}")
+
 # Helper functions for calculations
 def _generate_permutations(sizes, master_width):
     """Generate possible arrangements of sizes within master width"""
@@ -1550,13 +1736,25 @@ async def delete_client(client_id: str, current_user: dict = Depends(require_adm
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Client not found")
     
+    invalidate_client_cache(client_id)
+    
     return StandardResponse(success=True, message="Client deleted successfully")
 
 # ============= ORDER MANAGEMENT ENDPOINTS =============
 
 @api_router.get("/orders", response_model=List[Order])
-async def get_orders(status_filter: Optional[str] = None, current_user: dict = Depends(require_any_role)):
-    """Get all orders with optional status filter (excludes archived/completed orders by default)"""
+async def get_orders(
+    response: Response,
+    status_filter: Optional[str] = None,
+    view: str = Query("full", pattern="^(full|summary)$"),
+    page: PageParams = Depends(),
+    current_user: dict = Depends(require_any_role)
+):
+    """Get all orders with optional status filter (excludes archived/completed orders by default).
+
+    view=summary returns only the OrderSummary fields, projected in Mongo and
+    not re-validated, for list screens.
+    """
     query = {}
     
     # Exclude completed/cleared orders unless specifically requested
@@ -1570,7 +1768,14 @@ async def get_orders(status_filter: Optional[str] = None, current_user: dict = D
             {"current_stage": {"$ne": "cleared"}}
         ]
     
-    orders = await db.orders.find(query).sort("created_at", -1).to_list(1000)
+    orders, headers, projected = await find_page(
+        db.orders, query, page,
+        allowed_fields=Order.model_fields,
+        default_fields=ORDER_SUMMARY_FIELDS if view == "summary" else None
+    )
+    if projected:
+        return projected_response(orders, headers)
+    response.headers.update(headers)
     return [Order(**order) for order in orders]
 
 @api_router.post("/orders", response_model=StandardResponse)
@@ -1581,39 +1786,6 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(req
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    # Generate order number - find the highest existing order number for this year
-    current_year = datetime.now().year
-    order_number_pattern = f"ADM-{current_year}-"
-    
-    # Get all orders for this year and find the highest number
-    existing_orders = await db.orders.find(
-        {"order_number": {"$regex": f"^{order_number_pattern}"}}
-    ).sort("order_number", -1).limit(1).to_list(length=1)
-    
-    if existing_orders:
-        # Extract the number from the last order (e.g., "ADM-2025-0007" -> 7)
-        last_number = int(existing_orders[0]["order_number"].split("-")[-1])
-        next_number = last_number + 1
-    else:
-        # First order of the year
-        next_number = 1
-    
-    # Generate order number with uniqueness check
-    max_attempts = 100
-    for attempt in range(max_attempts):
-        order_number = f"ADM-{current_year}-{next_number:04d}"
-        
-        # Check if this order number already exists
-        existing = await db.orders.find_one({"order_number": order_number})
-        if not existing:
-            break
-        
-        # If it exists, increment and try again
-        next_number += 1
-    else:
-        # If we've tried 100 times and still can't find a unique number, something is very wrong
-        raise HTTPException(status_code=500, detail="Unable to generate unique order number")
-    
     # Calculate totals with discount applied before GST
     subtotal = sum(item.total_price for item in order_data.items)
     
@@ -1630,6 +1802,9 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(req
     gst = discounted_subtotal * 0.1
     total_amount = discounted_subtotal + gst
     
+    # Order numbers come from an atomic per-year counter
+    order_number = await next_order_number(db)
+    
     new_order = Order(
         order_number=order_number,
         client_id=order_data.client_id,
@@ -1652,7 +1827,20 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(req
         created_by=current_user["user_id"]
     )
     
-    await db.orders.insert_one(new_order.dict())
+    # The unique index on order_number catches a counter that was never
+    # seeded from legacy data; reseed from the orders and take the next number
+    order_doc = new_order.dict()
+    for attempt in range(3):
+        try:
+            await db.orders.insert_one(order_doc)
+            break
+        except DuplicateKeyError:
+            logger.warning(f"Order number {order_doc['order_number']} already taken, reseeding counter")
+            await seed_order_counters(db, datetime.now().year)
+            order_doc["order_number"] = await next_order_number(db)
+    else:
+        raise HTTPException(status_code=500, detail="Unable to generate unique order number")
+    order_number = order_doc["order_number"]
     
     # Log initial production stage
     production_log = ProductionLog(
@@ -1662,6 +1850,9 @@ async def create_order(order_data: OrderCreate, current_user: dict = Depends(req
         notes="Order created"
     )
     await db.production_logs.insert_one(production_log.dict())
+    await notify_board_orders_changed(db, [new_order.id])
+    await refresh_rollups(db, [new_order.id])
+    await publish_production_event("orders_changed", {"order_ids": [new_order.id]})
     
     return StandardResponse(success=True, message="Order created successfully", data={"id": new_order.id, "order_number": order_number})
 
@@ -1682,6 +1873,14 @@ async def update_order(order_id: str, update_data: dict, current_user: dict = De
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    # Dates arrive as JSON strings; store them as dates so reports can compare them
+    for field in DATE_FIELDS["orders"]:
+        if isinstance(update_data.get(field), str):
+            parsed = as_utc_datetime(update_data[field])
+            if parsed is None and update_data[field].strip():
+                raise HTTPException(status_code=400, detail=f"Invalid date for {field}")
+            update_data[field] = parsed
+    
     # Add updated_at timestamp
     update_data["updated_at"] = datetime.now(timezone.utc)
     
@@ -1690,6 +1889,11 @@ async def update_order(order_id: str, update_data: dict, current_user: dict = De
         {"id": order_id},
         {"$set": update_data}
     )
+    await notify_board_orders_changed(db, [order_id])
+    await refresh_rollups(db, [order_id])
+    await refresh_job_costs(db, [order_id])
+    await document_cache.invalidate_order(order_id)
+    await publish_production_event("orders_changed", {"order_ids": [order_id]})
     
     return StandardResponse(success=True, message="Order updated successfully")
 
@@ -1797,12 +2001,14 @@ async def update_production_stage(order_id: str, stage_update: ProductionStageUp
             # This allows for transition period and potential rollback
             update_data["status"] = OrderStatus.ARCHIVED
     
-    result = await db.orders.update_one(
+    previous = await db.orders.find_one_and_update(
         {"id": order_id},
-        {"$set": update_data}
+        {"$set": update_data},
+        projection={"_id": 0, "current_stage": 1},
+        return_document=ReturnDocument.BEFORE
     )
     
-    if result.matched_count == 0:
+    if previous is None:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Log production stage change
@@ -1813,36 +2019,85 @@ async def update_production_stage(order_id: str, stage_update: ProductionStageUp
         notes=stage_update.notes
     )
     await db.production_logs.insert_one(production_log.dict())
+    if ProductionStage.CLEARED in (stage_update.to_stage, previous.get("current_stage")):
+        # Cost the job into the ledger as it clears (or drop it if it's reopened)
+        await refresh_job_costs(db, [order_id])
+    await refresh_rollups(db, [order_id])
+    await notify_board_orders_changed(db, [order_id])
+    await document_cache.invalidate_order(order_id)
+    await publish_production_event("stage_changed", {
+        "order_id": order_id,
+        "from_stage": stage_update.from_stage,
+        "to_stage": stage_update.to_stage,
+        "log": production_log.dict()
+    })
     
     return StandardResponse(success=True, message="Production stage updated successfully")
 
 
 @api_router.put("/orders/reorder", response_model=StandardResponse)
 async def reorder_jobs_in_stage(
-    reorder_data: dict,
+    reorder_data: JobReorderRequest,
     current_user: dict = Depends(require_production_access)
 ):
-    """Reorder jobs within a production stage for drag and drop functionality"""
+    """Reorder jobs within a production stage for drag and drop functionality.
+
+    A move (order_id with previous_id/next_id) gives the card the midpoint of
+    its neighbours' display_order, so only that card is written. The column is
+    renumbered from job_order, or from the stored order, when there is no gap
+    left between the neighbours or only job_order was sent.
+    """
     try:
-        stage = reorder_data.get("stage")
-        job_order = reorder_data.get("job_order")  # List of order IDs in new order
+        stage = reorder_data.stage
+        job_order = reorder_data.job_order
+        
+        if not stage or not (reorder_data.order_id or job_order):
+            raise HTTPException(status_code=400, detail="Stage and order_id or job_order are required")
+        
+        ranks = None
+        if reorder_data.order_id:
+            neighbour_ids = [i for i in (reorder_data.previous_id, reorder_data.next_id) if i]
+            neighbours = {
+                order["id"]: order.get("display_order", UNRANKED)
+                async for order in db.orders.find({"id": {"$in": neighbour_ids}}, {"_id": 0, "id": 1, "display_order": 1})
+            }
+            rank = rank_between(
+                neighbours.get(reorder_data.previous_id) if reorder_data.previous_id else None,
+                neighbours.get(reorder_data.next_id) if reorder_data.next_id else None
+            )
+            if rank is not None and len(neighbours) == len(neighbour_ids):
+                ranks = {reorder_data.order_id: rank}
+            elif not job_order:
+                # No room between the neighbours: rebuild the column from the
+                # stored order with the moved card in its new place
+                column = await db.orders.find(
+                    {"current_stage": stage, "status": {"$ne": OrderStatus.COMPLETED}, "id": {"$ne": reorder_data.order_id}},
+                    {"_id": 0, "id": 1, "display_order": 1}
+                ).to_list(length=None)
+                column.sort(key=lambda order: order.get("display_order", UNRANKED))
+                job_order = [order["id"] for order in column]
+                if reorder_data.previous_id in job_order:
+                    position = job_order.index(reorder_data.previous_id) + 1
+                elif reorder_data.next_id in job_order:
+                    position = job_order.index(reorder_data.next_id)
+                else:
+                    position = len(job_order)
+                job_order.insert(position, reorder_data.order_id)
         
-        if not stage or not job_order:
-            raise HTTPException(status_code=400, detail="Stage and job_order are required")
+        if ranks is None:
+            ranks = spaced_ranks(job_order)
         
-        # Update display order for each job in the stage
-        for index, order_id in enumerate(job_order):
-            await db.orders.update_one(
-                {"id": order_id},
-                {"$set": {"display_order": index}}
-            )
+        await write_display_orders(client, db.orders, ranks)
         
-        logger.info(f"Reordered {len(job_order)} jobs in stage {stage} by user {current_user['user_id']}")
+        await notify_board_orders_changed(db, list(ranks))
+        await publish_production_event("jobs_reordered", {"stage": stage, "job_order": job_order, "ranks": ranks})
+        
+        logger.info(f"Reordered {len(ranks)} jobs in stage {stage} by user {current_user['user_id']}")
         
         return StandardResponse(
             success=True,
-            message=f"Successfully reordered {len(job_order)} jobs in {stage}",
-            data={"updated_count": len(job_order)}
+            message=f"Successfully reordered {len(ranks)} jobs in {stage}",
+            data={"updated_count": len(ranks), "ranks": ranks}
         )
         
     except HTTPException:
@@ -1961,6 +2216,11 @@ async def delete_order(order_id: str, current_user: dict = Depends(require_admin
     
     # Perform hard delete - completely remove the order
     result = await db.orders.delete_one({"id": order_id})
+    await notify_board_orders_changed(db, [order_id])
+    await refresh_rollups(db, [order_id])
+    await refresh_job_costs(db, [order_id])
+    await document_cache.invalidate_order(order_id)
+    await publish_production_event("orders_changed", {"order_ids": [order_id]})
     
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
@@ -1972,58 +2232,88 @@ async def delete_order(order_id: str, current_user: dict = Depends(require_admin
 # ============= PRODUCTION BOARD ENDPOINTS =============
 
 @api_router.get("/production/board")
-async def get_production_board(current_user: dict = Depends(require_any_role)):
-    """Get production board with orders grouped by stage"""
-    # Get all active orders
-    orders = await db.orders.find({"status": {"$ne": OrderStatus.COMPLETED}}).to_list(1000)
+async def get_production_board(
+    request: Request,
+    response: Response,
+    since: Optional[int] = None,
+    current_user: dict = Depends(require_any_role)
+):
+    """Get production board with orders grouped by stage.
+
+    Send If-None-Match with the last ETag to get a 304 when nothing moved, or
+    since=<version> to receive only the cards changed or removed after that version.
+    """
+    await production_board_snapshot.ensure_fresh(db)
+    etag = production_board_snapshot.etag
+    version = production_board_snapshot.version
     
-    # Group orders by production stage
-    board = {}
-    for stage in ProductionStage:
-        if stage != ProductionStage.CLEARED:  # Don't show cleared orders on board
-            board[stage.value] = []
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
     
-    for order in orders:
-        stage = order.get("current_stage", ProductionStage.ORDER_ENTERED.value)
-        if stage in board:
-            # Get client info for logo
-            client = await db.clients.find_one({"id": order["client_id"]})
-            
-            # Get materials status
-            materials_status = await db.materials_status.find_one({"order_id": order["id"]})
-            materials_ready = materials_status.get("materials_ready", False) if materials_status else False
-            
-            # Handle due_date comparison properly for timezone awareness
-            due_date = order["due_date"]
-            if isinstance(due_date, str):
-                due_date = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
-            elif isinstance(due_date, datetime) and due_date.tzinfo is None:
-                # Make timezone-naive datetime timezone-aware (assume UTC)
-                due_date = due_date.replace(tzinfo=timezone.utc)
-            
-            order_info = {
-                "id": order["id"],
-                "order_number": order["order_number"],
-                "client_name": order["client_name"],
-                "client_logo": get_file_url(client.get("logo_path", "")) if client else None,
-                "due_date": order["due_date"],
-                "total_amount": order["total_amount"],
-                "runtime": order.get("runtime_estimate", "2-3 days"),
-                "materials_ready": materials_ready,
-                "items": order["items"],
-                "delivery_address": order.get("delivery_address"),
-                "is_overdue": due_date < datetime.now(timezone.utc),
-                "production_started_at": order.get("production_started_at"),
-                "stage_start_times": order.get("stage_start_times", {}),
-                "display_order": order.get("display_order", 999)  # Default to end if not set
-            }
-            board[stage].append(order_info)
+    response.headers["ETag"] = etag
+    
+    if since is not None:
+        delta = production_board_snapshot.delta_since(since)
+        if delta is not None:
+            return {"success": True, "delta": True, "version": version, "data": delta}
     
-    # Sort each stage by display_order
-    for stage in board:
-        board[stage].sort(key=lambda x: x.get("display_order", 999))
+    return {"success": True, "delta": False, "version": version, "data": production_board_snapshot.board()}
+
+async def publish_production_event(event_type: str, data: dict):
+    """Publish a production event to connected displays, tagged with the board version"""
+    try:
+        await production_events.publish(event_type, {**data, "board_version": production_board_snapshot.version})
+    except Exception as e:
+        logger.error(f"Failed to publish production event {event_type}: {str(e)}")
+
+@api_router.post("/production/events/ticket")
+async def create_production_events_ticket(current_user: dict = Depends(get_current_user)):
+    """Issue a single-use ticket for opening /production/events.
+
+    Browsers' EventSource cannot set headers, and a bearer token in the URL
+    would end up in access and proxy logs, so displays fetch a ticket here
+    and open the stream with ?ticket=. Tickets expire after a minute.
+    """
+    if current_user.get("role") not in [role.value for role in UserRole]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return {"success": True, "data": await issue_stream_ticket(db, current_user)}
+
+@api_router.get("/production/events")
+async def stream_production_events(
+    request: Request,
+    ticket: Optional[str] = None,
+    last_event_id: Optional[int] = Header(None),
+    last_event_id_param: Optional[int] = Query(None, alias="last_event_id")
+):
+    """Server-sent event stream of production board changes.
+
+    Replaces polling /production/board and /production/logs/{order_id}.
+    Authenticate with ?ticket= from POST /production/events/ticket, or an
+    Authorization header where the client can send one. A ticket opens one
+    stream, so EventSource can't reconnect on its own: the display fetches a
+    new ticket and reopens with ?last_event_id= to replay what it missed.
+    Events: stage_changed, jobs_reordered, materials_status, item_status,
+    orders_changed (orders created, edited or deleted) and resync (reload
+    the full board).
+    """
+    if ticket:
+        payload = await redeem_stream_ticket(db, ticket)
+    else:
+        auth_header = request.headers.get("authorization", "")
+        payload = verify_token(auth_header[7:]) if auth_header.lower().startswith("bearer ") else None
+    if payload is None:
+        raise HTTPException(status_code=401, detail="Could not validate credentials")
+    if payload.get("role") not in [role.value for role in UserRole]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
     
-    return {"success": True, "data": board}
+    if last_event_id is None:
+        last_event_id = last_event_id_param
+    queue = await production_events.subscribe(last_event_id)
+    return StreamingResponse(
+        production_events.stream(queue, request.is_disconnected),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @api_router.get("/production/logs/{order_id}")
 async def get_production_logs(order_id: str, current_user: dict = Depends(require_any_role)):
@@ -2090,6 +2380,15 @@ async def move_order_stage(
         notes=request.notes
     )
     await db.production_logs.insert_one(stage_log.dict())
+    await notify_board_orders_changed(db, [order_id])
+    await refresh_rollups(db, [order_id])
+    await refresh_job_costs(db, [order_id])
+    await publish_production_event("stage_changed", {
+        "order_id": order_id,
+        "from_stage": current_stage,
+        "to_stage": new_stage,
+        "log": stage_log.dict()
+    })
     
     return {"success": True, "message": f"Order moved to {new_stage.value}", "new_stage": new_stage.value}
 
@@ -2136,6 +2435,15 @@ async def jump_to_stage(
         notes=f"Jumped from {current_stage.value} to {target_stage.value}" + (f" - {request.notes}" if request.notes else "")
     )
     await db.production_logs.insert_one(stage_log.dict())
+    await notify_board_orders_changed(db, [order_id])
+    await refresh_rollups(db, [order_id])
+    await refresh_job_costs(db, [order_id])
+    await publish_production_event("stage_changed", {
+        "order_id": order_id,
+        "from_stage": current_stage,
+        "to_stage": target_stage,
+        "log": stage_log.dict()
+    })
     
     return {"success": True, "message": f"Order jumped to {target_stage.value}", "new_stage": target_stage.value}
 
@@ -2190,6 +2498,11 @@ async def update_materials_status(
         {"$set": update_data},
         upsert=True
     )
+    await notify_board_orders_changed(db, [order_id])
+    await publish_production_event("materials_status", {
+        "order_id": order_id,
+        "materials_ready": status_update.materials_ready
+    })
     
     return {"success": True, "message": "Materials status updated"}
 
@@ -2212,6 +2525,8 @@ async def save_job_card(job_card_data: dict, current_user: dict = Depends(requir
     # Insert into job_cards collection
     await db.job_cards.insert_one(job_card_record)
     
+    await refresh_job_costs(db, [job_card_record.get("order_id")])
+    
     return StandardResponse(
         success=True, 
         message="Job card archived successfully",
@@ -2253,6 +2568,8 @@ async def update_job_card(job_card_id: str, update_data: dict, current_user: dic
         {"$set": update_data}
     )
     
+    await refresh_job_costs(db, {job_card.get("order_id"), update_data.get("order_id")})
+    
     return StandardResponse(success=True, message="Job card updated successfully")
 
 @api_router.get("/production/job-cards/search")
@@ -2362,6 +2679,12 @@ async def update_order_item_status(
         {"id": order_id},
         {"$set": update_query}
     )
+    await notify_board_orders_changed(db, [order_id])
+    await publish_production_event("item_status", {
+        "order_id": order_id,
+        "item_index": item_update.item_index,
+        "is_completed": item_update.is_completed
+    })
     
     return {"success": True, "message": f"Item {item_update.item_index} marked as {'completed' if item_update.is_completed else 'pending'}"}
 
@@ -2370,187 +2693,32 @@ async def update_order_item_status(
 
 @api_router.get("/reports/outstanding-jobs")
 async def get_outstanding_jobs_report(current_user: dict = Depends(require_admin_or_manager)):
-    """Generate outstanding jobs report"""
-    # Count jobs by stage
-    jobs_by_stage = {}
-    total_jobs = 0
-    overdue_jobs = 0
-    jobs_due_today = 0
-    jobs_due_this_week = 0
-    
-    now = datetime.now(timezone.utc)
-    today_end = now.replace(hour=23, minute=59, second=59)
-    week_end = now + timedelta(days=7)
-    
-    # Get all active orders
-    orders = await db.orders.find({"status": {"$ne": OrderStatus.COMPLETED}}).to_list(1000)
-    
-    for order in orders:
-        stage = order.get("current_stage", ProductionStage.ORDER_ENTERED.value)
-        jobs_by_stage[stage] = jobs_by_stage.get(stage, 0) + 1
-        total_jobs += 1
-        
-        due_date = order["due_date"]
-        if isinstance(due_date, str):
-            due_date = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
-        elif isinstance(due_date, datetime) and due_date.tzinfo is None:
-            # Make timezone-naive datetime timezone-aware (assume UTC)
-            due_date = due_date.replace(tzinfo=timezone.utc)
-        
-        if due_date < now:
-            overdue_jobs += 1
-        elif due_date <= today_end:
-            jobs_due_today += 1
-        elif due_date <= week_end:
-            jobs_due_this_week += 1
-    
-    report = OutstandingJobsReport(
-        total_jobs=total_jobs,
-        jobs_by_stage=jobs_by_stage,
-        overdue_jobs=overdue_jobs,
-        jobs_due_today=jobs_due_today,
-        jobs_due_this_week=jobs_due_this_week
-    )
+    """Generate outstanding jobs report (counts only, computed in MongoDB)"""
+    report = OutstandingJobsReport(**await outstanding_jobs_summary(db, datetime.now(timezone.utc)))
     
     return {"success": True, "data": report.dict()}
 
 @api_router.get("/reports/late-deliveries")
 async def get_late_deliveries_report(current_user: dict = Depends(require_admin_or_manager)):
-    """Generate late deliveries report"""
-    # Get completed orders that were delivered late
-    completed_orders = await db.orders.find({"status": OrderStatus.COMPLETED}).to_list(1000)
-    
-    late_deliveries = []
-    for order in completed_orders:
-        due_date = order["due_date"]
-        completed_date = order.get("completed_at")
-        
-        if completed_date and due_date:
-            if isinstance(due_date, str):
-                due_date = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
-            if isinstance(completed_date, str):
-                completed_date = datetime.fromisoformat(completed_date.replace("Z", "+00:00"))
-            
-            if completed_date > due_date:
-                delay_days = (completed_date - due_date).days
-                late_deliveries.append({
-                    "order": order,
-                    "delay_days": delay_days,
-                    "client_name": order["client_name"]
-                })
-    
-    # Calculate statistics
-    total_late = len(late_deliveries)
-    avg_delay = sum(ld["delay_days"] for ld in late_deliveries) / total_late if total_late > 0 else 0
-    
-    # Group by client
-    late_by_client = {}
-    for ld in late_deliveries:
-        client = ld["client_name"]
-        late_by_client[client] = late_by_client.get(client, 0) + 1
-    
-    # Group by month
-    late_by_month = {}
-    for ld in late_deliveries:
-        completed_date = ld["order"]["completed_at"]
-        if isinstance(completed_date, str):
-            completed_date = datetime.fromisoformat(completed_date.replace("Z", "+00:00"))
-        month_key = completed_date.strftime("%Y-%m")
-        late_by_month[month_key] = late_by_month.get(month_key, 0) + 1
-    
-    report = LateDeliveryReport(
-        total_late_deliveries=total_late,
-        average_delay_days=avg_delay,
-        late_deliveries_by_client=late_by_client,
-        late_deliveries_by_month=late_by_month
-    )
+    """Generate late deliveries report from the monthly late-delivery rollups"""
+    report = LateDeliveryReport(**await late_deliveries_rollup(db))
     
     return {"success": True, "data": report.dict()}
 
 @api_router.get("/reports/customer-annual/{client_id}")
 async def get_customer_annual_report(client_id: str, year: int, current_user: dict = Depends(require_admin_or_manager)):
-    """Generate customer annual report"""
+    """Generate customer annual report from the client's monthly rollups"""
     # Get client info
     client = await db.clients.find_one({"id": client_id})
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    # Get orders for the year
-    start_date = datetime(year, 1, 1)
-    end_date = datetime(year + 1, 1, 1)
-    
-    orders = await db.orders.find({
-        "client_id": client_id,
-        "created_at": {"$gte": start_date, "$lt": end_date}
-    }).to_list(1000)
-    
-    # Calculate statistics
-    total_orders = len(orders)
-    total_revenue = sum(order["total_amount"] for order in orders)
-    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
-    
-    # Orders by month
-    orders_by_month = {}
-    revenue_by_month = {}
-    for i in range(1, 13):
-        month_key = f"{year}-{i:02d}"
-        orders_by_month[month_key] = 0
-        revenue_by_month[month_key] = 0
-    
-    for order in orders:
-        created_date = order["created_at"]
-        if isinstance(created_date, str):
-            created_date = datetime.fromisoformat(created_date.replace("Z", "+00:00"))
-        month_key = created_date.strftime("%Y-%m")
-        if month_key in orders_by_month:
-            orders_by_month[month_key] += 1
-            revenue_by_month[month_key] += order["total_amount"]
-    
-    # Top products
-    product_stats = {}
-    for order in orders:
-        for item in order["items"]:
-            product_name = item["product_name"]
-            if product_name not in product_stats:
-                product_stats[product_name] = {"quantity": 0, "revenue": 0, "orders": 0}
-            product_stats[product_name]["quantity"] += item["quantity"]
-            product_stats[product_name]["revenue"] += item["total_price"]
-            product_stats[product_name]["orders"] += 1
-    
-    top_products = sorted(
-        [{"product": k, **v} for k, v in product_stats.items()],
-        key=lambda x: x["revenue"],
-        reverse=True
-    )[:5]
-    
-    # On-time delivery rate
-    completed_orders = [o for o in orders if o.get("completed_at")]
-    on_time_orders = 0
-    for order in completed_orders:
-        due_date = order["due_date"]
-        completed_date = order["completed_at"]
-        
-        if isinstance(due_date, str):
-            due_date = datetime.fromisoformat(due_date.replace("Z", "+00:00"))
-        if isinstance(completed_date, str):
-            completed_date = datetime.fromisoformat(completed_date.replace("Z", "+00:00"))
-        
-        if completed_date <= due_date:
-            on_time_orders += 1
-    
-    on_time_rate = (on_time_orders / len(completed_orders)) * 100 if completed_orders else 0
-    
+    # Monthly order, product and delivery rollups for the year
     report = CustomerAnnualReport(
         client_id=client_id,
         client_name=client["company_name"],
         year=year,
-        total_orders=total_orders,
-        total_revenue=total_revenue,
-        average_order_value=avg_order_value,
-        orders_by_month=orders_by_month,
-        revenue_by_month=revenue_by_month,
-        top_products=top_products,
-        on_time_delivery_rate=on_time_rate
+        **await customer_annual_rollup(db, client_id, year)
     )
     
     return {"success": True, "data": report.dict()}
@@ -2564,25 +2732,25 @@ async def simple_pdf_auth(token: str = None):
     # In production, you'd want proper authentication
     return {"user_id": "test-user", "role": "admin"}
 
-@api_router.get("/documents/acknowledgment/{order_id}")
-async def generate_acknowledgment(order_id: str):
-    """Generate order acknowledgment PDF"""
-    # Get order and client data
-    order = await db.orders.find_one({"id": order_id})
-    if not order:
-        raise HTTPException(status_code=404, detail="Order not found")
-    
-    client = await db.clients.find_one({"id": order["client_id"]})
-    if not client:
-        raise HTTPException(status_code=404, detail="Client not found")
-    
-    # Prepare data for PDF generation
-    order_data = {
+def _format_document_date(value):
+    return value.strftime("%d/%m/%Y") if isinstance(value, datetime) else value
+
+def _document_day() -> datetime:
+    """The date printed on a document, part of its render data so the cached copy is redone each day"""
+    return datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+
+def _client_address(client: dict) -> str:
+    return f"{client['address']}, {client['city']}, {client['state']} {client['postal_code']}"
+
+def build_acknowledgment_data(order: dict, client: dict) -> dict:
+    """Render data for an order acknowledgment"""
+    return {
         "order_number": order["order_number"],
         "invoice_number": f"INV-{order['order_number']}",
-        "due_date": order["due_date"].strftime("%d/%m/%Y") if isinstance(order["due_date"], datetime) else order["due_date"],
+        "document_date": _document_day(),
+        "due_date": _format_document_date(order["due_date"]),
         "client_name": client["company_name"],
-        "client_address": f"{client['address']}, {client['city']}, {client['state']} {client['postal_code']}",
+        "client_address": _client_address(client),
         "client_email": client["email"],
         "client_phone": client["phone"],
         "client_payment_terms": client.get("payment_terms", "Net 30 days"),
@@ -2594,19 +2762,92 @@ async def generate_acknowledgment(order_id: str):
         "total_amount": order["total_amount"],
         "bank_details": client.get("bank_details")
     }
+
+def build_job_card_data(order: dict, job_spec: Optional[dict], specifications: Optional[dict]) -> dict:
+    """Render data for a job card (specifications come from the order's first product)"""
+    return {
+        "order_number": order["order_number"],
+        "client_name": order["client_name"],
+        "due_date": _format_document_date(order["due_date"]),
+        "current_stage": order.get("current_stage", "order_entered"),
+        "specifications": specifications,
+        "job_specification": job_spec
+    }
+
+def build_packing_list_data(order: dict) -> dict:
+    """Render data for a packing list"""
+    return {
+        "order_number": order["order_number"],
+        "client_name": order["client_name"],
+        "document_date": _document_day(),
+        "delivery_address": order.get("delivery_address", "N/A"),
+        "delivery_instructions": order.get("delivery_instructions"),
+        "items": order["items"]
+    }
+
+def build_invoice_data(order: dict, client: dict) -> dict:
+    """Render data for an invoice"""
+    return {
+        "invoice_number": f"INV-{order['order_number']}",
+        "order_number": order["order_number"],
+        "document_date": _document_day(),
+        "payment_due_date": (datetime.now(timezone.utc) + timedelta(days=30)).strftime("%d/%m/%Y"),
+        "client_name": client["company_name"],
+        "client_address": _client_address(client),
+        "client_abn": client.get("abn", "N/A"),
+        "items": order["items"],
+        "subtotal": order["subtotal"],
+        "gst": order["gst"],
+        "total_amount": order["total_amount"]
+    }
+
+def _first_product_id(order: dict) -> Optional[str]:
+    if order["items"] and len(order["items"]) > 0:
+        return order["items"][0].get("product_id")
+    return None
+
+async def load_order_document(order: dict, doc_type: str, *render_args, template_id: str = None):
+    """Return (cache key, PDF bytes) for an order document, from the document cache when possible"""
+    key = document_cache_key(doc_type, order, render_args, template_id)
+    path = await document_cache.get(order["id"], key)
+    if path is not None:
+        try:
+            return key, await asyncio.to_thread(Path(path).read_bytes)
+        except FileNotFoundError:
+            # Evicted or invalidated between lookup and read
+            pass
+    pdf_content = await render_pdf(doc_type, *render_args)
+    await document_cache.put(order["id"], key, pdf_content)
+    return key, pdf_content
+
+async def serve_order_document(request: Request, order: dict, doc_type: str, filename: str, *render_args, template_id: str = None):
+    """Serve an order document from the document cache, rendering it on a miss"""
+    cached = not_modified(request, document_cache_key(doc_type, order, render_args, template_id))
+    if cached:
+        return cached
+
+    key, pdf_content = await load_order_document(order, doc_type, *render_args, template_id=template_id)
+    return cached_pdf_response(pdf_content, key, filename)
+
+@api_router.get("/documents/acknowledgment/{order_id}")
+async def generate_acknowledgment(order_id: str, request: Request):
+    """Generate order acknowledgment PDF"""
+    # Get order and client data
+    order = await db.orders.find_one({"id": order_id})
+    if not order:
+        raise HTTPException(status_code=404, detail="Order not found")
     
-    # Generate PDF
-    pdf_content = doc_generator.generate_order_acknowledgment(order_data)
+    client = await db.clients.find_one({"id": order["client_id"]})
+    if not client:
+        raise HTTPException(status_code=404, detail="Client not found")
     
-    return StreamingResponse(
-        BytesIO(pdf_content),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=acknowledgment_{order['order_number']}.pdf"}
-    )
+    # Generate PDF (or serve the cached copy)
+    order_data = build_acknowledgment_data(order, client)
+    return await serve_order_document(request, order, "acknowledgment", f"acknowledgment_{order['order_number']}.pdf", order_data)
 
 
 @api_router.get("/documents/acknowledgment/{order_id}/template/{template_id}")
-async def generate_acknowledgment_with_template(order_id: str, template_id: str):
+async def generate_acknowledgment_with_template(order_id: str, template_id: str, request: Request):
     """Generate order acknowledgment PDF using a page template"""
     # Get order data
     order = await db.orders.find_one({"id": order_id})
@@ -2627,159 +2868,56 @@ async def generate_acknowledgment_with_template(order_id: str, template_id: str)
         "order_number": order["order_number"],
         "invoice_number": f"INV-{order['order_number']}",
         "customer_name": client["company_name"],
-        "customer_address": f"{client['address']}, {client['city']}, {client['state']} {client['postal_code']}",
+        "customer_address": _client_address(client),
         "order_date": datetime.now().strftime("%d/%m/%Y"),
-        "due_date": order["due_date"].strftime("%d/%m/%Y") if isinstance(order["due_date"], datetime) else order["due_date"],
+        "due_date": _format_document_date(order["due_date"]),
         "total_amount": f"${order['total_amount']:.2f}",
         "notes": order.get("notes", "")
     }
     
     # Generate PDF from template
-    from reportlab.pdfgen import canvas
-    from reportlab.lib.pagesizes import A4
-    from io import BytesIO
-    
-    buffer = BytesIO()
-    pdf = canvas.Canvas(buffer, pagesize=(template.get('page_width', 595), template.get('page_height', 842)))
-    
-    # Render each element from template
-    for element in template.get('elements', []):
-        element_type = element.get('type')
-        x = element.get('x', 0)
-        y = template.get('page_height', 842) - element.get('y', 0) - element.get('height', 0)  # Flip Y coordinate
-        
-        if element_type == 'text':
-            # Render static text or label
-            pdf.setFont("Helvetica-Bold" if element.get('fontWeight') == 'bold' else "Helvetica", element.get('fontSize', 12))
-            pdf.setFillColor(element.get('color', '#000000'))
-            pdf.drawString(x, y, element.get('content', ''))
-            
-        elif element_type == 'field':
-            # Render dynamic field data
-            field_type = element.get('field_type')
-            value = order_data.get(field_type, f"{{{field_type}}}")
-            
-            pdf.setFont("Helvetica-Bold" if element.get('fontWeight') == 'bold' else "Helvetica", element.get('fontSize', 12))
-            pdf.setFillColor(element.get('color', '#000000'))
-            pdf.drawString(x, y, str(value))
-            
-        elif element_type == 'shape':
-            shape_type = element.get('shape_type')
-            width = element.get('width', 100)
-            height = element.get('height', 100)
-            
-            pdf.setStrokeColor(element.get('borderColor', '#000000'))
-            pdf.setLineWidth(element.get('borderWidth', 1))
-            
-            if element.get('fillColor') and element.get('fillColor') != 'transparent':
-                pdf.setFillColor(element.get('fillColor'))
-            
-            if shape_type == 'rectangle':
-                if element.get('fillColor') and element.get('fillColor') != 'transparent':
-                    pdf.rect(x, y, width, height, fill=1, stroke=1)
-                else:
-                    pdf.rect(x, y, width, height, fill=0, stroke=1)
-            elif shape_type == 'circle':
-                radius = min(width, height) / 2
-                if element.get('fillColor') and element.get('fillColor') != 'transparent':
-                    pdf.circle(x + radius, y + radius, radius, fill=1, stroke=1)
-                else:
-                    pdf.circle(x + radius, y + radius, radius, fill=0, stroke=1)
-            elif shape_type == 'line':
-                pdf.line(x, y, x + width, y)
-        
-        elif element_type == 'image' and element.get('src'):
-            # Handle base64 images
-            try:
-                import base64
-                from reportlab.lib.utils import ImageReader
-                
-                image_data = element.get('src', '')
-                if image_data.startswith('data:image'):
-                    # Extract base64 data
-                    image_data = image_data.split(',')[1]
-                    image_bytes = base64.b64decode(image_data)
-                    image_buffer = BytesIO(image_bytes)
-                    
-                    pdf.drawImage(ImageReader(image_buffer), x, y, 
-                                width=element.get('width', 200), 
-                                height=element.get('height', 150))
-            except Exception as e:
-                logger.error(f"Error rendering image: {str(e)}")
-    
-    pdf.save()
-    buffer.seek(0)
-    
-    return StreamingResponse(
-        buffer,
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=acknowledgment_{order['order_number']}.pdf"}
+    template.pop("_id", None)
+    return await serve_order_document(
+        request, order, "template", f"acknowledgment_{order['order_number']}.pdf", template, order_data, template_id=template_id
     )
 
 
 @api_router.get("/documents/job-card/{order_id}")
-async def generate_job_card(order_id: str):
+async def generate_job_card(order_id: str, request: Request):
     """Generate job card PDF"""
     order = await db.orders.find_one({"id": order_id})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Get job specifications if available
-    job_spec = await db.job_specifications.find_one({"order_id": order_id})
+    job_spec = await db.job_specifications.find_one({"order_id": order_id}, {"_id": 0})
     
     # Get product specifications
     specifications = None
-    if order["items"] and len(order["items"]) > 0:
-        product_id = order["items"][0].get("product_id")
-        if product_id:
-            product = await db.products.find_one({"id": product_id})
-            if product:
-                specifications = product.get("specifications")
-    
-    job_data = {
-        "order_number": order["order_number"],
-        "client_name": order["client_name"],
-        "due_date": order["due_date"].strftime("%d/%m/%Y") if isinstance(order["due_date"], datetime) else order["due_date"],
-        "current_stage": order.get("current_stage", "order_entered"),
-        "specifications": specifications,
-        "job_specification": job_spec
-    }
-    
-    pdf_content = doc_generator.generate_job_card(job_data)
+    product_id = _first_product_id(order)
+    if product_id:
+        product = await db.products.find_one({"id": product_id}, {"_id": 0, "specifications": 1})
+        if product:
+            specifications = product.get("specifications")
     
-    return StreamingResponse(
-        BytesIO(pdf_content),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=job_card_{order['order_number']}.pdf"}
-    )
+    job_data = build_job_card_data(order, job_spec, specifications)
+    return await serve_order_document(request, order, "job_card", f"job_card_{order['order_number']}.pdf", job_data)
 
 @api_router.get("/documents/packing-list/{order_id}")
-async def generate_packing_list(order_id: str):
+async def generate_packing_list(order_id: str, request: Request):
     """Generate packing list PDF"""
     order = await db.orders.find_one({"id": order_id})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
-    order_data = {
-        "order_number": order["order_number"],
-        "client_name": order["client_name"],
-        "delivery_address": order.get("delivery_address", "N/A"),
-        "delivery_instructions": order.get("delivery_instructions"),
-        "items": order["items"]
-    }
-    
-    pdf_content = doc_generator.generate_packing_list(order_data)
+    order_data = build_packing_list_data(order)
     
-    return StreamingResponse(
-        BytesIO(pdf_content),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=packing_list_{order['order_number']}.pdf"}
-    )
+    return await serve_order_document(request, order, "packing_list", f"packing_list_{order['order_number']}.pdf", order_data)
 
 # Moved this function above document endpoints
 
 @api_router.get("/documents/invoice/{order_id}")
-async def generate_invoice_pdf(order_id: str):
+async def generate_invoice_pdf(order_id: str, request: Request):
     """Generate invoice PDF"""
     order = await db.orders.find_one({"id": order_id})
     if not order:
@@ -2789,26 +2927,91 @@ async def generate_invoice_pdf(order_id: str):
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     
-    invoice_data = {
-        "invoice_number": f"INV-{order['order_number']}",
-        "order_number": order["order_number"],
-        "payment_due_date": (datetime.now(timezone.utc) + timedelta(days=30)).strftime("%d/%m/%Y"),
-        "client_name": client["company_name"],
-        "client_address": f"{client['address']}, {client['city']}, {client['state']} {client['postal_code']}",
-        "client_abn": client.get("abn", "N/A"),
-        "items": order["items"],
-        "subtotal": order["subtotal"],
-        "gst": order["gst"],
-        "total_amount": order["total_amount"]
+    invoice_data = build_invoice_data(order, client)
+    
+    return await serve_order_document(request, order, "invoice", f"invoice_{order['order_number']}.pdf", invoice_data)
+
+async def read_order_document(order: dict, doc_type: str, *render_args) -> bytes:
+    """PDF bytes for an order document, from the document cache when possible"""
+    _, pdf_content = await load_order_document(order, doc_type, *render_args)
+    return pdf_content
+
+@api_router.post("/documents/batch")
+async def generate_document_batch(request: DocumentBatchRequest, current_user: dict = Depends(require_any_role)):
+    """Generate documents for many orders at once as one merged PDF or a ZIP.
+
+    Orders, clients, job specifications and product specifications are each
+    fetched in one query; documents are rendered in parallel in the worker pool
+    (reusing cached copies) and returned in the order requested.
+    """
+    if request.output_format not in ("pdf", "zip"):
+        raise HTTPException(status_code=400, detail="output_format must be 'pdf' or 'zip'")
+    
+    order_ids = list(dict.fromkeys(request.order_ids))
+    doc_types = list(dict.fromkeys(doc_type.value for doc_type in request.document_types))
+    
+    orders = {
+        order["id"]: order
+        async for order in db.orders.find({"id": {"$in": order_ids}}, {"_id": 0})
     }
+    missing = [order_id for order_id in order_ids if order_id not in orders]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Orders not found: {', '.join(missing)}")
+    
+    clients = {}
+    if {"acknowledgment", "invoice"} & set(doc_types):
+        client_ids = list({order["client_id"] for order in orders.values()})
+        clients = {
+            client["id"]: client
+            async for client in db.clients.find({"id": {"$in": client_ids}}, {"_id": 0})
+        }
     
-    pdf_content = doc_generator.generate_invoice(invoice_data)
+    job_specs = {}
+    product_specifications = {}
+    if "job_card" in doc_types:
+        job_specs = {
+            spec["order_id"]: spec
+            async for spec in db.job_specifications.find({"order_id": {"$in": order_ids}}, {"_id": 0})
+        }
+        product_ids = list({_first_product_id(order) for order in orders.values()} - {None})
+        product_specifications = {
+            product["id"]: product.get("specifications")
+            async for product in db.products.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "specifications": 1})
+        }
     
-    return StreamingResponse(
-        BytesIO(pdf_content),
-        media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=invoice_{order['order_number']}.pdf"}
-    )
+    documents = []  # (filename, doc_type, order, render data)
+    for order_id in order_ids:
+        order = orders[order_id]
+        for doc_type in doc_types:
+            if doc_type in ("acknowledgment", "invoice"):
+                client = clients.get(order["client_id"])
+                if not client:
+                    raise HTTPException(status_code=404, detail=f"Client not found for order {order['order_number']}")
+                data = build_acknowledgment_data(order, client) if doc_type == "acknowledgment" else build_invoice_data(order, client)
+            elif doc_type == "job_card":
+                data = build_job_card_data(order, job_specs.get(order_id), product_specifications.get(_first_product_id(order)))
+            else:
+                data = build_packing_list_data(order)
+            documents.append((f"{doc_type}_{order['order_number']}.pdf", doc_type, order, data))
+    
+    # Keep this batch within the pdf queue's concurrency so it can't crowd out single downloads
+    semaphore = asyncio.Semaphore(JOB_TYPE_LIMITS["pdf"]["concurrency"])
+    
+    async def read_document(doc_type: str, order: dict, data: dict) -> bytes:
+        async with semaphore:
+            return await read_order_document(order, doc_type, data)
+    
+    contents = await asyncio.gather(*(read_document(doc_type, order, data) for _, doc_type, order, data in documents))
+    
+    batch_name = f"documents_{datetime.now(timezone.utc).strftime('%Y%m%d_%H%M%S')}"
+    if request.output_format == "zip":
+        archive = await job_executor.run_in_thread(
+            "pdf", zip_documents, [(filename, content) for (filename, *_), content in zip(documents, contents)]
+        )
+        return pdf_response(archive, f"{batch_name}.zip", media_type="application/zip")
+    
+    merged = await job_executor.run_in_process("pdf", merge_pdfs, list(contents), timeout=PDF_RENDER_TIMEOUT_SECONDS)
+    return pdf_response(merged, f"{batch_name}.pdf")
 
 # ============= XERO INTEGRATION ENDPOINTS =============
 
@@ -2859,7 +3062,6 @@ async def debug_xero_config():
 async def test_pdf_download():
     """Simple test PDF for debugging download issues"""
     from reportlab.pdfgen import canvas
-    from io import BytesIO
     
     buffer = BytesIO()
     c = canvas.Canvas(buffer)
@@ -3671,8 +3873,7 @@ async def generate_job_invoice(
     
     # Generate base invoice number if this is the first invoice for this job
     if not invoice_history:
-        invoice_count = await db.invoices.count_documents({}) + 1
-        base_invoice_number = f"INV-{invoice_count:04d}"
+        base_invoice_number = await next_invoice_number(db)
     else:
         # Use existing base invoice number from first invoice
         base_invoice_number = invoice_history[0].get("base_invoice_number") or invoice_history[0].get("invoice_number").split("~")[0]
@@ -3771,6 +3972,7 @@ async def generate_job_invoice(
         {"id": job_id},
         {"$set": update_data}
     )
+    await refresh_rollups(db, [job_id], [invoice_record["id"]])
     
     # For full invoices in accounting transactions, automatically create Xero draft
     if invoice_data.get("invoice_type") != "partial":
@@ -3785,13 +3987,13 @@ async def generate_job_invoice(
                 
                 # Get next Xero invoice number
                 next_number_response = await get_next_xero_invoice_number()
-                next_invoice_number = next_number_response["formatted_number"]
+                xero_invoice_number = next_number_response["formatted_number"]
                 
                 # Prepare Xero invoice data with proper formatting
                 xero_invoice_data = {
                     "client_name": client["company_name"] if client else job.get("client_name", "Unknown Client"),
                     "client_email": client.get("email", "") if client else "",
-                    "invoice_number": next_invoice_number,
+                    "invoice_number": xero_invoice_number,
                     "order_number": job["order_number"],
                     "items": [],
                     "total_amount": invoice_data.get("total_amount", job["total_amount"]),
@@ -3822,7 +4024,7 @@ async def generate_job_invoice(
                     {"id": invoice_record["id"]},
                     {"$set": {
                         "xero_invoice_id": xero_response.get("invoice_id"),
-                        "xero_invoice_number": next_invoice_number,
+                        "xero_invoice_number": xero_invoice_number,
                         "xero_status": "draft"
                     }}
                 )
@@ -3861,75 +4063,63 @@ async def get_archived_jobs(
             "$lt": end_date
         }
     
-    archived_jobs = await db.orders.find(query_filter).to_list(length=None)
-    
-    # Enrich with client and invoice information
-    for job in archived_jobs:
-        # Remove MongoDB ObjectId if present
-        if "_id" in job:
-            del job["_id"]
-            
-        # Get client info
-        client = await db.clients.find_one({"id": job["client_id"]})
-        if client:
-            job["client_name"] = client["company_name"]
-        
-        # Get invoice info
-        if job.get("invoice_id"):
-            invoice = await db.invoices.find_one({"id": job["invoice_id"]})
-            if invoice:
-                job["invoice_number"] = invoice["invoice_number"]
-                job["invoice_date"] = invoice["created_at"]
+    async def enriched_jobs():
+        # Enrich each batch with client and invoice information from two bulk lookups
+        async for batch in iter_batches(db.orders.find(query_filter, {"_id": 0})):
+            clients = await find_by_ids(db.clients, (job.get("client_id") for job in batch), {"_id": 0, "id": 1, "company_name": 1})
+            invoices = await find_by_ids(
+                db.invoices, (job.get("invoice_id") for job in batch), {"_id": 0, "id": 1, "invoice_number": 1, "created_at": 1}
+            )
+            for job in batch:
+                client = clients.get(job.get("client_id"))
+                if client:
+                    job["client_name"] = client["company_name"]
+                
+                invoice = invoices.get(job.get("invoice_id"))
+                if invoice:
+                    job["invoice_number"] = invoice["invoice_number"]
+                    job["invoice_date"] = invoice["created_at"]
+                yield job
     
-    return {"data": archived_jobs}
+    return StreamingResponse(stream_json_list("data", enriched_jobs()), media_type="application/json")
 
 @api_router.get("/invoicing/monthly-report")
 async def get_monthly_invoicing_report(
     month: int,
     year: int,
+    include_jobs: bool = False,
     current_user: dict = Depends(require_admin_or_manager)
 ):
-    """Generate monthly invoicing report"""
-    start_date = datetime(year, month, 1)
-    if month == 12:
-        end_date = datetime(year + 1, 1, 1)
-    else:
-        end_date = datetime(year, month + 1, 1)
-    
-    # Get jobs completed this month
-    completed_jobs = await db.orders.find({
-        "updated_at": {"$gte": start_date, "$lt": end_date},
-        "current_stage": "cleared"
-    }).to_list(length=None)
-    
-    # Get jobs invoiced this month
-    invoiced_jobs = await db.invoices.find({
-        "created_at": {"$gte": start_date, "$lt": end_date}
-    }).to_list(length=None)
+    """Generate monthly invoicing report.
     
-    # Remove ObjectIds from results
-    for job in completed_jobs:
-        if "_id" in job:
-            del job["_id"]
-    
-    for invoice in invoiced_jobs:
-        if "_id" in invoice:
-            del invoice["_id"]
-    
-    # Calculate totals
-    total_jobs_completed = len(completed_jobs)
-    total_jobs_invoiced = len(invoiced_jobs)
-    total_invoice_amount = sum(inv.get("total_amount", 0) for inv in invoiced_jobs)
-    
-    return {
+    Totals come from the monthly rollups, so the default response costs the
+    same however busy the month was. Pass include_jobs=true to also list the
+    completed and invoiced jobs themselves; completed jobs are those whose
+    cleared date (completed_at, falling back to updated_at) is in the month,
+    the same date the rollup totals count.
+    """
+    report = {
         "month": month,
         "year": year,
-        "total_jobs_completed": total_jobs_completed,
-        "total_jobs_invoiced": total_jobs_invoiced,
-        "total_invoice_amount": total_invoice_amount,
-        "completed_jobs": completed_jobs,
-        "invoiced_jobs": invoiced_jobs
+        **await monthly_invoicing_rollup(db, month, year)
     }
+    
+    if include_jobs:
+        start_date = datetime(year, month, 1)
+        if month == 12:
+            end_date = datetime(year + 1, 1, 1)
+        else:
+            end_date = datetime(year, month + 1, 1)
+        
+        # Jobs cleared (by the same cleared date the rollup counts) and invoiced this month
+        report["completed_jobs"] = await db.orders.find(
+            cleared_between_query(start_date, end_date), {"_id": 0}
+        ).to_list(length=None)
+        report["invoiced_jobs"] = await db.invoices.find({
+            "created_at": {"$gte": start_date, "$lt": end_date}
+        }, {"_id": 0}).to_list(length=None)
+    
+    return report
 
 # ============= ACCOUNTING TRANSACTIONS ENDPOINTS =============
 
@@ -3978,6 +4168,8 @@ async def complete_accounting_transaction(
             "updated_at": datetime.now(timezone.utc)
         }}
     )
+    await refresh_rollups(db, [job_id])
+    await refresh_job_costs(db, [job_id])
     
     # Get the updated order data for archiving
     updated_job = await db.orders.find_one({"id": job_id})
@@ -4015,116 +4207,122 @@ async def complete_accounting_transaction(
         "job_id": job_id
     }
 
-@api_router.get("/invoicing/export-drafted-csv")
-async def export_drafted_invoices_csv(current_user: dict = Depends(require_admin_or_manager)):
-    """Export all accounting transactions (drafted invoices) to CSV in Xero import format"""
+# CSV Headers based on Xero import format
+DRAFTED_INVOICES_CSV_HEADERS = [
+    "ContactName", "EmailAddress", "POAddressLine1", "POAddressLine2", 
+    "POAddressLine3", "POAddressLine4", "POCity", "PORegion", 
+    "POPostalCode", "POCountry", "InvoiceNumber", "Reference", 
+    "InvoiceDate", "DueDate", "InventoryItemCode", "Description", 
+    "Quantity", "UnitAmount", "Discount", "AccountCode", "TaxType", 
+    "TrackingName1", "TrackingOption1", "TrackingName2", "TrackingOption2", 
+    "Currency", "BrandingTheme"
+]
+
+def _drafted_invoice_rows(transaction: dict, client: Optional[dict], invoice: Optional[dict]) -> List[list]:
+    """Xero import rows (one per item) for one drafted invoice"""
+    client_name = client["company_name"] if client else transaction.get("client_name", "Unknown Client")
+    client_email = client.get("email", "") if client else ""
+    
+    invoice_number = invoice["invoice_number"] if invoice else f"INV-{transaction['order_number']}"
+    invoice_date = invoice["created_at"].strftime("%d/%m/%Y") if invoice and invoice.get("created_at") else datetime.now().strftime("%d/%m/%Y")
+    
+    # Calculate due date (30 days from invoice date)
+    due_date_obj = invoice["created_at"] + timedelta(days=30) if invoice and invoice.get("created_at") else datetime.now() + timedelta(days=30)
+    due_date = due_date_obj.strftime("%d/%m/%Y")
+    
+    # Process each item in the transaction
+    items = transaction.get("items", [])
+    if not items:
+        # Create a single line if no items
+        items = [{"description": f"Services for Order {transaction['order_number']}", "quantity": 1, "unit_price": transaction.get("total_amount", 0)}]
+    
+    rows = []
+    for item in items:
+        rows.append([
+            client_name,  # ContactName (required)
+            client_email,  # EmailAddress
+            "",  # POAddressLine1
+            "",  # POAddressLine2
+            "",  # POAddressLine3
+            "",  # POAddressLine4
+            "",  # POCity
+            "",  # PORegion
+            "",  # POPostalCode
+            "",  # POCountry
+            invoice_number,  # InvoiceNumber (required)
+            transaction["order_number"],  # Reference
+            invoice_date,  # InvoiceDate (required)
+            due_date,  # DueDate (required)
+            item.get("product_code", ""),  # InventoryItemCode
+            f"{item.get('product_name', item.get('description', 'Product'))} - {item.get('specifications', '')}".strip(" - "),  # Description (required)
+            str(item.get("quantity", 1)),  # Quantity (required)
+            str(item.get("unit_price", item.get("price", 0))),  # UnitAmount (required)
+            str(item.get("discount_percent", "")),  # Discount
+            os.getenv("XERO_SALES_ACCOUNT_CODE", "200"),  # AccountCode (required)
+            "OUTPUT",  # TaxType (required) - GST for sales
+            "",  # TrackingName1
+            "",  # TrackingOption1
+            "",  # TrackingName2
+            "",  # TrackingOption2
+            "AUD",  # Currency
+            ""   # BrandingTheme
+        ])
+    return rows
+
+async def drafted_invoices_csv_lines():
+    """Stream the drafted invoices (accounting transactions) CSV a batch of jobs at a time"""
+    import io
+    import csv
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(DRAFTED_INVOICES_CSV_HEADERS)
+    yield output.getvalue()
+    
+    transactions = db.orders.find(
+        {"current_stage": "accounting_transaction", "status": "accounting_draft"},
+        {"_id": 0, "client_id": 1, "client_name": 1, "invoice_id": 1, "order_number": 1, "items": 1, "total_amount": 1}
+    )
     try:
-        # Get all jobs in accounting transaction stage
-        transactions = await db.orders.find({
-            "current_stage": "accounting_transaction",
-            "status": "accounting_draft"
-        }).to_list(length=None)
-        
-        # Prepare CSV data
-        csv_data = []
-        
-        # CSV Headers based on Xero import format
-        headers = [
-            "ContactName", "EmailAddress", "POAddressLine1", "POAddressLine2", 
-            "POAddressLine3", "POAddressLine4", "POCity", "PORegion", 
-            "POPostalCode", "POCountry", "InvoiceNumber", "Reference", 
-            "InvoiceDate", "DueDate", "InventoryItemCode", "Description", 
-            "Quantity", "UnitAmount", "Discount", "AccountCode", "TaxType", 
-            "TrackingName1", "TrackingOption1", "TrackingName2", "TrackingOption2", 
-            "Currency", "BrandingTheme"
-        ]
-        
-        csv_data.append(headers)
-        
-        # Process each transaction
-        for transaction in transactions:
-            # Get client info
-            client = await db.clients.find_one({"id": transaction["client_id"]})
-            client_name = client["company_name"] if client else transaction.get("client_name", "Unknown Client")
-            client_email = client.get("email", "") if client else ""
-            
-            # Get invoice info
-            invoice = await db.invoices.find_one({"id": transaction.get("invoice_id")})
-            invoice_number = invoice["invoice_number"] if invoice else f"INV-{transaction['order_number']}"
-            invoice_date = invoice["created_at"].strftime("%d/%m/%Y") if invoice and invoice.get("created_at") else datetime.now().strftime("%d/%m/%Y")
-            
-            # Calculate due date (30 days from invoice date)
-            due_date_obj = invoice["created_at"] + timedelta(days=30) if invoice and invoice.get("created_at") else datetime.now() + timedelta(days=30)
-            due_date = due_date_obj.strftime("%d/%m/%Y")
-            
-            # Process each item in the transaction
-            items = transaction.get("items", [])
-            if not items:
-                # Create a single line if no items
-                items = [{"description": f"Services for Order {transaction['order_number']}", "quantity": 1, "unit_price": transaction.get("total_amount", 0)}]
-            
-            for item in items:
-                row = [
-                    client_name,  # ContactName (required)
-                    client_email,  # EmailAddress
-                    "",  # POAddressLine1
-                    "",  # POAddressLine2
-                    "",  # POAddressLine3
-                    "",  # POAddressLine4
-                    "",  # POCity
-                    "",  # PORegion
-                    "",  # POPostalCode
-                    "",  # POCountry
-                    invoice_number,  # InvoiceNumber (required)
-                    transaction["order_number"],  # Reference
-                    invoice_date,  # InvoiceDate (required)
-                    due_date,  # DueDate (required)
-                    item.get("product_code", ""),  # InventoryItemCode
-                    f"{item.get('product_name', item.get('description', 'Product'))} - {item.get('specifications', '')}".strip(" - "),  # Description (required)
-                    str(item.get("quantity", 1)),  # Quantity (required)
-                    str(item.get("unit_price", item.get("price", 0))),  # UnitAmount (required)
-                    str(item.get("discount_percent", "")),  # Discount
-                    os.getenv("XERO_SALES_ACCOUNT_CODE", "200"),  # AccountCode (required)
-                    "OUTPUT",  # TaxType (required) - GST for sales
-                    "",  # TrackingName1
-                    "",  # TrackingOption1
-                    "",  # TrackingName2
-                    "",  # TrackingOption2
-                    "AUD",  # Currency
-                    ""   # BrandingTheme
-                ]
-                csv_data.append(row)
-        
-        # Generate CSV content
-        import io
-        import csv
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerows(csv_data)
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Return CSV as response
-        from fastapi.responses import Response
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=drafted_invoices_{datetime.now().strftime('%Y%m%d')}.csv"}
-        )
-        
+        async for batch in iter_batches(transactions):
+            clients = await find_by_ids(db.clients, (t.get("client_id") for t in batch), {"_id": 0, "id": 1, "company_name": 1, "email": 1})
+            invoices = await find_by_ids(
+                db.invoices, (t.get("invoice_id") for t in batch), {"_id": 0, "id": 1, "invoice_number": 1, "created_at": 1}
+            )
+            output.seek(0)
+            output.truncate()
+            for transaction in batch:
+                writer.writerows(_drafted_invoice_rows(
+                    transaction, clients.get(transaction.get("client_id")), invoices.get(transaction.get("invoice_id"))
+                ))
+            yield output.getvalue()
     except Exception as e:
+        # Headers are already sent, so the download is cut short rather than turned into a 500
         logger.error(f"Failed to export drafted invoices CSV: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Failed to export CSV: {str(e)}")
+        raise
+
+def drafted_invoices_csv_response() -> StreamingResponse:
+    return StreamingResponse(
+        drafted_invoices_csv_lines(),
+        media_type="text/csv",
+        headers={"Content-Disposition": f"attachment; filename=drafted_invoices_{datetime.now().strftime('%Y%m%d')}.csv"}
+    )
+
+@api_router.get("/invoicing/export-drafted-csv")
+async def export_drafted_invoices_csv(current_user: dict = Depends(require_admin_or_manager)):
+    """Export all accounting transactions (drafted invoices) to CSV in Xero import format"""
+    return drafted_invoices_csv_response()
 
 # ============= ARCHIVED ORDERS ENDPOINTS =============
 
 @api_router.get("/clients/{client_id}/archived-orders")
 async def get_client_archived_orders(
     client_id: str,
+    response: Response,
     filters: ArchivedOrderFilter = Depends(),
+    page: PageParams = Depends(),
     current_user: dict = Depends(require_any_role)
 ):
-    """Get archived orders for a specific client with filtering"""
+    """Get archived orders for a specific client with filtering (paginated by archived_at)"""
     query = {"client_id": client_id}
     
     # Apply date filters
@@ -4145,15 +4343,82 @@ async def get_client_archived_orders(
             {"items.product_name": {"$regex": filters.search_query, "$options": "i"}}
         ]
     
-    archived_orders = await db.archived_orders.find(query).sort("archived_at", -1).to_list(length=None)
-    
-    # Remove MongoDB ObjectIds
-    for order in archived_orders:
-        if "_id" in order:
-            del order["_id"]
+    archived_orders, headers, projected = await find_page(db.archived_orders, query, page, sort_field="archived_at")
+    response.headers.update(headers)
     
     return StandardResponse(success=True, message="Archived orders retrieved", data=archived_orders)
 
+def _format_report_date(value) -> str:
+    return value.strftime("%Y-%m-%d") if value else ""
+
+# Fast report columns: selected field -> (column header, source fields, value for an archived order)
+FAST_REPORT_COLUMNS = {
+    ReportField.ORDER_NUMBER: ("Order Number", ["order_number"], lambda order: order.get("order_number", "")),
+    ReportField.CLIENT_NAME: ("Client Name", ["client_name"], lambda order: order.get("client_name", "")),
+    ReportField.PURCHASE_ORDER_NUMBER: ("Purchase Order Number", ["purchase_order_number"], lambda order: order.get("purchase_order_number", "")),
+    ReportField.ORDER_DATE: ("Order Date", ["created_at"], lambda order: _format_report_date(order.get("created_at"))),
+    ReportField.COMPLETION_DATE: ("Completion Date", ["completed_at"], lambda order: _format_report_date(order.get("completed_at"))),
+    ReportField.DUE_DATE: ("Due Date", ["due_date"], lambda order: _format_report_date(order.get("due_date"))),
+    ReportField.SUBTOTAL: ("Subtotal", ["subtotal"], lambda order: f"${order.get('subtotal', 0):.2f}"),
+    ReportField.GST: ("GST", ["gst"], lambda order: f"${order.get('gst', 0):.2f}"),
+    ReportField.TOTAL_AMOUNT: ("Total Amount", ["total_amount"], lambda order: f"${order.get('total_amount', 0):.2f}"),
+    ReportField.DELIVERY_ADDRESS: ("Delivery Address", ["delivery_address"], lambda order: order.get("delivery_address", "")),
+    ReportField.PRODUCT_NAMES: (
+        "Products", ["items.product_name"],
+        lambda order: ", ".join(item.get("product_name", "") for item in order.get("items", []))
+    ),
+    ReportField.PRODUCT_QUANTITIES: (
+        "Product Quantities", ["items.product_name", "items.quantity"],
+        lambda order: ", ".join(f"{item.get('product_name', '')}: {item.get('quantity', 0)}" for item in order.get("items", []))
+    ),
+    ReportField.NOTES: ("Notes", ["notes"], lambda order: order.get("notes", "")),
+    ReportField.RUNTIME_ESTIMATE: ("Runtime Estimate", ["runtime_estimate"], lambda order: order.get("runtime_estimate", "")),
+}
+
+# Widest a fast report column is auto-sized to, in characters
+FAST_REPORT_MAX_COLUMN_WIDTH = 50
+
+def _write_fast_report_workbook(path: str, headers: List[str], rows: List[tuple], widths: List[int], title: str, date_from: date, date_to: date):
+    """Write the archived orders fast report to path with a write-only workbook (runs on the job executor).
+
+    Rows are streamed straight into the sheet XML; column widths were already
+    measured while the rows were built, as they must precede the rows.
+    """
+    from openpyxl import Workbook
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font, Alignment
+    from openpyxl.utils import get_column_letter
+    
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Archived Orders Report")
+    
+    last_column = get_column_letter(len(headers))
+    for col_idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = min(width + 2, FAST_REPORT_MAX_COLUMN_WIDTH)
+    
+    def styled(value, **style):
+        cell = WriteOnlyCell(ws, value=value)
+        for name, setting in style.items():
+            setattr(cell, name, setting)
+        return cell
+    
+    # Title and date range span the report columns
+    ws.merged_cells.add(f"A1:{last_column}1")
+    ws.append([styled(title, font=Font(bold=True, size=16), alignment=Alignment(horizontal="center"))])
+    ws.merged_cells.add(f"A2:{last_column}2")
+    ws.append([styled(
+        f"Report Period: {date_from.strftime('%Y-%m-%d')} to {date_to.strftime('%Y-%m-%d')}",
+        alignment=Alignment(horizontal="center")
+    )])
+    ws.append([])
+    
+    # Column headers, then data
+    ws.append([styled(header, font=Font(bold=True), alignment=Alignment(horizontal="center")) for header in headers])
+    for row in rows:
+        ws.append(row)
+    
+    wb.save(path)
+
 @api_router.post("/clients/{client_id}/archived-orders/fast-report")
 async def generate_fast_report(
     client_id: str,
@@ -4161,13 +4426,6 @@ async def generate_fast_report(
     current_user: dict = Depends(require_any_role)
 ):
     """Generate Excel fast report for client archived orders"""
-    from openpyxl import Workbook
-    from openpyxl.styles import Font, Alignment, Border, Side
-    from openpyxl.utils.dataframe import dataframe_to_rows
-    from io import BytesIO
-    import pandas as pd
-    from fastapi.responses import StreamingResponse
-    
     # Calculate date range based on time period
     today = date.today()
     
@@ -4225,126 +4483,51 @@ async def generate_fast_report(
     if report_request.product_filter:
         query["items.product_name"] = {"$regex": report_request.product_filter, "$options": "i"}
     
-    # Get archived orders
-    archived_orders = await db.archived_orders.find(query).sort("archived_at", -1).to_list(length=None)
-    
-    if not archived_orders:
+    # Stream archived orders, building each report row and measuring column widths as we go
+    columns = [FAST_REPORT_COLUMNS[field] for field in dict.fromkeys(report_request.selected_fields)]
+    headers = [header for header, _, _ in columns]
+    widths = [len(header) for header in headers]
+    projection = {"_id": 0}
+    for _, source_fields, _ in columns:
+        projection.update({source_field: 1 for source_field in source_fields})
+    
+    rows = []
+    async for order in db.archived_orders.find(query, projection).sort("archived_at", -1):
+        row = tuple(value(order) for _, _, value in columns)
+        for col_idx, cell_value in enumerate(row):
+            if cell_value is not None and len(str(cell_value)) > widths[col_idx]:
+                widths[col_idx] = len(str(cell_value))
+        rows.append(row)
+    
+    if not rows:
         raise HTTPException(status_code=404, detail="No archived orders found for the specified criteria")
     
-    # Prepare data for Excel
-    excel_data = []
-    
-    for order in archived_orders:
-        row_data = {}
-        
-        # Map selected fields to Excel columns
-        for field in report_request.selected_fields:
-            if field == ReportField.ORDER_NUMBER:
-                row_data["Order Number"] = order.get("order_number", "")
-            elif field == ReportField.CLIENT_NAME:
-                row_data["Client Name"] = order.get("client_name", "")
-            elif field == ReportField.PURCHASE_ORDER_NUMBER:
-                row_data["Purchase Order Number"] = order.get("purchase_order_number", "")
-            elif field == ReportField.ORDER_DATE:
-                row_data["Order Date"] = order.get("created_at", "").strftime("%Y-%m-%d") if order.get("created_at") else ""
-            elif field == ReportField.COMPLETION_DATE:
-                row_data["Completion Date"] = order.get("completed_at", "").strftime("%Y-%m-%d") if order.get("completed_at") else ""
-            elif field == ReportField.DUE_DATE:
-                row_data["Due Date"] = order.get("due_date", "").strftime("%Y-%m-%d") if order.get("due_date") else ""
-            elif field == ReportField.SUBTOTAL:
-                row_data["Subtotal"] = f"${order.get('subtotal', 0):.2f}"
-            elif field == ReportField.GST:
-                row_data["GST"] = f"${order.get('gst', 0):.2f}"
-            elif field == ReportField.TOTAL_AMOUNT:
-                row_data["Total Amount"] = f"${order.get('total_amount', 0):.2f}"
-            elif field == ReportField.DELIVERY_ADDRESS:
-                row_data["Delivery Address"] = order.get("delivery_address", "")
-            elif field == ReportField.PRODUCT_NAMES:
-                products = [item.get("product_name", "") for item in order.get("items", [])]
-                row_data["Products"] = ", ".join(products)
-            elif field == ReportField.PRODUCT_QUANTITIES:
-                quantities = [f"{item.get('product_name', '')}: {item.get('quantity', 0)}" for item in order.get("items", [])]
-                row_data["Product Quantities"] = ", ".join(quantities)
-            elif field == ReportField.NOTES:
-                row_data["Notes"] = order.get("notes", "")
-            elif field == ReportField.RUNTIME_ESTIMATE:
-                row_data["Runtime Estimate"] = order.get("runtime_estimate", "")
-        
-        excel_data.append(row_data)
-    
-    # Create Excel workbook
-    df = pd.DataFrame(excel_data)
-    wb = Workbook()
-    ws = wb.active
-    
     # Set title
     title = report_request.report_title or f"Archived Orders Report - {report_request.time_period.value.replace('_', ' ').title()}"
-    ws.title = "Archived Orders Report"
-    
-    # Add header
-    ws.merge_cells("A1:{}1".format(chr(65 + len(df.columns) - 1)))
-    ws["A1"] = title
-    ws["A1"].font = Font(bold=True, size=16)
-    ws["A1"].alignment = Alignment(horizontal="center")
-    
-    # Add date range info
-    ws.merge_cells("A2:{}2".format(chr(65 + len(df.columns) - 1)))
-    ws["A2"] = f"Report Period: {date_from.strftime('%Y-%m-%d')} to {date_to.strftime('%Y-%m-%d')}"
-    ws["A2"].alignment = Alignment(horizontal="center")
-    
-    # Add column headers
-    for col, column_name in enumerate(df.columns, 1):
-        cell = ws.cell(row=4, column=col, value=column_name)
-        cell.font = Font(bold=True)
-        cell.alignment = Alignment(horizontal="center")
-    
-    # Add data
-    for row_idx, row_data in enumerate(excel_data, 5):
-        for col_idx, (column_name, value) in enumerate(row_data.items(), 1):
-            ws.cell(row=row_idx, column=col_idx, value=value)
-    
-    # Auto-adjust column widths
-    from openpyxl.utils import get_column_letter
-    for col_idx in range(1, len(df.columns) + 1):
-        max_length = 0
-        column_letter = get_column_letter(col_idx)
-        
-        # Check all cells in this column
-        for row_idx in range(4, ws.max_row + 1):  # Start from row 4 (after headers)
-            cell = ws.cell(row=row_idx, column=col_idx)
-            try:
-                if cell.value is not None:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-            except:
-                pass
-        
-        # Also check header length
-        header_cell = ws.cell(row=4, column=col_idx)
-        if header_cell.value is not None:
-            header_length = len(str(header_cell.value))
-            if header_length > max_length:
-                max_length = header_length
-        
-        adjusted_width = min(max_length + 2, 50)  # Cap at 50 characters
-        ws.column_dimensions[column_letter].width = adjusted_width
     
-    # Save to BytesIO
-    excel_file = BytesIO()
-    wb.save(excel_file)
-    excel_file.seek(0)
+    # Write the workbook to a temp file off the event loop; it is streamed from disk and removed afterwards
+    fd, report_path = tempfile.mkstemp(suffix=".xlsx")
+    os.close(fd)
+    try:
+        await job_executor.run_in_thread(
+            "excel", _write_fast_report_workbook, report_path, headers, rows, widths, title, date_from, date_to
+        )
+    except BaseException:
+        os.remove(report_path)
+        raise
     
     # Get client name for filename
-    client = await db.clients.find_one({"id": client_id})
+    client = await db.clients.find_one({"id": client_id}, {"_id": 0, "company_name": 1})
     client_name = client.get("company_name", "Client") if client else "Client"
     safe_client_name = "".join(c for c in client_name if c.isalnum() or c in (' ', '-', '_')).strip()
     
     filename = f"{safe_client_name}_Archived_Orders_{date_from.strftime('%Y%m%d')}-{date_to.strftime('%Y%m%d')}.xlsx"
     
-    return StreamingResponse(
-        BytesIO(excel_file.read()),
+    return FileResponse(
+        report_path,
         media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        headers={"Content-Disposition": f"attachment; filename={filename}"}
+        filename=filename,
+        background=BackgroundTask(os.remove, report_path)
     )
 
 # ============= FILE SERVING ENDPOINTS =============
@@ -5264,12 +5447,14 @@ async def get_material_usage_report(
         if material_id:
             query["product_id"] = material_id
         
-        # Get all relevant stock movements
-        movements = await db.stock_movements.find(query).to_list(length=None)
+        # Stream the relevant stock movements, grouping by material/product as they arrive
+        movements = db.stock_movements.find(
+            query,
+            {"_id": 0, "product_id": 1, "product_name": 1, "quantity": 1, "created_at": 1, "reference": 1, "movement_type": 1}
+        ).batch_size(REPORT_BATCH_SIZE)
         
-        # Group by material/product
         material_usage = {}
-        for movement in movements:
+        async for movement in movements:
             prod_id = movement.get("product_id", "unknown")
             if prod_id not in material_usage:
                 material_usage[prod_id] = {
@@ -5292,6 +5477,11 @@ async def get_material_usage_report(
         days_in_period = (datetime.fromisoformat(end_date.replace('Z', '+00:00')) - 
                          datetime.fromisoformat(start_date.replace('Z', '+00:00'))).days or 1
         
+        # Current stock levels for every material in the report, in two bulk lookups
+        stock_projection = {"_id": 0, "product_id": 1, "material_id": 1, "quantity_on_hand": 1}
+        substrate_stock = await find_by_ids(db.raw_substrate_stock, material_usage.keys(), stock_projection, key="product_id")
+        material_stock = await find_by_ids(db.raw_material_stock, material_usage.keys(), stock_projection, key="material_id")
+        
         projections = []
         for prod_id, data in material_usage.items():
             daily_usage = data["total_used"] / days_in_period
@@ -5299,8 +5489,7 @@ async def get_material_usage_report(
             projected_quarterly = daily_usage * 90
             
             # Get current stock level
-            stock = await db.raw_substrate_stock.find_one({"product_id": prod_id}) or \
-                   await db.raw_material_stock.find_one({"material_id": prod_id})
+            stock = substrate_stock.get(prod_id) or material_stock.get(prod_id)
             
             current_stock = stock.get("quantity_on_hand", 0) if stock else 0
             days_until_depleted = (current_stock / daily_usage) if daily_usage > 0 else 999
@@ -5945,16 +6134,21 @@ async def get_detailed_product_usage_report(
 
 
 @api_router.get("/stock/reports/projected-order-analysis", response_model=StandardResponse)
+@job_executor.limited("report")
 async def get_projected_order_analysis(
     client_id: Optional[str] = None,
     start_date: str = None,
     end_date: str = None,
+    include_orders: bool = False,
     current_user: dict = Depends(require_any_role)
 ):
     """
     Generate projected order analysis based on historical data.
     Shows projections for 3, 6, 9, and 12 months with product-level detail
     and raw material requirements.
+    
+    Demand is read from the daily product rollups, so whole days are
+    counted; the orders themselves are only listed when include_orders is set.
     """
     try:
         # Handle default dates if not provided
@@ -5968,454 +6162,15 @@ async def get_projected_order_analysis(
         end = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
         days_in_period = (end - start).days or 1
         
-        # Build query for orders in the date range
-        # Include all orders except cancelled/deleted to capture orders on hand
-        # FIX: MongoDB stores dates as datetime objects, not strings
-        # Use datetime objects for comparison instead of strings
-        start_dt = start.replace(tzinfo=None)
-        end_dt = end.replace(tzinfo=None)
-            
-        order_query = {
-            "created_at": {"$gte": start_dt, "$lte": end_dt}
-        }
-        
-        # Exclude cancelled/deleted orders if such status exists
-        if await db.orders.find_one({"status": "cancelled"}):
-            order_query["status"] = {"$ne": "cancelled"}
-        
-        if client_id:
-            order_query["client_id"] = client_id
-        
-        orders = await db.orders.find(order_query).to_list(length=None)
-        
-        # Track product usage with details
-        product_analysis = {}  # {product_id: {usage_data, client_info, product_specs}}
-        
-        for order in orders:
-            order_items = order.get("items", [])
-            
-            for item in order_items:
-                product_id = item.get("product_id")
-                if not product_id:
-                    continue
-                
-                logger.info(f"Order {order.get('order_number')}: found product_id {product_id} ({item.get('product_name')})")
-                
-                # Get product details
-                product = await db.client_products.find_one({"id": product_id})
-                if not product:
-                    continue
-                
-                quantity = item.get("quantity", 0)
-                if quantity <= 0:
-                    continue
-                
-                # Initialize product entry if not exists
-                if product_id not in product_analysis:
-                    product_analysis[product_id] = {
-                        "product_info": {
-                            "product_id": product_id,
-                            "product_description": product.get("product_description", "Unknown"),
-                            "product_code": product.get("product_code", "N/A"),
-                            "product_type": product.get("product_type", "Unknown"),
-                            "client_id": product.get("client_id"),
-                            "client_name": order.get("client_name", "Unknown"),
-                            "width": product.get("width", 0),
-                            "length": product.get("length", 0),
-                            "unit_of_measure": product.get("unit_of_measure", "units")
-                        },
-                        "historical_orders": [],
-                        "total_quantity": 0,
-                        "order_count": 0,
-                        "materials_composition": product.get("materials_composition", [])
-                    }
-                
-                # Track order
-                product_analysis[product_id]["historical_orders"].append({
-                    "order_number": order.get("order_number"),
-                    "order_date": order.get("created_at"),
-                    "quantity": quantity,
-                    "client_name": order.get("client_name")
-                })
-                
-                product_analysis[product_id]["total_quantity"] += quantity
-                product_analysis[product_id]["order_count"] += 1
-        
-        # Calculate projections and material requirements
-        products_list = []
-        
-        logger.info(f"Processing {len(product_analysis)} products for projections")
+        products_list = await projected_order_analysis(db, start, end, client_id)
         
-        for product_id, data in product_analysis.items():
-            logger.info(f"Analyzing product_id: {product_id} from product_analysis")
-            
-            # Calculate average usage per day
-            avg_per_day = data["total_quantity"] / days_in_period
-            
-            # Project for 3, 6, 9, and 12 months
-            projections = {
-                "3_months": round(avg_per_day * 90, 2),
-                "6_months": round(avg_per_day * 180, 2),
-                "9_months": round(avg_per_day * 270, 2),
-                "12_months": round(avg_per_day * 365, 2)
-            }
-            
-            # Calculate material requirements for projections
-            # Get product details including material_layers
-            product = await db.client_products.find_one({"id": product_id})
-            material_layers = product.get("material_layers", []) if product else []
-            
-            # Debug logging
-            logger.info(f"Product {product_id}: has {len(material_layers)} material layers")
-            if product:
-                logger.info(f"Product type: {product.get('product_type')}, width: {product.get('width')}, length: {product.get('length')}")
-            
-            material_requirements = {}
-            
-            if material_layers and len(material_layers) > 0:
-                # Check if this is a core-based product (paper cores) or flat product
-                is_core_product = product.get("product_type") == "paper_cores"
-                
-                if is_core_product:
-                    # Spiral-wound paper core calculation using cylinder shell formula
-                    try:
-                        # Get core specifications in mm
-                        core_id_mm = float(product.get("core_id") or 76)  # Inner diameter in mm
-                        core_length_mm = float(product.get("core_width") or product.get("width") or 1200)  # Core length in mm
-                        wall_thickness_mm = float(product.get("core_thickness") or 3)  # Wall thickness in mm
-                        
-                        # Convert to meters
-                        core_id_m = core_id_mm / 1000
-                        core_length_m = core_length_mm / 1000
-                        wall_thickness_m = wall_thickness_mm / 1000
-                        
-                        # Calculate inner radius
-                        inner_radius_m = core_id_m / 2
-                        
-                    except (TypeError, ValueError):
-                        # If conversion fails, use defaults
-                        core_id_mm = 76
-                        core_length_mm = 1200
-                        wall_thickness_mm = 3
-                        core_id_m = 0.076
-                        core_length_m = 1.2
-                        wall_thickness_m = 0.003
-                        inner_radius_m = 0.038
-                    
-                    for period, projected_qty in projections.items():
-                        material_requirements[period] = []
-                        
-                        # Track current radius position as we build layers
-                        current_inner_radius = inner_radius_m
-                        total_paper_mass_kg = 0
-                        total_paper_area_m2 = 0
-                        total_strip_length_m = 0
-                        total_cost = 0
-                        
-                        # Process each material layer
-                        for layer_index, layer in enumerate(material_layers):
-                            try:
-                                material_id = layer.get("material_id")
-                                thickness_mm = float(layer.get("thickness") or 0)  # Thickness per single layer in mm
-                                num_layers = int(layer.get("quantity") or 1)  # How many layers of this material
-                                layer_width_mm = float(layer.get("width") or 0)  # Width in mm (if material is cut into strips)
-                            except (TypeError, ValueError) as e:
-                                logger.error(f"Error parsing layer fields: {e}, layer: {layer}")
-                                continue
-                            
-                            if thickness_mm <= 0 or num_layers <= 0:
-                                continue
-                            
-                            # Convert to meters
-                            thickness_m = thickness_mm / 1000
-                            layer_width_m = layer_width_mm / 1000 if layer_width_mm > 0 else None
-                            
-                            # Calculate total thickness for this material stream
-                            total_stream_thickness_m = thickness_m * num_layers
-                            
-                            # Calculate inner and outer radius for this material stream
-                            stream_inner_radius = current_inner_radius
-                            stream_outer_radius = current_inner_radius + total_stream_thickness_m
-                            
-                            # Calculate volume using cylinder shell formula
-                            # Volume = π × core_length × (outer_radius² - inner_radius²)
-                            volume_m3 = 3.14159 * core_length_m * (
-                                (stream_outer_radius ** 2) - (stream_inner_radius ** 2)
-                            )
-                            
-                            # Get material information and GSM from database
-                            material_name = layer.get("material_name", "Unknown")
-                            layer_type = layer.get("layer_type", f"Layer {layer_index + 1}")
-                            gsm = 0  # Initialize GSM
-                            material_cost = 0
-                            cost_per_meter = 0
-                            price_per_tonne = 0
-                            linear_metres_per_tonne = 0
-                            
-                            if material_id:
-                                material = await db.materials.find_one({"id": material_id})
-                                if material:
-                                    material_name = material.get("material_description", material.get("supplier", material_name))
-                                    price_per_tonne = float(material.get("price", 0))
-                                    
-                                    # Get GSM from material database (it's stored as string, so convert to float)
-                                    gsm_str = material.get("gsm", "0")
-                                    try:
-                                        gsm = float(gsm_str) if gsm_str else 0
-                                    except (ValueError, TypeError):
-                                        gsm = 0
-                                    
-                                    # Calculate cost per linear metre using the correct formula
-                                    # Formula: Convert 1 tonne (1,000 kg = 1,000,000 grams) to linear metres
-                                    # linear_metres_per_tonne = 1,000,000 / (GSM × width_metres)
-                                    if gsm > 0 and layer_width_m and layer_width_m > 0:
-                                        # 1 tonne = 1,000,000 grams
-                                        # linear metres per tonne = 1,000,000 grams / (GSM × width_metres)
-                                        linear_metres_per_tonne = 1000000 / (gsm * layer_width_m)
-                                        # price per metre = price per tonne / linear metres per tonne
-                                        cost_per_meter = price_per_tonne / linear_metres_per_tonne
-                                    else:
-                                        # Fallback: if GSM or width not available, use price directly
-                                        cost_per_meter = price_per_tonne
-                            
-                            # Calculate density from GSM and thickness
-                            # density = GSM ÷ thickness(mm) gives kg/m³
-                            if thickness_mm > 0 and gsm > 0:
-                                density_kg_m3 = gsm / thickness_mm
-                            else:
-                                density_kg_m3 = 0
-                            
-                            # Calculate mass: mass = volume × density
-                            stream_mass_kg = volume_m3 * density_kg_m3
-                            
-                            # Calculate surface area: area = volume ÷ thickness
-                            if total_stream_thickness_m > 0:
-                                stream_area_m2 = volume_m3 / total_stream_thickness_m
-                            else:
-                                stream_area_m2 = 0
-                            
-                            # Calculate strip length if layer width is provided
-                            if layer_width_m and layer_width_m > 0:
-                                stream_strip_length_m = stream_area_m2 / layer_width_m
-                            else:
-                                stream_strip_length_m = 0
-                            
-                            # Calculate total for projected quantity
-                            total_mass_kg = stream_mass_kg * projected_qty
-                            total_area_m2 = stream_area_m2 * projected_qty
-                            total_length_m = stream_strip_length_m * projected_qty
-                            
-                            # Cost calculation: use strip length (linear metres) - moved here after strip length is calculated
-                            if stream_strip_length_m > 0:
-                                # Material cost = linear metres × cost per metre × projected quantity
-                                material_cost = stream_strip_length_m * cost_per_meter * projected_qty
-                            else:
-                                # Fallback to area-based calculation if strip length unavailable
-                                material_cost = stream_area_m2 * cost_per_meter
-                            
-                            # Add to totals
-                            total_paper_mass_kg += total_mass_kg
-                            total_paper_area_m2 += total_area_m2
-                            if stream_strip_length_m > 0:
-                                total_strip_length_m += total_length_m
-                            total_cost += material_cost
-                            
-                            material_requirements[period].append({
-                                "layer_order": layer_index + 1,
-                                "layer_type": layer_type,
-                                "material_id": material_id,
-                                "material_name": material_name,
-                                "width_mm": layer_width_mm,
-                                "thickness_mm": thickness_mm,
-                                "gsm": gsm,
-                                "num_layers": num_layers,
-                                "stream_inner_radius_mm": round(stream_inner_radius * 1000, 2),
-                                "stream_outer_radius_mm": round(stream_outer_radius * 1000, 2),
-                                "volume_m3_per_core": round(volume_m3, 6),
-                                "density_kg_m3": round(density_kg_m3, 2),
-                                "mass_kg_per_core": round(stream_mass_kg, 4),
-                                "area_m2_per_core": round(stream_area_m2, 4),
-                                "strip_length_m_per_core": round(stream_strip_length_m, 2) if stream_strip_length_m > 0 else None,
-                                "total_mass_kg": round(total_mass_kg, 2),
-                                "total_area_m2": round(total_area_m2, 2),
-                                "total_strip_length_m": round(total_length_m, 2) if stream_strip_length_m > 0 else None,
-                                "meters_per_core": round(stream_strip_length_m, 2) if stream_strip_length_m > 0 else round(stream_area_m2, 2),
-                                "total_meters_needed": round(total_length_m, 2) if stream_strip_length_m > 0 else round(total_area_m2, 2),
-                                # New cost calculation fields
-                                "price_per_tonne": round(price_per_tonne, 2),
-                                "linear_metres_per_tonne": round(linear_metres_per_tonne, 2) if linear_metres_per_tonne > 0 else None,
-                                "cost_per_meter": round(cost_per_meter, 4),
-                                "cost_per_core": round(stream_strip_length_m * cost_per_meter, 4) if stream_strip_length_m > 0 else round(stream_area_m2 * cost_per_meter, 4),
-                                "total_cost": round(material_cost, 2)
-                            })
-                            
-                            # Update current radius for next layer
-                            current_inner_radius = stream_outer_radius
-                        
-                        # Calculate outer diameter
-                        outer_diameter_mm = core_id_mm + (2 * wall_thickness_mm)
-                        
-                        # Calculate cost per core and per metre
-                        cost_per_core = total_cost / projected_qty if projected_qty > 0 else 0
-                        # Cost per metre of finished core (assuming core_length_m is the length of one core)
-                        cost_per_metre_of_core = cost_per_core / core_length_m if core_length_m > 0 else 0
-                        
-                        # Add summary totals
-                        if material_requirements[period]:
-                            material_requirements[period].append({
-                                "is_total": True,
-                                "outer_diameter_mm": round(outer_diameter_mm, 2),
-                                "core_length_m": round(core_length_m, 3),
-                                "total_paper_mass_kg": round(total_paper_mass_kg, 2),
-                                "total_paper_area_m2": round(total_paper_area_m2, 2),
-                                "total_strip_length_m": round(total_strip_length_m, 2) if total_strip_length_m > 0 else None,
-                                "total_meters_all_layers": round(total_strip_length_m, 2) if total_strip_length_m > 0 else round(total_paper_area_m2, 2),
-                                "total_cost": round(total_cost, 2),
-                                "cost_per_core": round(cost_per_core, 4),
-                                "cost_per_metre_of_core": round(cost_per_metre_of_core, 4),
-                                "projected_quantity": int(projected_qty)
-                            })
-                else:
-                    # Simpler calculation for flat products (labels, films, tapes)
-                    try:
-                        product_width = float(product.get("width") or 0) / 1000  # Convert mm to meters
-                        product_length = float(product.get("length") or 0)  # Already in meters
-                    except (TypeError, ValueError):
-                        product_width = 1.0  # Default 1 meter
-                        product_length = 100  # Default 100 meters
-                    
-                    for period, projected_qty in projections.items():
-                        material_requirements[period] = []
-                        total_meters_all_layers = 0
-                        
-                        for layer_index, layer in enumerate(material_layers):
-                            try:
-                                material_id = layer.get("material_id")
-                                thickness = float(layer.get("thickness") or 0)  # mm
-                                width = float(layer.get("width") or (product_width * 1000))  # mm
-                                quantity_per_unit = int(layer.get("quantity") or 1)
-                            except (TypeError, ValueError) as e:
-                                logger.error(f"Error parsing flat product layer fields: {e}, layer: {layer}")
-                                continue
-                            
-                            # For flat products: meters needed = product length × quantity per unit × projected qty
-                            meters_per_unit = product_length * quantity_per_unit
-                            total_meters = meters_per_unit * projected_qty
-                            total_meters_all_layers += total_meters
-                            
-                            material_name = layer.get("material_name", "Unknown")
-                            layer_type = layer.get("layer_type", f"Layer {layer_index + 1}")
-                            gsm = layer.get("gsm", 0)
-                            
-                            # Calculate material cost
-                            material_cost = 0
-                            cost_per_meter = 0
-                            
-                            if material_id:
-                                material = await db.materials.find_one({"id": material_id})
-                                if material:
-                                    material_name = material.get("material_description", material.get("supplier", material_name))
-                                    # Get cost per unit (usually per meter)
-                                    cost_per_unit = float(material.get("cost_per_unit", 0))
-                                    cost_per_meter = cost_per_unit
-                                    material_cost = total_meters * cost_per_meter
-                            
-                            material_requirements[period].append({
-                                "layer_order": layer_index + 1,
-                                "layer_type": layer_type,
-                                "material_id": material_id,
-                                "material_name": material_name,
-                                "width_mm": width,
-                                "thickness_mm": thickness,
-                                "gsm": gsm,
-                                "laps_per_core": quantity_per_unit,
-                                "meters_per_core": round(meters_per_unit, 2),
-                                "total_meters_needed": round(total_meters, 2),
-                                "cost_per_meter": round(cost_per_meter, 4),
-                                "total_cost": round(material_cost, 2)
-                            })
-                        
-                        if material_requirements[period]:
-                            material_requirements[period].append({
-                                "is_total": True,
-                                "total_meters_all_layers": round(total_meters_all_layers, 2)
-                            })
-            
-            # Calculate customer breakdown for projections
-            customer_breakdown = {}
-            total_qty = data["total_quantity"]
-            
-            for order in data["historical_orders"]:
-                client_name = order.get("client_name", "Unknown")
-                qty = order.get("quantity", 0)
-                
-                if client_name not in customer_breakdown:
-                    customer_breakdown[client_name] = {
-                        "total_quantity": 0,
-                        "order_count": 0,
-                        "percentage": 0
-                    }
-                
-                customer_breakdown[client_name]["total_quantity"] += qty
-                customer_breakdown[client_name]["order_count"] += 1
-            
-            # Calculate percentages and project per customer
-            customer_projections = {}
-            for client_name, client_data in customer_breakdown.items():
-                percentage = (client_data["total_quantity"] / total_qty * 100) if total_qty > 0 else 0
-                customer_breakdown[client_name]["percentage"] = round(percentage, 1)
-                
-                # Project quantities for each period based on historical percentage
-                customer_projections[client_name] = {
-                    "3_months": round(projections["3_months"] * percentage / 100, 2),
-                    "6_months": round(projections["6_months"] * percentage / 100, 2),
-                    "9_months": round(projections["9_months"] * percentage / 100, 2),
-                    "12_months": round(projections["12_months"] * percentage / 100, 2),
-                    "percentage": round(percentage, 1),
-                    "historical_total": client_data["total_quantity"],
-                    "order_count": client_data["order_count"]
-                }
-            
-            products_list.append({
-                "product_info": data["product_info"],
-                "historical_data": {
-                    "total_quantity": data["total_quantity"],
-                    "order_count": data["order_count"],
-                    "total_orders": data["order_count"],  # Alias for frontend compatibility
-                    "average_per_day": round(avg_per_day, 2),
-                    "average_per_month": round(avg_per_day * 30, 2),
-                    "avg_monthly_orders": round(avg_per_day * 30, 2),  # Alias for frontend compatibility
-                    "orders": data["historical_orders"]
-                },
-                "projections": projections,
-                "material_requirements": material_requirements,
-                "customer_breakdown": customer_breakdown,
-                "customer_projections": customer_projections
-            })
-        
-        # Sort by total quantity (most used first)
-        products_list.sort(key=lambda x: x["historical_data"]["total_quantity"], reverse=True)
-        
-        # Calculate period-based summaries for frontend including material costs
-        period_summaries = {}
-        for period in ["3_months", "6_months", "9_months", "12_months"]:
-            total_projected_orders = sum(
-                p["projections"][period] for p in products_list
+        if include_orders:
+            orders_by_product = await historical_orders(
+                db, start.replace(tzinfo=None), end.replace(tzinfo=None), client_id,
+                (product["product_info"]["product_id"] for product in products_list)
             )
-            
-            # Calculate total material cost across all products
-            total_material_cost = 0
             for product in products_list:
-                mat_reqs = product.get("material_requirements", {}).get(period, [])
-                for mat in mat_reqs:
-                    if not mat.get("is_total"):  # Skip total rows
-                        total_material_cost += mat.get("total_cost", 0)
-            
-            period_summaries[period] = {
-                "total_projected_orders": round(total_projected_orders, 2),
-                "total_projected_material_cost": round(total_material_cost, 2),
-                "products_analyzed": len(products_list)
-            }
+                product["historical_data"]["orders"] = orders_by_product[product["product_info"]["product_id"]]
         
         report_data = {
             "report_period": {
@@ -6426,7 +6181,7 @@ async def get_projected_order_analysis(
             "client_filter": client_id,
             "products": products_list,
             "total_products": len(products_list),
-            "summary": period_summaries  # Period-based summaries
+            "summary": period_summaries(products_list)  # Period-based summaries
         }
         
         return StandardResponse(
@@ -6447,6 +6202,7 @@ async def get_projected_order_analysis(
 
 
 @api_router.get("/stock/reports/job-card-performance", response_model=StandardResponse)
+@job_executor.limited("report")
 async def get_job_card_performance_report(
     start_date: str = None,
     end_date: str = None,
@@ -6478,281 +6234,54 @@ async def get_job_card_performance_report(
             "status": {"$in": ["completed", "archived"]}
         }
         
-        completed_orders = await db.orders.find(order_query).to_list(length=None)
-        
-        job_cards = []
-        total_time_hours = 0
-        total_stock_entries = 0
-        total_stock_quantity = 0
-        total_material_used_kg = 0
-        total_material_excess_kg = 0
-        jobs_on_time = 0
-        jobs_delayed = 0
-        
-        # Collect data for breakdowns
-        job_type_metrics = {}  # product_type -> metrics
-        client_metrics = {}  # client_id -> metrics
-        
-        for order in completed_orders:
-            order_id = order.get("id")
-            order_number = order.get("order_number", "Unknown")
-            client_id = order.get("client_id", "unknown")
-            client_name = order.get("client_name", "Unknown")
-            due_date = order.get("due_date")
-            completed_at = order.get("completed_at")
-            
-            # Calculate if on time
-            is_on_time = False
-            if due_date and completed_at:
-                if isinstance(due_date, str):
-                    due_date = datetime.fromisoformat(due_date.replace('Z', '+00:00'))
-                if isinstance(completed_at, str):
-                    completed_at = datetime.fromisoformat(completed_at.replace('Z', '+00:00'))
-                is_on_time = completed_at <= due_date
-            
-            if is_on_time:
-                jobs_on_time += 1
-            else:
-                jobs_delayed += 1
-            
-            # Get production logs for this order to calculate time spent
-            production_logs = await db.production_logs.find({
-                "order_id": order_id
-            }).sort("timestamp", 1).to_list(length=None)
-            
-            # Calculate time in each stage
-            time_by_stage = {}
-            stage_start_times = {}
-            
-            for log in production_logs:
-                timestamp = log.get("timestamp")
-                
-                if isinstance(timestamp, str):
-                    timestamp = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                
-                from_stage = log.get("from_stage")
-                to_stage = log.get("to_stage")
-                
-                # Mark end of previous stage
-                if from_stage and from_stage in stage_start_times:
-                    start_time = stage_start_times[from_stage]
-                    duration = (timestamp - start_time).total_seconds() / 3600  # hours
-                    time_by_stage[from_stage] = time_by_stage.get(from_stage, 0) + duration
-                    del stage_start_times[from_stage]
-                
-                # Mark start of new stage
-                if to_stage:
-                    stage_start_times[to_stage] = timestamp
-            
-            # Calculate total time for this job
-            total_job_time = sum(time_by_stage.values())
-            
-            # Get material consumption for this order from stock_movements
-            material_movements = await db.stock_movements.find({
-                "reference_id": order_id,
-                "reference_type": "order",
-                "movement_type": "consumption"
-            }).to_list(length=None)
-            
-            total_material_used = 0
-            material_details = []
-            
-            for movement in material_movements:
-                quantity = abs(movement.get("quantity_change", 0))  # Make positive
-                total_material_used += quantity
-                material_details.append({
-                    "stock_id": movement.get("stock_id"),
-                    "stock_type": movement.get("stock_type", "unknown"),
-                    "quantity": quantity,
-                    "notes": movement.get("notes", "")
-                })
-            
-            # Calculate expected material usage based on product specifications
-            order_items = order.get("items", [])
-            total_ordered_qty = sum(item.get("quantity", 0) for item in order_items)
-            expected_material = 0
-            product_types = []
-            
-            for item in order_items:
-                product_id = item.get("product_id")
-                quantity = item.get("quantity", 0)
-                
-                # Try to get product specifications
-                product_spec = await db.client_products.find_one({"id": product_id})
-                if product_spec:
-                    product_type = product_spec.get("product_type", "Unknown")
-                    if product_type not in product_types:
-                        product_types.append(product_type)
-                    
-                    # Try to calculate expected material from material_layers
-                    material_layers = product_spec.get("material_layers", [])
-                    for layer in material_layers:
-                        layer_quantity = layer.get("quantity", 0)
-                        expected_material += layer_quantity * quantity
-            
-            # Calculate excess material (wastage)
-            material_excess = max(0, total_material_used - expected_material) if expected_material > 0 else 0
-            waste_percentage = (material_excess / total_material_used * 100) if total_material_used > 0 else 0
-            
-            # Get stock entries for this order (finished goods entered into inventory)
-            stock_entries = await db.raw_substrate_stock.find({
-                "source_order_id": order_id
-            }).to_list(length=None)
-            
-            stock_summary = []
-            job_stock_quantity = 0
-            
-            for stock in stock_entries:
-                qty = stock.get("quantity_on_hand", 0)
-                job_stock_quantity += qty
-                stock_summary.append({
-                    "product_description": stock.get("product_description", "Unknown"),
-                    "quantity": qty,
-                    "unit_of_measure": stock.get("unit_of_measure", "units"),
-                    "created_at": stock.get("created_at")
-                })
-            
-            # Build job card data
-            job_card_data = {
-                "order_number": order_number,
-                "order_id": order_id,
-                "client_id": client_id,
-                "client_name": client_name,
-                "product_types": product_types,
-                "created_at": order.get("created_at"),
-                "due_date": order.get("due_date"),
-                "completed_at": order.get("completed_at"),
-                "is_on_time": is_on_time,
-                "total_time_hours": round(total_job_time, 2),
-                "time_by_stage": {k: round(v, 2) for k, v in time_by_stage.items()},
-                "material_used_kg": round(total_material_used, 2),
-                "expected_material_kg": round(expected_material, 2),
-                "material_excess_kg": round(material_excess, 2),
-                "waste_percentage": round(waste_percentage, 2),
-                "material_details": material_details,
-                "stock_entries": stock_summary,
-                "total_stock_produced": job_stock_quantity,
-                "ordered_quantity": total_ordered_qty,
-                "stock_entry_count": len(stock_summary)
-            }
-            
-            job_cards.append(job_card_data)
-            
-            # Update totals
-            total_time_hours += total_job_time
-            total_stock_entries += len(stock_summary)
-            total_stock_quantity += job_stock_quantity
-            total_material_used_kg += total_material_used
-            total_material_excess_kg += material_excess
-            
-            # Update job type breakdown
-            for product_type in product_types:
-                if product_type not in job_type_metrics:
-                    job_type_metrics[product_type] = {
-                        "job_count": 0,
-                        "total_time_hours": 0,
-                        "total_material_used": 0,
-                        "total_excess": 0,
-                        "jobs_on_time": 0,
-                        "jobs_delayed": 0
-                    }
-                
-                job_type_metrics[product_type]["job_count"] += 1
-                job_type_metrics[product_type]["total_time_hours"] += total_job_time
-                job_type_metrics[product_type]["total_material_used"] += total_material_used
-                job_type_metrics[product_type]["total_excess"] += material_excess
-                if is_on_time:
-                    job_type_metrics[product_type]["jobs_on_time"] += 1
-                else:
-                    job_type_metrics[product_type]["jobs_delayed"] += 1
-            
-            # Update client performance metrics
-            if client_id not in client_metrics:
-                client_metrics[client_id] = {
-                    "client_name": client_name,
-                    "job_count": 0,
-                    "total_time_hours": 0,
-                    "total_material_used": 0,
-                    "total_excess": 0,
-                    "jobs_on_time": 0,
-                    "jobs_delayed": 0
-                }
-            
-            client_metrics[client_id]["job_count"] += 1
-            client_metrics[client_id]["total_time_hours"] += total_job_time
-            client_metrics[client_id]["total_material_used"] += total_material_used
-            client_metrics[client_id]["total_excess"] += material_excess
-            if is_on_time:
-                client_metrics[client_id]["jobs_on_time"] += 1
-            else:
-                client_metrics[client_id]["jobs_delayed"] += 1
-        
-        # Calculate averages and efficiency metrics
-        job_count = len(job_cards)
-        efficiency_score = (jobs_on_time / job_count * 100) if job_count > 0 else 0
-        overall_waste_percentage = (total_material_excess_kg / total_material_used_kg * 100) if total_material_used_kg > 0 else 0
-        
-        averages = {
-            "average_time_per_job_hours": round(total_time_hours / job_count, 2) if job_count > 0 else 0,
-            "average_stock_entries_per_job": round(total_stock_entries / job_count, 2) if job_count > 0 else 0,
-            "average_stock_quantity_per_job": round(total_stock_quantity / job_count, 2) if job_count > 0 else 0,
-            "average_material_used_per_job_kg": round(total_material_used_kg / job_count, 2) if job_count > 0 else 0,
-            "average_waste_per_job_kg": round(total_material_excess_kg / job_count, 2) if job_count > 0 else 0,
-            "total_jobs_completed": job_count,
-            "jobs_on_time": jobs_on_time,
-            "jobs_delayed": jobs_delayed,
-            "efficiency_score_percentage": round(efficiency_score, 2),
-            "total_time_all_jobs_hours": round(total_time_hours, 2),
-            "total_stock_produced": total_stock_quantity,
-            "total_material_used_kg": round(total_material_used_kg, 2),
-            "total_material_excess_kg": round(total_material_excess_kg, 2),
-            "overall_waste_percentage": round(overall_waste_percentage, 2)
-        }
+        completed_orders = db.orders.find(
+            order_query,
+            {"_id": 0, "id": 1, "order_number": 1, "client_id": 1, "client_name": 1, "due_date": 1,
+             "completed_at": 1, "created_at": 1, "items.product_id": 1, "items.quantity": 1}
+        )
         
-        # Format job type breakdown
-        job_type_breakdown = []
-        for product_type, metrics in job_type_metrics.items():
-            efficiency = (metrics["jobs_on_time"] / metrics["job_count"] * 100) if metrics["job_count"] > 0 else 0
-            waste_pct = (metrics["total_excess"] / metrics["total_material_used"] * 100) if metrics["total_material_used"] > 0 else 0
-            
-            job_type_breakdown.append({
-                "product_type": product_type,
-                "job_count": metrics["job_count"],
-                "total_time_hours": round(metrics["total_time_hours"], 2),
-                "average_time_per_job": round(metrics["total_time_hours"] / metrics["job_count"], 2),
-                "total_material_used_kg": round(metrics["total_material_used"], 2),
-                "total_excess_kg": round(metrics["total_excess"], 2),
-                "waste_percentage": round(waste_pct, 2),
-                "jobs_on_time": metrics["jobs_on_time"],
-                "jobs_delayed": metrics["jobs_delayed"],
-                "efficiency_percentage": round(efficiency, 2)
-            })
+        # Each batch is worked through in the process pool while the next is
+        # read, so only one batch and its lookups are held at a time
+        metrics = empty_job_card_metrics()
+        pending = None
         
-        # Format client performance
-        client_performance = []
-        for client_id, metrics in client_metrics.items():
-            efficiency = (metrics["jobs_on_time"] / metrics["job_count"] * 100) if metrics["job_count"] > 0 else 0
-            waste_pct = (metrics["total_excess"] / metrics["total_material_used"] * 100) if metrics["total_material_used"] > 0 else 0
+        try:
+            async for batch in iter_batches(completed_orders):
+                # Logs, consumption, product specs and stock entries for the whole batch in four queries
+                batch_order_ids = [order.get("id") for order in batch]
+                logs_by_order = await group_by_key(
+                    db.production_logs, {"order_id": {"$in": batch_order_ids}}, "order_id",
+                    {"_id": 0, "order_id": 1, "timestamp": 1, "from_stage": 1, "to_stage": 1},
+                    sort=[("timestamp", 1)]
+                )
+                movements_by_order = await group_by_key(
+                    db.stock_movements,
+                    {"reference_id": {"$in": batch_order_ids}, "reference_type": "order", "movement_type": "consumption"},
+                    "reference_id",
+                    {"_id": 0, "reference_id": 1, "quantity_change": 1, "stock_id": 1, "stock_type": 1, "notes": 1}
+                )
+                products = await find_by_ids(
+                    db.client_products,
+                    (item.get("product_id") for order in batch for item in order.get("items", [])),
+                    {"_id": 0, "id": 1, "product_type": 1, "material_layers": 1}
+                )
+                stock_by_order = await group_by_key(
+                    db.raw_substrate_stock, {"source_order_id": {"$in": batch_order_ids}}, "source_order_id",
+                    {"_id": 0, "source_order_id": 1, "quantity_on_hand": 1, "product_description": 1, "unit_of_measure": 1, "created_at": 1}
+                )
             
-            client_performance.append({
-                "client_id": client_id,
-                "client_name": metrics["client_name"],
-                "job_count": metrics["job_count"],
-                "total_time_hours": round(metrics["total_time_hours"], 2),
-                "average_time_per_job": round(metrics["total_time_hours"] / metrics["job_count"], 2),
-                "total_material_used_kg": round(metrics["total_material_used"], 2),
-                "total_excess_kg": round(metrics["total_excess"], 2),
-                "waste_percentage": round(waste_pct, 2),
-                "jobs_on_time": metrics["jobs_on_time"],
-                "jobs_delayed": metrics["jobs_delayed"],
-                "efficiency_percentage": round(efficiency, 2)
-            })
+                if pending:
+                    merge_job_card_metrics(metrics, await pending)
+                pending = asyncio.ensure_future(job_executor.run_in_process(
+                    "report", job_card_batch_metrics, batch, logs_by_order, movements_by_order, products, stock_by_order
+                ))
         
-        # Sort client performance by efficiency (highest first)
-        client_performance.sort(key=lambda x: x["efficiency_percentage"], reverse=True)
-        
-        # Sort by completion date (most recent first)
-        job_cards.sort(key=lambda x: x["completed_at"] if x["completed_at"] else "", reverse=True)
+            if pending:
+                merge_job_card_metrics(metrics, await pending)
+        finally:
+            if pending and not pending.done():
+                pending.cancel()
+        report = job_card_performance(metrics)
         
         report_data = {
             "report_period": {
@@ -6760,10 +6289,7 @@ async def get_job_card_performance_report(
                 "end_date": end_date if end_date else end.isoformat() + 'Z',
                 "days": (end_dt - start_dt).days
             },
-            "job_cards": job_cards,
-            "averages": averages,
-            "job_type_breakdown": job_type_breakdown,
-            "client_performance": client_performance
+            **report
         }
         
         return StandardResponse(
@@ -6913,177 +6439,23 @@ async def print_stock_description(
 ):
     """Generate printable PDF description for a stock unit"""
     try:
-        from reportlab.lib.pagesizes import letter, A4
-        from reportlab.lib.units import inch
-        from reportlab.lib import colors
-        from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
-        from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-        from reportlab.lib.enums import TA_CENTER, TA_LEFT
-        from io import BytesIO
-        
         # Fetch stock data
         if stock_type == "substrate":
-            stock = await db.raw_substrate_stock.find_one({"id": stock_id})
+            stock = await db.raw_substrate_stock.find_one({"id": stock_id}, {"_id": 0})
             if not stock:
                 raise HTTPException(status_code=404, detail="Stock item not found")
         else:  # material
-            stock = await db.raw_material_stock.find_one({"id": stock_id})
+            stock = await db.raw_material_stock.find_one({"id": stock_id}, {"_id": 0})
             if not stock:
                 raise HTTPException(status_code=404, detail="Material not found")
         
-        # Create PDF in memory
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=letter, topMargin=0.5*inch, bottomMargin=0.5*inch)
-        
-        # Container for PDF elements
-        elements = []
-        styles = getSampleStyleSheet()
-        
-        # Custom styles
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=24,
-            textColor=colors.HexColor('#1e40af'),
-            spaceAfter=30,
-            alignment=TA_CENTER
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=14,
-            textColor=colors.HexColor('#1e3a8a'),
-            spaceAfter=12,
-            spaceBefore=12
-        )
-        
-        # Title
-        title_text = "Adela Merchants - Stock Description"
-        elements.append(Paragraph(title_text, title_style))
-        elements.append(Spacer(1, 0.3*inch))
-        
-        # Helper function to format date
-        def format_date(date_value):
-            """Safely format date from various types"""
-            if not date_value:
-                return "N/A"
-            try:
-                # Handle datetime objects directly
-                if isinstance(date_value, datetime):
-                    return date_value.strftime("%Y-%m-%d")
-                # Handle string dates
-                elif isinstance(date_value, str):
-                    # Parse ISO format string
-                    dt = datetime.fromisoformat(date_value.replace('Z', '+00:00'))
-                    return dt.strftime("%Y-%m-%d")
-                # Handle date objects
-                elif hasattr(date_value, 'strftime'):
-                    return date_value.strftime("%Y-%m-%d")
-                else:
-                    # Convert to string as fallback
-                    return str(date_value)
-            except Exception as e:
-                logger.warning(f"Date formatting error for value {date_value} (type: {type(date_value)}): {str(e)}")
-                return "N/A"
-        
-        # Stock Information
-        if stock_type == "substrate":
-            elements.append(Paragraph("Product on Hand", heading_style))
-            
-            data = [
-                ["Product Code:", stock.get("product_code", "N/A")],
-                ["Description:", stock.get("product_description", "N/A")],
-                ["Client:", stock.get("client_name", "N/A")],
-                ["Quantity on Hand:", f"{stock.get('quantity_on_hand', 0)} {stock.get('unit_of_measure', 'units')}"],
-                ["Minimum Stock Level:", f"{stock.get('minimum_stock_level', 0)} {stock.get('unit_of_measure', 'units')}"],
-                ["Source Order:", stock.get("source_order_id", "N/A")],
-                ["Location:", stock.get("location", "Main Warehouse")],
-                ["Last Updated:", format_date(stock.get("created_at"))]
-            ]
-        else:
-            elements.append(Paragraph("Raw Material Stock", heading_style))
-            
-            data = [
-                ["Material Name:", stock.get("material_name", "N/A")],
-                ["Material ID:", stock.get("material_id", "N/A")],
-                ["Quantity on Hand:", f"{stock.get('quantity_on_hand', 0)} {stock.get('unit_of_measure', 'kg')}"],
-                ["Minimum Stock Level:", f"{stock.get('minimum_stock_level', 0)} {stock.get('unit_of_measure', 'kg')}"],
-                ["Usage Rate/Month:", f"{stock.get('usage_rate_per_month', 0)} {stock.get('unit_of_measure', 'kg')}"],
-                ["Alert Threshold:", f"{stock.get('alert_threshold_days', 7)} days"],
-                ["Supplier:", stock.get("supplier_name", "N/A")],
-                ["Last Updated:", format_date(stock.get("created_at"))]
-            ]
-        
-        # Create table
-        table = Table(data, colWidths=[2.5*inch, 4*inch])
-        table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#e5e7eb')),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 12),
-            ('TOPPADDING', (0, 0), (-1, -1), 12),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-        ]))
-        
-        elements.append(table)
-        elements.append(Spacer(1, 0.5*inch))
-        
         # Get stock movements
         query = {"stock_id": stock_id} if stock_type == "substrate" else {"product_id": stock.get("material_id")}
-        movements = await db.stock_movements.find(query).sort("created_at", -1).limit(10).to_list(length=None)
+        movements = await db.stock_movements.find(query, {"_id": 0}).sort("created_at", -1).limit(10).to_list(length=None)
         
-        if movements:
-            elements.append(Paragraph("Recent Stock Movements", heading_style))
-            
-            movement_data = [["Date", "Type", "Quantity", "Reference"]]
-            for movement in movements:
-                date_str = format_date(movement.get("created_at"))
-                movement_data.append([
-                    date_str,
-                    movement.get("movement_type", "N/A").title(),
-                    f"{movement.get('quantity', 0)} {stock.get('unit_of_measure', 'units')}",
-                    movement.get("reference", "N/A")[:30]
-                ])
-            
-            movement_table = Table(movement_data, colWidths=[1.2*inch, 1.2*inch, 1.5*inch, 2.6*inch])
-            movement_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.HexColor('#1e40af')),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ]))
-            
-            elements.append(movement_table)
+        pdf_content = await render_pdf("stock_description", stock, stock_type, movements)
         
-        # Footer
-        elements.append(Spacer(1, 0.5*inch))
-
-        footer_text = f"Generated: {datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S UTC')}"
-        footer_style = ParagraphStyle('Footer', parent=styles['Normal'], fontSize=8, textColor=colors.grey, alignment=TA_CENTER)
-        elements.append(Paragraph(footer_text, footer_style))
-        
-        # Build PDF
-        doc.build(elements)
-        
-        # Return PDF
-        buffer.seek(0)
-        filename = f"stock_{stock_type}_{stock_id}.pdf"
-        
-        return Response(
-            content=buffer.getvalue(),
-            media_type="application/pdf",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}"
-            }
-        )
+        return pdf_response(pdf_content, f"stock_{stock_type}_{stock_id}.pdf")
         
     except HTTPException:
         raise
@@ -7426,6 +6798,7 @@ async def root():
     return {"message": "Misty Manufacturing Management System API"}
 
 @api_router.post("/reports/profitability", response_model=StandardResponse)
+@job_executor.limited("report")
 async def generate_profitability_report(
     request: ProfitabilityReportRequest,
     current_user: dict = Depends(require_any_role)
@@ -7438,23 +6811,14 @@ async def generate_profitability_report(
     - Machine costs (from job cards)
     - Consumables (from client products)
     - Selling price (from client product catalogue)
+    
+    Completed jobs are read from the job_costs ledger, which is kept up to
+    date as jobs clear and their job cards or timesheets change.
     """
     try:
-        from decimal import Decimal
-        
-        # Build query filter
+        # Build query filter (applies to the ledger and to orders alike)
         query = {}
         
-        # Filter by specific order IDs (legacy - not used in new design)
-        if request.order_ids:
-            query["id"] = {"$in": request.order_ids}
-        else:
-            # Filter completed/archived jobs
-            query["$or"] = [
-                {"status": "completed"},
-                {"current_stage": "cleared"}
-            ]
-        
         # Filter by multiple clients
         if request.client_ids and len(request.client_ids) > 0:
             query["client_id"] = {"$in": request.client_ids}
@@ -7465,241 +6829,39 @@ async def generate_profitability_report(
             end_dt = datetime.fromisoformat(request.end_date.replace('Z', '+00:00')).replace(tzinfo=None)
             query["created_at"] = {"$gte": start_dt, "$lte": end_dt}
         
-        # Get orders
-        orders = await db.orders.find(query).to_list(length=None)
-        
-        # Filter by products if specified
-        if request.product_ids and len(request.product_ids) > 0:
-            # Filter orders that contain at least one of the specified products
-            filtered_orders = []
-            for order in orders:
-                order_items = order.get("items", [])
-                for item in order_items:
-                    if item.get("product_id") in request.product_ids:
-                        filtered_orders.append(order)
-                        break  # Include this order only once
-            orders = filtered_orders
-        
-        if not orders:
+        if request.order_ids:
+            # Filter by specific order IDs (legacy - not used in new design).
+            # These needn't be complete, so they're costed live.
+            query["id"] = {"$in": request.order_ids}
+            if request.product_ids and len(request.product_ids) > 0:
+                query["items.product_id"] = {"$in": request.product_ids}
+            jobs = []
+            async for batch in iter_batches(db.orders.find(query, ORDER_COST_PROJECTION)):
+                inputs = await load_cost_inputs(db, batch)
+                jobs.extend(await job_executor.run_in_thread("report", cost_orders, batch, inputs))
+        else:
+            # Filter by products if specified (jobs containing at least one of them)
+            if request.product_ids and len(request.product_ids) > 0:
+                query["product_ids"] = {"$in": request.product_ids}
+            jobs = await db[JOB_COSTS_COLLECTION].find(
+                query, {"_id": 0, "client_id": 0, "created_at": 0, "product_ids": 0, "costed_at": 0}
+            ).to_list(length=None)
+        
+        if not jobs:
             return StandardResponse(
                 success=True,
                 message="No orders found matching the criteria",
                 data={"profitability_data": [], "summary": {}}
             )
         
-        profitability_data = []
-        total_revenue = 0
-        total_costs = 0
-        total_gp = 0
-        total_np = 0
-        
-        for order in orders:
-            order_id = order.get("id")
-            order_number = order.get("order_number", "Unknown")
-            client_name = order.get("client_name", "Unknown")
-            
-            # Calculate Job Revenue (selling price ex GST from order items)
-            job_revenue = 0
-            for item in order.get("items", []):
-                # Unit price is ex GST as per client product catalogue
-                unit_price = item.get("unit_price") or 0
-                quantity = item.get("quantity") or 0
-                job_revenue += unit_price * quantity
-            
-            # 1. Calculate Material Costs from Job Card with detailed breakdown
-            material_cost = 0
-            material_layers_breakdown = []
-            job_card = await db.job_cards.find_one({"order_id": order_id})
-            
-            if job_card:
-                # Get material layers from job card product specs
-                product_specs = job_card.get("product_specs", {})
-                material_layers = product_specs.get("material_layers", [])
-                
-                # Calculate total length from calculations if available
-                calculations = job_card.get("calculations", {})
-                total_length_m = float(calculations.get("totalLengthRequired") or 0)
-                good_length_m = float(calculations.get("goodMaterialLength") or 0)
-                makeready_length_m = float(calculations.get("makereadyLength") or 0)
-                waste_length_m = float(calculations.get("wasteLength") or 0)
-                
-                for layer in material_layers:
-                    material_id = layer.get("material_id")
-                    material_name = layer.get("material_name", "Unknown")
-                    layer_type = layer.get("layer_type", "Unknown")
-                    layer_width_mm = float(layer.get("width") or 0)
-                    layer_gsm = float(layer.get("gsm") or 0)
-                    layer_thickness = float(layer.get("thickness") or 0)
-                    supplier = layer.get("supplier", "Unknown")
-                    
-                    # Get material pricing from materials collection
-                    material_doc = await db.materials.find_one({"id": material_id})
-                    price_per_tonne = 0
-                    if material_doc:
-                        price_per_tonne = float(material_doc.get("price") or 0)
-                    
-                    # Calculate weight: (width_m * length_m * gsm) / 1000 = kg
-                    width_m = layer_width_mm / 1000.0
-                    weight_kg = (width_m * total_length_m * layer_gsm) / 1000.0
-                    
-                    # Cost = (weight_kg / 1000) * price_per_tonne
-                    layer_cost = (weight_kg / 1000.0) * price_per_tonne
-                    material_cost += layer_cost
-                    
-                    # Store detailed breakdown for this layer
-                    material_layers_breakdown.append({
-                        "layer_type": layer_type,
-                        "material_name": material_name,
-                        "supplier": supplier,
-                        "width_mm": layer_width_mm,
-                        "thickness_microns": layer_thickness,
-                        "gsm": layer_gsm,
-                        "linear_meters_consumed": round(total_length_m, 2),
-                        "good_material_meters": round(good_length_m, 2),
-                        "makeready_meters": round(makeready_length_m, 2),
-                        "waste_meters": round(waste_length_m, 2),
-                        "weight_kg": round(weight_kg, 3),
-                        "price_per_tonne": round(price_per_tonne, 2),
-                        "layer_cost_aud": round(layer_cost, 2)
-                    })
-            
-            # 2. Calculate Labour Costs (from timesheets)
-            labour_cost = 0
-            timesheets = await db.timesheets.find({"order_id": order_id}).to_list(length=None)
-            
-            for timesheet in timesheets:
-                employee_id = timesheet.get("employee_id")
-                
-                # Get employee hourly rate
-                employee = await db.employee_profiles.find_one({"id": employee_id})
-                if employee:
-                    hourly_rate = float(employee.get("hourly_rate") or 0)
-                    
-                    # Sum regular and overtime hours
-                    entries = timesheet.get("entries", [])
-                    for entry in entries:
-                        regular_hours = float(entry.get("regular_hours") or 0)
-                        overtime_hours = float(entry.get("overtime_hours") or 0)
-                        
-                        # Regular hours at normal rate, overtime at 1.5x
-                        labour_cost += (regular_hours * hourly_rate) + (overtime_hours * hourly_rate * 1.5)
-            
-            # 3. Calculate Machine Costs (from job card machine usage)
-            machine_cost = 0
-            overhead_cost = 0  # Overheads = machine costs as per requirements
-            
-            if job_card:
-                machine_usage = job_card.get("machine_usage", [])
-                for machine in machine_usage:
-                    machine_id = machine.get("machine_id")
-                    runtime_minutes = float(machine.get("runtime_minutes") or 0)
-                    
-                    # Get machine hourly rate
-                    machinery = await db.machinery_rates.find_one({"id": machine_id})
-                    if machinery:
-                        hourly_rate = float(machinery.get("hourly_rate") or 0)
-                        machine_cost += (runtime_minutes / 60.0) * hourly_rate
-                
-                # Overheads = machine costs
-                overhead_cost = machine_cost
-            
-            # 4. Calculate Consumables Costs (from client product catalogue)
-            consumables_cost = 0
-            for item in order.get("items", []):
-                product_id = item.get("product_id")
-                quantity = item.get("quantity") or 0
-                
-                # Get client product to check for consumables
-                client_product = await db.client_products.find_one({"id": product_id})
-                if client_product:
-                    # Check if product has consumables defined
-                    consumables = client_product.get("consumables", [])
-                    for consumable in consumables:
-                        consumable_cost_per_unit = float(consumable.get("cost_per_unit") or 0)
-                        consumable_quantity_per_product = float(consumable.get("quantity_per_unit") or 1)
-                        consumables_cost += quantity * consumable_quantity_per_product * consumable_cost_per_unit
-            
-            # 5. Calculate Totals
-            total_production_cost = material_cost + labour_cost + machine_cost + consumables_cost
-            
-            # Calculate Gross Profit
-            gross_profit = job_revenue - (material_cost + labour_cost + machine_cost + consumables_cost)
-            gp_percentage = (gross_profit / job_revenue * 100) if job_revenue > 0 else 0
-            
-            # Calculate Net Profit (GP - Overheads)
-            # Note: Overheads already included in machine_cost, so NP = GP - overhead_cost
-            # But since machine_cost is already subtracted in GP, we don't subtract again
-            # Per requirements: NP = GP - Overheads, and Overheads = machine costs
-            # But machine costs are already in GP calculation, so:
-            # Let's recalculate: GP should be Revenue - (Materials + Labour) only
-            # Then NP = GP - (Machine costs as overhead)
-            
-            gross_profit_proper = job_revenue - (material_cost + labour_cost + consumables_cost)
-            net_profit = gross_profit_proper - machine_cost
-            np_percentage = (net_profit / job_revenue * 100) if job_revenue > 0 else 0
-            
-            # Calculate additional metrics
-            profit_per_hour = 0
-            if job_card:
-                total_hours = 0
-                # Sum all labour hours
-                for timesheet in timesheets:
-                    entries = timesheet.get("entries", [])
-                    for entry in entries:
-                        total_hours += float(entry.get("regular_hours", 0)) + float(entry.get("overtime_hours", 0))
-                
-                profit_per_hour = (net_profit / total_hours) if total_hours > 0 else 0
-            
-            # Check profit threshold for alerts
-            alert_low_profit = np_percentage < request.profit_threshold
-            
-            profitability_data.append({
-                "order_id": order_id,
-                "order_number": order_number,
-                "client_name": client_name,
-                "job_revenue": round(job_revenue, 2),
-                "material_cost": round(material_cost, 2),
-                "material_layers_breakdown": material_layers_breakdown,  # Detailed layer info
-                "labour_cost": round(labour_cost, 2),
-                "machine_cost": round(machine_cost, 2),
-                "consumables_cost": round(consumables_cost, 2),
-                "total_production_cost": round(total_production_cost, 2),
-                "gross_profit": round(gross_profit_proper, 2),
-                "gp_percentage": round(gp_percentage, 2),
-                "overhead_cost": round(overhead_cost, 2),
-                "net_profit": round(net_profit, 2),
-                "np_percentage": round(np_percentage, 2),
-                "profit_per_hour": round(profit_per_hour, 2),
-                "alert_low_profit": alert_low_profit,
-                "completed_at": order.get("completed_at")
-            })
-            
-            # Accumulate totals
-            total_revenue += job_revenue
-            total_costs += total_production_cost
-            total_gp += gross_profit_proper
-            total_np += net_profit
-        
-        # Calculate summary
-        avg_gp_percentage = (total_gp / total_revenue * 100) if total_revenue > 0 else 0
-        avg_np_percentage = (total_np / total_revenue * 100) if total_revenue > 0 else 0
-        
-        summary = {
-            "total_jobs": len(profitability_data),
-            "total_revenue": round(total_revenue, 2),
-            "total_costs": round(total_costs, 2),
-            "total_gross_profit": round(total_gp, 2),
-            "total_net_profit": round(total_np, 2),
-            "average_gp_percentage": round(avg_gp_percentage, 2),
-            "average_np_percentage": round(avg_np_percentage, 2),
-            "jobs_below_threshold": sum(1 for job in profitability_data if job["alert_low_profit"])
-        }
+        # Flag low-profit jobs and total them up off the event loop
+        summary = await job_executor.run_in_thread("report", profitability_summary, jobs, request.profit_threshold)
         
         return StandardResponse(
             success=True,
-            message=f"Profitability report generated for {len(profitability_data)} jobs",
+            message=f"Profitability report generated for {len(jobs)} jobs",
             data={
-                "profitability_data": profitability_data,
+                "profitability_data": jobs,
                 "summary": summary
             }
         )
@@ -7830,6 +6992,55 @@ async def delete_manual_stocktake(
 async def health_check():
     return {"status": "healthy", "timestamp": datetime.now(timezone.utc)}
 
+@api_router.get("/system/executor-stats")
+async def get_executor_stats(current_user: dict = Depends(require_admin)):
+    """Worker pool sizes, per-job-type concurrency limits and queue depth metrics"""
+    return {"success": True, "data": job_executor.stats()}
+
+async def require_metrics_access(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    """Prometheus scrapes with METRICS_TOKEN; admins can read metrics with their usual token"""
+    if METRICS_TOKEN and secrets.compare_digest(credentials.credentials, METRICS_TOKEN):
+        return None
+    payload = verify_token(credentials.credentials)
+    if payload is None or payload.get("role") != UserRole.ADMIN.value:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return payload
+
+@api_router.get("/metrics")
+async def get_metrics(current_user: Optional[dict] = Depends(require_metrics_access)):
+    """Per-route latency, payload size and Mongo command metrics in Prometheus text format.
+
+    Metrics are per worker process; scrape each worker (or run a single one)
+    for complete numbers.
+    """
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@api_router.get("/system/indexes")
+async def get_index_report(
+    slow_ms: int = 100,
+    limit: int = SLOW_QUERY_LIMIT,
+    current_user: dict = Depends(require_admin)
+):
+    """Registered indexes that are missing, indexes with no recorded use, and
+    profiler entries slower than slow_ms (profiler must be enabled with
+    MONGO_PROFILER_SLOW_MS)"""
+    try:
+        return {"success": True, "data": await index_report(db, slow_ms=slow_ms, limit=min(limit, 500))}
+    except Exception as e:
+        logger.error(f"Failed to build index report: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to build index report: {str(e)}")
+
+@api_router.post("/system/indexes/ensure")
+async def ensure_registered_indexes(current_user: dict = Depends(require_admin)):
+    """Create any registered index that is missing (same as startup)"""
+    return {"success": True, "data": await ensure_indexes(db)}
+
+@api_router.post("/system/report-rollups/rebuild")
+@job_executor.limited("report")
+async def rebuild_report_rollups(current_user: dict = Depends(require_admin)):
+    """Recompute the report rollups from every order and invoice (same as rebuild_report_rollups.py)"""
+    return {"success": True, "data": await rebuild_rollups(db)}
+
 # Include the routers in the main app
 app.include_router(api_router)
 app.include_router(payroll_router)
@@ -7846,8 +7057,18 @@ app.add_middleware(
     allow_origins=["*"],  # Temporarily allow all origins for testing
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=PAGINATION_HEADERS,
 )
 
+# Admin-only X-Debug-Profile; sits inside compression so it rewrites plain bodies
+app.add_middleware(DebugProfileMiddleware)
+
+# Compress JSON/CSV responses (brotli or gzip, whichever the client accepts)
+app.add_middleware(CompressionMiddleware)
+
+# Outermost, so latency and response sizes are what the client actually sees
+app.add_middleware(MetricsMiddleware)
+
 # Router already included above, removing duplicate registration
 
 # Mount static files for uploads - Cross-platform compatible
@@ -7895,98 +7116,7 @@ async def export_drafted_invoices_csv_direct(authorization: str = Header(None)):
                 media_type="text/plain", 
                 status_code=401
             )
-        # Get all jobs in accounting transaction stage
-        transactions = await db.orders.find({
-            "current_stage": "accounting_transaction",
-            "status": "accounting_draft"
-        }).to_list(length=None)
-        
-        # Prepare CSV data
-        csv_data = []
-        
-        # CSV Headers based on Xero import format
-        headers = [
-            "ContactName", "EmailAddress", "POAddressLine1", "POAddressLine2", 
-            "POAddressLine3", "POAddressLine4", "POCity", "PORegion", 
-            "POPostalCode", "POCountry", "InvoiceNumber", "Reference", 
-            "InvoiceDate", "DueDate", "InventoryItemCode", "Description", 
-            "Quantity", "UnitAmount", "Discount", "AccountCode", "TaxType", 
-            "TrackingName1", "TrackingOption1", "TrackingName2", "TrackingOption2", 
-            "Currency", "BrandingTheme"
-        ]
-        
-        csv_data.append(headers)
-        
-        # Process each transaction
-        for transaction in transactions:
-            # Get client info
-            client = await db.clients.find_one({"id": transaction["client_id"]})
-            client_name = client["company_name"] if client else transaction.get("client_name", "Unknown Client")
-            client_email = client.get("email", "") if client else ""
-            
-            # Get invoice info
-            invoice = await db.invoices.find_one({"id": transaction.get("invoice_id")})
-            invoice_number = invoice["invoice_number"] if invoice else f"INV-{transaction['order_number']}"
-            invoice_date = invoice["created_at"].strftime("%d/%m/%Y") if invoice and invoice.get("created_at") else datetime.now().strftime("%d/%m/%Y")
-            
-            # Calculate due date (30 days from invoice date)
-            due_date_obj = invoice["created_at"] + timedelta(days=30) if invoice and invoice.get("created_at") else datetime.now() + timedelta(days=30)
-            due_date = due_date_obj.strftime("%d/%m/%Y")
-            
-            # Process each item in the transaction
-            items = transaction.get("items", [])
-            if not items:
-                # Create a single line if no items
-                items = [{"description": f"Services for Order {transaction['order_number']}", "quantity": 1, "unit_price": transaction.get("total_amount", 0)}]
-            
-            for item in items:
-                row = [
-                    client_name,  # ContactName (required)
-                    client_email,  # EmailAddress
-                    "",  # POAddressLine1
-                    "",  # POAddressLine2
-                    "",  # POAddressLine3
-                    "",  # POAddressLine4
-                    "",  # POCity
-                    "",  # PORegion
-                    "",  # POPostalCode
-                    "",  # POCountry
-                    invoice_number,  # InvoiceNumber (required)
-                    transaction["order_number"],  # Reference
-                    invoice_date,  # InvoiceDate (required)
-                    due_date,  # DueDate (required)
-                    item.get("product_code", ""),  # InventoryItemCode
-                    f"{item.get('product_name', item.get('description', 'Product'))} - {item.get('specifications', '')}".strip(" - "),  # Description (required)
-                    str(item.get("quantity", 1)),  # Quantity (required)
-                    str(item.get("unit_price", item.get("price", 0))),  # UnitAmount (required)
-                    str(item.get("discount_percent", "")),  # Discount
-                    os.getenv("XERO_SALES_ACCOUNT_CODE", "200"),  # AccountCode (required)
-                    "OUTPUT",  # TaxType (required) - GST for sales
-                    "",  # TrackingName1
-                    "",  # TrackingOption1
-                    "",  # TrackingName2
-                    "",  # TrackingOption2
-                    "AUD",  # Currency
-                    ""   # BrandingTheme
-                ]
-                csv_data.append(row)
-        
-        # Generate CSV content
-        import io
-        import csv
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerows(csv_data)
-        csv_content = output.getvalue()
-        output.close()
-        
-        # Return CSV as response
-        from fastapi.responses import Response
-        return Response(
-            content=csv_content,
-            media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=drafted_invoices_{datetime.now().strftime('%Y%m%d')}.csv"}
-        )
+        return drafted_invoices_csv_response()
         
     except Exception as e:
         logger.error(f"Failed to export drafted invoices CSV: {str(e)}")
@@ -8486,8 +7616,16 @@ async def startup_event():
         await db.users.insert_one(default_admin.dict())
         logger.info("Default admin user created successfully")
     
+    await ensure_indexes(db)
+    await enable_profiler(db)
+    await seed_counters(db)
+    
+    await production_events.start(db)
+    
     logger.info("Misty Manufacturing Management System started successfully!")
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
+    await production_events.stop()
+    job_executor.shutdown()
     client.close()
\ No newline at end of file
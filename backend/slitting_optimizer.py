@@ -0,0 +1,229 @@
+from dataclasses import dataclass, field
+from typing import List, Tuple, Dict, Optional
+import time
+import numpy as np
+
+# Widths are scaled to integer units before searching. Finer inputs are rounded
+# to 0.01 mm, which is well below what the slitter can hold.
+MAX_DECIMAL_PLACES = 2
+
+# Upper bound on master width in search units, to keep reachability tables small
+MAX_SEARCH_UNITS = 2_000_000
+
+DEFAULT_MAX_RESULTS = 200
+DEFAULT_TIME_BUDGET_SECONDS = 2.0
+
+@dataclass
+class SlitSearchResult:
+    """Outcome of a slit pattern search"""
+    widths: List[float]                                   # distinct slit widths, descending
+    patterns: List[Tuple[int, ...]] = field(default_factory=list)  # counts per width, best yield first
+    total_patterns: int = 0                               # every valid pattern, not just those returned
+    truncated: bool = False                               # stopped early on max_results or the time budget
+    timed_out: bool = False
+
+def _scale_for(values: List[float]) -> int:
+    """Smallest power of ten (up to MAX_DECIMAL_PLACES) that makes every value integral"""
+    for places in range(MAX_DECIMAL_PLACES + 1):
+        scale = 10 ** places
+        if all(abs(v * scale - round(v * scale)) < 1e-6 for v in values):
+            return scale
+    return 10 ** MAX_DECIMAL_PLACES
+
+def _unbounded_reach(reach: np.ndarray, width: int) -> np.ndarray:
+    """Totals reachable by adding any number of `width` to an already reachable set.
+
+    Shifting by width, 2*width, 4*width, ... covers every multiple in
+    log2(capacity / width) vectorised passes.
+    """
+    result = reach.copy()
+    shift = width
+    while shift < len(result):
+        result[shift:] |= result[:-shift]
+        shift *= 2
+    return result
+
+def _unbounded_count(counts: np.ndarray, width: int) -> np.ndarray:
+    """Number of multisets per total after allowing any number of `width`"""
+    size = len(counts)
+    padded_size = -(-size // width) * width
+    padded = np.zeros(padded_size, dtype=counts.dtype)
+    padded[:size] = counts
+    # Each residue class mod width is a prefix sum along the strided view
+    return padded.reshape(-1, width).cumsum(axis=0).reshape(-1)[:size]
+
+def _bounded_reach(reach: np.ndarray, width: int, max_count: int) -> np.ndarray:
+    """Totals reachable by adding up to max_count of `width` (binary splitting of the count)"""
+    result = reach.copy()
+    remaining = max_count
+    piece = 1
+    while remaining > 0:
+        take = min(piece, remaining)
+        shift = take * width
+        if shift < len(result):
+            result[shift:] |= result[:-shift].copy()
+        remaining -= take
+        piece *= 2
+    return result
+
+def _bounded_count(counts: np.ndarray, width: int, max_count: int) -> np.ndarray:
+    """Number of multisets per total after allowing up to max_count of `width`"""
+    result = _unbounded_count(counts, width)
+    shift = (max_count + 1) * width
+    if shift < len(result):
+        result[shift:] -= result[:-shift].copy()
+    return result
+
+def find_slit_patterns(
+    master_width_mm: float,
+    slit_widths: List[float],
+    waste_allowance_mm: float,
+    max_results: int = DEFAULT_MAX_RESULTS,
+    time_budget_seconds: float = DEFAULT_TIME_BUDGET_SECONDS,
+    max_counts: Optional[Dict[float, int]] = None
+) -> SlitSearchResult:
+    """Find the highest-yield ways to slit one master roll into the given widths.
+
+    A pattern is a count per width whose total fits the master width with no
+    more than waste_allowance_mm left over. Instead of enumerating every
+    combination, a reachability table over achievable used widths is built with
+    NumPy, then patterns are generated from the widest achievable total down,
+    only ever descending into branches that can still hit the target. The search
+    stops after max_results patterns or time_budget_seconds.
+
+    max_counts optionally caps how many slits of a width one pattern may hold.
+    """
+    widths = sorted({float(w) for w in slit_widths if w and w > 0}, reverse=True)
+    result = SlitSearchResult(widths=widths)
+    if not widths or master_width_mm <= 0:
+        return result
+
+    scale = _scale_for(widths + [master_width_mm, waste_allowance_mm])
+    while master_width_mm * scale > MAX_SEARCH_UNITS and scale > 1:
+        scale //= 10
+    capacity = int(round(master_width_mm * scale))
+    min_total = max(1, capacity - int(round(max(waste_allowance_mm, 0) * scale)))
+    units = [max(1, int(round(w * scale))) for w in widths]
+    limits = [
+        (max_counts or {}).get(w, capacity // unit) for w, unit in zip(widths, units)
+    ]
+
+    # suffix_reach[i][t]: total t can be made from widths[i:]
+    suffix_reach = [None] * (len(units) + 1)
+    reach = np.zeros(capacity + 1, dtype=bool)
+    reach[0] = True
+    suffix_reach[len(units)] = reach
+    counts = np.zeros(capacity + 1, dtype=np.float64)
+    counts[0] = 1
+    for i in range(len(units) - 1, -1, -1):
+        if limits[i] >= capacity // units[i]:
+            reach = _unbounded_reach(reach, units[i])
+            counts = _unbounded_count(counts, units[i])
+        else:
+            reach = _bounded_reach(reach, units[i], limits[i])
+            counts = _bounded_count(counts, units[i], limits[i])
+        suffix_reach[i] = reach
+
+    total_patterns = counts[min_total:capacity + 1].sum()
+    result.total_patterns = int(min(total_patterns, 2 ** 53))
+
+    targets = [t for t in range(capacity, min_total - 1, -1) if suffix_reach[0][t]]
+    deadline = time.monotonic() + time_budget_seconds
+    pattern = [0] * len(units)
+
+    def generate(index: int, remaining: int):
+        if index == len(units):
+            yield tuple(pattern)
+            return
+        width = units[index]
+        next_reach = suffix_reach[index + 1]
+        for count in range(min(remaining // width, limits[index]), -1, -1):
+            if next_reach[remaining - count * width]:
+                pattern[index] = count
+                yield from generate(index + 1, remaining - count * width)
+        pattern[index] = 0
+
+    for target in targets:
+        for found in generate(0, target):
+            result.patterns.append(found)
+            if len(result.patterns) >= max_results:
+                result.truncated = len(result.patterns) < result.total_patterns
+                return result
+            if time.monotonic() > deadline:
+                result.truncated = True
+                result.timed_out = True
+                return result
+
+    return result
+
+@dataclass
+class PatternMetrics:
+    """Per-pattern metrics for a candidate set, one array entry per pattern row"""
+    counts: np.ndarray              # patterns x widths slit counts
+    used_width_mm: np.ndarray
+    waste_mm: np.ndarray
+    yield_percentage: np.ndarray
+    slits: np.ndarray
+    weight_kg: np.ndarray           # per master roll
+    cost_aud: np.ndarray            # per master roll
+    weight_per_slit_kg: np.ndarray  # per width
+    cost_per_slit_aud: np.ndarray   # per width
+    order: np.ndarray               # row indices, best yield first
+
+def compute_pattern_metrics(
+    widths: List[float],
+    patterns: List[Tuple[int, ...]],
+    master_width_mm: float,
+    linear_meters: float,
+    gsm: float,
+    cost_per_tonne: float
+) -> PatternMetrics:
+    """Yield, waste, weight and cost for every candidate pattern in one vectorised pass"""
+    counts = np.array(patterns, dtype=np.int64).reshape(len(patterns), len(widths))
+    width_vector = np.array(widths, dtype=np.float64)
+
+    used_width = counts @ width_vector
+    waste = master_width_mm - used_width
+
+    # Material weight per slit: (width_m * length_m * GSM) / 1000 = kg
+    weight_per_slit = (width_vector / 1000.0) * linear_meters * gsm / 1000
+    # Material cost per slit: (weight_kg / 1000) * cost_per_tonne
+    cost_per_slit = (weight_per_slit / 1000) * cost_per_tonne
+
+    yield_pct = used_width / master_width_mm * 100
+    # Highest yield first, then lowest waste (rounded as displayed so ties stay stable)
+    order = np.lexsort((np.round(waste, 2), -np.round(yield_pct, 2)))
+
+    return PatternMetrics(
+        counts=counts,
+        used_width_mm=used_width,
+        waste_mm=waste,
+        yield_percentage=yield_pct,
+        slits=counts.sum(axis=1),
+        weight_kg=counts @ weight_per_slit,
+        cost_aud=counts @ cost_per_slit,
+        weight_per_slit_kg=weight_per_slit,
+        cost_per_slit_aud=cost_per_slit,
+        order=order
+    )
+
+def search_and_rank_patterns(
+    master_width_mm: float,
+    slit_widths: List[float],
+    waste_allowance_mm: float,
+    max_results: int,
+    time_budget_seconds: float,
+    linear_meters: float,
+    gsm: float,
+    cost_per_tonne: float
+) -> Tuple[SlitSearchResult, PatternMetrics]:
+    """Search for patterns and compute their metrics in one call (runs in a worker process)"""
+    search = find_slit_patterns(
+        master_width_mm,
+        slit_widths,
+        waste_allowance_mm,
+        max_results=max_results,
+        time_budget_seconds=time_budget_seconds
+    )
+    metrics = compute_pattern_metrics(search.widths, search.patterns, master_width_mm, linear_meters, gsm, cost_per_tonne)
+    return search, metrics
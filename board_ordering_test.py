@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+"""
+Board Ordering Test
+
+Exercises backend/board_ordering.py, and the reorder endpoint in
+backend/server.py that uses it, against the shared in-memory Mongo stand-in
+(no running server or MongoDB needed):
+1. A card dropped between two neighbours gets the midpoint, and only it is written
+2. A card dropped at either end of a column goes a gap past the end card
+3. Neighbours with no room left between them get the column respaced
+4. Several ranks are written in a transaction on a replica set, and without
+   one on a standalone server
+"""
+
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "board_ordering_test")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import board_ordering  # noqa: E402
+import server  # noqa: E402
+from board_ordering import MIN_RANK_GAP, RANK_GAP, UNRANKED, rank_between, spaced_ranks, write_display_orders  # noqa: E402
+from fake_mongo import FakeDatabase  # noqa: E402
+from models import JobReorderRequest  # noqa: E402
+
+CURRENT_USER = {"user_id": "user-1", "role": "production_manager"}
+
+class FakeSession:
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def start_transaction(self):
+        return FakeTransaction(self.client)
+
+class FakeTransaction:
+    def __init__(self, client):
+        self.client = client
+
+    async def __aenter__(self):
+        self.client.transactions += 1
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+class FakeAdmin:
+    def __init__(self, hello):
+        self.hello = hello
+
+    async def command(self, name):
+        return self.hello
+
+class FakeClient:
+    """A Motor client on a standalone server, or on a replica set when given its name"""
+
+    def __init__(self, set_name=None):
+        self.admin = FakeAdmin({"ismaster": True, **({"setName": set_name} if set_name else {})})
+        self.transactions = 0
+
+    async def start_session(self):
+        return FakeSession(self)
+
+def make_db(ranks):
+    db = FakeDatabase()
+    for number, rank in enumerate(ranks, start=1):
+        order = {"id": f"order-{number}", "current_stage": "winding", "status": "active"}
+        if rank is not None:
+            order["display_order"] = rank
+        db.orders.documents.append(order)
+    return db
+
+def column(db):
+    """Order ids in the winding column, top to bottom"""
+    cards = [order for order in db.orders.documents if order["current_stage"] == "winding"]
+    return [order["id"] for order in sorted(cards, key=lambda order: order.get("display_order", UNRANKED))]
+
+def reorder(db, **request):
+    """Call reorder_jobs_in_stage with the module's db and client swapped out; returns the written ranks"""
+    async def notify_board_orders_changed(db, order_ids):
+        pass
+
+    async def publish_production_event(event_type, data):
+        pass
+
+    async def run():
+        patched = {
+            "db": db,
+            "client": FakeClient(),
+            "notify_board_orders_changed": notify_board_orders_changed,
+            "publish_production_event": publish_production_event,
+        }
+        original = {name: getattr(server, name) for name in patched}
+        for name, value in patched.items():
+            setattr(server, name, value)
+        board_ordering._transactions_supported = None
+        try:
+            response = await server.reorder_jobs_in_stage(JobReorderRequest(stage="winding", **request), CURRENT_USER)
+        finally:
+            for name, value in original.items():
+                setattr(server, name, value)
+            board_ordering._transactions_supported = None
+        return response.data["ranks"]
+    return asyncio.run(run())
+
+def test_rank_between_neighbours():
+    assert rank_between(1.0, 2.0) == 1.5
+    assert rank_between(-3.0, 0.0) == -1.5
+    assert rank_between(1.0, 1.0) is None, "cards sharing a rank leave no room"
+    assert rank_between(1.0, 1.0 + MIN_RANK_GAP / 2) is None
+
+    db = make_db([0.0, 1.0, 2.0, 3.0])
+    ranks = reorder(db, order_id="order-4", previous_id="order-1", next_id="order-2")
+    assert ranks == {"order-4": 0.5}, "only the moved card is written"
+    assert column(db) == ["order-1", "order-4", "order-2", "order-3"]
+
+def test_rank_at_either_end():
+    assert rank_between(None, None) == 0.0
+    assert rank_between(None, 4.0) == 4.0 - RANK_GAP
+    assert rank_between(7.5, None) == 7.5 + RANK_GAP
+
+    db = make_db([0.0, 1.0, 2.0])
+    assert reorder(db, order_id="order-3", next_id="order-1") == {"order-3": -RANK_GAP}
+    assert column(db) == ["order-3", "order-1", "order-2"]
+    assert reorder(db, order_id="order-3", previous_id="order-2") == {"order-3": 1.0 + RANK_GAP}
+    assert column(db) == ["order-1", "order-2", "order-3"]
+
+def test_adjacent_neighbours_respace_column():
+    assert spaced_ranks(["b", "a", "c"]) == {"b": 0.0, "a": RANK_GAP, "c": 2 * RANK_GAP}
+
+    # order-2 and order-3 are as close as ranks get; order-5 was never ranked
+    db = make_db([0.0, 1.0, 1.0 + MIN_RANK_GAP / 2, 2.0, None])
+    ranks = reorder(db, order_id="order-1", previous_id="order-2", next_id="order-3")
+    assert column(db) == ["order-2", "order-1", "order-3", "order-4", "order-5"]
+    assert ranks == spaced_ranks(column(db)), "the whole column is renumbered a gap apart"
+
+    # Unranked cards all share a rank, so dropping between two of them respaces too
+    db = make_db([None, None, None])
+    reorder(db, order_id="order-3", previous_id="order-1", next_id="order-2")
+    assert column(db) == ["order-1", "order-3", "order-2"]
+    assert [order["display_order"] for order in db.orders.documents] == [0.0, 2.0, 1.0]
+
+def test_standalone_server_writes_without_transaction():
+    async def run():
+        ranks = {"order-1": 1.0, "order-2": 0.0}
+
+        board_ordering._transactions_supported = None
+        replica_set, db = FakeClient("rs0"), make_db([0.0, 1.0])
+        assert await write_display_orders(replica_set, db.orders, ranks) == 2
+        assert replica_set.transactions == 1
+        assert column(db) == ["order-2", "order-1"]
+
+        board_ordering._transactions_supported = None
+        standalone, db = FakeClient(), make_db([0.0, 1.0])
+        assert await write_display_orders(standalone, db.orders, ranks) == 2
+        assert standalone.transactions == 0, "a standalone server can't run transactions"
+        assert column(db) == ["order-2", "order-1"]
+
+        # A single card needs no transaction either way
+        board_ordering._transactions_supported = None
+        replica_set = FakeClient("rs0")
+        assert await write_display_orders(replica_set, db.orders, {"order-1": -1.0}) == 1
+        assert replica_set.transactions == 0
+        assert await write_display_orders(replica_set, db.orders, {}) == 0
+        board_ordering._transactions_supported = None
+    asyncio.run(run())
+
+def main():
+    tests = [
+        test_rank_between_neighbours,
+        test_rank_at_either_end,
+        test_adjacent_neighbours_respace_column,
+        test_standalone_server_writes_without_transaction,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} board ordering tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
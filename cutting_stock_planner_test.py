@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Cutting Stock Planner Test
+
+Runs backend/cutting_stock_planner.py plan_cutting_stock on fixed instances
+(no server needed):
+1. Every demanded width is planned at least in full
+2. Every pattern fits the master width, and any that wastes more than
+   max_waste_mm is flagged and counted
+3. The roll count stays within a couple of rolls of the lower bound
+"""
+
+import math
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from cutting_stock_planner import plan_cutting_stock  # noqa: E402
+
+# Rolls a plan may use above the lower bound
+ROLL_ALLOWANCE = 2
+
+CASES = [
+    # master width, master roll length, demand in metres by width, max waste
+    (1000, 5000, {100: 120000, 150: 310000, 200: 75000, 250: 220000}, 20),
+    (1320, 2000, {310: 90000, 220: 145000, 165: 300000, 95: 61000}, 60),
+    (1600, 3000, {533: 450000, 400: 120000, 250: 80000, 125: 15000}, 40),
+    (2500, 1000, {1180: 30000, 700: 50000, 370: 80000, 285: 40000, 110: 12000}, 30),
+    (500, 1200, {62.5: 50000, 77.25: 80000, 120: 30000}, 15.5),
+    # Widths wider than the master can't be planned
+    (1200, 4000, {"600": 18000, 400.0: 9000, 1500: 5000}, None),
+]
+
+def area_lower_bound(master_width_mm, master_roll_length_m, demand_meters):
+    demanded_area = sum(float(width) * meters for width, meters in demand_meters.items() if float(width) <= master_width_mm)
+    return math.ceil(demanded_area / (master_width_mm * master_roll_length_m) - 1e-6)
+
+def check_plan(master_width_mm, master_roll_length_m, demand_meters, max_waste_mm):
+    plan = plan_cutting_stock(master_width_mm, master_roll_length_m, demand_meters, max_waste_mm)
+    label = f"{master_width_mm}mm master"
+
+    planned = {row["slit_width_mm"]: row["planned_meters"] for row in plan["demand"]}
+    for width, meters in demand_meters.items():
+        if float(width) > master_width_mm:
+            assert float(width) in plan["unplannable_widths_mm"], f"{label}: {width}mm should be unplannable"
+            continue
+        assert planned.get(float(width), 0) >= meters, f"{label}: {width}mm planned {planned.get(float(width), 0)}m of {meters}m"
+
+    waste_limit = master_width_mm if max_waste_mm is None else max_waste_mm
+    for pattern in plan["patterns"]:
+        used = sum(float(width[:-2]) for width in pattern["pattern"])
+        assert math.isclose(used, pattern["used_width_mm"]), f"{label}: {pattern}"
+        assert used <= master_width_mm + 1e-6, f"{label}: {pattern['pattern_description']} is wider than the master"
+        assert pattern["exceeds_waste_limit"] == (master_width_mm - used > waste_limit + 1e-6), f"{label}: {pattern}"
+    assert plan["master_rolls_over_waste_limit"] == sum(
+        pattern["master_rolls"] for pattern in plan["patterns"] if pattern["exceeds_waste_limit"]
+    )
+
+    lower_bound = area_lower_bound(master_width_mm, master_roll_length_m, demand_meters)
+    assert plan["lower_bound_master_rolls"] == lower_bound, f"{label}: {plan['lower_bound_master_rolls']} != {lower_bound}"
+    assert lower_bound <= plan["total_master_rolls"] <= lower_bound + ROLL_ALLOWANCE, \
+        f"{label}: {plan['total_master_rolls']} rolls for a lower bound of {lower_bound}"
+    assert not plan["timed_out"]
+    return plan
+
+def test_fixed_instances():
+    for case in CASES:
+        check_plan(*case)
+
+def test_exact_fit_needs_no_waste():
+    plan = check_plan(1000, 2000, {250: 40000, 500: 20000}, 0)
+    assert plan["total_master_rolls"] == 10
+    assert plan["master_rolls_over_waste_limit"] == 0
+    assert all(row["surplus_meters"] == 0 for row in plan["demand"])
+
+def test_no_demand():
+    plan = plan_cutting_stock(1000, 2000, {250: 0})
+    assert plan["patterns"] == [] and plan["total_master_rolls"] == 0 and plan["lower_bound_master_rolls"] == 0
+
+def main():
+    tests = [
+        test_fixed_instances,
+        test_exact_fit_needs_no_waste,
+        test_no_demand,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} cutting stock planner tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+In-memory stand-in for the Motor calls the backend modules make, shared by the
+root-level test scripts that exercise those modules without a MongoDB server.
+
+Queries follow MongoDB's rules where the tests depend on them: a missing field
+matches None, values of different BSON types sort by type, and $gt/$lt/$gte/$lte
+only match values of the operand's own type. Projections are ignored. Every
+collection call yields to the event loop once, like a real round trip, so
+tests can interleave concurrent tasks.
+"""
+
+import asyncio
+import copy
+import functools
+from datetime import datetime
+
+from pymongo.errors import DuplicateKeyError
+
+MISSING = object()
+
+# MongoDB's cross-type sort order (missing and null first), as far as the tests need it
+def type_bracket(value):
+    if value is MISSING or value is None:
+        return 0
+    if isinstance(value, bool):
+        return 7
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, datetime):
+        return 8
+    return 6
+
+TYPE_ALIASES = {
+    "double": 1, "int": 1, "long": 1, "decimal": 1, "string": 2, "symbol": 2, "object": 3,
+    "array": 4, "binData": 5, "objectId": 6, "bool": 7, "date": 8,
+}
+
+def get_field(document, field):
+    """Value at a dotted field path, or MISSING"""
+    value = document
+    for part in field.split("."):
+        if not isinstance(value, dict) or part not in value:
+            return MISSING
+        value = value[part]
+    return value
+
+def compare_values(left, right):
+    left_bracket, right_bracket = type_bracket(left), type_bracket(right)
+    if left_bracket != right_bracket:
+        return -1 if left_bracket < right_bracket else 1
+    if left_bracket == 0:
+        return 0
+    return (left > right) - (left < right)
+
+def equals(value, condition):
+    if condition is None:
+        # {field: None} matches missing fields and nulls
+        return value in (MISSING, None)
+    return value is not MISSING and type_bracket(value) == type_bracket(condition) and value == condition
+
+COMPARISONS = {
+    "$gt": lambda result: result > 0,
+    "$gte": lambda result: result >= 0,
+    "$lt": lambda result: result < 0,
+    "$lte": lambda result: result <= 0,
+}
+
+def matches_condition(value, condition):
+    if not (isinstance(condition, dict) and condition and all(key.startswith("$") for key in condition)):
+        return equals(value, condition)
+    for operator, operand in condition.items():
+        if operator == "$in":
+            if not any(equals(value, candidate) for candidate in operand):
+                return False
+        elif operator == "$nin":
+            if any(equals(value, candidate) for candidate in operand):
+                return False
+        elif operator == "$ne":
+            if equals(value, operand):
+                return False
+        elif operator == "$exists":
+            if (value is not MISSING) != bool(operand):
+                return False
+        elif operator == "$type":
+            aliases = operand if isinstance(operand, list) else [operand]
+            if value in (MISSING, None) or type_bracket(value) not in {TYPE_ALIASES.get(alias) for alias in aliases}:
+                return False
+        elif operator in COMPARISONS:
+            if value in (MISSING, None) or type_bracket(value) != type_bracket(operand):
+                return False
+            if not COMPARISONS[operator](compare_values(value, operand)):
+                return False
+        else:
+            raise ValueError(f"fake_mongo doesn't support {operator}")
+    return True
+
+def matches(document, query):
+    for field, condition in (query or {}).items():
+        if field == "$and":
+            if not all(matches(document, part) for part in condition):
+                return False
+        elif field == "$or":
+            if not any(matches(document, part) for part in condition):
+                return False
+        elif not matches_condition(get_field(document, field), condition):
+            return False
+    return True
+
+def apply_update(document, update):
+    for name, value in update.get("$inc", {}).items():
+        document[name] = document.get(name, 0) + value
+    for name, value in update.get("$max", {}).items():
+        if name not in document or compare_values(value, document[name]) > 0:
+            document[name] = value
+    document.update(copy.deepcopy(update.get("$set", {})))
+    for name in update.get("$unset", {}):
+        document.pop(name, None)
+
+def upserted(query, update):
+    """The document an upsert inserts: the query's equality fields plus the update"""
+    document = {field: value for field, value in query.items() if not field.startswith("$") and not isinstance(value, dict)}
+    document.update(copy.deepcopy(update.get("$setOnInsert", {})))
+    apply_update(document, update)
+    return document
+
+class FakeResult:
+    def __init__(self, matched_count=0, modified_count=0, deleted_count=0, upserted_id=None):
+        self.matched_count = matched_count
+        self.modified_count = modified_count
+        self.deleted_count = deleted_count
+        self.upserted_id = upserted_id
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key_or_list, direction=1):
+        keys = [(key_or_list, direction)] if isinstance(key_or_list, str) else list(key_or_list)
+
+        def compare(left, right):
+            for field, field_direction in keys:
+                result = compare_values(get_field(left, field), get_field(right, field))
+                if result:
+                    return result * field_direction
+            return 0
+        self.documents.sort(key=functools.cmp_to_key(compare))
+        return self
+
+    def limit(self, count):
+        if count:
+            self.documents = self.documents[:count]
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def to_list(self, length=None):
+        await asyncio.sleep(0)
+        return list(self.documents if length is None else self.documents[:length])
+
+    def __aiter__(self):
+        self._iterator = iter(self.documents)
+        return self
+
+    async def __anext__(self):
+        # Yield to other tasks between documents, like a real cursor would
+        await asyncio.sleep(0)
+        try:
+            return next(self._iterator)
+        except StopIteration:
+            raise StopAsyncIteration
+
+class FakeCollection:
+    """The Motor collection calls the backend makes, over a plain list of documents"""
+
+    def __init__(self, documents=None):
+        self.documents = documents if documents is not None else []
+
+    def _find(self, query):
+        return [document for document in self.documents if matches(document, query)]
+
+    def find(self, query=None, projection=None):
+        return FakeCursor([copy.deepcopy(document) for document in self._find(query)])
+
+    async def find_one(self, query=None, projection=None):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        return copy.deepcopy(found[0]) if found else None
+
+    async def count_documents(self, query):
+        await asyncio.sleep(0)
+        return len(self._find(query))
+
+    async def insert_one(self, document):
+        await asyncio.sleep(0)
+        if "_id" in document and self._find({"_id": document["_id"]}):
+            raise DuplicateKeyError(f"duplicate _id {document['_id']}")
+        self.documents.append(copy.deepcopy(document))
+
+    async def insert_many(self, documents, ordered=True):
+        for document in documents:
+            await self.insert_one(document)
+
+    async def update_one(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if found:
+            apply_update(found[0], update)
+            return FakeResult(matched_count=1, modified_count=1)
+        if upsert:
+            self.documents.append(upserted(query, update))
+        return FakeResult()
+
+    async def update_many(self, query, update, upsert=False):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        for document in found:
+            apply_update(document, update)
+        return FakeResult(matched_count=len(found), modified_count=len(found))
+
+    async def find_one_and_update(self, query, update, upsert=False, return_document=None, projection=None):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if found:
+            target = found[0]
+        elif upsert:
+            target = upserted(query, update)
+            self.documents.append(target)
+            return copy.deepcopy(target)
+        else:
+            return None
+        apply_update(target, update)
+        return copy.deepcopy(target)
+
+    async def find_one_and_delete(self, query, projection=None):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if not found:
+            return None
+        self.documents.remove(found[0])
+        return found[0]
+
+    async def delete_one(self, query):
+        await asyncio.sleep(0)
+        found = self._find(query)
+        if found:
+            self.documents.remove(found[0])
+        return FakeResult(deleted_count=len(found[:1]))
+
+    async def delete_many(self, query):
+        await asyncio.sleep(0)
+        remaining = [document for document in self.documents if not matches(document, query)]
+        deleted = len(self.documents) - len(remaining)
+        self.documents[:] = remaining
+        return FakeResult(deleted_count=deleted)
+
+    async def bulk_write(self, operations, ordered=True, session=None):
+        """UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany requests, applied in order"""
+        await asyncio.sleep(0)
+        matched = 0
+        for operation in operations:
+            kind = type(operation).__name__
+            found = self._find(operation._filter)
+            if kind == "DeleteOne":
+                if found:
+                    self.documents.remove(found[0])
+            elif kind == "DeleteMany":
+                for document in found:
+                    self.documents.remove(document)
+            elif kind == "ReplaceOne":
+                matched += len(found[:1])
+                if found:
+                    self.documents[self.documents.index(found[0])] = copy.deepcopy(operation._doc)
+                elif operation._upsert:
+                    self.documents.append(copy.deepcopy(operation._doc))
+            elif kind in ("UpdateOne", "UpdateMany"):
+                targets = found if kind == "UpdateMany" else found[:1]
+                matched += len(targets)
+                for document in targets:
+                    apply_update(document, operation._doc)
+                if not targets and operation._upsert:
+                    self.documents.append(upserted(operation._filter, operation._doc))
+            else:
+                raise ValueError(f"fake_mongo doesn't support {kind}")
+        return FakeResult(matched_count=matched)
+
+class FakeDatabase:
+    def __init__(self):
+        self.collections = {}
+
+    def __getitem__(self, name):
+        return self.collections.setdefault(name, FakeCollection())
+
+    def __getattr__(self, name):
+        if name.startswith("_") or name == "collections":
+            raise AttributeError(name)
+        return self[name]
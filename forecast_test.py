@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+Forecast Test
+
+Exercises backend/forecast.py directly (no server or MongoDB needed):
+1. A paper core and a flat product get the same material requirement rows as
+   the projected order analysis's original per-period loop
+2. Editing a layer material's price invalidates the cached per-unit requirement
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import forecast  # noqa: E402
+from forecast import material_requirements, unit_requirement  # noqa: E402
+
+PROJECTIONS = {"3_months": 1234.57, "6_months": 2469.14, "9_months": 3703.7, "12_months": 5006.17}
+
+MATERIALS = {
+    "material-1": {"id": "material-1", "material_description": "Kraft 180", "supplier": "Visy", "price": 1450.0, "gsm": "180"},
+    "material-2": {"id": "material-2", "supplier": "Orora", "price": 1899.99, "gsm": "120.5"},
+    # No grammage: costed at the price per tonne
+    "material-3": {"id": "material-3", "material_description": "Glassine", "price": 2100, "gsm": ""},
+    "film-1": {"id": "film-1", "material_description": "BOPP 30mu", "cost_per_unit": 0.0415},
+    "film-2": {"id": "film-2", "supplier": "Avery", "cost_per_unit": "0.12"},
+}
+
+CORE_PRODUCT = {
+    "id": "product-core",
+    "product_type": "paper_cores",
+    "core_id": "76.2",
+    "core_width": 1250,
+    "core_thickness": "6",
+    "updated_at": "2026-03-01T00:00:00",
+    "material_layers": [
+        {"material_id": "material-1", "layer_type": "Inner", "thickness": 0.28, "quantity": 4, "width": 110},
+        {"material_id": "material-2", "layer_type": "Middle", "thickness": "0.21", "quantity": 10, "width": 95.5},
+        # No width: no strip length, so costed by area for one core
+        {"material_id": "material-3", "layer_type": "Outer", "thickness": 0.15, "quantity": 1},
+        {"material_id": "material-unknown", "material_name": "Mystery", "thickness": 0.2},
+        {"material_id": "material-1", "thickness": 0},
+        {"material_id": "material-1", "thickness": "thick"},
+    ],
+}
+
+FLAT_PRODUCT = {
+    "id": "product-flat",
+    "product_type": "labels",
+    "width": 330,
+    "length": "1500",
+    "created_at": "2026-02-01T00:00:00",
+    "material_layers": [
+        {"material_id": "film-1", "layer_type": "Face", "thickness": 0.03, "quantity": 2, "gsm": 28},
+        {"material_id": "film-2", "material_name": "Liner", "thickness": "0.05", "width": 340},
+        {"material_name": "No material", "thickness": 0.01},
+        {"material_id": "film-1", "thickness": None, "quantity": "x"},
+    ],
+}
+
+def baseline_core_requirements(product, materials, projections):
+    """The projected order analysis's original paper core loop, one pass per period"""
+    material_layers = product.get("material_layers", [])
+    material_requirements = {}
+    try:
+        core_id_mm = float(product.get("core_id") or 76)
+        core_length_mm = float(product.get("core_width") or product.get("width") or 1200)
+        wall_thickness_mm = float(product.get("core_thickness") or 3)
+        core_id_m = core_id_mm / 1000
+        core_length_m = core_length_mm / 1000
+        inner_radius_m = core_id_m / 2
+    except (TypeError, ValueError):
+        core_id_mm, core_length_mm, wall_thickness_mm = 76, 1200, 3
+        core_length_m, inner_radius_m = 1.2, 0.038
+
+    for period, projected_qty in projections.items():
+        material_requirements[period] = []
+        current_inner_radius = inner_radius_m
+        total_paper_mass_kg = 0
+        total_paper_area_m2 = 0
+        total_strip_length_m = 0
+        total_cost = 0
+
+        for layer_index, layer in enumerate(material_layers):
+            try:
+                material_id = layer.get("material_id")
+                thickness_mm = float(layer.get("thickness") or 0)
+                num_layers = int(layer.get("quantity") or 1)
+                layer_width_mm = float(layer.get("width") or 0)
+            except (TypeError, ValueError):
+                continue
+            if thickness_mm <= 0 or num_layers <= 0:
+                continue
+
+            thickness_m = thickness_mm / 1000
+            layer_width_m = layer_width_mm / 1000 if layer_width_mm > 0 else None
+            total_stream_thickness_m = thickness_m * num_layers
+            stream_inner_radius = current_inner_radius
+            stream_outer_radius = current_inner_radius + total_stream_thickness_m
+            volume_m3 = 3.14159 * core_length_m * ((stream_outer_radius ** 2) - (stream_inner_radius ** 2))
+
+            material_name = layer.get("material_name", "Unknown")
+            layer_type = layer.get("layer_type", f"Layer {layer_index + 1}")
+            gsm = 0
+            material_cost = 0
+            cost_per_meter = 0
+            price_per_tonne = 0
+            linear_metres_per_tonne = 0
+            if material_id:
+                material = materials.get(material_id)
+                if material:
+                    material_name = material.get("material_description", material.get("supplier", material_name))
+                    price_per_tonne = float(material.get("price", 0))
+                    gsm_str = material.get("gsm", "0")
+                    try:
+                        gsm = float(gsm_str) if gsm_str else 0
+                    except (ValueError, TypeError):
+                        gsm = 0
+                    if gsm > 0 and layer_width_m and layer_width_m > 0:
+                        linear_metres_per_tonne = 1000000 / (gsm * layer_width_m)
+                        cost_per_meter = price_per_tonne / linear_metres_per_tonne
+                    else:
+                        cost_per_meter = price_per_tonne
+
+            density_kg_m3 = gsm / thickness_mm if thickness_mm > 0 and gsm > 0 else 0
+            stream_mass_kg = volume_m3 * density_kg_m3
+            stream_area_m2 = volume_m3 / total_stream_thickness_m if total_stream_thickness_m > 0 else 0
+            stream_strip_length_m = stream_area_m2 / layer_width_m if layer_width_m and layer_width_m > 0 else 0
+
+            total_mass_kg = stream_mass_kg * projected_qty
+            total_area_m2 = stream_area_m2 * projected_qty
+            total_length_m = stream_strip_length_m * projected_qty
+            if stream_strip_length_m > 0:
+                material_cost = stream_strip_length_m * cost_per_meter * projected_qty
+            else:
+                material_cost = stream_area_m2 * cost_per_meter
+
+            total_paper_mass_kg += total_mass_kg
+            total_paper_area_m2 += total_area_m2
+            if stream_strip_length_m > 0:
+                total_strip_length_m += total_length_m
+            total_cost += material_cost
+
+            material_requirements[period].append({
+                "layer_order": layer_index + 1,
+                "layer_type": layer_type,
+                "material_id": material_id,
+                "material_name": material_name,
+                "width_mm": layer_width_mm,
+                "thickness_mm": thickness_mm,
+                "gsm": gsm,
+                "num_layers": num_layers,
+                "stream_inner_radius_mm": round(stream_inner_radius * 1000, 2),
+                "stream_outer_radius_mm": round(stream_outer_radius * 1000, 2),
+                "volume_m3_per_core": round(volume_m3, 6),
+                "density_kg_m3": round(density_kg_m3, 2),
+                "mass_kg_per_core": round(stream_mass_kg, 4),
+                "area_m2_per_core": round(stream_area_m2, 4),
+                "strip_length_m_per_core": round(stream_strip_length_m, 2) if stream_strip_length_m > 0 else None,
+                "total_mass_kg": round(total_mass_kg, 2),
+                "total_area_m2": round(total_area_m2, 2),
+                "total_strip_length_m": round(total_length_m, 2) if stream_strip_length_m > 0 else None,
+                "meters_per_core": round(stream_strip_length_m, 2) if stream_strip_length_m > 0 else round(stream_area_m2, 2),
+                "total_meters_needed": round(total_length_m, 2) if stream_strip_length_m > 0 else round(total_area_m2, 2),
+                "price_per_tonne": round(price_per_tonne, 2),
+                "linear_metres_per_tonne": round(linear_metres_per_tonne, 2) if linear_metres_per_tonne > 0 else None,
+                "cost_per_meter": round(cost_per_meter, 4),
+                "cost_per_core": round(stream_strip_length_m * cost_per_meter, 4) if stream_strip_length_m > 0 else round(stream_area_m2 * cost_per_meter, 4),
+                "total_cost": round(material_cost, 2),
+            })
+            current_inner_radius = stream_outer_radius
+
+        outer_diameter_mm = core_id_mm + (2 * wall_thickness_mm)
+        cost_per_core = total_cost / projected_qty if projected_qty > 0 else 0
+        cost_per_metre_of_core = cost_per_core / core_length_m if core_length_m > 0 else 0
+        if material_requirements[period]:
+            material_requirements[period].append({
+                "is_total": True,
+                "outer_diameter_mm": round(outer_diameter_mm, 2),
+                "core_length_m": round(core_length_m, 3),
+                "total_paper_mass_kg": round(total_paper_mass_kg, 2),
+                "total_paper_area_m2": round(total_paper_area_m2, 2),
+                "total_strip_length_m": round(total_strip_length_m, 2) if total_strip_length_m > 0 else None,
+                "total_meters_all_layers": round(total_strip_length_m, 2) if total_strip_length_m > 0 else round(total_paper_area_m2, 2),
+                "total_cost": round(total_cost, 2),
+                "cost_per_core": round(cost_per_core, 4),
+                "cost_per_metre_of_core": round(cost_per_metre_of_core, 4),
+                "projected_quantity": int(projected_qty),
+            })
+    return material_requirements
+
+def baseline_flat_requirements(product, materials, projections):
+    """The projected order analysis's original flat product loop, one pass per period"""
+    material_layers = product.get("material_layers", [])
+    material_requirements = {}
+    try:
+        product_width = float(product.get("width") or 0) / 1000
+        product_length = float(product.get("length") or 0)
+    except (TypeError, ValueError):
+        product_width = 1.0
+        product_length = 100
+
+    for period, projected_qty in projections.items():
+        material_requirements[period] = []
+        total_meters_all_layers = 0
+        for layer_index, layer in enumerate(material_layers):
+            try:
+                material_id = layer.get("material_id")
+                thickness = float(layer.get("thickness") or 0)
+                width = float(layer.get("width") or (product_width * 1000))
+                quantity_per_unit = int(layer.get("quantity") or 1)
+            except (TypeError, ValueError):
+                continue
+
+            meters_per_unit = product_length * quantity_per_unit
+            total_meters = meters_per_unit * projected_qty
+            total_meters_all_layers += total_meters
+            material_name = layer.get("material_name", "Unknown")
+            material_cost = 0
+            cost_per_meter = 0
+            if material_id:
+                material = materials.get(material_id)
+                if material:
+                    material_name = material.get("material_description", material.get("supplier", material_name))
+                    cost_per_meter = float(material.get("cost_per_unit", 0))
+                    material_cost = total_meters * cost_per_meter
+
+            material_requirements[period].append({
+                "layer_order": layer_index + 1,
+                "layer_type": layer.get("layer_type", f"Layer {layer_index + 1}"),
+                "material_id": material_id,
+                "material_name": material_name,
+                "width_mm": width,
+                "thickness_mm": thickness,
+                "gsm": layer.get("gsm", 0),
+                "laps_per_core": quantity_per_unit,
+                "meters_per_core": round(meters_per_unit, 2),
+                "total_meters_needed": round(total_meters, 2),
+                "cost_per_meter": round(cost_per_meter, 4),
+                "total_cost": round(material_cost, 2),
+            })
+        if material_requirements[period]:
+            material_requirements[period].append({
+                "is_total": True,
+                "total_meters_all_layers": round(total_meters_all_layers, 2),
+            })
+    return material_requirements
+
+def assert_same_rows(actual, expected):
+    assert list(actual) == list(expected)
+    for period in expected:
+        assert len(actual[period]) == len(expected[period]), period
+        for actual_row, expected_row in zip(actual[period], expected[period]):
+            assert actual_row == expected_row, f"{period}: {actual_row} != {expected_row}"
+
+def test_core_product_matches_baseline():
+    forecast._unit_requirements.clear()
+    expected = baseline_core_requirements(CORE_PRODUCT, MATERIALS, PROJECTIONS)
+    actual = material_requirements(unit_requirement(CORE_PRODUCT, MATERIALS), PROJECTIONS)
+    assert_same_rows(actual, expected)
+    assert len(expected["3_months"]) == 5, "four costed layers and a total row"
+
+def test_flat_product_matches_baseline():
+    forecast._unit_requirements.clear()
+    expected = baseline_flat_requirements(FLAT_PRODUCT, MATERIALS, PROJECTIONS)
+    actual = material_requirements(unit_requirement(FLAT_PRODUCT, MATERIALS), PROJECTIONS)
+    assert_same_rows(actual, expected)
+    assert len(expected["3_months"]) == 4, "three parsed layers and a total row"
+
+def test_material_price_edit_invalidates_cache():
+    forecast._unit_requirements.clear()
+    materials = {material_id: dict(material) for material_id, material in MATERIALS.items()}
+    for product in (CORE_PRODUCT, FLAT_PRODUCT):
+        unit = unit_requirement(product, materials)
+        assert unit_requirement(product, {material_id: dict(material) for material_id, material in materials.items()}) is unit, \
+            "an unchanged product and materials reuse the cached unit"
+
+    materials["material-2"]["price"] = 2250.0
+    materials["film-1"]["cost_per_unit"] = 0.05
+    core_unit = unit_requirement(CORE_PRODUCT, materials)
+    assert core_unit["layers"][1]["price_per_tonne"] == 2250.0, "a cached unit outlived its material's price"
+    assert_same_rows(
+        material_requirements(core_unit, PROJECTIONS),
+        baseline_core_requirements(CORE_PRODUCT, materials, PROJECTIONS),
+    )
+    assert_same_rows(
+        material_requirements(unit_requirement(FLAT_PRODUCT, materials), PROJECTIONS),
+        baseline_flat_requirements(FLAT_PRODUCT, materials, PROJECTIONS),
+    )
+
+def main():
+    tests = [
+        test_core_product_matches_baseline,
+        test_flat_product_matches_baseline,
+        test_material_price_edit_invalidates_cache,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} forecast tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
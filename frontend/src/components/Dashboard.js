@@ -38,7 +38,7 @@ const Dashboard = () => {
       setLoading(true);
       
       const [ordersRes, clientsRes, boardRes, reportsRes] = await Promise.all([
-        apiHelpers.getOrders(),
+        apiHelpers.getOrderSummaries(),
         hasPermission('manage_clients') ? apiHelpers.getClients() : Promise.resolve({ data: [] }),
         hasPermission('update_production') ? apiHelpers.getProductionBoard() : Promise.resolve({ data: { data: {} } }),
         hasPermission('view_reports') ? apiHelpers.getOutstandingJobsReport() : Promise.resolve({ data: { data: {} } })
@@ -80,7 +80,7 @@ const Dashboard = () => {
       
       switch (cardType) {
         case 'totalOrders':
-          const ordersRes = await apiHelpers.getOrders();
+          const ordersRes = await apiHelpers.getOrderSummaries();
           data = ordersRes.data.map(order => ({
             id: order.id,
             orderNumber: order.order_number,
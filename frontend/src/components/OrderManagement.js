@@ -33,7 +33,7 @@ const OrderManagement = () => {
   const loadOrders = async () => {
     try {
       setLoading(true);
-      const response = await apiHelpers.getOrders(statusFilter);
+      const response = await apiHelpers.getOrderSummaries(statusFilter);
       setOrders(response.data);
     } catch (error) {
       console.error('Failed to load orders:', error);
@@ -48,13 +48,29 @@ const OrderManagement = () => {
     setShowOrderModal(true);
   };
 
-  const handleEditOrder = (order) => {
-    setSelectedOrder(order);
+  // The list only holds order summaries; load the full order before editing or viewing
+  const loadFullOrder = async (order) => {
+    try {
+      const response = await apiHelpers.getOrder(order.id);
+      return response.data;
+    } catch (error) {
+      console.error('Failed to load order:', error);
+      toast.error('Failed to load order');
+      return null;
+    }
+  };
+
+  const handleEditOrder = async (order) => {
+    const fullOrder = await loadFullOrder(order);
+    if (!fullOrder) return;
+    setSelectedOrder(fullOrder);
     setShowOrderModal(true);
   };
 
-  const handleViewOrder = (order) => {
-    setSelectedOrder(order);
+  const handleViewOrder = async (order) => {
+    const fullOrder = await loadFullOrder(order);
+    if (!fullOrder) return;
+    setSelectedOrder(fullOrder);
     setShowDetailsModal(true);
   };
 
@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import Layout from './Layout';
 import JobCard from './JobCard';
 import { apiHelpers, stageDisplayNames, stageColors, formatCurrency, formatDate } from '../utils/api';
@@ -18,6 +18,10 @@ import {
   ClockIcon
 } from '@heroicons/react/24/outline';
 
+// Production event stream events that change what the board shows
+const BOARD_EVENTS = ['stage_changed', 'jobs_reordered', 'materials_status', 'item_status', 'orders_changed', 'resync'];
+const STREAM_RETRY_MS = 5000;
+
 // Custom Jumping Man Icon Component
 const JumpingManIcon = ({ className = "h-5 w-5" }) => (
   <svg 
@@ -49,21 +53,73 @@ const ProductionBoard = () => {
   const [showJobCard, setShowJobCard] = useState(false);
   const [selectedJobCard, setSelectedJobCard] = useState({ jobId: null, stage: null, orderId: null });
 
+  const showJobCardRef = useRef(showJobCard);
+  const refreshPendingRef = useRef(false);
+
+  useEffect(() => {
+    showJobCardRef.current = showJobCard;
+    // Catch up on changes that arrived while the job card was open
+    if (!showJobCard && refreshPendingRef.current) {
+      refreshPendingRef.current = false;
+      loadProductionBoard();
+    }
+  }, [showJobCard]);
+
   useEffect(() => {
     loadProductionBoard();
-    
-    const interval = setInterval(() => {
+
+    // Live updates from /production/events. A ticket opens one stream, so
+    // EventSource can't reconnect by itself: on an error the stream is
+    // reopened with a fresh ticket and the last event id it saw.
+    let source = null;
+    let reconnectTimer = null;
+    let lastEventId = null;
+    let reconnecting = false;
+    let closed = false;
+
+    const onBoardEvent = (event) => {
+      if (event.lastEventId) lastEventId = event.lastEventId;
       // Only refresh if no job card is currently open
-      if (!showJobCard) {
-        console.log('Auto-refreshing production board (no job card open)');
-        loadProductionBoard();
+      if (showJobCardRef.current) {
+        refreshPendingRef.current = true;
       } else {
-        console.log('Skipping auto-refresh (job card is open)');
+        loadProductionBoard();
       }
-    }, 30000); // Check every 30 seconds
-    
-    return () => clearInterval(interval);
-  }, [showJobCard]);
+    };
+
+    const connect = async () => {
+      try {
+        const response = await apiHelpers.createProductionEventsTicket();
+        if (closed) return;
+        source = new EventSource(apiHelpers.productionEventsUrl(response.data.data.ticket, lastEventId));
+        BOARD_EVENTS.forEach(type => source.addEventListener(type, onBoardEvent));
+        if (reconnecting && !lastEventId) {
+          // Nothing to replay from, so reload in case anything was missed
+          onBoardEvent({});
+        }
+        source.onerror = () => {
+          source.close();
+          scheduleReconnect();
+        };
+      } catch (error) {
+        console.error('Failed to open production event stream:', error);
+        scheduleReconnect();
+      }
+    };
+
+    const scheduleReconnect = () => {
+      reconnecting = true;
+      if (!closed) reconnectTimer = setTimeout(connect, STREAM_RETRY_MS);
+    };
+
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (source) source.close();
+    };
+  }, []);
 
   const loadProductionBoard = async () => {
     try {
@@ -166,6 +222,9 @@ const ProductionBoard = () => {
       const jobOrder = jobs.map(job => job.id);
       await apiHelpers.reorderJobs({
         stage: stageKey,
+        order_id: removed.id,
+        previous_id: jobs[destination.index - 1]?.id || null,
+        next_id: jobs[destination.index + 1]?.id || null,
         job_order: jobOrder
       });
       toast.success('Job order updated successfully');
@@ -450,7 +450,7 @@ const Reports = () => {
   
   const loadCompletedOrders = async () => {
     try {
-      const response = await apiHelpers.getOrders();
+      const response = await apiHelpers.getOrderSummaries();
       const completed = response.data.filter(order => 
         order.status === 'completed' || order.current_stage === 'cleared'
       );
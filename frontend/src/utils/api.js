@@ -108,7 +108,8 @@ export const apiHelpers = {
   copyClientProduct: (clientId, productId, targetClientId) => api.post(`/clients/${clientId}/catalog/${productId}/copy-to/${targetClientId}`),
   
   // Orders
-  getOrders: (statusFilter) => api.get('/orders', { params: { status_filter: statusFilter } }),
+  getOrders: (statusFilter, view) => api.get('/orders', { params: { status_filter: statusFilter, view } }),
+  getOrderSummaries: (statusFilter) => api.get('/orders', { params: { status_filter: statusFilter, view: 'summary' } }),
   createOrder: (data) => api.post('/orders', data),
   getOrder: (id) => api.get(`/orders/${id}`),
   deleteOrder: (id) => api.delete(`/orders/${id}`),
@@ -122,6 +123,13 @@ export const apiHelpers = {
   // Production Board
   getProductionBoard: () => api.get('/production/board'),
   getProductionLogs: (orderId) => api.get(`/production/logs/${orderId}`),
+  createProductionEventsTicket: () => api.post('/production/events/ticket'),
+  // EventSource can't send the Authorization header, so the stream is opened with a single-use ticket
+  productionEventsUrl: (ticket, lastEventId) => {
+    const params = new URLSearchParams({ ticket });
+    if (lastEventId) params.set('last_event_id', lastEventId);
+    return `${BACKEND_URL}/api/production/events?${params.toString()}`;
+  },
   moveOrderStage: (orderId, data) => api.post(`/production/move-stage/${orderId}`, data),
   jumpToStage: (orderId, data) => api.post(`/production/jump-stage/${orderId}`, data),
   reorderJobs: (data) => api.put('/orders/reorder', data),
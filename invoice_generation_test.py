@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Invoice Generation Test
+
+Calls generate_job_invoice from backend/server.py directly, with the module's
+db swapped for an in-memory stand-in (no running server or MongoDB needed):
+1. A first full invoice takes its number from the invoice counter
+2. Partial invoices reuse the base number with a ~N suffix
+3. With Xero connected the Xero number is stored alongside, not instead of, ours
+"""
+
+import asyncio
+import os
+import sys
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "invoice_generation_test")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import server  # noqa: E402
+from counters import COUNTERS_COLLECTION, INVOICE_COUNTER_NAME  # noqa: E402
+from fake_mongo import FakeDatabase  # noqa: E402
+
+CURRENT_USER = {"user_id": "user-1", "role": "admin"}
+
+def make_job(job_id="job-1"):
+    return {
+        "id": job_id,
+        "order_number": f"ADM-2026-{job_id[-1]}",
+        "client_id": "client-1",
+        "client_name": "Acme Labels",
+        "current_stage": "invoicing",
+        "status": "active",
+        "items": [
+            {"product_id": "product-1", "product_name": "Core 76mm", "quantity": 100, "unit_price": 1.0},
+        ],
+        "subtotal": 100.0,
+        "gst": 10.0,
+        "total_amount": 110.0,
+    }
+
+def make_db(*jobs):
+    db = FakeDatabase()
+    db.orders.documents = [make_job(job_id) for job_id in jobs]
+    db.clients.documents = [{"id": "client-1", "company_name": "Acme Labels", "email": "accounts@acme.test"}]
+    return db
+
+def run_with_db(db, coroutine_factory, xero_calls=None):
+    """Run coroutine_factory() with server.db and its side-effect helpers patched"""
+    async def refresh_rollups(db, order_ids=(), invoice_ids=()):
+        pass
+
+    async def get_next_xero_invoice_number():
+        return {"formatted_number": "XERO-0042"}
+
+    async def create_xero_draft_invoice(data):
+        if xero_calls is not None:
+            xero_calls.append(data)
+        return {"invoice_id": "xero-invoice-1"}
+
+    patched = {
+        "db": db,
+        "refresh_rollups": refresh_rollups,
+        "get_next_xero_invoice_number": get_next_xero_invoice_number,
+        "create_xero_draft_invoice": create_xero_draft_invoice,
+    }
+    original = {name: getattr(server, name) for name in patched}
+    for name, value in patched.items():
+        setattr(server, name, value)
+    try:
+        return asyncio.run(coroutine_factory())
+    finally:
+        for name, value in original.items():
+            setattr(server, name, value)
+
+def test_full_invoice_numbers_from_counter():
+    db = make_db("job-1", "job-2")
+
+    async def run():
+        first = await server.generate_job_invoice("job-1", {"invoice_type": "full"}, CURRENT_USER)
+        second = await server.generate_job_invoice("job-2", {"invoice_type": "full"}, CURRENT_USER)
+        return first, second
+
+    first, second = run_with_db(db, run)
+    assert first["invoice_number"] == "INV-0001", first
+    assert second["invoice_number"] == "INV-0002", second
+    assert db[COUNTERS_COLLECTION].documents == [{"_id": INVOICE_COUNTER_NAME, "seq": 2}]
+    assert [invoice["invoice_number"] for invoice in db.invoices.documents] == ["INV-0001", "INV-0002"]
+    assert db.orders.documents[0]["current_stage"] == "accounting_transaction"
+
+def test_partial_invoices_share_base_number():
+    db = make_db("job-1")
+    partial = {
+        "invoice_type": "partial",
+        "items": [{"product_id": "product-1", "product_name": "Core 76mm", "quantity": 40}],
+    }
+
+    async def run():
+        first = await server.generate_job_invoice("job-1", partial, CURRENT_USER)
+        second = await server.generate_job_invoice("job-1", partial, CURRENT_USER)
+        return first, second
+
+    first, second = run_with_db(db, run)
+    assert first["invoice_number"] == "INV-0001~1", first
+    assert second["invoice_number"] == "INV-0001~2", second
+    assert db[COUNTERS_COLLECTION].documents == [{"_id": INVOICE_COUNTER_NAME, "seq": 1}]
+    assert db.orders.documents[0]["partially_invoiced"] is True
+
+def test_xero_draft_keeps_our_invoice_number():
+    db = make_db("job-1")
+    db.xero_tokens.documents = [{"user_id": "system", "access_token": "token"}]
+    xero_calls = []
+
+    async def run():
+        return await server.generate_job_invoice("job-1", {"invoice_type": "full"}, CURRENT_USER)
+
+    result = run_with_db(db, run, xero_calls)
+    assert result["invoice_number"] == "INV-0001", result
+    assert [call["invoice_number"] for call in xero_calls] == ["XERO-0042"]
+    invoice = db.invoices.documents[0]
+    assert invoice["invoice_number"] == "INV-0001"
+    assert invoice["xero_invoice_number"] == "XERO-0042"
+    assert invoice["xero_invoice_id"] == "xero-invoice-1"
+
+def main():
+    tests = [
+        test_full_invoice_numbers_from_counter,
+        test_partial_invoices_share_base_number,
+        test_xero_draft_keeps_our_invoice_number,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} invoice generation tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Job Costing Test
+
+Exercises backend/job_costing.py, and the profitability report in
+backend/server.py that reads its ledger, against the shared in-memory Mongo
+stand-in (no running server or MongoDB needed):
+1. job_cost gives the same figures as the report's original per-order calculation
+2. Orders that are no longer completed are removed from the job_costs ledger
+3. exact_totals is dropped from every job before the report goes out
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "job_costing_test")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+import server  # noqa: E402
+from fake_mongo import FakeDatabase  # noqa: E402
+from job_costing import JOB_COSTS_COLLECTION, job_cost, load_cost_inputs, record_job_costs  # noqa: E402
+from models import ProfitabilityReportRequest  # noqa: E402
+
+CURRENT_USER = {"user_id": "user-1", "role": "admin"}
+
+def make_order(order_id, **changes):
+    number = int(order_id[-1])
+    order = {
+        "id": order_id,
+        "order_number": f"ADM-2026-{number:04d}",
+        "client_id": "client-1",
+        "client_name": "Acme Labels",
+        "status": "completed",
+        "current_stage": "cleared",
+        "created_at": datetime(2026, 3, number),
+        "completed_at": datetime(2026, 3, number + 5),
+        "items": [
+            {"product_id": "product-1", "quantity": 1000 * number, "unit_price": 0.85},
+            {"product_id": "product-2", "quantity": 250, "unit_price": 1.1 + number / 7},
+        ],
+    }
+    order.update(changes)
+    return order
+
+def make_db():
+    db = FakeDatabase()
+    db.orders.documents = [
+        make_order("order-1"),
+        make_order("order-2"),
+        # No job card or timesheets: revenue and consumables only
+        make_order("order-3"),
+    ]
+    db.job_cards.documents = [
+        {
+            "order_id": order_id,
+            "calculations": {"totalLengthRequired": 1234.5 * factor, "goodMaterialLength": 1100 * factor, "makereadyLength": 80, "wasteLength": 54.5},
+            "product_specs": {"material_layers": [
+                {"material_id": "material-1", "material_name": "Kraft", "layer_type": "Inner", "width": 75, "gsm": 180, "thickness": 210},
+                {"material_id": "material-2", "material_name": "Liner", "layer_type": "Outer", "width": 80.5, "gsm": 120},
+                {"material_id": "material-missing", "width": 60, "gsm": 90},
+            ]},
+            "machine_usage": [
+                {"machine_id": "machine-1", "runtime_minutes": 95 * factor},
+                {"machine_id": "machine-missing", "runtime_minutes": 30},
+            ],
+        }
+        for order_id, factor in (("order-1", 1), ("order-2", 3))
+    ]
+    db.timesheets.documents = [
+        {"order_id": "order-1", "employee_id": "employee-1", "entries": [{"regular_hours": 7.6, "overtime_hours": 1.5}, {"regular_hours": 4}]},
+        {"order_id": "order-1", "employee_id": "employee-2", "entries": [{"regular_hours": 3.25}]},
+        # Hours without a known employee count towards profit per hour, not labour cost
+        {"order_id": "order-2", "employee_id": "employee-missing", "entries": [{"regular_hours": 6, "overtime_hours": 2}]},
+        {"order_id": "order-2", "employee_id": "employee-1", "entries": [{"regular_hours": 2.5, "overtime_hours": 0.75}]},
+    ]
+    db.materials.documents = [{"id": "material-1", "price": 1450.0}, {"id": "material-2", "price": "1899.99"}]
+    db.employee_profiles.documents = [{"id": "employee-1", "hourly_rate": 32.15}, {"id": "employee-2", "hourly_rate": 41}]
+    db.machinery_rates.documents = [{"id": "machine-1", "hourly_rate": 118.0}]
+    db.client_products.documents = [
+        {"id": "product-1", "consumables": [{"cost_per_unit": 0.013, "quantity_per_unit": 2}, {"cost_per_unit": 0.002}]},
+        {"id": "product-2", "consumables": []},
+    ]
+    return db
+
+async def baseline_job_cost(db, order):
+    """The profitability report's original per-order calculation, one query per lookup"""
+    order_id = order.get("id")
+    job_revenue = 0
+    for item in order.get("items", []):
+        job_revenue += (item.get("unit_price") or 0) * (item.get("quantity") or 0)
+
+    material_cost = 0
+    material_layers_breakdown = []
+    job_card = await db.job_cards.find_one({"order_id": order_id})
+    if job_card:
+        calculations = job_card.get("calculations", {})
+        total_length_m = float(calculations.get("totalLengthRequired") or 0)
+        good_length_m = float(calculations.get("goodMaterialLength") or 0)
+        makeready_length_m = float(calculations.get("makereadyLength") or 0)
+        waste_length_m = float(calculations.get("wasteLength") or 0)
+        for layer in job_card.get("product_specs", {}).get("material_layers", []):
+            layer_width_mm = float(layer.get("width") or 0)
+            layer_gsm = float(layer.get("gsm") or 0)
+            material_doc = await db.materials.find_one({"id": layer.get("material_id")})
+            price_per_tonne = float(material_doc.get("price") or 0) if material_doc else 0
+            weight_kg = (layer_width_mm / 1000.0 * total_length_m * layer_gsm) / 1000.0
+            layer_cost = (weight_kg / 1000.0) * price_per_tonne
+            material_cost += layer_cost
+            material_layers_breakdown.append({
+                "layer_type": layer.get("layer_type", "Unknown"),
+                "material_name": layer.get("material_name", "Unknown"),
+                "supplier": layer.get("supplier", "Unknown"),
+                "width_mm": layer_width_mm,
+                "thickness_microns": float(layer.get("thickness") or 0),
+                "gsm": layer_gsm,
+                "linear_meters_consumed": round(total_length_m, 2),
+                "good_material_meters": round(good_length_m, 2),
+                "makeready_meters": round(makeready_length_m, 2),
+                "waste_meters": round(waste_length_m, 2),
+                "weight_kg": round(weight_kg, 3),
+                "price_per_tonne": round(price_per_tonne, 2),
+                "layer_cost_aud": round(layer_cost, 2),
+            })
+
+    labour_cost = 0
+    timesheets = await db.timesheets.find({"order_id": order_id}).to_list(length=None)
+    for timesheet in timesheets:
+        employee = await db.employee_profiles.find_one({"id": timesheet.get("employee_id")})
+        if employee:
+            hourly_rate = float(employee.get("hourly_rate") or 0)
+            for entry in timesheet.get("entries", []):
+                regular_hours = float(entry.get("regular_hours") or 0)
+                overtime_hours = float(entry.get("overtime_hours") or 0)
+                labour_cost += (regular_hours * hourly_rate) + (overtime_hours * hourly_rate * 1.5)
+
+    machine_cost = 0
+    overhead_cost = 0
+    if job_card:
+        for machine in job_card.get("machine_usage", []):
+            machinery = await db.machinery_rates.find_one({"id": machine.get("machine_id")})
+            if machinery:
+                machine_cost += (float(machine.get("runtime_minutes") or 0) / 60.0) * float(machinery.get("hourly_rate") or 0)
+        overhead_cost = machine_cost
+
+    consumables_cost = 0
+    for item in order.get("items", []):
+        quantity = item.get("quantity") or 0
+        client_product = await db.client_products.find_one({"id": item.get("product_id")})
+        if client_product:
+            for consumable in client_product.get("consumables", []):
+                consumables_cost += quantity * float(consumable.get("quantity_per_unit") or 1) * float(consumable.get("cost_per_unit") or 0)
+
+    total_production_cost = material_cost + labour_cost + machine_cost + consumables_cost
+    gross_profit = job_revenue - (material_cost + labour_cost + machine_cost + consumables_cost)
+    gp_percentage = (gross_profit / job_revenue * 100) if job_revenue > 0 else 0
+    gross_profit_proper = job_revenue - (material_cost + labour_cost + consumables_cost)
+    net_profit = gross_profit_proper - machine_cost
+    np_percentage = (net_profit / job_revenue * 100) if job_revenue > 0 else 0
+
+    profit_per_hour = 0
+    if job_card:
+        total_hours = 0
+        for timesheet in timesheets:
+            for entry in timesheet.get("entries", []):
+                total_hours += float(entry.get("regular_hours", 0)) + float(entry.get("overtime_hours", 0))
+        profit_per_hour = (net_profit / total_hours) if total_hours > 0 else 0
+
+    return {
+        "order_id": order_id,
+        "order_number": order.get("order_number", "Unknown"),
+        "client_name": order.get("client_name", "Unknown"),
+        "job_revenue": round(job_revenue, 2),
+        "material_cost": round(material_cost, 2),
+        "material_layers_breakdown": material_layers_breakdown,
+        "labour_cost": round(labour_cost, 2),
+        "machine_cost": round(machine_cost, 2),
+        "consumables_cost": round(consumables_cost, 2),
+        "total_production_cost": round(total_production_cost, 2),
+        "gross_profit": round(gross_profit_proper, 2),
+        "gp_percentage": round(gp_percentage, 2),
+        "overhead_cost": round(overhead_cost, 2),
+        "net_profit": round(net_profit, 2),
+        "np_percentage": round(np_percentage, 2),
+        "profit_per_hour": round(profit_per_hour, 2),
+        "completed_at": order.get("completed_at"),
+    }
+
+def test_job_cost_matches_baseline():
+    async def run():
+        db = make_db()
+        orders = db.orders.documents
+        inputs = await load_cost_inputs(db, orders)
+        for order in orders:
+            expected = await baseline_job_cost(db, order)
+            actual = job_cost(order, inputs)
+            exact_totals = actual.pop("exact_totals")
+            assert actual == expected, f"{order['id']}: {actual} != {expected}"
+            assert round(exact_totals["net_profit"], 2) == expected["net_profit"]
+        assert expected["material_cost"] == 0 and expected["consumables_cost"] > 0, "order-3 has no job card"
+    asyncio.run(run())
+
+def test_uncompleted_orders_leave_ledger():
+    async def run():
+        db = make_db()
+        written = await record_job_costs(db, ["order-1", "order-2", "order-3"])
+        ledger = db[JOB_COSTS_COLLECTION].documents
+        assert written == 3 and sorted(entry["order_id"] for entry in ledger) == ["order-1", "order-2", "order-3"]
+
+        # order-2 is reopened and order-3 deleted outright
+        db.orders.documents[1].update({"status": "active", "current_stage": "winding"})
+        db.orders.documents.pop(2)
+        written = await record_job_costs(db, ["order-2", "order-3"])
+        assert written == 0
+        assert [entry["order_id"] for entry in ledger] == ["order-1"]
+
+        # Recosting a completed order replaces its entry rather than adding one
+        db.timesheets.documents.append({"order_id": "order-1", "employee_id": "employee-2", "entries": [{"regular_hours": 1}]})
+        labour_cost = ledger[0]["labour_cost"]
+        await record_job_costs(db, ["order-1"])
+        assert len(ledger) == 1 and ledger[0]["labour_cost"] == round(labour_cost + 41, 2)
+    asyncio.run(run())
+
+def test_exact_totals_dropped_from_report():
+    async def run():
+        db = make_db()
+        await record_job_costs(db, ["order-1", "order-2", "order-3"])
+        expected = [await baseline_job_cost(db, order) for order in db.orders.documents]
+
+        original_db = server.db
+        server.db = db
+        try:
+            ledger_report = await server.generate_profitability_report(ProfitabilityReportRequest(), CURRENT_USER)
+            live_report = await server.generate_profitability_report(
+                ProfitabilityReportRequest(order_ids=["order-1", "order-2", "order-3"]), CURRENT_USER
+            )
+        finally:
+            server.db = original_db
+
+        for report in (ledger_report, live_report):
+            jobs = report.data["profitability_data"]
+            assert all("exact_totals" not in job for job in jobs), "exact_totals must not reach the response"
+            assert sorted(job["order_id"] for job in jobs) == ["order-1", "order-2", "order-3"]
+            assert report.data["summary"]["total_jobs"] == 3
+            assert round(report.data["summary"]["total_net_profit"] - sum(job["net_profit"] for job in expected), 2) in (-0.01, 0, 0.01)
+        assert ledger_report.data["summary"] == live_report.data["summary"]
+    asyncio.run(run())
+
+def main():
+    tests = [
+        test_job_cost_matches_baseline,
+        test_uncompleted_orders_leave_ledger,
+        test_exact_totals_dropped_from_report,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} job costing tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Job Executor Test
+
+Exercises backend/job_executor.py directly with small pools (no server needed):
+1. A short job queued behind a long one that fills the pool still completes
+   within its own timeout, which only starts once a worker picks it up
+2. A job that really runs past its timeout still times out
+3. The same holds for the process pool
+4. PDF renders have their own process pool, so they don't wait behind a plan
+"""
+
+import asyncio
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from job_executor import JobExecutor  # noqa: E402
+
+LONG_JOB_SECONDS = 1.0
+SHORT_JOB_TIMEOUT = 0.5
+
+def test_short_job_waits_for_free_thread():
+    async def run():
+        executor = JobExecutor(process_workers=1, thread_workers=1)
+        try:
+            long_job = asyncio.ensure_future(executor.run_in_thread("planner", time.sleep, LONG_JOB_SECONDS))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            result = await executor.run_in_thread("calculator", math.factorial, 10, timeout=SHORT_JOB_TIMEOUT)
+            waited = time.monotonic() - started
+            await long_job
+            return result, waited
+        finally:
+            executor.shutdown()
+
+    result, waited = asyncio.run(run())
+    assert result == 3628800
+    assert waited > SHORT_JOB_TIMEOUT, "the short job should have queued behind the long one"
+
+def test_running_job_still_times_out():
+    async def run():
+        executor = JobExecutor(process_workers=1, thread_workers=1)
+        try:
+            await executor.run_in_thread("calculator", time.sleep, LONG_JOB_SECONDS, timeout=0.1)
+        except asyncio.TimeoutError:
+            return executor.stats()["job_types"]["calculator"]["timed_out"]
+        finally:
+            executor.shutdown()
+        return 0
+
+    assert asyncio.run(run()) == 1
+
+def test_short_job_waits_for_free_process():
+    async def run():
+        executor = JobExecutor(process_workers=1, thread_workers=1)
+        try:
+            # Start the worker process first so spawn time isn't part of the test
+            await executor.run_in_process("calculator", math.factorial, 1)
+            long_job = asyncio.ensure_future(executor.run_in_process("planner", time.sleep, LONG_JOB_SECONDS))
+            await asyncio.sleep(0.05)
+            result = await executor.run_in_process("calculator", math.factorial, 10, timeout=SHORT_JOB_TIMEOUT)
+            await long_job
+            return result
+        finally:
+            executor.shutdown()
+
+    assert asyncio.run(run()) == 3628800
+
+def test_pdf_jobs_skip_the_shared_process_pool():
+    async def run():
+        executor = JobExecutor(process_workers=1, thread_workers=1, pdf_process_workers=1)
+        try:
+            # Start both pools' worker processes first so spawn time isn't part of the test
+            await executor.run_in_process("calculator", math.factorial, 1)
+            await executor.run_in_process("pdf", math.factorial, 1)
+            long_job = asyncio.ensure_future(executor.run_in_process("planner", time.sleep, LONG_JOB_SECONDS))
+            await asyncio.sleep(0.05)
+            started = time.monotonic()
+            result = await executor.run_in_process("pdf", math.factorial, 10, timeout=SHORT_JOB_TIMEOUT)
+            waited = time.monotonic() - started
+            await long_job
+            return result, waited
+        finally:
+            executor.shutdown()
+
+    result, waited = asyncio.run(run())
+    assert result == 3628800
+    assert waited < SHORT_JOB_TIMEOUT, f"the PDF job waited {waited:.2f}s behind the planner"
+
+def main():
+    tests = [
+        test_short_job_waits_for_free_thread,
+        test_running_job_still_times_out,
+        test_short_job_waits_for_free_process,
+        test_pdf_jobs_skip_the_shared_process_pool,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} job executor tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
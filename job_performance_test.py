@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Job Card Performance Test
+
+Exercises backend/job_performance.py directly (no server or MongoDB needed):
+1. Metrics merged batch by batch give the same report as one big batch
+2. Job type and client breakdowns add up across batches
+"""
+
+import os
+import sys
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from job_performance import (  # noqa: E402
+    empty_job_card_metrics,
+    job_card_batch_metrics,
+    job_card_performance,
+    merge_job_card_metrics,
+)
+
+PRODUCTS = {
+    "product-1": {"id": "product-1", "product_type": "Spiral Paper Core", "material_layers": [{"quantity": 0.5}]},
+    "product-2": {"id": "product-2", "product_type": "Composite Can", "material_layers": [{"quantity": 0.2}, {"quantity": 0.1}]},
+}
+
+def make_orders(count):
+    start = datetime(2026, 3, 1)
+    orders = []
+    for number in range(count):
+        completed_at = start + timedelta(days=number, hours=8)
+        orders.append({
+            "id": f"order-{number}",
+            "order_number": f"ADM-2026-{number:04d}",
+            "client_id": f"client-{number % 3}",
+            "client_name": f"Client {number % 3}",
+            "created_at": start + timedelta(days=number),
+            "due_date": start + timedelta(days=number, hours=4 + number % 8),
+            "completed_at": completed_at,
+            "items": [{"product_id": f"product-{1 + number % 2}", "quantity": 10 + number}],
+        })
+    return orders
+
+def lookups(orders):
+    logs, movements, stock = {}, {}, {}
+    for number, order in enumerate(orders):
+        order_id, created_at = order["id"], order["created_at"]
+        logs[order_id] = [
+            {"order_id": order_id, "timestamp": created_at, "from_stage": None, "to_stage": "paper_slitting"},
+            {"order_id": order_id, "timestamp": created_at + timedelta(hours=2), "from_stage": "paper_slitting", "to_stage": "winding"},
+            {"order_id": order_id, "timestamp": created_at + timedelta(hours=5), "from_stage": "winding", "to_stage": "cleared"},
+        ]
+        movements[order_id] = [{"reference_id": order_id, "quantity_change": -(8.0 + number), "stock_id": "stock-1", "stock_type": "paper"}]
+        stock[order_id] = [{"source_order_id": order_id, "quantity_on_hand": 5 + number, "product_description": "Cores"}]
+    return logs, movements, stock
+
+def report_in_batches(orders, batch_size):
+    logs, movements, stock = lookups(orders)
+    metrics = empty_job_card_metrics()
+    for offset in range(0, len(orders), batch_size):
+        batch = orders[offset:offset + batch_size]
+        ids = {order["id"] for order in batch}
+        merge_job_card_metrics(metrics, job_card_batch_metrics(
+            batch,
+            {key: value for key, value in logs.items() if key in ids},
+            {key: value for key, value in movements.items() if key in ids},
+            PRODUCTS,
+            {key: value for key, value in stock.items() if key in ids},
+        ))
+    return job_card_performance(metrics)
+
+def by_key(rows, key):
+    return {row[key]: row for row in rows}
+
+def test_batched_report_matches_single_batch():
+    orders = make_orders(25)
+    whole = report_in_batches(orders, len(orders))
+    batched = report_in_batches(orders, 4)
+    assert batched["job_cards"] == whole["job_cards"]
+    assert batched["averages"] == whole["averages"]
+    assert by_key(batched["job_type_breakdown"], "product_type") == by_key(whole["job_type_breakdown"], "product_type")
+    assert by_key(batched["client_performance"], "client_id") == by_key(whole["client_performance"], "client_id")
+
+def test_breakdowns_add_up():
+    report = report_in_batches(make_orders(25), 4)
+    averages = report["averages"]
+    assert averages["total_jobs_completed"] == 25
+    assert averages["jobs_on_time"] + averages["jobs_delayed"] == 25
+    assert sum(row["job_count"] for row in report["client_performance"]) == 25
+    assert sum(row["job_count"] for row in report["job_type_breakdown"]) == 25
+    assert averages["average_time_per_job_hours"] == 5.0
+    assert report["job_cards"][0]["order_number"] == "ADM-2026-0024", "most recently completed first"
+
+def test_no_orders():
+    report = job_card_performance(empty_job_card_metrics())
+    assert report["job_cards"] == []
+    assert report["averages"]["total_jobs_completed"] == 0
+    assert report["averages"]["efficiency_score_percentage"] == 0
+
+def main():
+    tests = [
+        test_batched_report_matches_single_batch,
+        test_breakdowns_add_up,
+        test_no_orders,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} job card performance tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Keyset Pagination Test
+
+Exercises backend/pagination.py's find_page against an in-memory collection
+that filters and sorts the way MongoDB does: values of different BSON types
+sort by type, and $gt/$lt only match values of the operand's own type
+(no server or MongoDB needed):
+1. Paging through a field with missing, null, number, string and date values
+   returns every row exactly once, in MongoDB's order, in both directions
+2. A single-type sort field still pages every row exactly once
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fake_mongo import MISSING, FakeCollection  # noqa: E402
+from pagination import NEXT_CURSOR_HEADER, PageParams, find_page  # noqa: E402
+
+def mixed_documents():
+    values = [
+        MISSING, None, MISSING, 3, 3, 1.5, 10, "apple", "banana", "apple",
+        datetime(2026, 1, 1), datetime(2025, 6, 1), datetime(2026, 1, 1), True, False, "2026-01-01",
+    ]
+    documents = []
+    for number, value in enumerate(values):
+        document = {"id": f"row-{number:02d}"}
+        if value is not MISSING:
+            document["sort_value"] = value
+        documents.append(document)
+    return documents
+
+async def page_through(collection, direction, limit):
+    ids, after = [], None
+    for _ in range(len(collection.documents) + 2):
+        page = PageParams(after=after, limit=limit, fields=None)
+        documents, headers, _ = await find_page(collection, {}, page, sort_field="sort_value", direction=direction)
+        ids.extend(document["id"] for document in documents)
+        after = headers.get(NEXT_CURSOR_HEADER)
+        if not after:
+            return ids
+    raise AssertionError("paging did not finish")
+
+def expected_order(collection, direction):
+    return [document["id"] for document in collection.find({}).sort([("sort_value", direction), ("id", direction)]).documents]
+
+def test_mixed_types_page_in_mongo_order():
+    async def run():
+        collection = FakeCollection(mixed_documents())
+        for direction in (1, -1):
+            for limit in (1, 2, 3, 5):
+                ids = await page_through(collection, direction, limit)
+                assert ids == expected_order(collection, direction), f"direction={direction} limit={limit}: {ids}"
+    asyncio.run(run())
+
+def test_single_type_pages_unchanged():
+    async def run():
+        collection = FakeCollection([{"id": f"row-{number}", "sort_value": datetime(2026, 1, 1 + number % 5)} for number in range(12)])
+        for direction in (1, -1):
+            ids = await page_through(collection, direction, 4)
+            assert ids == expected_order(collection, direction)
+            assert len(set(ids)) == 12
+    asyncio.run(run())
+
+def main():
+    tests = [
+        test_mixed_types_page_in_mongo_order,
+        test_single_type_pages_unchanged,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} pagination tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Production Board Snapshot Test
+
+Exercises backend/production_board.py directly against an in-memory stand-in
+for the Motor calls it makes (no server or MongoDB needed):
+1. Logged board writes move the version, ETag and deltas
+2. A reload that finds changes nobody logged moves the ETag and deltas too
+3. A reload that finds nothing new keeps the ETag
+4. A change still being logged is waited for; one that was lost rebuilds the board
+5. A card that passes its due date untouched shows as overdue on the next read
+"""
+
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from counters import next_sequence  # noqa: E402
+from fake_mongo import FakeDatabase  # noqa: E402
+from production_board import (  # noqa: E402
+    BOARD_CHANGES_COLLECTION,
+    BOARD_CHANGE_GRACE_SECONDS,
+    BOARD_VERSION_COUNTER,
+    ProductionBoardSnapshot,
+    record_board_change,
+)
+
+def make_order(order_id, stage="order_entered", **changes):
+    order = {
+        "id": order_id,
+        "order_number": f"ADM-2026-{order_id[-1]}",
+        "client_id": "client-1",
+        "client_name": "Acme Labels",
+        "status": "active",
+        "current_stage": stage,
+        "due_date": datetime.now() + timedelta(days=7),
+        "total_amount": 100.0,
+        "items": [],
+        "display_order": int(order_id[-1]),
+    }
+    order.update(changes)
+    return order
+
+def make_db():
+    db = FakeDatabase()
+    db.orders.documents = [make_order("order-1"), make_order("order-2")]
+    db.clients.documents = [{"id": "client-1", "company_name": "Acme Labels"}]
+    return db
+
+async def loaded_snapshot(db):
+    """A snapshot loaded at a logged version, so deltas can start from it"""
+    await record_board_change(db, [])
+    snapshot = ProductionBoardSnapshot()
+    await snapshot.ensure_fresh(db)
+    return snapshot
+
+def test_logged_write_moves_etag():
+    async def run():
+        db = make_db()
+        snapshot = await loaded_snapshot(db)
+        etag = snapshot.etag
+        db.orders.documents[0]["current_stage"] = "paper_slitting"
+        await record_board_change(db, ["order-1"])
+        await snapshot.ensure_fresh(db)
+        assert snapshot.etag != etag
+        delta = snapshot.delta_since(1)
+        assert [entry["card"]["id"] for entry in delta["changed"]] == ["order-1"]
+        assert delta["changed"][0]["stage"] == "paper_slitting"
+    asyncio.run(run())
+
+def test_reload_logs_unlogged_changes():
+    async def run():
+        db = make_db()
+        snapshot = await loaded_snapshot(db)
+        etag, version = snapshot.etag, snapshot.version
+
+        # Written straight to Mongo: no counter bump, no logged change
+        db.orders.documents[0]["current_stage"] = "winding"
+        db.orders.documents.pop(1)
+        db.orders.documents.append(make_order("order-3"))
+        snapshot.invalidate()
+        await snapshot.ensure_fresh(db)
+
+        assert snapshot.etag != etag, "a reload that found changes must not reuse the old ETag"
+        assert snapshot.version > version
+        delta = snapshot.delta_since(version)
+        assert sorted(entry["card"]["id"] for entry in delta["changed"]) == ["order-1", "order-3"]
+        assert delta["removed"] == ["order-2"]
+        assert snapshot.board()["winding"][0]["id"] == "order-1"
+
+        # Another worker's snapshot catches up on the same logged change
+        other = ProductionBoardSnapshot()
+        await other.ensure_fresh(db)
+        assert other.etag == snapshot.etag
+    asyncio.run(run())
+
+def test_reload_without_changes_keeps_etag():
+    async def run():
+        db = make_db()
+        snapshot = await loaded_snapshot(db)
+        etag = snapshot.etag
+        snapshot.invalidate()
+        await snapshot.ensure_fresh(db)
+        assert snapshot.etag == etag
+        assert len(db.production_board_changes.documents) == 1
+    asyncio.run(run())
+
+def count_reloads(snapshot):
+    reloads = []
+    reload = snapshot._reload
+
+    async def counted(db):
+        reloads.append(1)
+        await reload(db)
+    snapshot._reload = counted
+    return reloads
+
+def test_change_still_being_logged_is_waited_for():
+    async def run():
+        db = make_db()
+        snapshot = await loaded_snapshot(db)
+        reloads = count_reloads(snapshot)
+
+        # Writer A has its version but hasn't logged it; writer B logs the next one
+        db.orders.documents[0]["current_stage"] = "winding"
+        version_a = await next_sequence(db, BOARD_VERSION_COUNTER)
+        db.orders.documents[1]["current_stage"] = "finishing"
+        await record_board_change(db, ["order-2"])
+        await snapshot.ensure_fresh(db)
+        assert reloads == [] and snapshot.version == 1, "stops before the gap without rebuilding"
+
+        await db[BOARD_CHANGES_COLLECTION].insert_one(
+            {"_id": version_a, "order_ids": ["order-1"], "created_at": datetime.now(timezone.utc)}
+        )
+        await snapshot.ensure_fresh(db)
+        assert reloads == [] and snapshot.version == 3
+        assert sorted(entry["card"]["id"] for entry in snapshot.delta_since(1)["changed"]) == ["order-1", "order-2"]
+    asyncio.run(run())
+
+def test_lost_change_rebuilds_board():
+    async def run():
+        db = make_db()
+        snapshot = await loaded_snapshot(db)
+        reloads = count_reloads(snapshot)
+
+        # Writer A took a version and failed; writer B's change is long logged
+        db.orders.documents[0]["current_stage"] = "winding"
+        await next_sequence(db, BOARD_VERSION_COUNTER)
+        await record_board_change(db, ["order-2"])
+        db[BOARD_CHANGES_COLLECTION].documents[-1]["created_at"] = datetime.now(timezone.utc) - timedelta(seconds=BOARD_CHANGE_GRACE_SECONDS + 5)
+        await snapshot.ensure_fresh(db)
+        assert reloads == [1]
+        assert snapshot.version >= 3
+        assert snapshot.board()["winding"][0]["id"] == "order-1"
+    asyncio.run(run())
+
+def test_card_goes_overdue_without_a_write():
+    async def run():
+        db = make_db()
+        db.orders.documents[0]["due_date"] = datetime.now(timezone.utc) + timedelta(seconds=0.3)
+        snapshot = await loaded_snapshot(db)
+        etag, version = snapshot.etag, snapshot.version
+        assert snapshot.board()["order_entered"][0]["is_overdue"] is False
+        assert snapshot.delta_since(version)["changed"] == []
+
+        time.sleep(0.4)
+        await snapshot.ensure_fresh(db)
+        assert snapshot.version == version, "nothing was written"
+        assert snapshot.board()["order_entered"][0]["is_overdue"] is True
+        assert snapshot.etag != etag, "a client holding the old board must not get a 304"
+        delta = snapshot.delta_since(version)
+        assert [(entry["card"]["id"], entry["card"]["is_overdue"]) for entry in delta["changed"]] == [("order-1", True)]
+    asyncio.run(run())
+
+def main():
+    tests = [
+        test_logged_write_moves_etag,
+        test_reload_logs_unlogged_changes,
+        test_reload_without_changes_keeps_etag,
+        test_change_still_being_logged_is_waited_for,
+        test_lost_change_rebuilds_board,
+        test_card_goes_overdue_without_a_write,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} production board tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Production Events Ticket Test
+
+Calls the production event stream endpoints in backend/server.py directly,
+with the module's db swapped for an in-memory stand-in (no running server or
+MongoDB needed):
+1. A ticket is issued to a signed-in user and opens exactly one stream
+2. Expired and unknown tickets are refused
+3. A bearer token passed in the URL is no longer accepted
+"""
+
+import asyncio
+import os
+import sys
+from datetime import datetime, timedelta, timezone
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "production_events_ticket_test")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fastapi import HTTPException  # noqa: E402
+from starlette.requests import Request  # noqa: E402
+
+import server  # noqa: E402
+from auth import create_access_token  # noqa: E402
+from fake_mongo import FakeDatabase  # noqa: E402
+from production_events import STREAM_TICKETS_COLLECTION, issue_stream_ticket, redeem_stream_ticket  # noqa: E402
+
+USER = {"sub": "operator", "role": "production_team", "user_id": "user-1"}
+
+def make_request(query_string="", headers=None):
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/api/production/events",
+        "query_string": query_string.encode(),
+        "headers": [(name.lower().encode(), value.encode()) for name, value in (headers or {}).items()],
+    })
+
+def open_stream(db, ticket=None, headers=None):
+    """Status code stream_production_events answers with (200 if it would stream)"""
+    async def subscribe(last_event_id=None):
+        return asyncio.Queue()
+
+    async def run():
+        original_db, original_subscribe = server.db, server.production_events.subscribe
+        server.db, server.production_events.subscribe = db, subscribe
+        try:
+            response = await server.stream_production_events(
+                make_request(headers=headers), ticket=ticket, last_event_id=None, last_event_id_param=None
+            )
+            return response.status_code
+        except HTTPException as e:
+            return e.status_code
+        finally:
+            server.db, server.production_events.subscribe = original_db, original_subscribe
+    return asyncio.run(run())
+
+def test_ticket_opens_one_stream():
+    db = FakeDatabase()
+    issued = asyncio.run(issue_stream_ticket(db, USER))
+    stored = db[STREAM_TICKETS_COLLECTION].documents[0]
+    assert stored["role"] == "production_team" and stored["user_id"] == "user-1"
+    assert open_stream(db, ticket=issued["ticket"]) == 200
+    assert open_stream(db, ticket=issued["ticket"]) == 401, "tickets are single-use"
+
+def test_expired_and_unknown_tickets_refused():
+    db = FakeDatabase()
+    issued = asyncio.run(issue_stream_ticket(db, USER))
+    db[STREAM_TICKETS_COLLECTION].documents[0]["expires_at"] = datetime.now(timezone.utc) - timedelta(seconds=1)
+    assert asyncio.run(redeem_stream_ticket(db, issued["ticket"])) is None
+    assert open_stream(db, ticket="not-a-ticket") == 401
+
+def test_bearer_token_only_in_header():
+    db = FakeDatabase()
+    token = create_access_token(USER)
+    assert open_stream(db, headers={"Authorization": f"Bearer {token}"}) == 200
+    assert open_stream(db, ticket=token) == 401, "a JWT is not a ticket"
+    assert open_stream(db) == 401
+
+def main():
+    tests = [
+        test_ticket_opens_one_stream,
+        test_expired_and_unknown_tickets_refused,
+        test_bearer_token_only_in_header,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} production events ticket tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Report Rollups Test
+
+Exercises backend/report_rollups.py directly against an in-memory stand-in for
+the handful of Motor calls it makes (no server or MongoDB needed):
+1. Editing, cancelling and deleting an order moves its contribution between buckets
+2. Incremental refreshes end up with the same buckets as a full rebuild
+3. Two concurrent refreshes of the same order only count it once
+4. Buckets are dropped once nothing counts towards them any more
+"""
+
+import asyncio
+import copy
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from fake_mongo import FakeDatabase  # noqa: E402
+from report_rollups import (  # noqa: E402
+    CONTRIBUTIONS_COLLECTION,
+    ROLLUPS_COLLECTION,
+    order_contribution,
+    rebuild_rollups,
+    record_rollups,
+)
+
+def make_order(order_id="order-1", **changes):
+    order = {
+        "id": order_id,
+        "client_id": "client-1",
+        "client_name": "Acme Labels",
+        "status": "active",
+        "current_stage": "order_entered",
+        "total_amount": 150.0,
+        "due_date": datetime(2026, 3, 20),
+        "created_at": datetime(2026, 3, 2),
+        "items": [
+            {"product_id": "product-1", "product_name": "Core 76mm", "quantity": 100, "total_price": 100.0},
+            {"product_id": "product-2", "product_name": "Core 40mm", "quantity": 50, "total_price": 50.0},
+        ],
+    }
+    order.update(changes)
+    return order
+
+def buckets(db):
+    return {document["_id"]: document for document in db[ROLLUPS_COLLECTION].documents}
+
+async def rebuilt_buckets(db):
+    """Buckets a full rebuild produces from the same orders and invoices"""
+    fresh = FakeDatabase()
+    fresh.orders.documents = copy.deepcopy(db.orders.documents)
+    fresh.invoices.documents = copy.deepcopy(db.invoices.documents)
+    await rebuild_rollups(fresh)
+    return buckets(fresh)
+
+def assert_same_buckets(actual, expected):
+    """A metric missing from a bucket reads as 0, as it does in the reports"""
+    assert set(actual) == set(expected), f"{sorted(actual)} != {sorted(expected)}"
+    for key in expected:
+        for name in set(actual[key]) | set(expected[key]):
+            actual_value, expected_value = actual[key].get(name, 0), expected[key].get(name, 0)
+            assert actual_value == expected_value, f"{key}.{name}: {actual_value} != {expected_value}"
+
+def keys_of_kind(db, kind):
+    return sorted(key for key, bucket in buckets(db).items() if bucket.get("kind") == kind)
+
+def test_order_contribution_edit():
+    order = make_order()
+    edited = make_order(total_amount=200.0, items=[
+        {"product_id": "product-1", "product_name": "Core 76mm", "quantity": 200, "total_price": 200.0},
+    ])
+    before = {bucket["key"]: bucket["values"] for bucket in order_contribution(order)}
+    after = {bucket["key"]: bucket["values"] for bucket in order_contribution(edited)}
+    assert before["client_month:client-1:2026-03"]["revenue"] == 150.0
+    assert after["client_month:client-1:2026-03"]["revenue"] == 200.0
+    assert "client_product_month:client-1:2026-03:Core 40mm" in before
+    assert "client_product_month:client-1:2026-03:Core 40mm" not in after
+    assert after["product_day:product-1:client-1:2026-03-02"]["quantity"] == 200
+
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [order]
+        await record_rollups(db, ["order-1"])
+        db.orders.documents = [edited]
+        await record_rollups(db, ["order-1"])
+        assert_same_buckets(buckets(db), await rebuilt_buckets(db))
+        assert buckets(db)["client_month:client-1:2026-03"]["revenue"] == 200.0
+        assert keys_of_kind(db, "client_product_month") == ["client_product_month:client-1:2026-03:Core 76mm"]
+    asyncio.run(run())
+
+def test_order_contribution_cancel():
+    cancelled = make_order(status="cancelled")
+    kinds = {bucket["meta"]["kind"] for bucket in order_contribution(cancelled)}
+    assert "product_day" not in kinds, "cancelled orders don't count towards daily demand"
+    assert "client_month" in kinds, "cancelled orders still count as orders"
+
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [make_order()]
+        await record_rollups(db, ["order-1"])
+        assert len(keys_of_kind(db, "product_day")) == 2
+        db.orders.documents = [cancelled]
+        await record_rollups(db, ["order-1"])
+        assert keys_of_kind(db, "product_day") == []
+        assert_same_buckets(buckets(db), await rebuilt_buckets(db))
+    asyncio.run(run())
+
+def test_order_contribution_delete():
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [make_order(), make_order("order-2", total_amount=80.0, items=[])]
+        await record_rollups(db, ["order-1", "order-2"])
+        assert buckets(db)["client_month:client-1:2026-03"]["count"] == 2
+        db.orders.documents = [make_order("order-2", total_amount=80.0, items=[])]
+        await record_rollups(db, ["order-1"])
+        assert buckets(db)["client_month:client-1:2026-03"]["count"] == 1
+        assert buckets(db)["client_month:client-1:2026-03"]["revenue"] == 80.0
+        assert [document["_id"] for document in db[CONTRIBUTIONS_COLLECTION].documents] == ["order:order-2"]
+        assert_same_buckets(buckets(db), await rebuilt_buckets(db))
+    asyncio.run(run())
+
+def test_concurrent_refreshes_count_once():
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [make_order()]
+        # Two first-time refreshes race to insert the contribution
+        await asyncio.gather(record_rollups(db, ["order-1"]), record_rollups(db, ["order-1"]))
+        assert buckets(db)["client_month:client-1:2026-03"]["count"] == 1
+
+        # Two refreshes after an edit both read the old contribution
+        db.orders.documents = [make_order(total_amount=400.0)]
+        await asyncio.gather(record_rollups(db, ["order-1"]), record_rollups(db, ["order-1"]))
+        assert buckets(db)["client_month:client-1:2026-03"]["revenue"] == 400.0
+        assert buckets(db)["client_month:client-1:2026-03"]["count"] == 1
+
+        # An edit landing while another refresh is already running
+        async def edit_and_refresh():
+            await asyncio.sleep(0)
+            db.orders.documents = [make_order(total_amount=90.0, current_stage="cleared", completed_at=datetime(2026, 4, 1))]
+            await record_rollups(db, ["order-1"])
+        await asyncio.gather(record_rollups(db, ["order-1"]), edit_and_refresh())
+        assert_same_buckets(buckets(db), await rebuilt_buckets(db))
+        assert db[CONTRIBUTIONS_COLLECTION].documents[0]["version"] >= 3
+    asyncio.run(run())
+
+def test_bucket_deleted_when_count_returns_to_zero():
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [make_order(current_stage="cleared", completed_at=datetime(2026, 3, 10))]
+        await record_rollups(db, ["order-1"])
+        assert "completed_month:2026-03" in buckets(db)
+
+        # Moved back off cleared: the completed_month bucket goes, the rest stay
+        db.orders.documents = [make_order()]
+        await record_rollups(db, ["order-1"])
+        assert "completed_month:2026-03" not in buckets(db)
+        assert "client_month:client-1:2026-03" in buckets(db)
+
+        db.orders.documents = []
+        await record_rollups(db, ["order-1"])
+        assert buckets(db) == {}
+        assert db[CONTRIBUTIONS_COLLECTION].documents == []
+    asyncio.run(run())
+
+def test_bucket_kept_while_other_metrics_pending():
+    async def run():
+        db = FakeDatabase()
+        db.orders.documents = [make_order(items=[])]
+        await record_rollups(db, ["order-1"])
+        # Revenue another refresh has added but whose count hasn't landed yet
+        buckets(db)["client_month:client-1:2026-03"]["revenue"] += 25.0
+        db.orders.documents = []
+        await record_rollups(db, ["order-1"])
+        bucket = buckets(db)["client_month:client-1:2026-03"]
+        assert bucket["count"] == 0 and bucket["revenue"] == 25.0
+    asyncio.run(run())
+
+def main():
+    tests = [
+        test_order_contribution_edit,
+        test_order_contribution_cancel,
+        test_order_contribution_delete,
+        test_concurrent_refreshes_count_once,
+        test_bucket_deleted_when_count_returns_to_zero,
+        test_bucket_kept_while_other_metrics_pending,
+    ]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} report rollup tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
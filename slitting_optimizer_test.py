@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Slitting Optimizer Test
+
+Checks backend/slitting_optimizer.py find_slit_patterns against brute-force
+enumeration on small width sets (no server needed):
+1. Every valid pattern is found, and nothing else, with and without max_counts
+2. total_patterns matches the brute-force count
+3. Patterns come back widest used width first, so a capped search returns the best
+"""
+
+import itertools
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+
+from slitting_optimizer import find_slit_patterns  # noqa: E402
+
+# Inputs below use at most two decimal places, so hundredths are exact
+UNITS_PER_MM = 100
+
+CASES = [
+    # master width, slit widths, waste allowance, max counts
+    (1000, [100, 150, 200, 250], 20, None),
+    (1000, [100, 150, 200, 250], 20, {100: 2, 150: 1, 200: 3}),
+    (1320, [310, 220, 165, 95], 60, None),
+    (1320, [310, 220, 165, 95], 60, {310: 1, 220: 2, 165: 0}),
+    (500, [62.5, 77.25, 120], 15.5, None),
+    (500, [62.5, 77.25, 120], 15.5, {62.5: 3, 120: 1}),
+    (400, [450, 130, 90], 400, None),
+]
+
+def units(value):
+    return int(round(value * UNITS_PER_MM))
+
+def brute_force_patterns(master_width_mm, slit_widths, waste_allowance_mm, max_counts=None):
+    """Every count vector (widths descending) that fits within the waste allowance"""
+    widths = sorted(set(slit_widths), reverse=True)
+    capacity = units(master_width_mm)
+    min_total = max(1, capacity - units(waste_allowance_mm))
+    ranges = []
+    for width in widths:
+        most = capacity // units(width)
+        if max_counts and width in max_counts:
+            most = min(most, max_counts[width])
+        ranges.append(range(most + 1))
+    patterns = {}
+    for pattern in itertools.product(*ranges):
+        total = sum(count * units(width) for count, width in zip(pattern, widths))
+        if min_total <= total <= capacity:
+            patterns[pattern] = total
+    return widths, patterns
+
+def used_width(widths, pattern):
+    return sum(count * units(width) for count, width in zip(pattern, widths))
+
+def check_case(master_width_mm, slit_widths, waste_allowance_mm, max_counts):
+    widths, expected = brute_force_patterns(master_width_mm, slit_widths, waste_allowance_mm, max_counts)
+    search = find_slit_patterns(
+        master_width_mm, slit_widths, waste_allowance_mm,
+        max_results=10_000, time_budget_seconds=30, max_counts=max_counts
+    )
+    label = f"{master_width_mm}mm {slit_widths} waste {waste_allowance_mm} caps {max_counts}"
+    assert search.widths == [float(width) for width in widths], label
+    assert set(search.patterns) == set(expected), f"{label}: patterns differ from brute force"
+    assert len(search.patterns) == len(expected), f"{label}: duplicate patterns"
+    assert search.total_patterns == len(expected), f"{label}: total {search.total_patterns} != {len(expected)}"
+    assert not search.truncated and not search.timed_out, label
+
+    totals = [used_width(widths, pattern) for pattern in search.patterns]
+    assert totals == sorted(totals, reverse=True), f"{label}: not widest first"
+
+    # A capped search returns the widest patterns there are
+    if len(expected) > 3:
+        capped = find_slit_patterns(
+            master_width_mm, slit_widths, waste_allowance_mm,
+            max_results=3, time_budget_seconds=30, max_counts=max_counts
+        )
+        best = sorted(expected.values(), reverse=True)[:3]
+        assert [used_width(widths, pattern) for pattern in capped.patterns] == best, f"{label}: capped search missed the best"
+        assert capped.truncated and capped.total_patterns == len(expected), label
+
+def test_fixed_cases():
+    for case in CASES:
+        check_case(*case)
+
+def test_random_cases():
+    rng = random.Random(20260301)
+    for _ in range(40):
+        master_width_mm = rng.randrange(300, 900, 10)
+        slit_widths = rng.sample(range(60, 300, 5), rng.randint(2, 4))
+        waste_allowance_mm = rng.choice([10, 40, 120, master_width_mm])
+        max_counts = None
+        if rng.random() < 0.5:
+            max_counts = {width: rng.randint(0, 4) for width in slit_widths if rng.random() < 0.7}
+        check_case(master_width_mm, slit_widths, waste_allowance_mm, max_counts)
+
+def test_no_widths():
+    search = find_slit_patterns(1000, [], 50)
+    assert search.patterns == [] and search.total_patterns == 0
+
+def main():
+    tests = [test_fixed_cases, test_random_cases, test_no_widths]
+    failed = 0
+    for test in tests:
+        try:
+            test()
+            print(f"✅ PASS: {test.__name__}")
+        except AssertionError as e:
+            failed += 1
+            print(f"❌ FAIL: {test.__name__} - {e}")
+    print(f"\n{len(tests) - failed}/{len(tests)} slitting optimizer tests passed")
+    return failed == 0
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)